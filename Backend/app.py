@@ -11,13 +11,27 @@ load_dotenv()
 
 # Import routes
 from app.auth import auth_bp
-from app.users import users_bp
+from app.users import users_bp, recent_plays_cache
 from app.subscriptions import subscriptions_bp
+from app.uploads import uploads_bp
+from app.songs import songs_bp
+from app.search import search_bp, search_service, autocomplete_service
+from app.recommendations import recommendations_bp, similar_songs_service, for_you_service, trending_service
+from app.analytics import analytics_bp, unique_listeners_service, play_rollup_aggregator, session_aggregator
 from services.s3_service import s3_service
+from services.segment_cache import segment_cache
+from services.jamendo_service import jamendo_service
+from services.media_probe import MediaProbeError, sniff_file
 
 # Allowed file extensions
 ALLOWED_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv', 'webm', 'mp3', 'wav', 'flac'}
 
+
+def allowed_file(filename):
+    """Check the file name has one of ALLOWED_EXTENSIONS"""
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
 def create_app():
     app = Flask(__name__)
 
@@ -26,6 +40,7 @@ def create_app():
     app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=7)  # Session expires after 7 days
     app.config['SESSION_COOKIE_HTTPONLY'] = True
     app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
+    app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_UPLOAD_MB', 512)) * 1024 * 1024  # Upload size limit
     
     # Store database config for direct PyMySQL connections
     app.config['DB_CONFIG'] = {
@@ -45,6 +60,25 @@ def create_app():
     app.register_blueprint(auth_bp)
     app.register_blueprint(users_bp)
     app.register_blueprint(subscriptions_bp)
+    app.register_blueprint(uploads_bp)
+    app.register_blueprint(songs_bp)
+    app.register_blueprint(search_bp)
+    app.register_blueprint(recommendations_bp)
+    app.register_blueprint(analytics_bp)
+
+    # Build the search and autocomplete indexes in the background
+    search_service.init_app(app)
+    autocomplete_service.init_app(app)
+
+    # Keep the "for you" genre charts and trending charts fresh in the background
+    for_you_service.init_app(app)
+    trending_service.init_app(app)
+
+    # Write unique-listener sketches and fold new plays into the rollups and
+    # listening sessions in the background
+    unique_listeners_service.init_app(app)
+    play_rollup_aggregator.init_app(app)
+    session_aggregator.init_app(app)
 
     
     # Health check endpoint with database connection test
@@ -96,6 +130,76 @@ def create_app():
                 'bucket': s3_service.bucket_name
             }), 500
     
+    # Stream segment cache statistics
+    @app.route('/health/stream-cache')
+    def stream_cache_stats():
+        return jsonify({
+            'status': 'ok',
+            'service': 'stream segment cache',
+            'cache': segment_cache.get_stats()
+        })
+    
+    # Recent plays served from memory for the first history pages
+    @app.route('/health/history-cache')
+    def history_cache_stats():
+        return jsonify({
+            'status': 'ok',
+            'service': 'recent plays cache',
+            'cache': recent_plays_cache.get_stats()
+        })
+    
+    # S3 client pool and latency statistics
+    @app.route('/health/s3-client')
+    def s3_stats():
+        return jsonify({
+            'status': 'ok',
+            'service': 'S3 client',
+            's3': s3_service.get_stats()
+        })
+    
+    @app.route('/health/jamendo')
+    def jamendo_stats():
+        return jsonify({
+            'status': 'ok',
+            'service': 'Jamendo API client',
+            'jamendo': jamendo_service.get_stats()
+        })
+    
+    @app.route('/health/search')
+    def search_stats():
+        stats = search_service.get_stats()
+        autocomplete = autocomplete_service.get_stats()
+        return jsonify({
+            'status': 'ok' if stats['ready'] and autocomplete['ready'] else 'building',
+            'service': 'search index',
+            'search': stats,
+            'autocomplete': autocomplete
+        })
+    
+    @app.route('/health/recommendations')
+    def recommendations_stats():
+        stats = similar_songs_service.get_stats()
+        for_you = for_you_service.get_stats()
+        trending = trending_service.get_stats()
+        return jsonify({
+            'status': 'ok' if stats['ready'] and for_you['ready'] and trending['ready'] else 'not built',
+            'service': 'recommendations',
+            'similar_songs': stats,
+            'for_you': for_you,
+            'trending': trending
+        })
+    
+    @app.route('/health/analytics')
+    def analytics_stats():
+        stats = unique_listeners_service.get_stats()
+        return jsonify({
+            'status': 'ok',
+            'service': 'analytics',
+            'unique_listeners': stats,
+            'play_rollups': play_rollup_aggregator.last_run,
+            'sessions': session_aggregator.last_run
+        })
+    
     # Root endpoint
     @app.route('/')
     def root():
@@ -106,6 +210,8 @@ def create_app():
                 'auth': '/api/auth',
                 'music': '/api/music',
                 'upload': '/api/upload',
+                'uploads': '/api/uploads',
+                'songs': '/api/songs',
                 'health': '/health'
             }
         })
@@ -121,9 +227,14 @@ def create_app():
         - folder: Target folder in S3 (e.g., 'uploads/songs')
         - filename: (Optional) Custom filename
         
+        The file's extension must be in ALLOWED_EXTENSIONS and its first bytes
+        must be that media type (415 otherwise), checked before anything is
+        sent to S3.
+        
         Returns:
             - success: True/False
             - url: S3 URL of uploaded file
+            - media: Format, duration, bitrate and sample rate read from the headers
             - error: Error message if failed
         """
         try:
@@ -136,6 +247,18 @@ def create_app():
             if file.filename == '':
                 return jsonify({'error': 'No file selected'}), 400
             
+            if not allowed_file(file.filename):
+                return jsonify({
+                    'error': 'File type not allowed',
+                    'allowed_extensions': sorted(ALLOWED_EXTENSIONS)
+                }), 400
+            
+            # Check the content really is that media type before uploading it
+            try:
+                media = sniff_file(file.stream, file.filename)
+            except MediaProbeError as e:
+                return jsonify({'error': f"Unsupported media: {str(e)}"}), 415
+            
             # Get folder path (default to 'uploads')
             folder = request.form.get('folder', 'uploads')
             custom_filename = request.form.get('filename')
@@ -147,7 +270,8 @@ def create_app():
                 return jsonify({
                     'success': True,
                     'url': result['url'],
-                    'key': result['key']
+                    'key': result['key'],
+                    'media': media
                 }), 200
             else:
                 return jsonify({
@@ -0,0 +1,7 @@
+"""
+Analytics module for listening statistics
+"""
+from .routes import analytics_bp
+from .services import unique_listeners_service, play_rollup_aggregator, session_aggregator
+
+__all__ = ['analytics_bp', 'unique_listeners_service', 'play_rollup_aggregator', 'session_aggregator']
@@ -0,0 +1,119 @@
+"""
+Job rebuilding unique-listener sketches from PlayHistory
+
+Plays are read one day at a time with a server-side cursor and merged into
+ListenerSketch like the API's own flushes. Merging is idempotent, so a range
+can be backfilled while the API is running, or backfilled again, without
+counting anyone twice.
+
+Run it from the Backend directory:
+
+    python -m app.analytics.backfill                       # last 30 days
+    python -m app.analytics.backfill --from 2025-01-01 --to 2025-06-30
+"""
+import json
+import time
+import argparse
+import pymysql
+from datetime import date, datetime, timedelta
+from app.auth.utils import get_db_connection
+from app.utils.cli import job_app
+from .hll import HyperLogLog
+from .services import write_sketches
+
+
+# Rows pulled per round trip while streaming
+FETCH_SIZE = 10000
+
+
+def backfill_unique_listeners(start, end, connect=None):
+    """
+    Merge the plays of start..end into ListenerSketch
+
+    Args:
+        start (date): First day, inclusive
+        end (date): Last day, inclusive
+        connect: Database connection factory (default: get_db_connection)
+
+    Returns:
+        tuple: (success: bool, result: dict/str)
+    """
+    started = time.monotonic()
+    plays = 0
+    rows = 0
+    connection = None
+    try:
+        connection = (connect or get_db_connection)()
+        day = start
+        while day <= end:
+            pending = {}
+            cursor = connection.cursor(pymysql.cursors.SSCursor)
+            try:
+                cursor.execute(
+                    "SELECT ListenerID, SongID FROM PlayHistory WHERE PlayedAt >= %s AND PlayedAt < %s",
+                    (day, day + timedelta(days=1))
+                )
+                while True:
+                    batch = cursor.fetchmany(FETCH_SIZE)
+                    if not batch:
+                        break
+                    for listener_id, song_id in batch:
+                        sketch = pending.get(song_id)
+                        if sketch is None:
+                            sketch = pending[song_id] = HyperLogLog()
+                        sketch.add(listener_id)
+                    plays += len(batch)
+            finally:
+                cursor.close()
+
+            if pending:
+                rows += write_sketches(connection, {(day, song_id): sketch for song_id, sketch in pending.items()})
+            day += timedelta(days=1)
+
+    except pymysql.Error as e:
+        if connection:
+            connection.rollback()
+        return False, f"Database error: {str(e)}"
+
+    finally:
+        if connection:
+            connection.close()
+
+    return True, {
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'plays': plays,
+        'rows': rows,
+        'seconds': round(time.monotonic() - started, 3)
+    }
+
+
+def _date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild unique-listener sketches from PlayHistory")
+    parser.add_argument('--from', dest='start', type=_date, default=None,
+                        help="first day, YYYY-MM-DD (default: 30 days ago)")
+    parser.add_argument('--to', dest='end', type=_date, default=None,
+                        help="last day, YYYY-MM-DD (default: today)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    app = job_app(__name__)
+
+    end = args.end or date.today()
+    start = args.start or end - timedelta(days=29)
+
+    with app.app_context():
+        success, result = backfill_unique_listeners(start, end)
+
+    print(json.dumps(result, indent=2) if success else result)
+    return 0 if success else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
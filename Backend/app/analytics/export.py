@@ -0,0 +1,420 @@
+"""
+Columnar export of PlayHistory, Reaction and Follow for offline analysis
+
+Each table is streamed with a server-side cursor, past the last exported ID,
+into one file per column, partitioned by day:
+
+    <root>/<Table>/day=2025-05-28/part-<first id>/<Column>.npy
+    <root>/<Table>/_export.json
+
+Columns are plain 1-D .npy files (written directly, numpy is not needed
+here), so analysis code can map them with numpy.load(path, mmap_mode='r'),
+or with open_column() below without numpy, and scan them vectorized instead
+of querying MySQL. Types:
+
+    ids and counts      int64 / int32, NULL as -1
+    timestamps          datetime64[s] (the database's wall-clock time), NULL as NaT
+    short strings       int16 codes into _export.json "dictionaries", NULL as -1
+
+_export.json holds the last exported ID (the watermark) and the string
+dictionaries. It is written after every part is in place, so an interrupted
+export is simply repeated: the parts it rewrites get the same names (a part
+is named after its first row's ID) and are replaced whole.
+
+Rows younger than SETTLE_SECONDS are left for the next run, as in
+rollups.py: IDs are handed out before commit, so the watermark must not
+pass a row that is still in flight.
+
+Exports only append: rows deleted or changed in the database after export
+(an unfollow, an edited reaction) keep their exported values.
+
+Run it from the Backend directory (e.g. nightly from cron):
+
+    python -m app.analytics.export
+    python -m app.analytics.export --table PlayHistory --out /data/exports
+
+The default directory is EXPORT_DIR (or music-exports in the temp dir).
+"""
+import os
+import ast
+import sys
+import json
+import mmap
+import time
+import shutil
+import tempfile
+import struct
+import argparse
+import calendar
+import pymysql
+from array import array
+from datetime import date, datetime
+from app.auth.utils import get_db_connection
+from app.utils.cli import job_app
+from .rollups import SETTLE_SECONDS
+
+
+# Rows pulled per round trip while streaming
+FETCH_SIZE = 10000
+
+# Rows per part file; a day with more plays gets several parts
+PART_ROWS = 1000000
+
+# Days buffered at once. Rows arrive in ID order, which is close to time
+# order, so older days are written out as newer ones appear.
+MAX_OPEN_DAYS = 3
+
+# Column kinds: array typecode, .npy descr, NULL value
+_INT64 = ('q', '<i8', -1)
+_INT32 = ('i', '<i4', -1)
+_TIMESTAMP = ('q', '<M8[s]', -2 ** 63)
+_CATEGORY = ('h', '<i2', -1)
+
+_DESCR_TYPECODES = {'<i8': 'q', '<i4': 'i', '<i2': 'h', '<M8[s]': 'q'}
+
+# Exported tables: ID column, timestamp column (for the day) and columns
+TABLES = {
+    'PlayHistory': {
+        'id': 'HistoryID',
+        'time': 'PlayedAt',
+        'columns': [
+            ('HistoryID', _INT64),
+            ('ListenerID', _INT64),
+            ('SongID', _INT64),
+            ('PlayedAt', _TIMESTAMP),
+            ('ListenDuration', _INT32)
+        ]
+    },
+    'Reaction': {
+        'id': 'ReactionID',
+        'time': 'ReactedAt',
+        'columns': [
+            ('ReactionID', _INT64),
+            ('ListenerID', _INT64),
+            ('ReactableType', _CATEGORY),
+            ('ReactableID', _INT64),
+            ('Emotion', _CATEGORY),
+            ('ReactedAt', _TIMESTAMP)
+        ]
+    },
+    'Follow': {
+        'id': 'FollowID',
+        'time': 'FollowedDate',
+        'columns': [
+            ('FollowID', _INT64),
+            ('ListenerID', _INT64),
+            ('ArtistID', _INT64),
+            ('FollowedDate', _TIMESTAMP)
+        ]
+    }
+}
+
+_STATE_FILE = '_export.json'
+_NPY_MAGIC = b'\x93NUMPY'
+
+
+def _npy_header(descr, length):
+    """Version 1.0 .npy header for a 1-D array, padded so the data starts 64-byte aligned"""
+    header = "{'descr': '%s', 'fortran_order': False, 'shape': (%d,), }" % (descr, length)
+    header += ' ' * (-(len(_NPY_MAGIC) + 4 + len(header) + 1) % 64) + '\n'
+    return _NPY_MAGIC + b'\x01\x00' + struct.pack('<H', len(header)) + header.encode('latin1')
+
+
+def write_column(path, values, descr):
+    """Write an array as a 1-D little-endian .npy file"""
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    with open(path, 'wb') as f:
+        f.write(_npy_header(descr, len(values)))
+        values.tofile(f)
+
+
+def open_column(path):
+    """
+    Read-only, memory-mapped view of a column written by write_column
+
+    Returns:
+        memoryview: The values (int64 seconds for timestamps)
+
+    Raises:
+        ValueError: If the file is not a 1-D .npy column of a supported type
+    """
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    view = memoryview(mapped)
+    if bytes(view[:6]) != _NPY_MAGIC or view[6] != 1:
+        raise ValueError(f"Not a version 1 .npy file: {path}")
+    header_length, = struct.unpack_from('<H', view, 8)
+    header = ast.literal_eval(bytes(view[10:10 + header_length]).decode('latin1'))
+    typecode = _DESCR_TYPECODES.get(header['descr'])
+    if typecode is None or header['fortran_order'] or len(header['shape']) != 1:
+        raise ValueError(f"Unsupported column {path}: {header}")
+    if sys.byteorder != 'little':
+        raise ValueError("open_column needs a little-endian machine; use numpy.load instead")
+    return view[10 + header_length:].cast(typecode)
+
+
+def partitions(root, table, start=None, end=None):
+    """
+    Part directories of an exported table, oldest day first
+
+    Args:
+        root (str): Export directory
+        table (str): Table name
+        start (date): First day wanted (default: all)
+        end (date): Last day wanted (default: all)
+
+    Returns:
+        list: [(day, part directory)]
+    """
+    directory = os.path.join(root, table)
+    if not os.path.isdir(directory):
+        return []
+
+    result = []
+    for name in sorted(os.listdir(directory)):
+        if not name.startswith('day='):
+            continue
+        day = date.fromisoformat(name[4:])
+        if (start and day < start) or (end and day > end):
+            continue
+        day_directory = os.path.join(directory, name)
+        parts = sorted(
+            (part for part in os.listdir(day_directory) if part.startswith('part-')),
+            key=lambda part: int(part[5:])
+        )
+        result.extend((day, os.path.join(day_directory, part)) for part in parts)
+    return result
+
+
+def _epoch_seconds(value):
+    """Seconds since the epoch of a DATETIME (or DATE, from midnight), read as UTC"""
+    return calendar.timegm(value.timetuple())
+
+
+class _Part:
+    """Column buffers of one day's rows, from the row with first_id on"""
+
+    def __init__(self, first_id, columns):
+        self.first_id = first_id
+        self.columns = [array(kind[0]) for _, kind in columns]
+
+    def __len__(self):
+        return len(self.columns[0])
+
+
+class TableExporter:
+    """
+    Exports one table past its watermark into day partitions
+
+    Args:
+        root (str): Export directory
+        table (str): One of TABLES
+        part_rows (int): Rows per part file
+    """
+
+    def __init__(self, root, table, part_rows=PART_ROWS):
+        self.spec = TABLES[table]
+        self.table = table
+        self.directory = os.path.join(root, table)
+        self.part_rows = part_rows
+        self.state = self._load_state()
+        self._parts = {}        # day -> _Part, least recently started first
+        self.parts_written = 0
+
+    def _load_state(self):
+        try:
+            with open(os.path.join(self.directory, _STATE_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'table': self.table, 'last_id': 0, 'rows': 0, 'dictionaries': {}}
+
+    def _save_state(self):
+        path = os.path.join(self.directory, _STATE_FILE)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(temp_path, path)
+
+    def _code(self, column, value):
+        """Dictionary code of a string, adding it when new"""
+        dictionary = self.state['dictionaries'].setdefault(column, [])
+        try:
+            return dictionary.index(value)
+        except ValueError:
+            dictionary.append(value)
+            return len(dictionary) - 1
+
+    def _write_part(self, day, part):
+        day_directory = os.path.join(self.directory, f'day={day.isoformat()}')
+        final = os.path.join(day_directory, f'part-{part.first_id}')
+        temp = os.path.join(day_directory, f'.tmp-part-{part.first_id}')
+        os.makedirs(day_directory, exist_ok=True)
+        shutil.rmtree(temp, ignore_errors=True)
+        os.makedirs(temp)
+        for (name, (_, descr, _)), values in zip(self.spec['columns'], part.columns):
+            write_column(os.path.join(temp, f'{name}.npy'), values, descr)
+        if os.path.exists(final):
+            # A repeated export of the same rows (plus any added since)
+            shutil.rmtree(final)
+        os.rename(temp, final)
+        self.parts_written += 1
+
+    def _add(self, row, day):
+        part = self._parts.get(day)
+        if part is None:
+            if len(self._parts) >= MAX_OPEN_DAYS:
+                oldest = next(iter(self._parts))
+                self._write_part(oldest, self._parts.pop(oldest))
+            part = self._parts[day] = _Part(row[0], self.spec['columns'])
+
+        for (name, (_, descr, null)), values, value in zip(self.spec['columns'], part.columns, row):
+            if value is None:
+                values.append(null)
+            elif descr == '<M8[s]':
+                values.append(_epoch_seconds(value))
+            elif descr == '<i2':
+                values.append(self._code(name, value))
+            else:
+                values.append(value)
+
+        if len(part) >= self.part_rows:
+            self._write_part(day, self._parts.pop(day))
+
+    def export(self, connection):
+        """
+        Stream the rows past the watermark into part files and move the watermark
+
+        Args:
+            connection: Open database connection
+
+        Returns:
+            int: Rows exported
+        """
+        names = [name for name, _ in self.spec['columns']]
+        id_column, time_column = self.spec['id'], self.spec['time']
+        time_index = names.index(time_column)
+        assert names[0] == id_column
+
+        rows = 0
+        last_id = self.state['last_id']
+        cursor = connection.cursor()
+        try:
+            cursor.execute(
+                f"""
+                SELECT MAX({id_column}) FROM {self.table}
+                WHERE {id_column} > %s AND {time_column} < NOW() - INTERVAL %s SECOND
+                """,
+                (last_id, SETTLE_SECONDS)
+            )
+            settled_id = cursor.fetchone()[0]
+        finally:
+            cursor.close()
+        if settled_id is None:
+            return 0
+
+        cursor = connection.cursor(pymysql.cursors.SSCursor)
+        try:
+            cursor.execute(
+                f"SELECT {', '.join(names)} FROM {self.table} WHERE {id_column} > %s AND {id_column} <= %s ORDER BY {id_column}",
+                (last_id, settled_id)
+            )
+            while True:
+                batch = cursor.fetchmany(FETCH_SIZE)
+                if not batch:
+                    break
+                for row in batch:
+                    timestamp = row[time_index]
+                    day = timestamp.date() if isinstance(timestamp, datetime) else (timestamp or date(1970, 1, 1))
+                    self._add(row, day)
+                rows += len(batch)
+                last_id = batch[-1][0]
+        finally:
+            cursor.close()
+
+        for day, part in self._parts.items():
+            self._write_part(day, part)
+        self._parts = {}
+
+        if rows:
+            self.state.update({
+                'last_id': last_id,
+                'rows': self.state['rows'] + rows,
+                'exported_at': datetime.now().isoformat(timespec='seconds'),
+                'columns': {name: descr for name, (_, descr, _) in self.spec['columns']}
+            })
+            os.makedirs(self.directory, exist_ok=True)
+            self._save_state()
+        return rows
+
+
+def export_tables(root, tables=None, part_rows=PART_ROWS, connect=None):
+    """
+    Export new rows of each table
+
+    Args:
+        root (str): Export directory
+        tables (list): Table names (default: all of TABLES)
+        part_rows (int): Rows per part file
+        connect: Database connection factory (default: get_db_connection)
+
+    Returns:
+        tuple: (success: bool, result: dict/str)
+    """
+    started = time.monotonic()
+    report = {'root': root, 'tables': {}}
+    connection = None
+    try:
+        connection = (connect or get_db_connection)()
+        for table in tables or TABLES:
+            table_started = time.monotonic()
+            exporter = TableExporter(root, table, part_rows=part_rows)
+            rows = exporter.export(connection)
+            report['tables'][table] = {
+                'rows': rows,
+                'parts': exporter.parts_written,
+                'last_id': exporter.state['last_id'],
+                'seconds': round(time.monotonic() - table_started, 3)
+            }
+
+    except pymysql.Error as e:
+        return False, f"Database error: {str(e)}"
+
+    except OSError as e:
+        return False, f"Export failed: {str(e)}"
+
+    finally:
+        if connection:
+            connection.close()
+
+    report['seconds'] = round(time.monotonic() - started, 3)
+    return True, report
+
+
+def _parse_args(argv=None):
+    default_root = os.getenv('EXPORT_DIR') or os.path.join(tempfile.gettempdir(), 'music-exports')
+    parser = argparse.ArgumentParser(description="Export PlayHistory, Reaction and Follow to columnar files")
+    parser.add_argument('--out', default=default_root,
+                        help=f"export directory (default: EXPORT_DIR or {default_root})")
+    parser.add_argument('--table', action='append', dest='tables', choices=list(TABLES),
+                        help="table to export, repeatable (default: all)")
+    parser.add_argument('--part-rows', type=int, default=PART_ROWS,
+                        help=f"rows per part file (default: {PART_ROWS})")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    app = job_app(__name__)
+
+    with app.app_context():
+        success, result = export_tables(args.out, tables=args.tables, part_rows=args.part_rows)
+
+    print(json.dumps(result, indent=2) if success else result)
+    return 0 if success else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
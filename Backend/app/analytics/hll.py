@@ -0,0 +1,177 @@
+"""
+HyperLogLog: approximate distinct counts in a few kilobytes
+
+Each value is hashed to 64 bits. The first PRECISION bits pick one of
+m = 2^PRECISION registers, which keeps the longest run of leading zeros
+(plus one) seen in the remaining bits. Few distinct values rarely produce
+long runs, so the registers together estimate the count with a standard
+error of about 1.04 / sqrt(m) (1.6% here), however many values were added.
+
+Two sketches merge by taking the larger of each register, giving the sketch
+of the union. Merging is idempotent, so adding the same sketch twice is
+harmless, and daily sketches can be combined into any range of days.
+
+Small sketches are kept sparse (only the registers that are set) and switch
+to a dense array of m bytes once that is smaller.
+
+Serialized form (see to_bytes):
+    sparse  b'\\x00' then (register uint16, value uint8) big-endian pairs
+    dense   b'\\x01' then m register bytes
+"""
+import math
+import struct
+
+
+PRECISION = 12
+REGISTERS = 1 << PRECISION
+
+_SPARSE = 0
+_DENSE = 1
+_PAIR = struct.Struct('>HB')
+_VALUE_BITS = 64 - PRECISION
+_VALUE_MASK = (1 << _VALUE_BITS) - 1
+_MASK64 = (1 << 64) - 1
+
+# Largest sparse sketch: past this the dense array takes less space
+_MAX_SPARSE = REGISTERS // _PAIR.size
+
+_ALPHA = 0.7213 / (1 + 1.079 / REGISTERS)
+_POWERS = [2.0 ** -value for value in range(_VALUE_BITS + 2)]
+
+
+def hash64(value):
+    """
+    64-bit hash of an integer (splitmix64 finalizer)
+
+    Stable across processes and runs, unlike hash(), which is the identity for ints.
+    """
+    value = (value + 0x9E3779B97F4A7C15) & _MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return value ^ (value >> 31)
+
+
+class HyperLogLog:
+    """
+    Distinct-count sketch of integers (e.g. ListenerIDs)
+
+    Not thread-safe; the owner serializes updates.
+    """
+
+    __slots__ = ('_sparse', '_dense')
+
+    def __init__(self):
+        self._sparse = {}       # register -> value while small
+        self._dense = None      # bytearray of REGISTERS values once large
+
+    def add(self, value):
+        """Add an integer"""
+        hashed = hash64(value)
+        register = hashed >> _VALUE_BITS
+        rank = _VALUE_BITS - (hashed & _VALUE_MASK).bit_length() + 1
+        self._set(register, rank)
+
+    def _set(self, register, rank):
+        dense = self._dense
+        if dense is not None:
+            if rank > dense[register]:
+                dense[register] = rank
+            return
+        sparse = self._sparse
+        if rank > sparse.get(register, 0):
+            sparse[register] = rank
+            if len(sparse) > _MAX_SPARSE:
+                self._densify()
+
+    def _densify(self):
+        dense = bytearray(REGISTERS)
+        for register, rank in self._sparse.items():
+            dense[register] = rank
+        self._dense = dense
+        self._sparse = {}
+
+    def merge(self, other):
+        """
+        Fold another sketch into this one (the union of both)
+
+        Returns:
+            HyperLogLog: self
+        """
+        if other._dense is None:
+            for register, rank in other._sparse.items():
+                self._set(register, rank)
+            return self
+        if self._dense is None:
+            self._densify()
+        self._dense = bytearray(map(max, self._dense, other._dense))
+        return self
+
+    @classmethod
+    def union(cls, sketches):
+        """
+        One sketch of the union of many, merging all dense arrays in a single pass
+
+        Args:
+            sketches: Iterable of HyperLogLog
+
+        Returns:
+            HyperLogLog: New sketch
+        """
+        result = cls()
+        dense = []
+        for sketch in sketches:
+            if sketch._dense is not None:
+                dense.append(sketch._dense)
+            else:
+                result.merge(sketch)
+        if dense:
+            merged = bytearray(map(max, *dense)) if len(dense) > 1 else bytearray(dense[0])
+            if result._dense is None and not result._sparse:
+                result._dense = merged
+            else:
+                other = cls()
+                other._dense = merged
+                result.merge(other)
+        return result
+
+    def count(self):
+        """
+        Estimated number of distinct values added
+
+        Returns:
+            int: Estimate, within about 1.6% (3.2% at two standard errors)
+        """
+        if self._dense is not None:
+            zeros = self._dense.count(0)
+            total = sum(map(_POWERS.__getitem__, self._dense))
+        else:
+            zeros = REGISTERS - len(self._sparse)
+            total = zeros + sum(map(_POWERS.__getitem__, self._sparse.values()))
+
+        estimate = _ALPHA * REGISTERS * REGISTERS / total
+        if estimate <= 2.5 * REGISTERS and zeros:
+            # Linear counting is more accurate while many registers are empty
+            estimate = REGISTERS * math.log(REGISTERS / zeros)
+        return round(estimate)
+
+    def to_bytes(self):
+        if self._dense is not None:
+            return bytes([_DENSE]) + bytes(self._dense)
+        return bytes([_SPARSE]) + b''.join(_PAIR.pack(register, rank) for register, rank in sorted(self._sparse.items()))
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Sketch from to_bytes() output
+
+        Raises:
+            ValueError: If data is not a serialized sketch of this precision
+        """
+        sketch = cls()
+        if data[:1] == bytes([_DENSE]) and len(data) == REGISTERS + 1:
+            sketch._dense = bytearray(data[1:])
+        elif data[:1] == bytes([_SPARSE]) and (len(data) - 1) % _PAIR.size == 0:
+            sketch._sparse = dict(_PAIR.iter_unpack(data[1:]))
+        else:
+            raise ValueError("Not a HyperLogLog sketch")
+        return sketch
@@ -0,0 +1,224 @@
+"""
+Hourly and daily play rollups maintained from PlayHistory
+
+PlayRollupAggregator folds the PlayHistory rows past a watermark
+(RollupWatermark.LastHistoryID) into SongPlayRollup and ArtworkPlayRollup,
+one bounded range of HistoryIDs at a time. Each range is grouped in the
+database and added to the rollups with upserts, and the watermark moves in
+the same transaction, so a batch is applied exactly once: a failed run
+leaves nothing behind and a repeated run starts after the last committed
+batch. The watermark row is locked while a batch runs, so several processes
+can run the aggregator at once.
+
+Rows younger than SETTLE_SECONDS are left for the next run: HistoryIDs are
+handed out before commit, so a newer row can become visible before an older
+one, and the watermark must never pass a row still in flight.
+
+Run it from the Backend directory to catch up (the API also runs it in the
+background):
+
+    python -m app.analytics.rollups
+    python -m app.analytics.rollups --batch-size 200000
+"""
+import json
+import time
+import argparse
+import threading
+import pymysql
+from app.auth.utils import get_db_connection
+from app.utils.cli import job_app
+
+
+WATERMARK_NAME = 'play_rollups'
+
+# PlayHistory rows folded per transaction
+BATCH_SIZE = 50000
+
+# Plays this recent are left for the next run
+SETTLE_SECONDS = 60
+
+# A play that stops within this many seconds (or before the end of a
+# shorter song) counts as a skip
+SKIP_SECONDS = 30
+
+_PERIOD_START = {
+    'hour': "DATE_FORMAT(ph.PlayedAt, '%%Y-%%m-%%d %%H:00:00')",
+    'day': "DATE(ph.PlayedAt)"
+}
+
+_ROLLUP_QUERY = """
+    INSERT INTO {table} ({key}, Granularity, PeriodStart, ArtistID, Plays, ListenSeconds, Skips)
+    SELECT {source}, %s, {period_start} AS PeriodStart, aw.ArtistID,
+           COUNT(*),
+           COALESCE(SUM(ph.ListenDuration), 0),
+           SUM(COALESCE(ph.ListenDuration, 0) < LEAST(%s, COALESCE(s.Duration, %s)))
+    FROM PlayHistory ph
+    JOIN Song s ON ph.SongID = s.SongID
+    JOIN Artwork aw ON s.ArtworkID = aw.ArtworkID
+    WHERE ph.HistoryID > %s AND ph.HistoryID <= %s
+    GROUP BY {source}, PeriodStart, aw.ArtistID
+    ON DUPLICATE KEY UPDATE
+        Plays = Plays + VALUES(Plays),
+        ListenSeconds = ListenSeconds + VALUES(ListenSeconds),
+        Skips = Skips + VALUES(Skips)
+"""
+
+# (granularity, statement) for every rollup table and granularity
+_ROLLUPS = [
+    (granularity, _ROLLUP_QUERY.format(table=table, key=key, source=source, period_start=period_start))
+    for table, key, source in (
+        ('SongPlayRollup', 'SongID', 'ph.SongID'),
+        ('ArtworkPlayRollup', 'ArtworkID', 's.ArtworkID')
+    )
+    for granularity, period_start in _PERIOD_START.items()
+]
+
+
+class PlayRollupAggregator:
+    """
+    Keeps SongPlayRollup and ArtworkPlayRollup up to date with PlayHistory
+
+    Args:
+        batch_size (int): PlayHistory rows folded per transaction
+        interval (int): Seconds between background runs (see init_app)
+        connect: Database connection factory (default: get_db_connection)
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, interval=60, connect=None):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.connect = connect
+        self._thread = None
+        self.last_run = None
+
+    def init_app(self, app):
+        """Start a background thread catching the rollups up every `interval` seconds"""
+        if self._thread is not None:
+            return
+
+        def run():
+            while True:
+                with app.app_context():
+                    success, message = self.run()
+                    if not success:
+                        print(f"Play rollup failed: {message}")
+                time.sleep(self.interval)
+
+        self._thread = threading.Thread(target=run, name='play-rollups', daemon=True)
+        self._thread.start()
+
+    def run_batch(self):
+        """
+        Fold the next batch of settled plays into the rollups
+
+        Returns:
+            tuple: (success: bool, result: dict/str)
+                result dict has the HistoryID range folded ('from' exclusive,
+                'to' inclusive), or 'to' None when there was nothing to do
+        """
+        connection = None
+        try:
+            connection = (self.connect or get_db_connection)()
+            cursor = connection.cursor(pymysql.cursors.DictCursor)
+
+            cursor.execute(
+                "INSERT IGNORE INTO RollupWatermark (Name, LastHistoryID) VALUES (%s, 0)",
+                (WATERMARK_NAME,)
+            )
+            cursor.execute(
+                "SELECT LastHistoryID FROM RollupWatermark WHERE Name = %s FOR UPDATE",
+                (WATERMARK_NAME,)
+            )
+            watermark = cursor.fetchone()['LastHistoryID']
+
+            # Start from the first row past the watermark, so gaps in
+            # HistoryID never stall the aggregator
+            cursor.execute("SELECT MIN(HistoryID) AS FirstID FROM PlayHistory WHERE HistoryID > %s", (watermark,))
+            first_id = cursor.fetchone()['FirstID']
+            last_id = None
+            if first_id is not None:
+                cursor.execute(
+                    """
+                    SELECT MAX(HistoryID) AS LastID FROM PlayHistory
+                    WHERE HistoryID >= %s AND HistoryID < %s
+                      AND PlayedAt < NOW() - INTERVAL %s SECOND
+                    """,
+                    (first_id, first_id + self.batch_size, SETTLE_SECONDS)
+                )
+                last_id = cursor.fetchone()['LastID']
+            if last_id is None:
+                connection.commit()
+                return True, {'from': watermark, 'to': None}
+
+            for granularity, query in _ROLLUPS:
+                cursor.execute(query, (granularity, SKIP_SECONDS, SKIP_SECONDS, watermark, last_id))
+
+            cursor.execute(
+                "UPDATE RollupWatermark SET LastHistoryID = %s WHERE Name = %s",
+                (last_id, WATERMARK_NAME)
+            )
+            connection.commit()
+            return True, {'from': watermark, 'to': last_id}
+
+        except pymysql.Error as e:
+            if connection:
+                connection.rollback()
+            return False, f"Database error: {str(e)}"
+
+        finally:
+            if connection:
+                cursor.close()
+                connection.close()
+
+    def run(self, max_batches=None):
+        """
+        Fold batches until the rollups have caught up (or max_batches ran)
+
+        Returns:
+            tuple: (success: bool, result: dict/str)
+        """
+        started = time.monotonic()
+        batches = 0
+        first = last = None
+        while max_batches is None or batches < max_batches:
+            success, result = self.run_batch()
+            if not success:
+                return False, result
+            if result['to'] is None:
+                break
+            first = result['from'] if first is None else first
+            last = result['to']
+            batches += 1
+
+        self.last_run = {
+            'finished_at': time.time(),
+            'seconds': round(time.monotonic() - started, 3),
+            'batches': batches,
+            'from': first,
+            'to': last
+        }
+        return True, self.last_run
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fold new PlayHistory rows into the play rollup tables")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                        help=f"rows folded per transaction (default: {BATCH_SIZE})")
+    parser.add_argument('--max-batches', type=int, default=None,
+                        help="stop after this many batches (default: until caught up)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    app = job_app(__name__)
+
+    with app.app_context():
+        success, result = PlayRollupAggregator(batch_size=args.batch_size).run(max_batches=args.max_batches)
+
+    print(json.dumps(result, indent=2) if success else result)
+    return 0 if success else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
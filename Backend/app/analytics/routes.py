@@ -0,0 +1,244 @@
+"""
+Analytics routes for listening statistics
+"""
+from datetime import date, datetime, timedelta
+from flask import Blueprint, request, jsonify
+from app.utils.decorators import artist_required, listener_required
+from .services import unique_listeners_service, ArtistAnalyticsService, ListenerSessionsService
+
+
+# Create Blueprint
+analytics_bp = Blueprint('analytics', __name__, url_prefix='/api/analytics')
+
+# Days covered when no range is given
+DEFAULT_RANGE_DAYS = 28
+
+
+def _date_range():
+    """
+    'from' and 'to' query parameters as dates
+
+    Returns:
+        tuple: (start, end), defaulting to the last DEFAULT_RANGE_DAYS days
+
+    Raises:
+        ValueError: If a date is not YYYY-MM-DD
+    """
+    end = request.args.get('to')
+    end = datetime.strptime(end, '%Y-%m-%d').date() if end else date.today()
+    start = request.args.get('from')
+    start = datetime.strptime(start, '%Y-%m-%d').date() if start else end - timedelta(days=DEFAULT_RANGE_DAYS - 1)
+    return start, end
+
+
+def _unique_listeners(kind, entity_id):
+    try:
+        try:
+            start, end = _date_range()
+        except ValueError:
+            return jsonify({'error': "Dates must be in YYYY-MM-DD format"}), 400
+
+        success, result = unique_listeners_service.unique_listeners(kind, entity_id, start, end)
+
+        if not success:
+            status_code = 400 if 'invalid' in result.lower() else 500
+            return jsonify({'error': result}), status_code
+
+        response = jsonify(result)
+        response.headers['Cache-Control'] = 'public, max-age=60'
+        return response, 200
+
+    except Exception as e:
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+
+
+@analytics_bp.route('/songs/<int:song_id>/listeners', methods=['GET'])
+def song_listeners(song_id):
+    """
+    Approximate unique listeners of a song between two days
+
+    Query Parameters:
+        from (str): First day, YYYY-MM-DD (default: 27 days before 'to')
+        to (str): Last day, YYYY-MM-DD (default: today)
+
+    Returns:
+        200: Range and estimated 'unique_listeners' (within about 2%)
+        400: Invalid dates or range over two years
+        500: Server error
+    """
+    return _unique_listeners('song', song_id)
+
+
+@analytics_bp.route('/artists/<int:artist_id>/listeners', methods=['GET'])
+def artist_listeners(artist_id):
+    """
+    Approximate unique listeners of an artist's songs between two days
+
+    Query Parameters:
+        from (str): First day, YYYY-MM-DD (default: 27 days before 'to')
+        to (str): Last day, YYYY-MM-DD (default: today)
+
+    Returns:
+        200: Range and estimated 'unique_listeners' (within about 2%)
+        400: Invalid dates or range over two years
+        500: Server error
+    """
+    return _unique_listeners('artist', artist_id)
+
+
+def _artist_error(result):
+    if 'not an artist' in result.lower():
+        status_code = 403
+    elif 'invalid' in result.lower():
+        status_code = 400
+    else:
+        status_code = 500
+    return jsonify({'error': result}), status_code
+
+
+@analytics_bp.route('/artist/summary', methods=['GET'])
+@artist_required
+def artist_summary(user_id):
+    """
+    Plays, listening time and skips of the current artist's songs
+
+    Query Parameters:
+        from (str): First day, YYYY-MM-DD (default: 27 days before 'to')
+        to (str): Last day, YYYY-MM-DD (default: today)
+        granularity (str): 'day' (default, up to 366 days) or 'hour' (up to 31 days)
+
+    Returns:
+        200: Totals and a series per hour or day
+        400: Invalid parameters
+        401: Not authenticated
+        403: Not an artist
+        500: Server error
+    """
+    try:
+        try:
+            start, end = _date_range()
+        except ValueError:
+            return jsonify({'error': "Dates must be in YYYY-MM-DD format"}), 400
+
+        granularity = request.args.get('granularity', 'day')
+        success, result = ArtistAnalyticsService.get_summary(user_id, start, end, granularity=granularity)
+
+        if not success:
+            return _artist_error(result)
+
+        return jsonify(result), 200
+
+    except Exception as e:
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+
+
+def _artist_top_items(user_id, kind):
+    try:
+        try:
+            start, end = _date_range()
+        except ValueError:
+            return jsonify({'error': "Dates must be in YYYY-MM-DD format"}), 400
+
+        limit = request.args.get('limit', 20, type=int)
+        if limit < 1 or limit > 100:
+            return jsonify({'error': 'Limit must be between 1 and 100'}), 400
+
+        success, result = ArtistAnalyticsService.get_top_items(user_id, kind, start, end, limit=limit)
+
+        if not success:
+            return _artist_error(result)
+
+        return jsonify(result), 200
+
+    except Exception as e:
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+
+
+@analytics_bp.route('/artist/songs', methods=['GET'])
+@artist_required
+def artist_songs(user_id):
+    """
+    The current artist's most played songs
+
+    Query Parameters:
+        from (str): First day, YYYY-MM-DD (default: 27 days before 'to')
+        to (str): Last day, YYYY-MM-DD (default: today)
+        limit (int): 1-100 (default: 20)
+
+    Returns:
+        200: Songs with plays, listening time and skips, most played first
+        400: Invalid parameters
+        401: Not authenticated
+        403: Not an artist
+        500: Server error
+    """
+    return _artist_top_items(user_id, 'song')
+
+
+@analytics_bp.route('/artist/artworks', methods=['GET'])
+@artist_required
+def artist_artworks(user_id):
+    """
+    The current artist's most played artworks
+
+    Query Parameters:
+        from (str): First day, YYYY-MM-DD (default: 27 days before 'to')
+        to (str): Last day, YYYY-MM-DD (default: today)
+        limit (int): 1-100 (default: 20)
+
+    Returns:
+        200: Artworks with plays, listening time and skips, most played first
+        400: Invalid parameters
+        401: Not authenticated
+        403: Not an artist
+        500: Server error
+    """
+    return _artist_top_items(user_id, 'artwork')
+
+
+@analytics_bp.route('/me/sessions', methods=['GET'])
+@listener_required
+def my_sessions(user_id):
+    """
+    The current listener's listening sessions and engagement totals
+
+    Query Parameters:
+        from (str): First day, YYYY-MM-DD (default: 27 days before 'to')
+        to (str): Last day, YYYY-MM-DD (default: today)
+        limit (int): Sessions listed, 1-100 (default: 20)
+
+    Returns:
+        200: Totals (sessions, plays per session, skip and completion rates)
+             and the newest sessions
+        400: Invalid parameters
+        401: Not authenticated
+        403: Not a listener
+        500: Server error
+    """
+    try:
+        try:
+            start, end = _date_range()
+        except ValueError:
+            return jsonify({'error': "Dates must be in YYYY-MM-DD format"}), 400
+
+        limit = request.args.get('limit', 20, type=int)
+        if limit < 1 or limit > 100:
+            return jsonify({'error': 'Limit must be between 1 and 100'}), 400
+
+        success, result = ListenerSessionsService.get_sessions(user_id, start, end, limit=limit)
+
+        if not success:
+            if 'not a listener' in result.lower():
+                status_code = 403
+            elif 'invalid' in result.lower():
+                status_code = 400
+            else:
+                status_code = 500
+            return jsonify({'error': result}), status_code
+
+        response = jsonify(result)
+        response.headers['Cache-Control'] = 'private, max-age=60'
+        return response, 200
+
+    except Exception as e:
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
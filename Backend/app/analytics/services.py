@@ -0,0 +1,614 @@
+"""
+Analytics service layer: unique listeners per song and artist, artist
+statistics read from the play rollups, and listeners' sessions
+"""
+import os
+import time
+import threading
+import pymysql
+from datetime import date, timedelta
+from app.auth.utils import get_db_connection
+from services.metrics import LatencyRecorder
+from .hll import HyperLogLog
+from .rollups import PlayRollupAggregator
+from .sessions import SessionAggregator
+
+
+KINDS = ('song', 'artist')
+
+# Longest range a unique-listener query may cover
+MAX_RANGE_DAYS = 731
+
+# Longest ranges of the artist statistics, per rollup granularity
+MAX_ROLLUP_DAYS = {'hour': 31, 'day': 366}
+
+# Entities per IN (...) query
+BATCH_SIZE = 500
+
+_UPSERT_SKETCH = """
+    INSERT INTO ListenerSketch (Kind, EntityID, Granularity, Day, Registers)
+    VALUES (%s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE Registers = VALUES(Registers)
+"""
+
+
+def covering_periods(start, end):
+    """
+    Fewest ListenerSketch rows covering start..end: whole months as monthly
+    rows, the days before and after them as daily rows
+
+    Returns:
+        list: [(granularity, day)], at most 60 daily rows plus one per month
+    """
+    periods = []
+    day = start
+    while day <= end:
+        if day.day == 1:
+            next_month = (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+            if next_month - timedelta(days=1) <= end:
+                periods.append(('month', day))
+                day = next_month
+                continue
+        periods.append(('day', day))
+        day += timedelta(days=1)
+    return periods
+
+
+def _batches(items):
+    items = sorted(items)
+    for start in range(0, len(items), BATCH_SIZE):
+        yield items[start:start + BATCH_SIZE]
+
+
+def write_sketches(connection, pending):
+    """
+    Merge per-song daily sketches into ListenerSketch and commit
+
+    Each song's sketch is also merged into its artist's, and both into the
+    monthly rows. Stored rows are locked, merged with the new sketches and
+    written back, so concurrent writers never lose each other's listeners.
+
+    Args:
+        connection: Open database connection
+        pending (dict): (day, SongID) -> HyperLogLog of ListenerIDs
+
+    Returns:
+        int: ListenerSketch rows written
+    """
+    cursor = connection.cursor(pymysql.cursors.DictCursor)
+    try:
+        artists = {}
+        for batch in _batches({song_id for _, song_id in pending}):
+            cursor.execute(
+                f"""
+                SELECT s.SongID, aw.ArtistID FROM Song s
+                JOIN Artwork aw ON s.ArtworkID = aw.ArtworkID
+                WHERE s.SongID IN ({', '.join(['%s'] * len(batch))})
+                """,
+                batch
+            )
+            artists.update((row['SongID'], row['ArtistID']) for row in cursor.fetchall())
+
+        rows = {}   # (Kind, EntityID, Granularity, Day) -> HyperLogLog
+        for (day, song_id), sketch in pending.items():
+            entities = [('song', song_id)]
+            if song_id in artists:
+                entities.append(('artist', artists[song_id]))
+            for kind, entity_id in entities:
+                for key in ((kind, entity_id, 'day', day), (kind, entity_id, 'month', day.replace(day=1))):
+                    if key in rows:
+                        rows[key].merge(sketch)
+                    else:
+                        rows[key] = HyperLogLog.union([sketch])
+
+        groups = {}
+        for kind, entity_id, granularity, day in rows:
+            groups.setdefault((kind, granularity, day), []).append(entity_id)
+
+        for (kind, granularity, day), entity_ids in sorted(groups.items()):
+            for batch in _batches(entity_ids):
+                cursor.execute(
+                    f"""
+                    SELECT EntityID, Registers FROM ListenerSketch
+                    WHERE Kind = %s AND Granularity = %s AND Day = %s
+                      AND EntityID IN ({', '.join(['%s'] * len(batch))})
+                    FOR UPDATE
+                    """,
+                    [kind, granularity, day, *batch]
+                )
+                for row in cursor.fetchall():
+                    rows[(kind, row['EntityID'], granularity, day)].merge(HyperLogLog.from_bytes(row['Registers']))
+
+        cursor.executemany(_UPSERT_SKETCH, [(*key, sketch.to_bytes()) for key, sketch in rows.items()])
+        connection.commit()
+        return len(rows)
+
+    finally:
+        cursor.close()
+
+
+class UniqueListenersService:
+    """
+    Counts unique listeners per song and artist with HyperLogLog sketches
+
+    record_play() is called by UserService.record_play_history and only adds
+    the listener to an in-memory sketch for the song and day. A background
+    thread merges those into ListenerSketch every `flush_interval` seconds,
+    so counts lag behind plays by up to that long (the artist's by exactly
+    that, its sketch is built at flush time). Plays still in memory are lost
+    if the process dies; `python -m app.analytics.backfill` rebuilds any
+    range from PlayHistory.
+
+    Args:
+        flush_interval (int): Seconds between writes to the database
+    """
+
+    def __init__(self, flush_interval=60):
+        self.flush_interval = flush_interval
+        self._pending = {}      # (day, SongID) -> HyperLogLog of ListenerIDs
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self.last_flush = None
+        self.latency = LatencyRecorder()
+
+    def init_app(self, app):
+        """Start the background flush thread for an app"""
+        if self._thread is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(self.flush_interval)
+                with app.app_context():
+                    success, message = self.flush()
+                    if not success:
+                        print(f"Unique listener flush failed: {message}")
+
+        self._thread = threading.Thread(target=run, name='unique-listeners', daemon=True)
+        self._thread.start()
+
+    def record_play(self, listener_id, song_id, day=None):
+        """
+        Count a listener of a song
+
+        Args:
+            listener_id (int): Listener's ID
+            song_id (int): Song played
+            day (date): Day of the play (default: today)
+        """
+        key = (day or date.today(), song_id)
+        with self._lock:
+            sketch = self._pending.get(key)
+            if sketch is None:
+                sketch = self._pending[key] = HyperLogLog()
+            sketch.add(listener_id)
+
+    def flush(self):
+        """
+        Write the sketches recorded since the last flush
+
+        Returns:
+            tuple: (success: bool, result: dict/str)
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return True, {'rows': 0}
+
+            started = time.monotonic()
+            connection = None
+            try:
+                connection = get_db_connection()
+                rows = write_sketches(connection, pending)
+
+            except pymysql.Error as e:
+                if connection:
+                    connection.rollback()
+                # Keep them for the next flush
+                with self._lock:
+                    for key, sketch in pending.items():
+                        if key in self._pending:
+                            sketch.merge(self._pending[key])
+                        self._pending[key] = sketch
+                return False, f"Database error: {str(e)}"
+
+            finally:
+                if connection:
+                    connection.close()
+
+            self.last_flush = {
+                'flushed_at': time.time(),
+                'seconds': round(time.monotonic() - started, 3),
+                'songs': len(pending),
+                'rows': rows
+            }
+            return True, self.last_flush
+
+    def unique_listeners(self, kind, entity_id, start, end):
+        """
+        Approximate number of distinct listeners of a song or artist between two days
+
+        Reads at most 60 daily sketches plus one per month whatever the
+        number of plays.
+
+        Args:
+            kind (str): 'song' or 'artist'
+            entity_id (int): SongID or ArtistID
+            start (date): First day, inclusive
+            end (date): Last day, inclusive
+
+        Returns:
+            tuple: (success: bool, result: dict/str)
+        """
+        if kind not in KINDS:
+            return False, f"Unknown kind: {kind}"
+        if start > end:
+            return False, "Invalid date range: 'from' is after 'to'"
+        if (end - start).days >= MAX_RANGE_DAYS:
+            return False, f"Invalid date range: at most {MAX_RANGE_DAYS} days"
+
+        periods = covering_periods(start, end)
+        conditions = []
+        params = [kind, entity_id]
+        for granularity in ('day', 'month'):
+            days = [day for period, day in periods if period == granularity]
+            if days:
+                conditions.append(f"(Granularity = '{granularity}' AND Day IN ({', '.join(['%s'] * len(days))}))")
+                params.extend(days)
+
+        connection = None
+        with self.latency.time('unique_listeners'):
+            try:
+                connection = get_db_connection()
+                cursor = connection.cursor(pymysql.cursors.DictCursor)
+                cursor.execute(
+                    f"""
+                    SELECT Registers FROM ListenerSketch
+                    WHERE Kind = %s AND EntityID = %s AND ({' OR '.join(conditions)})
+                    """,
+                    params
+                )
+                sketches = [HyperLogLog.from_bytes(row['Registers']) for row in cursor.fetchall()]
+
+            except pymysql.Error as e:
+                return False, f"Database error: {str(e)}"
+
+            finally:
+                if connection:
+                    cursor.close()
+                    connection.close()
+
+            if kind == 'song':
+                with self._lock:
+                    sketches.extend(
+                        HyperLogLog.union([sketch]) for (day, song_id), sketch in self._pending.items()
+                        if song_id == entity_id and start <= day <= end
+                    )
+
+            return True, {
+                'kind': kind,
+                'id': entity_id,
+                'from': start.isoformat(),
+                'to': end.isoformat(),
+                'unique_listeners': HyperLogLog.union(sketches).count()
+            }
+
+    def get_stats(self):
+        """
+        Pending sketches, last flush and query latency for monitoring
+
+        Returns:
+            dict: pending song-days, last flush and latency percentiles
+        """
+        return {
+            'pending': len(self._pending),
+            'last_flush': self.last_flush,
+            'latency': self.latency.snapshot()
+        }
+
+
+def _totals(row):
+    """Plays, listening time and skip rate from summed rollup columns"""
+    plays = int(row['Plays'] or 0)
+    skips = int(row['Skips'] or 0)
+    return {
+        'plays': plays,
+        'listen_seconds': int(row['ListenSeconds'] or 0),
+        'skips': skips,
+        'skip_rate': round(skips / plays, 4) if plays else 0.0
+    }
+
+
+class ArtistAnalyticsService:
+    """
+    Statistics of the current artist's songs and artworks
+
+    Reads only SongPlayRollup and ArtworkPlayRollup (see rollups.py), never
+    PlayHistory, so every query costs the same however many plays there are.
+    """
+
+    @staticmethod
+    def _check_range(start, end, granularity='day'):
+        if granularity not in MAX_ROLLUP_DAYS:
+            return f"Invalid granularity: {granularity}. Use 'hour' or 'day'"
+        if start > end:
+            return "Invalid date range: 'from' is after 'to'"
+        if (end - start).days >= MAX_ROLLUP_DAYS[granularity]:
+            return f"Invalid date range: at most {MAX_ROLLUP_DAYS[granularity]} days by {granularity}"
+        return None
+
+    @staticmethod
+    def _artist_id(cursor, user_id):
+        cursor.execute("SELECT ArtistID FROM Artist WHERE UserID = %s", (user_id,))
+        artist = cursor.fetchone()
+        return artist['ArtistID'] if artist else None
+
+    @staticmethod
+    def get_summary(user_id, start, end, granularity='day'):
+        """
+        Totals of an artist's plays between two days, with a per-hour or per-day series
+
+        Args:
+            user_id (int): Artist's user ID
+            start (date): First day, inclusive
+            end (date): Last day, inclusive
+            granularity (str): 'hour' (up to 31 days) or 'day' (up to 366)
+
+        Returns:
+            tuple: (success: bool, result: dict/str)
+                result dict has 'totals' and 'series' (periods without plays
+                are left out), each with plays, listen_seconds, skips and
+                skip_rate
+        """
+        error = ArtistAnalyticsService._check_range(start, end, granularity)
+        if error:
+            return False, error
+
+        connection = None
+        try:
+            connection = get_db_connection()
+            cursor = connection.cursor(pymysql.cursors.DictCursor)
+
+            artist_id = ArtistAnalyticsService._artist_id(cursor, user_id)
+            if artist_id is None:
+                return False, "User is not an artist"
+
+            cursor.execute(
+                """
+                SELECT PeriodStart, SUM(Plays) AS Plays, SUM(ListenSeconds) AS ListenSeconds, SUM(Skips) AS Skips
+                FROM ArtworkPlayRollup
+                WHERE ArtistID = %s AND Granularity = %s AND PeriodStart >= %s AND PeriodStart < %s
+                GROUP BY PeriodStart
+                ORDER BY PeriodStart
+                """,
+                (artist_id, granularity, start, end + timedelta(days=1))
+            )
+            rows = cursor.fetchall()
+
+            totals = _totals({
+                column: sum(row[column] or 0 for row in rows)
+                for column in ('Plays', 'ListenSeconds', 'Skips')
+            })
+            series = [
+                {'period_start': row['PeriodStart'].isoformat(), **_totals(row)}
+                for row in rows
+            ]
+            return True, {
+                'artist_id': artist_id,
+                'from': start.isoformat(),
+                'to': end.isoformat(),
+                'granularity': granularity,
+                'totals': totals,
+                'series': series
+            }
+
+        except pymysql.Error as e:
+            return False, f"Database error: {str(e)}"
+
+        finally:
+            if connection:
+                cursor.close()
+                connection.close()
+
+    @staticmethod
+    def get_top_items(user_id, kind, start, end, limit=20):
+        """
+        An artist's most played songs or artworks between two days
+
+        Args:
+            user_id (int): Artist's user ID
+            kind (str): 'song' or 'artwork'
+            start (date): First day, inclusive
+            end (date): Last day, inclusive
+            limit (int): Most items returned
+
+        Returns:
+            tuple: (success: bool, result: dict/str)
+                result dict has 'items', most played first, each with its ID,
+                title, plays, listen_seconds, skips and skip_rate
+        """
+        error = ArtistAnalyticsService._check_range(start, end)
+        if error:
+            return False, error
+
+        if kind == 'song':
+            query = """
+                SELECT r.SongID AS ItemID, s.Title,
+                       SUM(r.Plays) AS Plays, SUM(r.ListenSeconds) AS ListenSeconds, SUM(r.Skips) AS Skips
+                FROM SongPlayRollup r
+                LEFT JOIN Song s ON r.SongID = s.SongID
+                WHERE r.ArtistID = %s AND r.Granularity = 'day' AND r.PeriodStart >= %s AND r.PeriodStart < %s
+                GROUP BY r.SongID, s.Title
+                ORDER BY Plays DESC, r.SongID
+                LIMIT %s
+            """
+        else:
+            query = """
+                SELECT r.ArtworkID AS ItemID, aw.Title,
+                       SUM(r.Plays) AS Plays, SUM(r.ListenSeconds) AS ListenSeconds, SUM(r.Skips) AS Skips
+                FROM ArtworkPlayRollup r
+                LEFT JOIN Artwork aw ON r.ArtworkID = aw.ArtworkID
+                WHERE r.ArtistID = %s AND r.Granularity = 'day' AND r.PeriodStart >= %s AND r.PeriodStart < %s
+                GROUP BY r.ArtworkID, aw.Title
+                ORDER BY Plays DESC, r.ArtworkID
+                LIMIT %s
+            """
+
+        connection = None
+        try:
+            connection = get_db_connection()
+            cursor = connection.cursor(pymysql.cursors.DictCursor)
+
+            artist_id = ArtistAnalyticsService._artist_id(cursor, user_id)
+            if artist_id is None:
+                return False, "User is not an artist"
+
+            cursor.execute(query, (artist_id, start, end + timedelta(days=1), limit))
+            items = [
+                {f'{kind}_id': row['ItemID'], 'title': row['Title'], **_totals(row)}
+                for row in cursor.fetchall()
+            ]
+            return True, {
+                'artist_id': artist_id,
+                'from': start.isoformat(),
+                'to': end.isoformat(),
+                'items': items
+            }
+
+        except pymysql.Error as e:
+            return False, f"Database error: {str(e)}"
+
+        finally:
+            if connection:
+                cursor.close()
+                connection.close()
+
+
+def _session_totals(row):
+    """Session counts and ratios from summed ListeningSession columns"""
+    sessions = int(row['Sessions'] or 0)
+    plays = int(row['Plays'] or 0)
+    skips = int(row['Skips'] or 0)
+    completions = int(row['Completions'] or 0)
+    return {
+        'sessions': sessions,
+        'plays': plays,
+        'listen_seconds': int(row['ListenSeconds'] or 0),
+        'plays_per_session': round(plays / sessions, 2) if sessions else 0.0,
+        'average_span_seconds': round(int(row['SpanSeconds'] or 0) / sessions) if sessions else 0,
+        'skip_rate': round(skips / plays, 4) if plays else 0.0,
+        'completion_rate': round(completions / plays, 4) if plays else 0.0
+    }
+
+
+class ListenerSessionsService:
+    """
+    The current listener's listening sessions
+
+    Reads only ListeningSession (see sessions.py): one row per session,
+    however many plays it had.
+    """
+
+    @staticmethod
+    def get_sessions(user_id, start, end, limit=20):
+        """
+        A listener's sessions that started between two days, with totals
+
+        Args:
+            user_id (int): Listener's user ID
+            start (date): First day, inclusive
+            end (date): Last day, inclusive
+            limit (int): Sessions listed, newest first
+
+        Returns:
+            tuple: (success: bool, result: dict/str)
+                result dict has 'totals' (sessions, plays, listening time,
+                plays per session, average span, skip and completion rates)
+                and 'sessions'
+        """
+        if start > end:
+            return False, "Invalid date range: 'from' is after 'to'"
+        if (end - start).days >= MAX_RANGE_DAYS:
+            return False, f"Invalid date range: at most {MAX_RANGE_DAYS} days"
+
+        connection = None
+        try:
+            connection = get_db_connection()
+            cursor = connection.cursor(pymysql.cursors.DictCursor)
+
+            cursor.execute("SELECT ListenerID FROM Listener WHERE UserID = %s", (user_id,))
+            listener = cursor.fetchone()
+            if not listener:
+                return False, "User is not a listener"
+
+            # LastPlayedAt >= start follows from StartedAt >= start, and lets
+            # the (ListenerID, LastPlayedAt) index skip older sessions
+            params = (listener['ListenerID'], start, start, end + timedelta(days=1))
+            where = "ListenerID = %s AND LastPlayedAt >= %s AND StartedAt >= %s AND StartedAt < %s"
+            cursor.execute(
+                f"""
+                SELECT COUNT(*) AS Sessions, SUM(Plays) AS Plays, SUM(ListenSeconds) AS ListenSeconds,
+                       SUM(Skips) AS Skips, SUM(Completions) AS Completions,
+                       SUM(TIMESTAMPDIFF(SECOND, StartedAt, LastPlayedAt)) AS SpanSeconds
+                FROM ListeningSession
+                WHERE {where}
+                """,
+                params
+            )
+            totals = _session_totals(cursor.fetchone())
+
+            cursor.execute(
+                f"""
+                SELECT SessionID, StartedAt, LastPlayedAt, Plays, ListenSeconds, Skips, Completions,
+                       TIMESTAMPDIFF(SECOND, StartedAt, LastPlayedAt) AS SpanSeconds
+                FROM ListeningSession
+                WHERE {where}
+                ORDER BY StartedAt DESC
+                LIMIT %s
+                """,
+                params + (limit,)
+            )
+            sessions = [
+                {
+                    'session_id': row['SessionID'],
+                    'started_at': row['StartedAt'].isoformat(),
+                    'last_played_at': row['LastPlayedAt'].isoformat(),
+                    'plays': row['Plays'],
+                    'listen_seconds': row['ListenSeconds'],
+                    'span_seconds': int(row['SpanSeconds']),
+                    'skips': row['Skips'],
+                    'completions': row['Completions']
+                }
+                for row in cursor.fetchall()
+            ]
+            return True, {
+                'from': start.isoformat(),
+                'to': end.isoformat(),
+                'totals': totals,
+                'sessions': sessions
+            }
+
+        except pymysql.Error as e:
+            return False, f"Database error: {str(e)}"
+
+        finally:
+            if connection:
+                cursor.close()
+                connection.close()
+
+
+# Singleton instances
+unique_listeners_service = UniqueListenersService(
+    flush_interval=int(os.getenv('UNIQUE_LISTENERS_FLUSH_SECONDS', 60))
+)
+
+play_rollup_aggregator = PlayRollupAggregator(
+    interval=int(os.getenv('PLAY_ROLLUP_INTERVAL_SECONDS', 60))
+)
+
+session_aggregator = SessionAggregator(
+    gap_seconds=int(os.getenv('SESSION_GAP_MINUTES', 30)) * 60,
+    interval=int(os.getenv('SESSION_INTERVAL_SECONDS', 60))
+)
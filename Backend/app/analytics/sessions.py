@@ -0,0 +1,315 @@
+"""
+Listening sessions summarized from PlayHistory
+
+A session is a run of one listener's plays with no pause longer than
+SESSION_GAP_SECONDS between consecutive plays. SessionAggregator reads the
+PlayHistory rows past a watermark (RollupWatermark 'listening_sessions') one
+bounded range of HistoryIDs at a time, groups them by listener in play
+order, and either extends the listener's latest ListeningSession or starts
+new ones. Each session keeps only its summary: first and last play, plays,
+listening time, skips and completions, so engagement questions (session
+length, plays per session, skip and completion ratios) are answered from
+ListeningSession without window functions over PlayHistory.
+
+Skips are counted as in the play rollups (stopped within SKIP_SECONDS, or
+before the end of a shorter song); a completion is a play that lasted at
+least COMPLETE_RATIO of Song.Duration. The sessions and the watermark are
+committed in one transaction on the locked watermark row, and rows younger
+than SETTLE_SECONDS wait for the next run, as in rollups.py. A play that
+only becomes visible after a later session of its listener was summarized
+is not merged back into its own session but counted as a session of its own.
+
+Run it from the Backend directory to catch up (the API also runs it in the
+background):
+
+    python -m app.analytics.sessions
+    python -m app.analytics.sessions --batch-size 200000
+"""
+import json
+import time
+import argparse
+import threading
+import pymysql
+from datetime import timedelta
+from app.auth.utils import get_db_connection
+from app.utils.cli import job_app
+from .rollups import BATCH_SIZE, SETTLE_SECONDS, SKIP_SECONDS
+
+
+WATERMARK_NAME = 'listening_sessions'
+
+# Longest pause between two plays of the same session
+SESSION_GAP_SECONDS = 30 * 60
+
+# Share of a song's duration a play must last to count as completed
+COMPLETE_RATIO = 0.9
+
+# Listeners per IN (...) query
+LISTENER_BATCH_SIZE = 500
+
+_LATEST_SESSIONS_QUERY = """
+    SELECT ls.SessionID, ls.ListenerID, ls.StartedAt, ls.LastPlayedAt
+    FROM ListeningSession ls
+    JOIN (
+        SELECT ListenerID, MAX(LastPlayedAt) AS LastPlayedAt
+        FROM ListeningSession
+        WHERE ListenerID IN ({placeholders})
+        GROUP BY ListenerID
+    ) latest ON latest.ListenerID = ls.ListenerID AND latest.LastPlayedAt = ls.LastPlayedAt
+"""
+
+_INSERT_SESSION = """
+    INSERT INTO ListeningSession
+        (ListenerID, StartedAt, LastPlayedAt, Plays, ListenSeconds, Skips, Completions)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+_EXTEND_SESSION = """
+    UPDATE ListeningSession
+    SET StartedAt = LEAST(StartedAt, %s),
+        LastPlayedAt = GREATEST(LastPlayedAt, %s),
+        Plays = Plays + %s,
+        ListenSeconds = ListenSeconds + %s,
+        Skips = Skips + %s,
+        Completions = Completions + %s
+    WHERE SessionID = %s
+"""
+
+
+class _Session:
+    """A session being summarized: an existing row (session_id set) or a new one"""
+
+    __slots__ = ('session_id', 'started_at', 'last_played_at', 'plays', 'listen_seconds', 'skips', 'completions')
+
+    def __init__(self, started_at, last_played_at, session_id=None):
+        self.session_id = session_id
+        self.started_at = started_at
+        self.last_played_at = last_played_at
+        self.plays = self.listen_seconds = self.skips = self.completions = 0
+
+    def covers(self, played_at, gap):
+        return self.started_at - gap <= played_at <= self.last_played_at + gap
+
+    def add(self, played_at, listen_duration, song_duration):
+        listened = listen_duration or 0
+        self.started_at = min(self.started_at, played_at)
+        self.last_played_at = max(self.last_played_at, played_at)
+        self.plays += 1
+        self.listen_seconds += listened
+        self.skips += listened < min(SKIP_SECONDS, song_duration or SKIP_SECONDS)
+        self.completions += bool(song_duration) and listened >= COMPLETE_RATIO * song_duration
+
+
+def sessionize(plays, latest, gap):
+    """
+    Fold one listener's plays into sessions
+
+    Args:
+        plays: (PlayedAt, ListenDuration, Song.Duration) tuples in play order
+        latest (_Session): The listener's latest stored session, or None
+        gap (timedelta): Longest pause within a session
+
+    Returns:
+        list: _Session objects with new plays; the stored one (if extended) first
+    """
+    sessions = []
+    current = latest
+    for played_at, listen_duration, song_duration in plays:
+        if current is None or not current.covers(played_at, gap):
+            current = _Session(played_at, played_at)
+        if not sessions or sessions[-1] is not current:
+            sessions.append(current)
+        current.add(played_at, listen_duration, song_duration)
+    return sessions
+
+
+class SessionAggregator:
+    """
+    Keeps ListeningSession up to date with PlayHistory
+
+    Args:
+        batch_size (int): PlayHistory rows summarized per transaction
+        gap_seconds (int): Longest pause within a session
+        interval (int): Seconds between background runs (see init_app)
+        connect: Database connection factory (default: get_db_connection)
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, gap_seconds=SESSION_GAP_SECONDS, interval=60, connect=None):
+        self.batch_size = batch_size
+        self.gap = timedelta(seconds=gap_seconds)
+        self.interval = interval
+        self.connect = connect
+        self._thread = None
+        self.last_run = None
+
+    def init_app(self, app):
+        """Start a background thread catching the sessions up every `interval` seconds"""
+        if self._thread is not None:
+            return
+
+        def run():
+            while True:
+                with app.app_context():
+                    success, message = self.run()
+                    if not success:
+                        print(f"Session aggregation failed: {message}")
+                time.sleep(self.interval)
+
+        self._thread = threading.Thread(target=run, name='listening-sessions', daemon=True)
+        self._thread.start()
+
+    def _latest_sessions(self, cursor, listener_ids):
+        latest = {}
+        for i in range(0, len(listener_ids), LISTENER_BATCH_SIZE):
+            batch = listener_ids[i:i + LISTENER_BATCH_SIZE]
+            cursor.execute(_LATEST_SESSIONS_QUERY.format(placeholders=', '.join(['%s'] * len(batch))), batch)
+            for row in cursor.fetchall():
+                latest[row['ListenerID']] = _Session(row['StartedAt'], row['LastPlayedAt'], row['SessionID'])
+        return latest
+
+    def run_batch(self):
+        """
+        Summarize the next batch of settled plays into sessions
+
+        Returns:
+            tuple: (success: bool, result: dict/str)
+                result dict has the HistoryID range summarized ('from'
+                exclusive, 'to' inclusive, None when there was nothing to
+                do), and the sessions started and extended
+        """
+        connection = None
+        try:
+            connection = (self.connect or get_db_connection)()
+            cursor = connection.cursor(pymysql.cursors.DictCursor)
+
+            cursor.execute(
+                "INSERT IGNORE INTO RollupWatermark (Name, LastHistoryID) VALUES (%s, 0)",
+                (WATERMARK_NAME,)
+            )
+            cursor.execute(
+                "SELECT LastHistoryID FROM RollupWatermark WHERE Name = %s FOR UPDATE",
+                (WATERMARK_NAME,)
+            )
+            watermark = cursor.fetchone()['LastHistoryID']
+
+            cursor.execute("SELECT MIN(HistoryID) AS FirstID FROM PlayHistory WHERE HistoryID > %s", (watermark,))
+            first_id = cursor.fetchone()['FirstID']
+            last_id = None
+            if first_id is not None:
+                cursor.execute(
+                    """
+                    SELECT MAX(HistoryID) AS LastID FROM PlayHistory
+                    WHERE HistoryID >= %s AND HistoryID < %s
+                      AND PlayedAt < NOW() - INTERVAL %s SECOND
+                    """,
+                    (first_id, first_id + self.batch_size, SETTLE_SECONDS)
+                )
+                last_id = cursor.fetchone()['LastID']
+            if last_id is None:
+                connection.commit()
+                return True, {'from': watermark, 'to': None, 'started': 0, 'extended': 0}
+
+            cursor.execute(
+                """
+                SELECT ph.ListenerID, ph.PlayedAt, ph.ListenDuration, s.Duration
+                FROM PlayHistory ph
+                LEFT JOIN Song s ON ph.SongID = s.SongID
+                WHERE ph.HistoryID > %s AND ph.HistoryID <= %s
+                ORDER BY ph.ListenerID, ph.PlayedAt, ph.HistoryID
+                """,
+                (watermark, last_id)
+            )
+            plays = {}
+            for row in cursor.fetchall():
+                plays.setdefault(row['ListenerID'], []).append((row['PlayedAt'], row['ListenDuration'], row['Duration']))
+
+            latest = self._latest_sessions(cursor, list(plays))
+            inserts, updates = [], []
+            for listener_id, listener_plays in plays.items():
+                for session in sessionize(listener_plays, latest.get(listener_id), self.gap):
+                    counts = (session.plays, session.listen_seconds, session.skips, session.completions)
+                    if session.session_id is None:
+                        inserts.append((listener_id, session.started_at, session.last_played_at) + counts)
+                    else:
+                        updates.append((session.started_at, session.last_played_at) + counts + (session.session_id,))
+
+            if updates:
+                cursor.executemany(_EXTEND_SESSION, updates)
+            if inserts:
+                cursor.executemany(_INSERT_SESSION, inserts)
+            cursor.execute(
+                "UPDATE RollupWatermark SET LastHistoryID = %s WHERE Name = %s",
+                (last_id, WATERMARK_NAME)
+            )
+            connection.commit()
+            return True, {'from': watermark, 'to': last_id, 'started': len(inserts), 'extended': len(updates)}
+
+        except pymysql.Error as e:
+            if connection:
+                connection.rollback()
+            return False, f"Database error: {str(e)}"
+
+        finally:
+            if connection:
+                cursor.close()
+                connection.close()
+
+    def run(self, max_batches=None):
+        """
+        Summarize batches until the sessions have caught up (or max_batches ran)
+
+        Returns:
+            tuple: (success: bool, result: dict/str)
+        """
+        started = time.monotonic()
+        batches = sessions_started = sessions_extended = 0
+        first = last = None
+        while max_batches is None or batches < max_batches:
+            success, result = self.run_batch()
+            if not success:
+                return False, result
+            if result['to'] is None:
+                break
+            first = result['from'] if first is None else first
+            last = result['to']
+            sessions_started += result['started']
+            sessions_extended += result['extended']
+            batches += 1
+
+        self.last_run = {
+            'finished_at': time.time(),
+            'seconds': round(time.monotonic() - started, 3),
+            'batches': batches,
+            'from': first,
+            'to': last,
+            'sessions_started': sessions_started,
+            'sessions_extended': sessions_extended
+        }
+        return True, self.last_run
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize new PlayHistory rows into listening sessions")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                        help=f"rows summarized per transaction (default: {BATCH_SIZE})")
+    parser.add_argument('--gap-minutes', type=int, default=SESSION_GAP_SECONDS // 60,
+                        help=f"longest pause within a session (default: {SESSION_GAP_SECONDS // 60})")
+    parser.add_argument('--max-batches', type=int, default=None,
+                        help="stop after this many batches (default: until caught up)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    app = job_app(__name__)
+
+    with app.app_context():
+        aggregator = SessionAggregator(batch_size=args.batch_size, gap_seconds=args.gap_minutes * 60)
+        success, result = aggregator.run(max_batches=args.max_batches)
+
+    print(json.dumps(result, indent=2) if success else result)
+    return 0 if success else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
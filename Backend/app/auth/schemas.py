@@ -1,7 +1,83 @@
 """
 Request validation schemas for authentication endpoints
 """
-import re
+from app.utils.validation import (
+    Schema,
+    Field,
+    Check,
+    min_length,
+    max_length,
+    matches,
+    contains,
+    one_of,
+    first_error
+)
+
+
+EMAIL_RULES = (
+    matches(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', "Invalid email format"),
+)
+
+PASSWORD_RULES = (
+    min_length(8, "Password must be at least 8 characters long"),
+    contains(r'[A-Z]', "Password must contain at least one uppercase letter"),
+    contains(r'[a-z]', "Password must contain at least one lowercase letter"),
+    contains(r'\d', "Password must contain at least one number"),
+)
+
+USERNAME_RULES = (
+    min_length(3, "Username must be at least 3 characters long"),
+    max_length(100, "Username must be at most 100 characters long"),
+    matches(
+        r'^[a-zA-Z][a-zA-Z0-9_]*$',
+        "Username must start with a letter and contain only letters, numbers, and underscores"
+    ),
+)
+
+FIRST_NAME_RULES = (max_length(100, "First name must be at most 100 characters"),)
+LAST_NAME_RULES = (max_length(100, "Last name must be at most 100 characters"),)
+
+
+REGISTRATION_SCHEMA = Schema({
+    'email': Field(required="Email is required", rules=EMAIL_RULES),
+    'password': Field(required="Password is required", rules=PASSWORD_RULES),
+    'username': Field(required="Username is required", rules=USERNAME_RULES),
+    'role': Field(rules=[
+        one_of(['Guest', 'Listener', 'Artist'], "Role must be 'Guest', 'Listener', or 'Artist'")
+    ]),
+    'first_name': Field(rules=FIRST_NAME_RULES),
+    'last_name': Field(rules=LAST_NAME_RULES),
+})
+
+LOGIN_SCHEMA = Schema(
+    {
+        'password': Field(required="Password is required"),
+    },
+    checks=[
+        # Accept either email or username
+        Check('login', lambda data: data.get('email') or data.get('username'),
+              "Email or username is required"),
+    ]
+)
+
+PROFILE_UPDATE_SCHEMA = Schema({
+    'email': Field(rules=EMAIL_RULES),
+    'username': Field(rules=USERNAME_RULES),
+    'first_name': Field(rules=FIRST_NAME_RULES),
+    'last_name': Field(rules=LAST_NAME_RULES),
+})
+
+PASSWORD_CHANGE_SCHEMA = Schema(
+    {
+        'current_password': Field(required="Current password is required"),
+        'new_password': Field(required="New password is required", rules=PASSWORD_RULES),
+        'confirm_password': Field(required="Password confirmation is required"),
+    },
+    checks=[
+        Check('confirm_password', lambda data: data.get('new_password') == data.get('confirm_password'),
+              "Passwords do not match"),
+    ]
+)
 
 
 def validate_email(email):
@@ -17,8 +93,7 @@ def validate_email(email):
     if not email:
         return False
 
-    email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(email_pattern, email) is not None
+    return first_error(EMAIL_RULES, email) is None
 
 
 def validate_password(password):
@@ -39,17 +114,9 @@ def validate_password(password):
     if not password:
         return False, "Password is required"
 
-    if len(password) < 8:
-        return False, "Password must be at least 8 characters long"
-
-    if not re.search(r'[A-Z]', password):
-        return False, "Password must contain at least one uppercase letter"
-
-    if not re.search(r'[a-z]', password):
-        return False, "Password must contain at least one lowercase letter"
-
-    if not re.search(r'\d', password):
-        return False, "Password must contain at least one number"
+    error = first_error(PASSWORD_RULES, password)
+    if error:
+        return False, error
 
     return True, ""
 
@@ -71,14 +138,9 @@ def validate_username(username):
     if not username:
         return False, "Username is required"
 
-    if len(username) < 3:
-        return False, "Username must be at least 3 characters long"
-
-    if len(username) > 100:
-        return False, "Username must be at most 100 characters long"
-
-    if not re.match(r'^[a-zA-Z][a-zA-Z0-9_]*$', username):
-        return False, "Username must start with a letter and contain only letters, numbers, and underscores"
+    error = first_error(USERNAME_RULES, username)
+    if error:
+        return False, error
 
     return True, ""
 
@@ -93,43 +155,7 @@ def validate_registration_data(data):
     Returns:
         tuple: (bool, dict) - (is_valid, errors_dict)
     """
-    errors = {}
-
-    # Validate required fields
-    if 'email' not in data or not data['email']:
-        errors['email'] = "Email is required"
-    elif not validate_email(data['email']):
-        errors['email'] = "Invalid email format"
-
-    if 'password' not in data or not data['password']:
-        errors['password'] = "Password is required"
-    else:
-        is_valid, error_msg = validate_password(data['password'])
-        if not is_valid:
-            errors['password'] = error_msg
-
-    if 'username' not in data or not data['username']:
-        errors['username'] = "Username is required"
-    else:
-        is_valid, error_msg = validate_username(data['username'])
-        if not is_valid:
-            errors['username'] = error_msg
-
-    # Validate role
-    if 'role' in data and data['role']:
-        if data['role'] not in ['Guest', 'Listener', 'Artist']:
-            errors['role'] = "Role must be 'Guest', 'Listener', or 'Artist'"
-
-    # Optional fields validation
-    if 'first_name' in data and data['first_name']:
-        if len(data['first_name']) > 100:
-            errors['first_name'] = "First name must be at most 100 characters"
-
-    if 'last_name' in data and data['last_name']:
-        if len(data['last_name']) > 100:
-            errors['last_name'] = "Last name must be at most 100 characters"
-
-    return len(errors) == 0, errors
+    return REGISTRATION_SCHEMA.validate(data)
 
 
 def validate_login_data(data):
@@ -142,16 +168,7 @@ def validate_login_data(data):
     Returns:
         tuple: (bool, dict) - (is_valid, errors_dict)
     """
-    errors = {}
-
-    # Accept either email or username
-    if ('email' not in data or not data['email']) and ('username' not in data or not data['username']):
-        errors['login'] = "Email or username is required"
-
-    if 'password' not in data or not data['password']:
-        errors['password'] = "Password is required"
-
-    return len(errors) == 0, errors
+    return LOGIN_SCHEMA.validate(data)
 
 
 def validate_profile_update_data(data):
@@ -164,30 +181,7 @@ def validate_profile_update_data(data):
     Returns:
         tuple: (bool, dict) - (is_valid, errors_dict)
     """
-    errors = {}
-
-    # Email validation (if provided)
-    if 'email' in data and data['email']:
-        if not validate_email(data['email']):
-            errors['email'] = "Invalid email format"
-
-    # Username validation (if provided)
-    if 'username' in data and data['username']:
-        is_valid, error_msg = validate_username(data['username'])
-        if not is_valid:
-            errors['username'] = error_msg
-
-    # First name validation (if provided)
-    if 'first_name' in data and data['first_name']:
-        if len(data['first_name']) > 100:
-            errors['first_name'] = "First name must be at most 100 characters"
-
-    # Last name validation (if provided)
-    if 'last_name' in data and data['last_name']:
-        if len(data['last_name']) > 100:
-            errors['last_name'] = "Last name must be at most 100 characters"
-
-    return len(errors) == 0, errors
+    return PROFILE_UPDATE_SCHEMA.validate(data)
 
 
 def validate_password_change_data(data):
@@ -200,21 +194,4 @@ def validate_password_change_data(data):
     Returns:
         tuple: (bool, dict) - (is_valid, errors_dict)
     """
-    errors = {}
-
-    if 'current_password' not in data or not data['current_password']:
-        errors['current_password'] = "Current password is required"
-
-    if 'new_password' not in data or not data['new_password']:
-        errors['new_password'] = "New password is required"
-    else:
-        is_valid, error_msg = validate_password(data['new_password'])
-        if not is_valid:
-            errors['new_password'] = error_msg
-
-    if 'confirm_password' not in data or not data['confirm_password']:
-        errors['confirm_password'] = "Password confirmation is required"
-    elif data.get('new_password') != data.get('confirm_password'):
-        errors['confirm_password'] = "Passwords do not match"
-
-    return len(errors) == 0, errors
+    return PASSWORD_CHANGE_SCHEMA.validate(data)
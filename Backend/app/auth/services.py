@@ -4,6 +4,8 @@ Authentication service layer for business logic
 import pymysql
 from flask import current_app
 from .utils import hash_password, verify_password, get_db_connection
+from app.search import services as search  # module import: app.search imports app.auth
+from app.users.recent import recent_plays_cache
 
 
 class AuthService:
@@ -68,6 +70,9 @@ class AuthService:
 
             connection.commit()
 
+            if role == 'Artist':
+                search.search_service.user_changed(user_id)
+
             # Fetch and return the created user
             cursor.execute(
                 "SELECT UserID, Email, Username, FirstName, LastName, Role FROM User WHERE UserID = %s",
@@ -315,6 +320,10 @@ class AuthService:
             cursor.execute(update_query, values)
             connection.commit()
 
+            # Artist names in the search index come from Username
+            if username is not None:
+                search.search_service.user_changed(user_id)
+
             # Fetch and return updated user
             cursor.execute(
                 "SELECT UserID, Email, Username, FirstName, LastName, Role FROM User WHERE UserID = %s",
@@ -322,6 +331,10 @@ class AuthService:
             )
             updated_user = cursor.fetchone()
 
+            # Cached play histories carry artist usernames
+            if username is not None and updated_user['Role'] == 'Artist':
+                recent_plays_cache.clear()
+
             return True, updated_user
 
         except pymysql.Error as e:
@@ -404,10 +417,41 @@ class AuthService:
             if not cursor.fetchone():
                 return False, "User not found"
 
-            # Delete user (cascade will handle related records)
+            cursor.execute("SELECT ArtistID FROM Artist WHERE UserID = %s", (user_id,))
+            artist = cursor.fetchone()
+
+            # PlayHistory is partitioned, which rules out foreign keys, so
+            # the cascade does not reach it: delete the account's plays and
+            # the plays of its songs first
+            cursor.execute(
+                """
+                DELETE ph FROM PlayHistory ph
+                JOIN Listener l ON ph.ListenerID = l.ListenerID
+                WHERE l.UserID = %s
+                """,
+                (user_id,)
+            )
+            if artist:
+                cursor.execute(
+                    """
+                    DELETE ph FROM PlayHistory ph
+                    JOIN Song s ON ph.SongID = s.SongID
+                    JOIN Artwork aw ON s.ArtworkID = aw.ArtworkID
+                    WHERE aw.ArtistID = %s
+                    """,
+                    (artist['ArtistID'],)
+                )
+
+            # Delete user (cascade will handle related records). Their S3 media
+            # is no longer referenced and is removed by app/uploads/gc.py.
             cursor.execute("DELETE FROM User WHERE UserID = %s", (user_id,))
             connection.commit()
 
+            recent_plays_cache.forget(user_id)
+            if artist:
+                search.search_service.artist_removed(artist['ArtistID'])
+                recent_plays_cache.clear()
+
             return True, "Account deleted successfully"
 
         except pymysql.Error as e:
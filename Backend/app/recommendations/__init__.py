@@ -0,0 +1,7 @@
+"""
+Recommendations module for listening-history based suggestions
+"""
+from .routes import recommendations_bp
+from .services import similar_songs_service, for_you_service, trending_service
+
+__all__ = ['recommendations_bp', 'similar_songs_service', 'for_you_service', 'trending_service']
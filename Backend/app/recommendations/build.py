@@ -0,0 +1,120 @@
+"""
+Offline job writing the similar-songs file from PlayHistory
+
+PlayHistory is streamed with a server-side cursor, grouped by listener, into
+a PlayMatrix; every song's neighbours are then computed in memory and written
+to SIMILAR_SONGS_PATH, which the API maps on its next check.
+
+Run it from the Backend directory (e.g. nightly from cron):
+
+    python -m app.recommendations.build
+    python -m app.recommendations.build --days 180 --top-n 30
+"""
+import json
+import time
+import argparse
+import pymysql
+from app.auth.utils import get_db_connection
+from app.utils.cli import job_app
+from .similar import (
+    PlayMatrix, write_similar_songs,
+    DEFAULT_TOP_N, DEFAULT_MIN_COOCCURRENCE, MAX_SONGS_PER_LISTENER
+)
+from .services import similar_songs_service, stream_rows
+
+
+def build_similar_songs(path, days=None, top_n=DEFAULT_TOP_N, min_cooccurrence=DEFAULT_MIN_COOCCURRENCE,
+                        max_songs_per_listener=MAX_SONGS_PER_LISTENER, connect=None):
+    """
+    Read PlayHistory and write the similar-songs file
+
+    Args:
+        path (str): Destination file
+        days (int): Only use plays from the last `days` days (default: all)
+        top_n (int): Neighbours kept per song
+        min_cooccurrence (int): Fewest shared listeners for a pair to count
+        max_songs_per_listener (int): Distinct songs kept per listener
+        connect: Database connection factory (default: get_db_connection)
+
+    Returns:
+        tuple: (success: bool, result: dict/str)
+    """
+    started = time.monotonic()
+    connection = None
+    try:
+        connection = (connect or get_db_connection)()
+
+        query = "SELECT ListenerID, SongID FROM PlayHistory"
+        params = ()
+        if days:
+            query += " WHERE PlayedAt >= NOW() - INTERVAL %s DAY"
+            params = (days,)
+        query += " ORDER BY ListenerID"
+        matrix = PlayMatrix(stream_rows(connection, query, params), max_songs_per_listener=max_songs_per_listener)
+        loaded = time.monotonic()
+
+        songs = {}
+        for song_id, title, artwork_id, artist_name in stream_rows(
+            connection,
+            """
+            SELECT s.SongID, s.Title, s.ArtworkID, COALESCE(u.Username, ar.JamendoName)
+            FROM Song s
+            JOIN Artwork aw ON s.ArtworkID = aw.ArtworkID
+            JOIN Artist ar ON aw.ArtistID = ar.ArtistID
+            LEFT JOIN User u ON ar.UserID = u.UserID
+            """
+        ):
+            songs[song_id] = (title, artist_name, artwork_id)
+
+    except pymysql.Error as e:
+        return False, f"Database error: {str(e)}"
+
+    finally:
+        if connection:
+            connection.close()
+
+    result = write_similar_songs(matrix, songs, path, top_n=top_n, min_cooccurrence=min_cooccurrence)
+    return True, {
+        'path': path,
+        'listeners': matrix.listeners,
+        'pairs': len(matrix.row_songs),
+        'read_seconds': round(loaded - started, 3),
+        'seconds': round(time.monotonic() - started, 3),
+        **result
+    }
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compute similar songs from PlayHistory")
+    parser.add_argument('--path', default=similar_songs_service.path,
+                        help=f"output file (default: {similar_songs_service.path})")
+    parser.add_argument('--days', type=int, default=None,
+                        help="only use plays from the last N days (default: all)")
+    parser.add_argument('--top-n', type=int, default=DEFAULT_TOP_N,
+                        help=f"neighbours kept per song (default: {DEFAULT_TOP_N})")
+    parser.add_argument('--min-cooccurrence', type=int, default=DEFAULT_MIN_COOCCURRENCE,
+                        help=f"fewest shared listeners for a pair (default: {DEFAULT_MIN_COOCCURRENCE})")
+    parser.add_argument('--max-songs-per-listener', type=int, default=MAX_SONGS_PER_LISTENER,
+                        help=f"distinct songs kept per listener (default: {MAX_SONGS_PER_LISTENER})")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    app = job_app(__name__)
+
+    with app.app_context():
+        success, result = build_similar_songs(
+            args.path,
+            days=args.days,
+            top_n=args.top_n,
+            min_cooccurrence=args.min_cooccurrence,
+            max_songs_per_listener=args.max_songs_per_listener
+        )
+
+    print(json.dumps(result, indent=2) if success else result)
+    return 0 if success else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,134 @@
+"""
+Per-genre top songs from a stream of recent plays
+
+Every play adds a weight that doubles every `half_life` seconds (forward
+decay): a play at time t weighs 2^((t - origin) / half_life). Scores only
+ever grow, so a new play is one addition with nothing to age, yet comparing
+two songs' scores at any moment gives the same order as decaying every play
+since. Older plays fade out smoothly instead of falling off a window edge.
+
+GenreCharts keeps one score per song and the genres of each song, and builds
+the top songs of every genre (plus an overall list under '') on demand.
+"""
+import re
+import heapq
+
+
+# Key of the list ranking every song regardless of genre
+ALL_GENRES = ''
+
+# Scores are rescaled once weights reach 2^RESCALE_EXPONENT, well before floats overflow
+RESCALE_EXPONENT = 64
+
+_GENRE_SPLIT_RE = re.compile(r'[,;/|]')
+
+
+def genre_key(name):
+    """Lowercase, single-spaced form of a genre name ('' for blanks)"""
+    return ' '.join((name or '').casefold().split())
+
+
+def parse_genres(text):
+    """
+    Genre keys in a comma (or ; / |) separated list
+
+    Args:
+        text (str): e.g. 'Pop, Rock' or Song.JamendoGenres 'rock,indie'
+
+    Returns:
+        tuple: Distinct genre keys in order
+    """
+    keys = (genre_key(part) for part in _GENRE_SPLIT_RE.split(text or ''))
+    return tuple(dict.fromkeys(key for key in keys if key))
+
+
+class GenreCharts:
+    """
+    Decayed play scores per song and the top songs per genre
+
+    Not thread-safe; the owner serializes updates and publishes the lists
+    returned by top_lists().
+
+    Args:
+        half_life (float): Seconds for a play's weight to halve
+        origin (float): Reference timestamp for the weights (default: first play)
+    """
+
+    def __init__(self, half_life=7 * 86400, origin=None):
+        self.half_life = half_life
+        self.origin = origin
+        self._scores = {}       # SongID -> weight relative to origin
+        self._genres = {}       # SongID -> tuple of genre keys
+
+    def __len__(self):
+        return len(self._scores)
+
+    def __contains__(self, song_id):
+        return song_id in self._scores
+
+    def set_genres(self, song_id, genres):
+        """Record the genre keys of a song (songs without any only rank overall)"""
+        self._genres[song_id] = tuple(genres)
+
+    def add_play(self, song_id, timestamp):
+        """
+        Count one play
+
+        Args:
+            song_id (int): Song played
+            timestamp (float): When, in seconds since the epoch
+        """
+        if self.origin is None:
+            self.origin = timestamp
+        exponent = (timestamp - self.origin) / self.half_life
+        if exponent > RESCALE_EXPONENT:
+            self._rescale(timestamp)
+            exponent = 0.0
+        self._scores[song_id] = self._scores.get(song_id, 0.0) + 2.0 ** exponent
+
+    def _rescale(self, timestamp):
+        """Move the origin to timestamp, shrinking every score to match"""
+        factor = 2.0 ** (-(timestamp - self.origin) / self.half_life)
+        self._scores = {song_id: score * factor for song_id, score in self._scores.items()}
+        self.origin = timestamp
+
+    def prune(self, now, min_score=0.05):
+        """
+        Forget songs whose decayed play count has fallen below min_score
+
+        Returns:
+            int: Songs dropped
+        """
+        if self.origin is None:
+            return 0
+        threshold = min_score * 2.0 ** ((now - self.origin) / self.half_life)
+        stale = [song_id for song_id, score in self._scores.items() if score < threshold]
+        for song_id in stale:
+            del self._scores[song_id]
+            self._genres.pop(song_id, None)
+        return len(stale)
+
+    def top_lists(self, top_n, now):
+        """
+        Best scored songs per genre
+
+        Args:
+            top_n (int): Songs kept per genre
+            now (float): Timestamp the returned scores are decayed to
+
+        Returns:
+            dict: genre key -> [(SongID, decayed score)] best first, with the
+                overall list under ALL_GENRES
+        """
+        members = {ALL_GENRES: []}
+        for song_id, score in self._scores.items():
+            entry = (score, song_id)
+            members[ALL_GENRES].append(entry)
+            for genre in self._genres.get(song_id, ()):
+                members.setdefault(genre, []).append(entry)
+
+        decay = 2.0 ** (-(now - self.origin) / self.half_life) if self.origin is not None else 1.0
+        return {
+            genre: [(song_id, score * decay) for score, song_id in heapq.nlargest(top_n, entries)]
+            for genre, entries in members.items()
+        }
@@ -0,0 +1,130 @@
+"""
+Recommendation routes served from precomputed files and in-memory charts
+"""
+from flask import Blueprint, request, jsonify
+from app.utils.decorators import listener_required
+from .services import similar_songs_service, for_you_service, trending_service
+
+
+# Create Blueprint
+recommendations_bp = Blueprint('recommendations', __name__, url_prefix='/api/recommendations')
+
+
+@recommendations_bp.route('/songs/<int:song_id>/similar', methods=['GET'])
+def similar_songs(song_id):
+    """
+    Songs most often played by the listeners of a song
+
+    Query Parameters:
+        limit (int): 1-50 (default: 10)
+
+    Returns:
+        200: Similar songs, most similar first (empty when the song has too
+            little history)
+        400: Invalid parameters
+        503: No similar-songs file built yet
+        500: Server error
+    """
+    try:
+        limit = request.args.get('limit', 10, type=int)
+
+        if limit < 1 or limit > 50:
+            return jsonify({'error': 'Limit must be between 1 and 50'}), 400
+
+        success, result = similar_songs_service.get_similar_songs(song_id, limit=limit)
+
+        if not success:
+            status_code = 503 if 'not ready' in result.lower() else 500
+            return jsonify({'error': result}), status_code
+
+        response = jsonify({'song_id': song_id, 'similar': result})
+        response.headers['Cache-Control'] = 'public, max-age=300'
+        return response, 200
+
+    except Exception as e:
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+
+
+@recommendations_bp.route('/for-you', methods=['GET'])
+@listener_required
+def for_you(user_id):
+    """
+    Songs for the current listener from their favourite genres, Jamendo and
+    what is trending
+
+    Query Parameters:
+        limit (int): 1-50 (default: 20)
+
+    Returns:
+        200: The listener's genres and tracks, each with its 'source'
+        400: Invalid parameters
+        401: Not authenticated
+        403: Not a listener
+        503: Charts not built yet
+        500: Server error
+    """
+    try:
+        limit = request.args.get('limit', 20, type=int)
+
+        if limit < 1 or limit > 50:
+            return jsonify({'error': 'Limit must be between 1 and 50'}), 400
+
+        success, result = for_you_service.for_you(user_id, limit=limit)
+
+        if not success:
+            if 'not ready' in result.lower():
+                status_code = 503
+            elif 'not a listener' in result.lower():
+                status_code = 403
+            else:
+                status_code = 500
+            return jsonify({'error': result}), status_code
+
+        response = jsonify(result)
+        response.headers['Cache-Control'] = 'private, max-age=60'
+        return response, 200
+
+    except Exception as e:
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+
+
+@recommendations_bp.route('/charts', methods=['GET'])
+def trending_chart():
+    """
+    Most played songs of the last hour, day or week
+
+    Query Parameters:
+        window (str): '1h', '24h' or '7d' (default: '24h')
+        limit (int): 1-100 (default: 50)
+
+    Returns:
+        200: Chart with the window's total plays and its songs, most played
+            first
+        400: Invalid parameters
+        503: Charts not published yet
+        500: Server error
+    """
+    try:
+        window = request.args.get('window', '24h')
+        limit = request.args.get('limit', 50, type=int)
+
+        if limit < 1 or limit > 100:
+            return jsonify({'error': 'Limit must be between 1 and 100'}), 400
+
+        success, result = trending_service.get_chart(window, limit=limit)
+
+        if not success:
+            if 'unknown window' in result.lower():
+                status_code = 400
+            elif 'not ready' in result.lower():
+                status_code = 503
+            else:
+                status_code = 500
+            return jsonify({'error': result}), status_code
+
+        response = jsonify(result)
+        response.headers['Cache-Control'] = 'public, max-age=30'
+        return response, 200
+
+    except Exception as e:
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
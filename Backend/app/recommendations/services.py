@@ -0,0 +1,717 @@
+"""
+Recommendation service layer: precomputed similar songs and in-memory "for you" lists
+"""
+import os
+import json
+import time
+import tempfile
+import threading
+import pymysql
+from collections import OrderedDict
+from app.auth.utils import get_db_connection
+from services.metrics import LatencyRecorder
+from services.jamendo_service import jamendo_service
+from .similar import SimilarSongsIndex
+from .genres import GenreCharts, ALL_GENRES, parse_genres
+from .trending import SlidingTopK, DEFAULT_CAPACITY
+
+
+# How often the file's modification time is checked for a newer build
+RELOAD_CHECK_SECONDS = 60
+
+# Rows pulled per round trip while streaming
+FETCH_SIZE = 10000
+
+# Songs looked up per query when new songs show up among the plays
+SONG_BATCH_SIZE = 1000
+
+# Trending windows: name -> (seconds, buckets the window slides by)
+TRENDING_WINDOWS = {
+    '1h': (3600, 12),
+    '24h': (86400, 24),
+    '7d': (7 * 86400, 28)
+}
+
+# Songs kept in each published chart
+CHART_SIZE = 100
+
+# Genres of a listener used for "for you" (FavoriteGenre first)
+MAX_LISTENER_GENRES = 3
+
+_SONG_DETAILS_QUERY = """
+    SELECT s.SongID, s.Title, s.ArtworkID, s.JamendoID, s.JamendoGenres, ar.Genre,
+           COALESCE(u.Username, ar.JamendoName) AS ArtistName
+    FROM Song s
+    JOIN Artwork aw ON s.ArtworkID = aw.ArtworkID
+    JOIN Artist ar ON aw.ArtistID = ar.ArtistID
+    LEFT JOIN User u ON ar.UserID = u.UserID
+    WHERE s.SongID IN ({placeholders})
+"""
+
+
+def stream_rows(connection, query, params=()):
+    """Rows of a query as tuples, read from the server in batches instead of all at once"""
+    cursor = connection.cursor(pymysql.cursors.SSCursor)
+    try:
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                return
+            yield from rows
+    finally:
+        cursor.close()
+
+
+def fetch_songs(connection, song_ids):
+    """Title, artist, artwork, Jamendo ID and genres of songs, queried SONG_BATCH_SIZE at a time"""
+    song_ids = list(song_ids)
+    cursor = connection.cursor(pymysql.cursors.DictCursor)
+    try:
+        for start in range(0, len(song_ids), SONG_BATCH_SIZE):
+            batch = song_ids[start:start + SONG_BATCH_SIZE]
+            cursor.execute(_SONG_DETAILS_QUERY.format(placeholders=', '.join(['%s'] * len(batch))), batch)
+            yield from cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def _song_summary(row):
+    return {
+        'song_id': row['SongID'],
+        'title': row['Title'],
+        'artist_name': row['ArtistName'],
+        'artwork_id': row['ArtworkID'],
+        'jamendo_id': str(row['JamendoID']) if row['JamendoID'] else None
+    }
+
+
+class SimilarSongsService:
+    """
+    Owns the memory-mapped similar-songs file
+
+    The file is written offline by `python -m app.recommendations.build`.
+    It is mapped on first use and remapped when a newer file replaces it, so
+    lookups never touch the database.
+
+    Args:
+        path (str): Similar-songs file location
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+        self._index = None
+        self._mtime = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self.latency = LatencyRecorder()
+
+    def _current(self):
+        """The mapped index, remapping it if the file changed since the last check"""
+        now = time.monotonic()
+        if now - self._checked < RELOAD_CHECK_SECONDS:
+            return self._index
+
+        with self._lock:
+            if now - self._checked < RELOAD_CHECK_SECONDS:
+                return self._index
+            self._checked = now
+            try:
+                mtime = os.path.getmtime(self.path)
+                if mtime != self._mtime:
+                    self._index = SimilarSongsIndex(self.path)
+                    self._mtime = mtime
+            except (OSError, ValueError) as e:
+                print(f"Similar songs file not loaded: {e}")
+        return self._index
+
+    def get_similar_songs(self, song_id, limit=10):
+        """
+        Songs most often played by the listeners of a song
+
+        Args:
+            song_id (int): Song's ID
+            limit (int): Most songs returned
+
+        Returns:
+            tuple: (success: bool, result: list/str)
+        """
+        index = self._current()
+        if index is None:
+            return False, "Similar songs are not ready yet"
+
+        with self.latency.time('similar'):
+            return True, index.similar(song_id, limit=limit)
+
+    def get_stats(self):
+        """
+        File details and lookup latency for monitoring
+
+        Returns:
+            dict: ready flag, file stats and lookup latency percentiles
+        """
+        index = self._current()
+        return {
+            'ready': index is not None,
+            'file': index.get_stats() if index is not None else None,
+            'latency': self.latency.snapshot()
+        }
+
+
+class ForYouService:
+    """
+    Serves "for you" lists from memory: the listener's genre charts, overall
+    trending songs and Jamendo's featured tracks for their favourite genre
+
+    A background thread reads the plays added to PlayHistory since its last
+    pass (by HistoryID) every `refresh_interval` seconds, folds them into
+    decayed per-song scores (see GenreCharts) and publishes fresh top lists.
+    The first pass reads the last `window_days` of plays. The same thread
+    keeps Jamendo genre results for the listeners' favourite genres in
+    memory, so requests never wait on Jamendo.
+
+    Listener genres are cached (LRU, `max_listeners` entries) and updated by
+    preferences_changed() when a listener edits them.
+
+    Args:
+        refresh_interval (int): Seconds between passes over new plays
+        top_n (int): Songs kept per genre
+        half_life_days (float): Days for a play's weight to halve
+        window_days (int): Days of history read by the first pass
+        max_listeners (int): Listener genre entries kept in memory
+        jamendo: JamendoService for genre results (default: the shared one)
+    """
+
+    def __init__(self, refresh_interval=600, top_n=50, half_life_days=7, window_days=28,
+                 max_listeners=100000, jamendo=None):
+        self.refresh_interval = refresh_interval
+        self.top_n = top_n
+        self.window_days = window_days
+        self.max_listeners = max_listeners
+        self.jamendo = jamendo or jamendo_service
+
+        self.charts = GenreCharts(half_life=half_life_days * 86400)
+        self._songs = {}                # SongID -> song dict, None for deleted songs
+        self._watermark = None          # last HistoryID read
+        self._refresh_lock = threading.Lock()
+
+        # Published state, replaced wholesale so readers need no lock
+        self._lists = None              # genre key -> tuple of song dicts
+        self._jamendo_lists = {}        # genre key -> tuple of formatted Jamendo tracks
+
+        self._listeners = OrderedDict()  # UserID -> genre keys, least recently used first
+        self._listeners_lock = threading.Lock()
+        self._wanted = set()            # genres whose Jamendo results are kept warm
+        self._wake = threading.Event()
+
+        self._thread = None
+        self.latency = LatencyRecorder()
+        self.last_refresh = None
+
+    def init_app(self, app):
+        """Start the background refresh thread for an app"""
+        if self._thread is not None:
+            return
+
+        def run():
+            while True:
+                with app.app_context():
+                    success, message = self.refresh()
+                    if not success:
+                        print(f"For you refresh failed: {message}")
+                self._refresh_jamendo()
+                self._wake.wait(self.refresh_interval)
+                self._wake.clear()
+
+        self._thread = threading.Thread(target=run, name='for-you', daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------------
+    # Refreshing
+    # ------------------------------------------------------------------
+
+    def refresh(self):
+        """
+        Fold the plays recorded since the last pass into the charts and publish new top lists
+
+        Returns:
+            tuple: (success: bool, result: dict/str)
+        """
+        if not self._refresh_lock.acquire(blocking=False):
+            return False, "Refresh already running"
+
+        started = time.monotonic()
+        connection = None
+        try:
+            connection = get_db_connection()
+            if self._watermark is None:
+                query = """
+                    SELECT HistoryID, SongID, PlayedAt FROM PlayHistory
+                    WHERE PlayedAt >= NOW() - INTERVAL %s DAY
+                    ORDER BY HistoryID
+                """
+                params = (self.window_days,)
+            else:
+                query = "SELECT HistoryID, SongID, PlayedAt FROM PlayHistory WHERE HistoryID > %s ORDER BY HistoryID"
+                params = (self._watermark,)
+
+            plays = 0
+            unknown = set()
+            for history_id, song_id, played_at in stream_rows(connection, query, params):
+                self.charts.add_play(song_id, played_at.timestamp())
+                self._watermark = history_id
+                plays += 1
+                if song_id not in self._songs:
+                    unknown.add(song_id)
+            self._load_songs(connection, unknown)
+
+            now = time.time()
+            self.charts.prune(now)
+            self._songs = {song_id: song for song_id, song in self._songs.items() if song_id in self.charts}
+            self._publish(now)
+
+        except pymysql.Error as e:
+            return False, f"Database error: {str(e)}"
+
+        finally:
+            if connection:
+                connection.close()
+            self._refresh_lock.release()
+
+        self.last_refresh = {
+            'finished_at': time.time(),
+            'seconds': round(time.monotonic() - started, 3),
+            'plays': plays,
+            'watermark': self._watermark
+        }
+        return True, self.last_refresh
+
+    def _load_songs(self, connection, song_ids):
+        """Titles, artists and genres of newly seen songs"""
+        for song_id in song_ids:
+            self._songs[song_id] = None
+        for row in fetch_songs(connection, song_ids):
+            self._songs[row['SongID']] = _song_summary(row)
+            self.charts.set_genres(row['SongID'], parse_genres(row['JamendoGenres']) or parse_genres(row['Genre']))
+
+    def _publish(self, now):
+        lists = {}
+        for genre, ranked in self.charts.top_lists(self.top_n * 2, now).items():
+            songs = [
+                {**self._songs[song_id], 'score': round(score, 2)}
+                for song_id, score in ranked
+                if self._songs.get(song_id) is not None
+            ]
+            lists[genre] = tuple(songs[:self.top_n])
+        self._lists = lists
+
+    def _refresh_jamendo(self):
+        """Fetch Jamendo's featured tracks for every wanted genre (served from its response cache when fresh)"""
+        jamendo_lists = dict(self._jamendo_lists)
+        for genre in list(self._wanted):
+            data = self.jamendo.get_tracks_by_genre(genre, limit=self.top_n)
+            if data and data.get('results') is not None:
+                jamendo_lists[genre] = tuple(self.jamendo.format_track_response(track) for track in data['results'])
+        self._jamendo_lists = jamendo_lists
+
+    # ------------------------------------------------------------------
+    # Listener genres
+    # ------------------------------------------------------------------
+
+    def preferences_changed(self, user_id, listener):
+        """
+        Update a listener's cached genres after their preferences were saved
+
+        Args:
+            user_id (int): User's ID
+            listener (dict): Row with 'FavoriteGenre' and 'Preference'
+        """
+        self._remember(user_id, listener.get('FavoriteGenre'), listener.get('Preference'))
+
+    def _remember(self, user_id, favorite_genre, preference):
+        favorite = parse_genres(favorite_genre)
+        genres = tuple(dict.fromkeys(favorite + parse_genres(preference)))[:MAX_LISTENER_GENRES]
+        with self._listeners_lock:
+            self._listeners[user_id] = genres
+            self._listeners.move_to_end(user_id)
+            while len(self._listeners) > self.max_listeners:
+                self._listeners.popitem(last=False)
+            # Preference is free text; only the favourite genre is looked up on Jamendo
+            new = [genre for genre in favorite[:1] if genre not in self._wanted]
+            self._wanted.update(new)
+        if new:
+            self._wake.set()
+        return genres
+
+    def _listener_genres(self, user_id):
+        with self._listeners_lock:
+            genres = self._listeners.get(user_id)
+            if genres is not None:
+                self._listeners.move_to_end(user_id)
+                return True, genres
+
+        connection = None
+        try:
+            connection = get_db_connection()
+            cursor = connection.cursor(pymysql.cursors.DictCursor)
+            cursor.execute("SELECT FavoriteGenre, Preference FROM Listener WHERE UserID = %s", (user_id,))
+            listener = cursor.fetchone()
+            if not listener:
+                return False, "User is not a listener"
+            return True, self._remember(user_id, listener['FavoriteGenre'], listener['Preference'])
+
+        except pymysql.Error as e:
+            return False, f"Database error: {str(e)}"
+
+        finally:
+            if connection:
+                cursor.close()
+                connection.close()
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def for_you(self, user_id, limit=20):
+        """
+        Songs for a listener: their genres' top songs, Jamendo picks for
+        their favourite genre and overall trending songs, interleaved
+
+        Args:
+            user_id (int): Listener's user ID
+            limit (int): Most tracks returned
+
+        Returns:
+            tuple: (success: bool, result: dict/str)
+                result dict has 'genres' and 'tracks'; each track carries a
+                'source' of 'genre', 'jamendo' or 'trending'
+        """
+        lists = self._lists
+        if lists is None:
+            return False, "Recommendations are not ready yet"
+
+        success, genres = self._listener_genres(user_id)
+        if not success:
+            return False, genres
+
+        with self.latency.time('for_you'):
+            sources = [('genre', lists.get(genre, ())) for genre in genres]
+            if genres:
+                sources.append(('jamendo', self._jamendo_lists.get(genres[0], ())))
+            sources.append(('trending', lists.get(ALL_GENRES, ())))
+            return True, {'genres': list(genres), 'tracks': _interleave(sources, limit)}
+
+    def get_stats(self):
+        """
+        Chart sizes, last refresh and lookup latency for monitoring
+
+        Returns:
+            dict: ready flag, tracked songs and genres, Jamendo genres kept
+                warm, cached listeners, last refresh, and latency percentiles
+        """
+        lists = self._lists
+        return {
+            'ready': lists is not None,
+            'songs': len(self.charts),
+            'genres': len(lists) - 1 if lists else 0,
+            'jamendo_genres': len(self._jamendo_lists),
+            'listeners_cached': len(self._listeners),
+            'last_refresh': self.last_refresh,
+            'latency': self.latency.snapshot()
+        }
+
+
+def _interleave(sources, limit):
+    """
+    Round-robin over (source name, tracks) lists, skipping tracks already taken
+
+    Local songs and Jamendo tracks are matched on their Jamendo ID too, so an
+    imported song is not listed twice.
+    """
+    tracks = []
+    seen = set()
+    positions = [0] * len(sources)
+    while len(tracks) < limit:
+        progressed = False
+        for i, (source, items) in enumerate(sources):
+            while positions[i] < len(items):
+                item = items[positions[i]]
+                positions[i] += 1
+                keys = {('jamendo', item['jamendo_id'])} if item.get('jamendo_id') else set()
+                if 'song_id' in item:
+                    keys.add(('song', item['song_id']))
+                if keys & seen:
+                    continue
+                seen |= keys
+                tracks.append({**item, 'source': source})
+                progressed = True
+                break
+            if len(tracks) >= limit:
+                break
+        if not progressed:
+            break
+    return tracks
+
+
+def _process_alive(pid):
+    """Whether a process with this ID is running"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class TrendingService:
+    """
+    Most played songs of the last hour, day and week, counted as plays are recorded
+
+    record_play() is called by UserService.record_play_history for every
+    play and only updates in-memory SlidingTopK summaries, so PlayHistory is
+    never grouped. A background thread publishes the charts, with song
+    titles, every `publish_interval` seconds and saves the summaries to
+    `path` every `persist_interval` seconds; they are loaded again on
+    startup so a restart does not empty the charts.
+
+    Each process counts the plays it records itself and saves them to its
+    own file next to `path` (music-trending.<pid>.json), so workers never
+    overwrite each other's counts. On startup a process takes over the file
+    of one process that is gone, which carries the counts across restarts
+    without two workers loading the same plays.
+
+    Args:
+        path (str): Base name of the files the summaries are saved to
+        publish_interval (int): Seconds between chart updates
+        persist_interval (int): Seconds between saves
+        capacity (int): Songs counted per bucket
+    """
+
+    def __init__(self, path, publish_interval=30, persist_interval=300, capacity=DEFAULT_CAPACITY):
+        self.path = path
+        self.publish_interval = publish_interval
+        self.persist_interval = persist_interval
+        self.windows = {
+            name: SlidingTopK(span, buckets, capacity=capacity)
+            for name, (span, buckets) in TRENDING_WINDOWS.items()
+        }
+        self._lock = threading.Lock()
+        self._songs = {}        # SongID -> song dict, None for deleted songs
+        self._charts = None     # window name -> published chart, replaced wholesale
+        self._thread = None
+        self.last_publish = None
+        self.last_save = None
+        self.latency = LatencyRecorder()
+
+    def init_app(self, app):
+        """Load saved summaries and start the background publish thread for an app"""
+        if self._thread is not None:
+            return
+        self.load()
+
+        def run():
+            while True:
+                with app.app_context():
+                    success, message = self.publish()
+                    if not success:
+                        print(f"Trending publish failed: {message}")
+                if time.time() - (self.last_save or {}).get('saved_at', 0) >= self.persist_interval:
+                    self.save()
+                time.sleep(self.publish_interval)
+
+        self._thread = threading.Thread(target=run, name='trending', daemon=True)
+        self._thread.start()
+
+    def record_play(self, song_id, timestamp=None):
+        """
+        Count one play of a song in every window
+
+        Args:
+            song_id (int): Song played
+            timestamp (float): When, in seconds since the epoch (default: now)
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            for window in self.windows.values():
+                window.add(song_id, timestamp)
+
+    def publish(self):
+        """
+        Rebuild the charts from the current summaries
+
+        Returns:
+            tuple: (success: bool, result: dict/str)
+        """
+        started = time.monotonic()
+        now = time.time()
+        with self._lock:
+            tops = {name: window.top(CHART_SIZE * 2, now) for name, window in self.windows.items()}
+
+        wanted = {song_id for entries, _ in tops.values() for song_id, _, _ in entries}
+        unknown = wanted - self._songs.keys()
+        if unknown:
+            connection = None
+            try:
+                connection = get_db_connection()
+                songs = dict.fromkeys(unknown)
+                for row in fetch_songs(connection, unknown):
+                    songs[row['SongID']] = _song_summary(row)
+                self._songs.update(songs)
+
+            except pymysql.Error as e:
+                return False, f"Database error: {str(e)}"
+
+            finally:
+                if connection:
+                    connection.close()
+        self._songs = {song_id: self._songs[song_id] for song_id in wanted}
+
+        charts = {}
+        for name, (entries, plays) in tops.items():
+            songs = [
+                {**self._songs[song_id], 'plays': count, 'min_plays': count - error}
+                for song_id, count, error in entries
+                if self._songs[song_id] is not None
+            ]
+            charts[name] = {'window': name, 'plays': plays, 'updated_at': now, 'songs': tuple(songs[:CHART_SIZE])}
+        self._charts = charts
+
+        self.last_publish = {'published_at': now, 'seconds': round(time.monotonic() - started, 3)}
+        return True, self.last_publish
+
+    def get_chart(self, window='24h', limit=50):
+        """
+        Most played songs of a window
+
+        Args:
+            window (str): '1h', '24h' or '7d'
+            limit (int): Most songs returned
+
+        Returns:
+            tuple: (success: bool, result: dict/str)
+                result dict has 'window', 'plays' (all plays in the window),
+                'updated_at' and 'songs', each with estimated 'plays' and a
+                guaranteed 'min_plays'
+        """
+        if window not in TRENDING_WINDOWS:
+            return False, f"Unknown window: {window}. Use one of: {', '.join(TRENDING_WINDOWS)}"
+
+        charts = self._charts
+        if charts is None:
+            return False, "Charts are not ready yet"
+
+        with self.latency.time('chart'):
+            chart = charts[window]
+            return True, {**chart, 'songs': list(chart['songs'][:limit])}
+
+    def _state_path(self, pid):
+        root, ext = os.path.splitext(os.path.abspath(self.path))
+        return f"{root}.{pid}{ext}"
+
+    def _orphaned_paths(self):
+        """Saved files of processes that are no longer running, plus a single-file save from older versions"""
+        root, ext = os.path.splitext(os.path.abspath(self.path))
+        directory, prefix = os.path.dirname(root), os.path.basename(root) + '.'
+        paths = [os.path.abspath(self.path)]
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return paths
+        for name in sorted(names):
+            pid = name[len(prefix):len(name) - len(ext)] if name.startswith(prefix) and name.endswith(ext) else ''
+            if pid.isdigit() and not _process_alive(int(pid)):
+                paths.append(os.path.join(directory, name))
+        return paths
+
+    def save(self):
+        """
+        Write the summaries to this process's file (atomically, via a temporary file)
+
+        Returns:
+            tuple: (success: bool, result: dict/str)
+        """
+        with self._lock:
+            data = {
+                'saved_at': time.time(),
+                'windows': {name: window.to_dict() for name, window in self.windows.items()}
+            }
+
+        path = self._state_path(os.getpid())
+        temp_path = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.trending-')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(temp_path, path)
+        except OSError as e:
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False, f"Could not save trending charts: {str(e)}"
+
+        self.last_save = {'saved_at': data['saved_at'], 'path': path, 'bytes': os.path.getsize(path)}
+        return True, self.last_save
+
+    def load(self):
+        """
+        Restore summaries saved by save(): this process's own file, or else
+        the file of one process that has exited, which is renamed to this
+        process's so no other worker loads it too
+        """
+        path = self._state_path(os.getpid())
+        data = None
+        for candidate in [path] + self._orphaned_paths():
+            try:
+                if candidate != path:
+                    # Only one of several starting workers can win the rename
+                    os.rename(candidate, path)
+                with open(path) as f:
+                    data = json.load(f)
+                break
+            except FileNotFoundError:
+                continue
+            except (OSError, ValueError) as e:
+                print(f"Trending charts not loaded: {e}")
+                return False
+        if data is None:
+            return False
+
+        with self._lock:
+            for name, window in self.windows.items():
+                window.load(data.get('windows', {}).get(name, {}))
+        return True
+
+    def get_stats(self):
+        """
+        Publish and save times and lookup latency for monitoring
+
+        Returns:
+            dict: ready flag, tracked songs per window, last publish and
+                save, and latency percentiles
+        """
+        charts = self._charts
+        return {
+            'ready': charts is not None,
+            'windows': {name: {'plays': chart['plays'], 'songs': len(chart['songs'])} for name, chart in (charts or {}).items()},
+            'last_publish': self.last_publish,
+            'last_save': self.last_save,
+            'latency': self.latency.snapshot()
+        }
+
+
+# Singleton instances
+similar_songs_service = SimilarSongsService(
+    path=os.getenv('SIMILAR_SONGS_PATH') or os.path.join(tempfile.gettempdir(), 'music-similar-songs.idx')
+)
+
+for_you_service = ForYouService(
+    refresh_interval=int(os.getenv('FOR_YOU_REFRESH_MINUTES', 10)) * 60,
+    half_life_days=float(os.getenv('FOR_YOU_HALF_LIFE_DAYS', 7))
+)
+
+trending_service = TrendingService(
+    path=os.getenv('TRENDING_STATE_PATH') or os.path.join(tempfile.gettempdir(), 'music-trending.json'),
+    publish_interval=int(os.getenv('TRENDING_PUBLISH_SECONDS', 30))
+)
@@ -0,0 +1,320 @@
+"""
+Item-to-item song similarity from listening history
+
+PlayHistory is read as a sparse listener x song matrix A of 0/1 entries (a
+listener either played a song or not). The similarity of two songs is the
+cosine of their columns:
+
+    sim(i, j) = (A^T A)[i, j] / sqrt(listeners(i) * listeners(j))
+
+where (A^T A)[i, j] counts the listeners who played both. The matrix is kept
+in compressed row and column form (flat arrays plus offsets), and each row of
+A^T A is computed at once by counting the song rows of that song's listeners
+with Counter.update, which runs in C, so only one row is ever materialized.
+Thresholding and scoring the row use map/compress over builtins for the same
+reason: no Python code runs per co-occurring pair.
+
+write_similar_songs() stores the top neighbours of every song in one file;
+SimilarSongsIndex maps it read-only and answers lookups without touching the
+database.
+
+File layout (native byte order, sections 8-byte aligned):
+    header            magic, version, counts and section offsets
+    song_ids    int64    n_songs SongIDs in ascending order
+    artwork_ids int64    ArtworkID of each song
+    offsets     uint32   n_songs + 1 offsets into neighbors/scores
+    neighbors   uint32   positions (into song_ids) of each song's neighbours, best first
+    scores      float32  cosine similarity of each neighbour
+    text_offsets uint32  n_songs + 1 offsets into text_blob
+    text_blob   bytes    "title\\x1fartist name" in UTF-8
+"""
+import os
+import math
+import mmap
+import heapq
+import struct
+import tempfile
+from array import array
+from bisect import bisect_left
+from operator import ge, mul
+from itertools import compress, repeat
+from collections import Counter
+
+
+MAGIC = b'SIMS'
+VERSION = 1
+_HEADER = struct.Struct('<4sIII8Q')
+
+_SEPARATOR = '\x1f'
+
+# Neighbours kept per song
+DEFAULT_TOP_N = 50
+
+# Pairs played together by fewer listeners are ignored as noise
+DEFAULT_MIN_COOCCURRENCE = 2
+
+# Distinct songs kept per listener. A handful of listeners who played
+# everything would otherwise dominate both the counts and the running time.
+MAX_SONGS_PER_LISTENER = 1000
+
+# Listeners sampled per song when computing its row; counts are scaled up
+MAX_LISTENERS_PER_SONG = 2000
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+class PlayMatrix:
+    """
+    Sparse 0/1 listener x song matrix in row and column compressed form
+
+    Songs are numbered densely in the order they first appear.
+
+    Args:
+        pairs: Iterable of (ListenerID, SongID), grouped by listener (e.g.
+            ORDER BY ListenerID); repeated plays are fine
+        max_songs_per_listener (int): Distinct songs kept per listener
+    """
+
+    def __init__(self, pairs, max_songs_per_listener=MAX_SONGS_PER_LISTENER):
+        self.song_ids = array('q')
+        numbers = {}
+
+        # Rows: listener -> song numbers
+        self.row_offsets = array('Q', [0])
+        self.row_songs = array('I')
+
+        current = None
+        seen = set()
+        for listener_id, song_id in pairs:
+            if listener_id != current:
+                if seen:
+                    self.row_offsets.append(len(self.row_songs))
+                current = listener_id
+                seen = set()
+            number = numbers.get(song_id)
+            if number is None:
+                number = numbers[song_id] = len(self.song_ids)
+                self.song_ids.append(song_id)
+            if number not in seen and len(seen) < max_songs_per_listener:
+                seen.add(number)
+                self.row_songs.append(number)
+        if seen:
+            self.row_offsets.append(len(self.row_songs))
+
+        # Columns: song -> listener rows (a counting sort of the rows)
+        n_songs = len(self.song_ids)
+        self.listener_counts = array('I', [0]) * n_songs
+        for number in self.row_songs:
+            self.listener_counts[number] += 1
+        self.inverse_norms = array('d', (1 / math.sqrt(count) if count else 0.0 for count in self.listener_counts))
+        self.column_offsets = array('Q', [0]) * (n_songs + 1)
+        for number in range(n_songs):
+            self.column_offsets[number + 1] = self.column_offsets[number] + self.listener_counts[number]
+        fill = array('Q', self.column_offsets[:n_songs])
+        self.column_listeners = array('I', [0]) * len(self.row_songs)
+        for row in range(len(self.row_offsets) - 1):
+            for i in range(self.row_offsets[row], self.row_offsets[row + 1]):
+                number = self.row_songs[i]
+                self.column_listeners[fill[number]] = row
+                fill[number] += 1
+
+    @property
+    def listeners(self):
+        return len(self.row_offsets) - 1
+
+    def cooccurrence(self, number, max_listeners=MAX_LISTENERS_PER_SONG):
+        """
+        One row of A^T A: listeners shared with every other song
+
+        Args:
+            number (int): Song number
+            max_listeners (int): Listeners sampled; counts are scaled by
+                listeners / sampled when there are more
+
+        Returns:
+            tuple: (Counter of song number -> shared listeners, scale factor)
+        """
+        start, end = self.column_offsets[number], self.column_offsets[number + 1]
+        stop = min(end, start + max_listeners)
+        counts = Counter()
+        offsets, songs = self.row_offsets, self.row_songs
+        for row in self.column_listeners[start:stop]:
+            counts.update(songs[offsets[row]:offsets[row + 1]])
+        del counts[number]
+        return counts, (end - start) / (stop - start) if stop > start else 1.0
+
+    def similar(self, number, top_n=DEFAULT_TOP_N, min_cooccurrence=DEFAULT_MIN_COOCCURRENCE):
+        """
+        Most similar songs to one song by cosine similarity
+
+        Returns:
+            list: [(score, song number)] best first
+        """
+        counts, scale = self.cooccurrence(number)
+        selected = list(map(ge, counts.values(), repeat(min_cooccurrence / scale)))
+        others = list(compress(counts.keys(), selected))
+        shared = compress(counts.values(), selected)
+        scored = zip(map(mul, shared, map(self.inverse_norms.__getitem__, others)), others)
+        factor = scale * self.inverse_norms[number]
+        return [(min(score * factor, 1.0), other) for score, other in heapq.nlargest(top_n, scored)]
+
+
+def write_similar_songs(matrix, songs, path, top_n=DEFAULT_TOP_N, min_cooccurrence=DEFAULT_MIN_COOCCURRENCE):
+    """
+    Compute every song's neighbours and write them to a file
+
+    The file is written next to `path` and renamed over it, so readers that
+    already mapped the old file keep working.
+
+    Args:
+        matrix (PlayMatrix): Listening history
+        songs (dict): SongID -> (title, artist name, ArtworkID) for the songs
+            that still exist; the others are left out
+        path (str): Destination file
+        top_n (int): Neighbours kept per song
+        min_cooccurrence (int): Fewest shared listeners for a pair to count
+
+    Returns:
+        dict: songs, neighbours and bytes written
+    """
+    # Positions in SongID order, for binary search at read time
+    numbers = sorted(
+        (number for number, song_id in enumerate(matrix.song_ids) if song_id in songs),
+        key=matrix.song_ids.__getitem__
+    )
+    positions = {number: position for position, number in enumerate(numbers)}
+
+    song_ids = array('q')
+    artwork_ids = array('q')
+    offsets = array('I', [0])
+    neighbors = array('I')
+    scores = array('f')
+    text_offsets = array('I', [0])
+    texts = bytearray()
+
+    for number in numbers:
+        song_id = matrix.song_ids[number]
+        title, artist_name, artwork_id = songs[song_id]
+        song_ids.append(song_id)
+        artwork_ids.append(artwork_id or 0)
+        texts += f"{title or ''}{_SEPARATOR}{artist_name or ''}".encode('utf-8')
+        text_offsets.append(len(texts))
+
+        for score, other in matrix.similar(number, top_n=top_n, min_cooccurrence=min_cooccurrence):
+            position = positions.get(other)
+            if position is not None:
+                neighbors.append(position)
+                scores.append(score)
+        offsets.append(len(neighbors))
+
+    sections = [song_ids, artwork_ids, offsets, neighbors, scores, text_offsets, bytes(texts)]
+    sections = [section.tobytes() if isinstance(section, array) else section for section in sections]
+
+    section_offsets = []
+    position = _align(_HEADER.size)
+    for section in sections:
+        section_offsets.append(position)
+        position = _align(position + len(section))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.similar-songs-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, len(song_ids), len(neighbors), *section_offsets, 0))
+            for offset, section in zip(section_offsets, sections):
+                f.seek(offset)
+                f.write(section)
+            f.truncate(position)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return {'songs': len(song_ids), 'neighbors': len(neighbors), 'bytes': position}
+
+
+class SimilarSongsIndex:
+    """
+    Read-only view of a similar-songs file
+
+    Args:
+        path (str): File written by write_similar_songs
+
+    Raises:
+        ValueError: If the file is not a similar-songs file of this version
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        view = memoryview(self._map)
+        magic, version, self.n_songs, self.n_neighbors, *offsets, _ = _HEADER.unpack_from(view)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Invalid similar-songs file: {path}")
+        song_ids, artwork_ids, neighbor_offsets, neighbors, scores, text_offsets, text_blob = offsets
+
+        n, m = self.n_songs, self.n_neighbors
+        self._song_ids = view[song_ids:song_ids + 8 * n].cast('q')
+        self._artwork_ids = view[artwork_ids:artwork_ids + 8 * n].cast('q')
+        self._offsets = view[neighbor_offsets:neighbor_offsets + 4 * (n + 1)].cast('I')
+        self._neighbors = view[neighbors:neighbors + 4 * m].cast('I')
+        self._scores = view[scores:scores + 4 * m].cast('f')
+        self._text_offsets = view[text_offsets:text_offsets + 4 * (n + 1)].cast('I')
+        self._text_blob = view[text_blob:]
+
+    def _position(self, song_id):
+        position = bisect_left(self._song_ids, song_id)
+        if position < self.n_songs and self._song_ids[position] == song_id:
+            return position
+        return None
+
+    def _song(self, position):
+        title, _, artist_name = bytes(
+            self._text_blob[self._text_offsets[position]:self._text_offsets[position + 1]]
+        ).decode('utf-8').partition(_SEPARATOR)
+        return {
+            'song_id': self._song_ids[position],
+            'title': title,
+            'artist_name': artist_name or None,
+            'artwork_id': self._artwork_ids[position] or None
+        }
+
+    def __contains__(self, song_id):
+        return self._position(song_id) is not None
+
+    def similar(self, song_id, limit=10):
+        """
+        Songs most often played by the same listeners
+
+        Args:
+            song_id (int): Song to start from
+            limit (int): Most songs returned
+
+        Returns:
+            list: [{'song_id', 'title', 'artist_name', 'artwork_id', 'score'}]
+                best first; empty for songs without enough history
+        """
+        position = self._position(song_id)
+        if position is None:
+            return []
+        start = self._offsets[position]
+        end = min(self._offsets[position + 1], start + limit)
+        return [
+            {**self._song(self._neighbors[i]), 'score': round(self._scores[i], 4)}
+            for i in range(start, end)
+        ]
+
+    def get_stats(self):
+        """
+        File size and counts for monitoring
+
+        Returns:
+            dict: path, songs, neighbours and mapped bytes
+        """
+        return {'path': self.path, 'songs': self.n_songs, 'neighbors': self.n_neighbors, 'bytes': len(self._map)}
@@ -0,0 +1,173 @@
+"""
+Trending songs over sliding time windows from a stream of plays
+
+Counting plays per song exactly would mean a counter for every song ever
+played in the window; SpaceSaving keeps a fixed number of counters instead
+and still finds the heavy hitters. When a new song arrives and every counter
+is taken, it replaces the song with the smallest count and inherits that
+count as its possible overestimate (its `error`). Any song played more than
+total / capacity times is guaranteed to be tracked, and a song's count is off
+by at most its error.
+
+A window (e.g. the last 24 hours) is a ring of buckets (e.g. one per hour),
+each with its own SpaceSaving summary. Plays go to the newest bucket; buckets
+that fall out of the window are dropped whole, and the top songs of the
+window come from merging the remaining buckets. The window therefore slides
+in steps of one bucket.
+"""
+import heapq
+from collections import deque, Counter
+
+
+# Counters kept per bucket
+DEFAULT_CAPACITY = 1000
+
+
+class SpaceSaving:
+    """
+    Approximate counts of the most frequent items in a stream
+
+    Args:
+        capacity (int): Items tracked at once
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.total = 0
+        self.counts = {}
+        self.errors = {}
+        # One (count, item) entry per tracked item; an entry may lag behind
+        # the item's count and is fixed up when it reaches the top
+        self._heap = []
+
+    def __len__(self):
+        return len(self.counts)
+
+    def add(self, item, count=1):
+        """Count `count` occurrences of item"""
+        self.total += count
+        counts = self.counts
+        if item in counts:
+            counts[item] += count
+            return
+
+        heap = self._heap
+        if len(counts) < self.capacity:
+            counts[item] = count
+            self.errors[item] = 0
+            heapq.heappush(heap, (count, item))
+            return
+
+        while True:
+            smallest, victim = heap[0]
+            current = counts[victim]
+            if current == smallest:
+                break
+            heapq.heapreplace(heap, (current, victim))
+
+        del counts[victim]
+        del self.errors[victim]
+        counts[item] = smallest + count
+        self.errors[item] = smallest
+        heapq.heapreplace(heap, (smallest + count, item))
+
+    def to_dict(self):
+        return {
+            'capacity': self.capacity,
+            'total': self.total,
+            'items': [[item, count, self.errors[item]] for item, count in self.counts.items()]
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        summary = cls(data['capacity'])
+        summary.total = data['total']
+        for item, count, error in data['items']:
+            summary.counts[item] = count
+            summary.errors[item] = error
+            summary._heap.append((count, item))
+        heapq.heapify(summary._heap)
+        return summary
+
+
+class SlidingTopK:
+    """
+    Heavy hitters of the last `span` seconds, in `buckets` steps
+
+    Not thread-safe; the owner serializes calls.
+
+    Args:
+        span (int): Window length in seconds
+        buckets (int): Buckets the window is split into
+        capacity (int): Counters per bucket
+    """
+
+    def __init__(self, span, buckets, capacity=DEFAULT_CAPACITY):
+        self.span = span
+        self.bucket_seconds = span // buckets
+        self.capacity = capacity
+        self._buckets = deque()     # (bucket start, SpaceSaving), oldest first
+
+    def _bucket_start(self, timestamp):
+        return int(timestamp // self.bucket_seconds) * self.bucket_seconds
+
+    def _expire(self, now):
+        oldest = self._bucket_start(now) - self.span + self.bucket_seconds
+        while self._buckets and self._buckets[0][0] < oldest:
+            self._buckets.popleft()
+
+    def add(self, item, timestamp, count=1):
+        """
+        Count plays of item at timestamp (seconds since the epoch)
+
+        Late plays are added to the bucket they fall in while it is still
+        held, and ignored otherwise.
+        """
+        start = self._bucket_start(timestamp)
+        buckets = self._buckets
+        if not buckets or start > buckets[-1][0]:
+            buckets.append((start, SpaceSaving(self.capacity)))
+            self._expire(timestamp)
+        elif start < buckets[-1][0]:
+            for bucket_start, summary in reversed(buckets):
+                if bucket_start <= start:
+                    if bucket_start == start:
+                        summary.add(item, count)
+                    break
+            return
+        buckets[-1][1].add(item, count)
+
+    def top(self, n, now):
+        """
+        Most played items in the window ending at now
+
+        Returns:
+            tuple: ([(item, count, error)] most played first, total plays)
+                where count - error is a guaranteed lower bound
+        """
+        self._expire(now)
+        counts = Counter()
+        errors = Counter()
+        total = 0
+        for _, summary in self._buckets:
+            counts.update(summary.counts)
+            errors.update(summary.errors)
+            total += summary.total
+        return [(item, count, errors[item]) for item, count in heapq.nlargest(n, counts.items(), key=_count)], total
+
+    def to_dict(self):
+        return {
+            'span': self.span,
+            'bucket_seconds': self.bucket_seconds,
+            'buckets': [[start, summary.to_dict()] for start, summary in self._buckets]
+        }
+
+    def load(self, data):
+        """Restore buckets saved by to_dict() with the same span and bucket size (otherwise ignored)"""
+        if data.get('span') != self.span or data.get('bucket_seconds') != self.bucket_seconds:
+            return
+        self._buckets = deque((start, SpaceSaving.from_dict(summary)) for start, summary in data['buckets'])
+
+
+def _count(entry):
+    return entry[1]
@@ -0,0 +1,7 @@
+"""
+Search module for local full-text search
+"""
+from .routes import search_bp
+from .services import search_service, autocomplete_service
+
+__all__ = ['search_bp', 'search_service', 'autocomplete_service']
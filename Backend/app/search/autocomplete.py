@@ -0,0 +1,310 @@
+"""
+Prefix suggestions from a memory-mapped sorted key array
+
+write_autocomplete() turns catalog documents into one file; AutocompleteIndex
+maps it read-only and answers prefix queries without deserializing anything,
+so a process starts serving suggestions as soon as the file is mapped and
+several worker processes share the same pages.
+
+Every name is stored under its folded form (see app.search.text) and under
+the suffixes starting at its next few words, so "tung" finds "Sơn Tùng".
+Keys are sorted; the keys sharing a prefix form one contiguous range found
+by binary search. A max segment tree over key popularity then yields the
+range's most played entries one by one in O(log n) each.
+
+File layout (native byte order, sections 8-byte aligned):
+    header                 magic, version, counts and section offsets
+    key_offsets  uint32    n_keys + 1 offsets into key_blob
+    key_blob     bytes     folded UTF-8 keys in sorted order
+    key_entries  uint32    entry of each key
+    key_scores   uint32    popularity of each key's entry
+    tree         uint32    2 * tree_size nodes, key position of the subtree maximum
+    entry_kinds  uint8     index into KINDS
+    entry_ids    int64     SongID / ArtistID / ArtworkID
+    text_offsets uint32    n_entries + 1 offsets into text_blob
+    text_blob    bytes     "title\\x1fsubtitle" in UTF-8
+"""
+import os
+import mmap
+import heapq
+import struct
+import tempfile
+from array import array
+from bisect import bisect_left
+from .index import KINDS
+from .text import tokenize
+
+
+MAGIC = b'ACMP'
+VERSION = 1
+_HEADER = struct.Struct('<4sIIII10Q')
+
+# Word positions a name can be matched from: "a b c d" is stored as
+# "a b c d", "b c d" and "c d"
+MAX_SUFFIXES = 3
+
+# Longest key stored, in bytes; longer names are matched on this prefix
+MAX_KEY_BYTES = 96
+
+# Ranges this small are scanned directly instead of through the tree
+SCAN_THRESHOLD = 32
+
+# Most candidates looked at per query (duplicates of an entry under several
+# keys and filtered kinds are skipped)
+MAX_CANDIDATES = 200
+
+_EMPTY = 0xFFFFFFFF
+_SEPARATOR = '\x1f'
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def suggestion_key(text):
+    """Folded, single-spaced form of text used as (and to look up) keys"""
+    return ' '.join(tokenize(text))
+
+
+def write_autocomplete(documents, path):
+    """
+    Build an autocomplete file from search documents
+
+    The file is written next to `path` and renamed over it, so readers that
+    already mapped the old file keep working.
+
+    Args:
+        documents: Iterable of dicts with 'kind', 'id', 'title', 'subtitle'
+            and 'plays' (see SearchIndex.load)
+        path (str): Destination file
+
+    Returns:
+        dict: keys and entries written
+    """
+    kinds = bytearray()
+    ids = array('q')
+    scores = array('I')
+    texts = []
+    keys = []
+
+    for document in documents:
+        words = tokenize(document['title'])
+        if not words:
+            continue
+        entry = len(kinds)
+        kinds.append(KINDS.index(document['kind']))
+        ids.append(document['id'])
+        scores.append(min(document.get('plays') or 0, _EMPTY - 1))
+        texts.append(f"{document['title']}{_SEPARATOR}{document.get('subtitle') or ''}".encode('utf-8'))
+        for start in range(min(len(words), MAX_SUFFIXES)):
+            key = ' '.join(words[start:]).encode('utf-8')[:MAX_KEY_BYTES]
+            keys.append((key, entry))
+
+    keys.sort()
+    n_keys, n_entries = len(keys), len(kinds)
+
+    tree_size = 1
+    while tree_size < n_keys:
+        tree_size *= 2
+    key_scores = array('I', (scores[entry] for _, entry in keys))
+    tree = array('I', [_EMPTY]) * (2 * tree_size)
+    tree[tree_size:tree_size + n_keys] = array('I', range(n_keys))
+    for node in range(tree_size - 1, 0, -1):
+        left, right = tree[2 * node], tree[2 * node + 1]
+        if right == _EMPTY or (left != _EMPTY and key_scores[left] >= key_scores[right]):
+            tree[node] = left
+        else:
+            tree[node] = right
+
+    key_offsets = array('I', [0])
+    for key, _ in keys:
+        key_offsets.append(key_offsets[-1] + len(key))
+    text_offsets = array('I', [0])
+    for text in texts:
+        text_offsets.append(text_offsets[-1] + len(text))
+
+    sections = [
+        key_offsets,
+        b''.join(key for key, _ in keys),
+        array('I', (entry for _, entry in keys)),
+        key_scores,
+        tree,
+        kinds,
+        ids,
+        text_offsets,
+        b''.join(texts),
+    ]
+    sections = [section.tobytes() if isinstance(section, array) else section for section in sections]
+
+    offsets = []
+    position = _align(_HEADER.size)
+    for section in sections:
+        offsets.append(position)
+        position = _align(position + len(section))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.autocomplete-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, n_keys, n_entries, tree_size, *offsets, 0))
+            for offset, section in zip(offsets, sections):
+                f.seek(offset)
+                f.write(section)
+            f.truncate(position)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return {'keys': n_keys, 'entries': n_entries, 'bytes': position}
+
+
+class _Keys:
+    """Sequence view of the sorted keys, for bisect"""
+
+    def __init__(self, offsets, data, base):
+        self._offsets = offsets
+        self._data = data
+        self._base = base
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, position):
+        return self._data[self._base + self._offsets[position]:self._base + self._offsets[position + 1]]
+
+
+class AutocompleteIndex:
+    """
+    Read-only view of an autocomplete file
+
+    Args:
+        path (str): File written by write_autocomplete
+
+    Raises:
+        ValueError: If the file is not an autocomplete file of this version
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        view = memoryview(self._map)
+        (magic, version, self.n_keys, self.n_entries, tree_size,
+         *offsets, _) = _HEADER.unpack_from(view)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Invalid autocomplete file: {path}")
+        (key_offsets, key_blob, key_entries, key_scores, tree,
+         entry_kinds, entry_ids, text_offsets, text_blob) = offsets
+
+        n_keys, n_entries = self.n_keys, self.n_entries
+        self._key_offsets = view[key_offsets:key_offsets + 4 * (n_keys + 1)].cast('I')
+        self._keys = _Keys(self._key_offsets, self._map, key_blob)
+        self._key_entries = view[key_entries:key_entries + 4 * n_keys].cast('I')
+        self._key_scores = view[key_scores:key_scores + 4 * n_keys].cast('I')
+        self._tree = view[tree:tree + 8 * tree_size].cast('I')
+        self._tree_size = tree_size
+        self._entry_kinds = view[entry_kinds:entry_kinds + n_entries]
+        self._entry_ids = view[entry_ids:entry_ids + 8 * n_entries].cast('q')
+        self._text_offsets = view[text_offsets:text_offsets + 4 * (n_entries + 1)].cast('I')
+        self._text_blob = view[text_blob:]
+
+    def _range(self, prefix):
+        """Positions [lo, hi) of the keys starting with prefix"""
+        lo = bisect_left(self._keys, prefix)
+        hi = bisect_left(self._keys, prefix + b'\xff', lo)
+        return lo, hi
+
+    def _range_max(self, lo, hi):
+        """Key position with the highest score in [lo, hi)"""
+        scores, tree = self._key_scores, self._tree
+        best = _EMPTY
+        lo += self._tree_size
+        hi += self._tree_size
+        while lo < hi:
+            if lo & 1:
+                candidate = tree[lo]
+                if best == _EMPTY or scores[candidate] > scores[best]:
+                    best = candidate
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                candidate = tree[hi]
+                if best == _EMPTY or scores[candidate] > scores[best]:
+                    best = candidate
+            lo >>= 1
+            hi >>= 1
+        return best
+
+    def _best_positions(self, lo, hi):
+        """Key positions in [lo, hi), highest score first"""
+        scores = self._key_scores
+        if hi - lo <= SCAN_THRESHOLD:
+            yield from sorted(range(lo, hi), key=lambda position: (-scores[position], position))
+            return
+
+        best = self._range_max(lo, hi)
+        heap = [(-scores[best], best, lo, hi)]
+        while heap:
+            _, position, left, right = heapq.heappop(heap)
+            yield position
+            if left < position:
+                candidate = self._range_max(left, position)
+                heapq.heappush(heap, (-scores[candidate], candidate, left, position))
+            if position + 1 < right:
+                candidate = self._range_max(position + 1, right)
+                heapq.heappush(heap, (-scores[candidate], candidate, position + 1, right))
+
+    def suggest(self, prefix, kinds=None, limit=10):
+        """
+        Most played names starting with (a word sequence starting with) prefix
+
+        Args:
+            prefix (str): Text typed so far; case and accents are ignored
+            kinds (iterable): Restrict to these kinds (default: all)
+            limit (int): Most suggestions returned
+
+        Returns:
+            list: [{'type', 'id', 'title', 'subtitle', 'plays'}] most played first
+        """
+        key = suggestion_key(prefix).encode('utf-8')[:MAX_KEY_BYTES]
+        if not key:
+            return []
+        kind_codes = {KINDS.index(kind) for kind in kinds} if kinds else None
+
+        lo, hi = self._range(key)
+        results = []
+        seen = set()
+        for examined, position in enumerate(self._best_positions(lo, hi)):
+            if len(results) >= limit or examined >= MAX_CANDIDATES:
+                break
+            entry = self._key_entries[position]
+            if entry in seen:
+                continue
+            seen.add(entry)
+            kind = self._entry_kinds[entry]
+            if kind_codes is not None and kind not in kind_codes:
+                continue
+            title, _, subtitle = bytes(
+                self._text_blob[self._text_offsets[entry]:self._text_offsets[entry + 1]]
+            ).decode('utf-8').partition(_SEPARATOR)
+            results.append({
+                'type': KINDS[kind],
+                'id': self._entry_ids[entry],
+                'title': title,
+                'subtitle': subtitle or None,
+                'plays': self._key_scores[position]
+            })
+        return results
+
+    def get_stats(self):
+        """
+        File size and counts for monitoring
+
+        Returns:
+            dict: path, keys, entries and mapped bytes
+        """
+        return {'path': self.path, 'keys': self.n_keys, 'entries': self.n_entries, 'bytes': len(self._map)}
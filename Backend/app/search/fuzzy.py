@@ -0,0 +1,206 @@
+"""
+Typo-tolerant matching with a trigram index over the search vocabulary
+
+A catalog of a million names has only a few hundred thousand distinct words,
+so misspellings are corrected word by word instead of name by name: every
+indexed term is padded with spaces and split into overlapping three-character
+grams ("tung" -> " tu", "tun", "ung", "ng "). Postings arrays list the terms
+containing each trigram, one array per trigram and term length.
+
+A word is corrected in two steps:
+- Candidate generation: one edit changes at most four trigrams (three for an
+  insertion, deletion or substitution, four for a swap of adjacent
+  characters), so a term within k edits of the word shares at least
+  (trigrams of the word) - 4k of them and its length differs by at most k.
+  A short word may share none with a swap of itself ("tnug" / "tung"), so
+  indexed words one swap away are looked up directly. The word's postings lists for
+  those lengths are counted and terms below that bar are dropped.
+- Re-ranking: the remaining terms are compared with the word by edit distance
+  (adjacent transpositions count as one edit); those within k edits are
+  returned, most common first.
+
+SearchIndex then runs the query with the corrected terms and ranks the names
+it finds by the edit distance of their correction, then by score.
+"""
+from array import array
+from collections import Counter
+
+
+# Terms compared by edit distance per word, most shared trigrams first
+MAX_CANDIDATES = 200
+
+
+def trigrams(word):
+    """Distinct trigrams of a folded word, padded with one space on each side"""
+    padded = f" {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_edits(length):
+    """Edits tolerated for a word of this many characters"""
+    if length <= 2:
+        return 0
+    if length <= 5:
+        return 1
+    return 2
+
+
+def edit_distance(a, b, limit=None):
+    """
+    Optimal string alignment distance between two strings
+
+    Insertions, deletions, substitutions and swaps of adjacent characters
+    each count as one edit ("tugn" -> "tung" is 1).
+
+    Args:
+        a (str): First string
+        b (str): Second string
+        limit (int): Stop early and return limit + 1 once the distance is
+            known to exceed it (default: no limit)
+
+    Returns:
+        int: Edit distance (or limit + 1)
+    """
+    if limit is None:
+        limit = max(len(a), len(b))
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    # Only cells within `limit` of the diagonal can stay within `limit`
+    beyond = limit + 1
+    previous2 = None
+    previous = [j if j <= limit else beyond for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [beyond] * (len(b) + 1)
+        if i <= limit:
+            current[0] = i
+        char = a[i - 1]
+        best = current[0]
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            value = previous[j - 1] if char == b[j - 1] else previous[j - 1] + 1
+            if previous[j] + 1 < value:
+                value = previous[j] + 1
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if previous2 is not None and j > 1 and char == b[j - 2] and a[i - 2] == b[j - 1] and previous2[j - 2] + 1 < value:
+                value = previous2[j - 2] + 1
+            current[j] = value
+            if value < best:
+                best = value
+        if best > limit:
+            return beyond
+        previous2, previous = previous, current
+    return min(previous[-1], beyond)
+
+
+class TrigramIndex:
+    """
+    Trigram postings over a growing list of words
+
+    Words are numbered in the order they are added, which lets SearchIndex use
+    its term ids. Words are expected to be folded already (see
+    app.search.text.tokenize).
+    """
+
+    def __init__(self):
+        self._trigram_ids = {}           # (word length, trigram) -> postings index
+        self._postings = []              # postings index -> array of word numbers, ascending
+        self._words = []
+        self._numbers = {}               # word -> its number, for exact lookups
+
+    def __len__(self):
+        return len(self._words)
+
+    def add(self, word):
+        """
+        Index one word
+
+        Args:
+            word (str): Folded word
+
+        Returns:
+            int: The word's number
+        """
+        number = len(self._words)
+        self._words.append(word)
+        self._numbers.setdefault(word, number)
+        for gram in trigrams(word):
+            key = (len(word), gram)
+            postings_id = self._trigram_ids.get(key)
+            if postings_id is None:
+                postings_id = self._trigram_ids[key] = len(self._postings)
+                self._postings.append(array('I'))
+            self._postings[postings_id].append(number)
+        return number
+
+    def match(self, word, limit=5, rank=None):
+        """
+        Indexed words closest to a word, within a few edits
+
+        One edit is tried first; two edits (for longer words) only when
+        nothing is one edit away, since the one-edit corrections are nearly
+        always the intended ones and their candidates are far fewer.
+
+        Args:
+            word (str): Folded, possibly misspelled word
+            limit (int): Most matches returned
+            rank (callable): rank(number) -> sort key among equally close
+                words (lower first), e.g. negative document frequency
+
+        Returns:
+            list: [(distance, number)] all at the smallest distance found; the
+                word itself is not included
+        """
+        grams = trigrams(word)
+        counts = Counter()
+        counted = set()
+        for edits in range(1, max_edits(len(word)) + 1):
+            for length in range(len(word) - edits, len(word) + edits + 1):
+                if length in counted:
+                    continue
+                counted.add(length)
+                for gram in grams:
+                    postings_id = self._trigram_ids.get((length, gram))
+                    if postings_id is not None:
+                        counts.update(self._postings[postings_id])
+
+            needed = len(grams) - 4 * edits
+            candidates = [number for number, shared in counts.items() if shared >= needed]
+            if len(candidates) > MAX_CANDIDATES:
+                candidates = sorted(candidates, key=counts.__getitem__, reverse=True)[:MAX_CANDIDATES]
+            if edits == 1:
+                # Short words can share no trigram with a swap of themselves ("tnug" / "tung")
+                candidates.extend(number for number in self._swaps(word) if number not in candidates)
+
+            matches = []
+            for number in candidates:
+                candidate = self._words[number]
+                if candidate != word and edit_distance(word, candidate, limit=edits) <= edits:
+                    matches.append((rank(number) if rank else 0, number))
+            if matches:
+                matches.sort()
+                return [(edits, number) for _, number in matches[:limit]]
+        return []
+
+    def _swaps(self, word):
+        """Numbers of the indexed words one swap of adjacent characters away"""
+        for i in range(len(word) - 1):
+            number = self._numbers.get(word[:i] + word[i + 1] + word[i] + word[i + 2:])
+            if number is not None:
+                yield number
+
+    def get_stats(self):
+        """
+        Index size for monitoring and benchmarks
+
+        Returns:
+            dict: words, postings arrays (one per trigram and word length),
+                postings and bytes held by the postings arrays
+        """
+        postings = sum(len(p) for p in self._postings)
+        return {
+            'words': len(self._words),
+            'postings_arrays': len(self._postings),
+            'postings': postings,
+            'postings_bytes': postings * 4
+        }
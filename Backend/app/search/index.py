@@ -0,0 +1,451 @@
+"""
+In-memory inverted index with BM25 ranking
+
+Documents are songs, artists and artworks. Each has a few text fields
+(title, artist name, album title) that are tokenized with app.search.text
+and weighted, plus a play count that boosts its score.
+
+Layout:
+- Postings: per term, document numbers and their precomputed score
+  contribution (BM25 term weight x popularity boost), sorted by contribution
+  so the best matches for a term come first
+- Forward index: per document, its terms and contributions, so the other
+  query terms of a candidate are checked without touching their postings
+- Delta segment: documents added after the build live in small dicts until
+  `merge_threshold` of them pile up and are merged into the postings.
+  Replaced or removed documents are only marked dead; the next full build
+  drops them
+- Trigrams: every term also goes into a TrigramIndex (app.search.fuzzy) under
+  its term id, so query words that are not in the index can be corrected
+"""
+import math
+import heapq
+import threading
+from array import array
+from itertools import islice, product
+from .text import tokenize
+from .fuzzy import TrigramIndex
+
+
+KINDS = ('song', 'artist', 'artwork')
+_KIND_CODES = {kind: code for code, kind in enumerate(KINDS)}
+
+# Term frequency multiplier per field: a hit in a title counts more than one
+# in the artist or album name attached to it
+FIELD_WEIGHTS = {'title': 2.0, 'artist': 1.0, 'album': 0.5}
+
+# When not every query term matches, only this many of each term's best
+# postings are considered
+DISJUNCTIVE_CANDIDATES = 500
+
+# Most documents scored by one query. Queries made only of very common terms
+# stop here and rank what they have found, which keeps their latency bounded
+# at the cost of possibly missing a match deep in the postings.
+MAX_CANDIDATES = 2000
+
+# Corrections tried per unknown query word, and most corrected queries run
+FUZZY_EXPANSIONS = 3
+FUZZY_QUERIES = 9
+
+
+class SearchIndex:
+    """
+    BM25 index over songs, artists and artworks
+
+    Build a fresh instance with load() and swap it in; upsert() and remove()
+    keep it current between builds. All methods are thread-safe.
+
+    Args:
+        k1 (float): BM25 term frequency saturation
+        b (float): BM25 length normalization
+        popularity_weight (float): Score multiplier is 1 + popularity_weight * ln(1 + plays)
+        merge_threshold (int): Delta documents that trigger a merge into the postings
+    """
+
+    def __init__(self, k1=1.2, b=0.75, popularity_weight=0.25, merge_threshold=10000):
+        self.k1 = k1
+        self.b = b
+        self.popularity_weight = popularity_weight
+        self.merge_threshold = merge_threshold
+
+        self._lock = threading.Lock()
+
+        # Per document number
+        self._keys = {}                 # (kind, id) -> document number
+        self._kinds = bytearray()
+        self._ids = array('q')
+        self._owners = array('q')       # ArtistID the document belongs to
+        self._titles = []
+        self._subtitles = []
+        self._alive = bytearray()
+        self._live = 0
+        self._avg_length = 1.0
+
+        # Merged segment
+        self._term_ids = {}             # term -> term id
+        self._postings = []             # term id -> (array of docs, array of contributions), best first
+        self._forward_offsets = array('Q', [0])
+        self._forward_terms = array('I')
+        self._forward_weights = array('f')
+        self._merged_docs = 0
+
+        # Delta segment
+        self._delta_postings = {}       # term id -> {doc: contribution}
+        self._delta_forward = {}        # doc -> {term id: contribution}
+
+        # Term trigrams, numbered like the term ids
+        self._trigrams = TrigramIndex()
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+
+    def load(self, documents):
+        """
+        Index documents into this (empty) instance
+
+        Args:
+            documents: Iterable of dicts with 'kind' ('song', 'artist' or
+                'artwork'), 'id', 'title', 'subtitle' (shown under the title),
+                'fields' ({'title', 'artist', 'album'} text to index), 'plays'
+                and 'artist_id' (the artist it belongs to)
+        """
+        lengths = array('f')
+        boosts = array('f')
+        total_length = 0.0
+
+        for document in documents:
+            terms = self._term_frequencies(document['fields'])
+            self._append_document(document)
+            length = sum(terms.values())
+            total_length += length
+            lengths.append(length)
+            boosts.append(self._boost(document.get('plays', 0)))
+            for term_id, frequency in terms.items():
+                self._forward_terms.append(term_id)
+                self._forward_weights.append(frequency)
+            self._forward_offsets.append(len(self._forward_terms))
+
+        count = len(self._kinds)
+        self._avg_length = total_length / count if count else 1.0
+
+        # Turn frequencies into contributions and collect the postings
+        posting_docs = [array('I') for _ in self._term_ids]
+        posting_weights = [array('f') for _ in self._term_ids]
+        offsets, terms, weights = self._forward_offsets, self._forward_terms, self._forward_weights
+        for doc in range(count):
+            boost, length = boosts[doc], lengths[doc]
+            for i in range(offsets[doc], offsets[doc + 1]):
+                weight = self._contribution(weights[i], length) * boost
+                weights[i] = weight
+                posting_docs[terms[i]].append(doc)
+                posting_weights[terms[i]].append(weight)
+
+        for docs, contributions in zip(posting_docs, posting_weights):
+            order = sorted(range(len(docs)), key=contributions.__getitem__, reverse=True)
+            self._postings.append((
+                array('I', (docs[i] for i in order)),
+                array('f', (contributions[i] for i in order))
+            ))
+        self._merged_docs = count
+        return self
+
+    def _append_document(self, document):
+        doc = len(self._kinds)
+        self._keys[(document['kind'], document['id'])] = doc
+        self._kinds.append(_KIND_CODES[document['kind']])
+        self._ids.append(document['id'])
+        self._owners.append(document.get('artist_id') or 0)
+        self._titles.append(document['title'])
+        self._subtitles.append(document.get('subtitle'))
+        self._alive.append(1)
+        self._live += 1
+        return doc
+
+    def _term_frequencies(self, fields):
+        """Field-weighted frequency of each term, registering new terms"""
+        frequencies = {}
+        for field, text in fields.items():
+            weight = FIELD_WEIGHTS.get(field, 1.0)
+            for token in tokenize(text):
+                term_id = self._term_ids.get(token)
+                if term_id is None:
+                    term_id = self._term_ids[token] = len(self._term_ids)
+                    self._trigrams.add(token)
+                frequencies[term_id] = frequencies.get(term_id, 0.0) + weight
+        return frequencies
+
+    def _boost(self, plays):
+        return 1.0 + self.popularity_weight * math.log1p(max(plays or 0, 0))
+
+    def _contribution(self, frequency, length):
+        """BM25 term weight without idf (idf depends on the query-time document count)"""
+        norm = self.k1 * (1 - self.b + self.b * length / self._avg_length)
+        return frequency * (self.k1 + 1) / (frequency + norm)
+
+    # ------------------------------------------------------------------
+    # Incremental updates
+    # ------------------------------------------------------------------
+
+    def upsert(self, document):
+        """Add a document, replacing any earlier version with the same kind and id"""
+        with self._lock:
+            self._remove((document['kind'], document['id']))
+
+            terms = self._term_frequencies(document['fields'])
+            doc = self._append_document(document)
+            length = sum(terms.values())
+            boost = self._boost(document.get('plays', 0))
+
+            contributions = {}
+            for term_id, frequency in terms.items():
+                while len(self._postings) <= term_id:
+                    self._postings.append((array('I'), array('f')))
+                contribution = self._contribution(frequency, length) * boost
+                contributions[term_id] = contribution
+                self._delta_postings.setdefault(term_id, {})[doc] = contribution
+            self._delta_forward[doc] = contributions
+
+            if len(self._delta_forward) >= self.merge_threshold:
+                self._merge()
+
+    def remove(self, kind, id):
+        """Drop a document; unknown documents are ignored"""
+        with self._lock:
+            self._remove((kind, id))
+
+    def remove_artist(self, artist_id):
+        """Drop an artist together with every song and artwork belonging to it"""
+        with self._lock:
+            for doc, owner in enumerate(self._owners):
+                if owner == artist_id and self._alive[doc]:
+                    self._remove((KINDS[self._kinds[doc]], self._ids[doc]))
+
+    def _remove(self, key):
+        doc = self._keys.pop(key, None)
+        if doc is None:
+            return
+        self._alive[doc] = 0
+        self._live -= 1
+        contributions = self._delta_forward.pop(doc, None)
+        if contributions:
+            for term_id in contributions:
+                self._delta_postings[term_id].pop(doc, None)
+
+    def _merge(self):
+        """Fold the delta segment into the postings and forward index. Caller holds _lock."""
+        for term_id, delta in self._delta_postings.items():
+            if not delta:
+                continue
+            docs, weights = self._postings[term_id]
+            merged = [(weight, doc) for doc, weight in zip(docs, weights) if self._alive[doc]]
+            merged.extend((weight, doc) for doc, weight in delta.items())
+            merged.sort(reverse=True)
+            self._postings[term_id] = (
+                array('I', (doc for _, doc in merged)),
+                array('f', (weight for weight, _ in merged))
+            )
+
+        for doc in range(self._merged_docs, len(self._kinds)):
+            for term_id, weight in self._delta_forward.get(doc, {}).items():
+                self._forward_terms.append(term_id)
+                self._forward_weights.append(weight)
+            self._forward_offsets.append(len(self._forward_terms))
+
+        self._merged_docs = len(self._kinds)
+        self._delta_postings = {}
+        self._delta_forward = {}
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def search(self, query, kinds=None, limit=20, offset=0):
+        """
+        Best matching documents for a query
+
+        Documents containing every query term come first; when there are
+        fewer than offset + limit of them, documents matching some of the
+        terms follow. A query word that is not in the index (usually a typo)
+        is replaced by the closest indexed terms first, and the documents
+        found that way are marked fuzzy.
+
+        Args:
+            query (str): Free text
+            kinds (iterable): Restrict to these kinds (default: all)
+            limit (int): Page size
+            offset (int): Results to skip
+
+        Returns:
+            list: [{'type', 'id', 'title', 'subtitle', 'score', 'fuzzy'}] best first
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+        term_ids = [self._term_ids.get(token, -1) for token in tokens]
+
+        kind_codes = {_KIND_CODES[kind] for kind in kinds} if kinds else None
+        wanted = offset + limit
+
+        with self._lock:
+            fuzzy = set()
+            if -1 not in term_ids:
+                hits = self._conjunctive(term_ids, kind_codes, wanted)
+            else:
+                hits = self._fuzzy(tokens, term_ids, kind_codes, wanted)
+                fuzzy = {doc for _, doc in hits}
+            if len(hits) < wanted:
+                found = {doc for _, doc in hits}
+                partial = self._disjunctive(list({t for t in term_ids if t != -1}), kind_codes, wanted)
+                hits.extend(hit for hit in partial if hit[1] not in found)
+
+            return [
+                {
+                    'type': KINDS[self._kinds[doc]],
+                    'id': self._ids[doc],
+                    'title': self._titles[doc],
+                    'subtitle': self._subtitles[doc],
+                    'score': round(score, 4),
+                    'fuzzy': doc in fuzzy
+                }
+                for score, doc in hits[offset:wanted]
+            ]
+
+    def _document_frequency(self, term_id):
+        return len(self._postings[term_id][0]) + len(self._delta_postings.get(term_id, ()))
+
+    def _idf(self, term_id):
+        frequency = self._document_frequency(term_id)
+        return math.log(1 + (self._live - frequency + 0.5) / (frequency + 0.5))
+
+    def _fuzzy(self, tokens, term_ids, kind_codes, wanted):
+        """
+        Top documents for the query with its unknown words corrected
+
+        Each unknown word is replaced in turn by up to FUZZY_EXPANSIONS indexed
+        terms within a few edits of it (closest, then most common first) and
+        the corrected queries are run conjunctively. Documents are ranked by the
+        edit distance of the correction that found them, then by score.
+        """
+        options = []
+        for token, term_id in zip(tokens, term_ids):
+            if term_id != -1:
+                options.append([(0, term_id)])
+                continue
+            corrections = self._trigrams.match(token, limit=FUZZY_EXPANSIONS, rank=lambda t: -self._document_frequency(t))
+            if not corrections:
+                return []
+            options.append(corrections)
+
+        ranked = {}
+        for corrected in islice(product(*options), FUZZY_QUERIES):
+            distance = sum(edits for edits, _ in corrected)
+            corrected_ids = list(dict.fromkeys(term_id for _, term_id in corrected))
+            for score, doc in self._conjunctive(corrected_ids, kind_codes, wanted):
+                if doc not in ranked or (distance, -score) < ranked[doc]:
+                    ranked[doc] = (distance, -score)
+
+        best = sorted(ranked.items(), key=lambda item: (item[1], item[0]))[:wanted]
+        return [(-negative_score, doc) for doc, (_, negative_score) in best]
+
+    def _document_weights(self, doc, term_ids):
+        """Contributions of the given terms to one document"""
+        contributions = self._delta_forward.get(doc)
+        if contributions is not None:
+            return {t: contributions[t] for t in term_ids if t in contributions}
+        found = {}
+        terms, weights = self._forward_terms, self._forward_weights
+        for i in range(self._forward_offsets[doc], self._forward_offsets[doc + 1]):
+            if terms[i] in term_ids:
+                found[terms[i]] = weights[i]
+        return found
+
+    def _score(self, doc, term_ids, idfs, kind_codes, require_all):
+        if not self._alive[doc] or (kind_codes is not None and self._kinds[doc] not in kind_codes):
+            return None
+        weights = self._document_weights(doc, term_ids)
+        if require_all and len(weights) < len(term_ids):
+            return None
+        return sum(idfs[t] * w for t, w in weights.items())
+
+    def _conjunctive(self, term_ids, kind_codes, wanted):
+        """
+        Top documents containing every term
+
+        Walks all the terms' postings side by side, best first (Fagin's
+        threshold algorithm). A document not seen yet scores at most the sum of
+        the contributions at the current positions, so the walk stops once the
+        top list beats that, once any term runs out of postings, or after
+        MAX_CANDIDATES documents.
+        """
+        term_ids = sorted(term_ids, key=self._document_frequency)
+        idfs = {t: self._idf(t) for t in term_ids}
+        wanted_terms = set(term_ids)
+        lists = [(idfs[t], self._postings[t][0], self._postings[t][1]) for t in term_ids]
+        heap = []
+        seen = set()
+
+        def consider(doc):
+            seen.add(doc)
+            score = self._score(doc, wanted_terms, idfs, kind_codes, require_all=True)
+            if score is None:
+                return
+            if len(heap) < wanted:
+                heapq.heappush(heap, (score, -doc))
+            elif score > heap[0][0]:
+                heapq.heapreplace(heap, (score, -doc))
+
+        for doc in list(self._delta_postings.get(term_ids[0], ())):
+            consider(doc)
+
+        # Sorted by document frequency, delta included, so the first list
+        # is not necessarily the shortest merged one
+        shortest = min(len(docs) for _, docs, _ in lists)
+        for position in range(shortest):
+            threshold = 0.0
+            for idf, docs, weights in lists:
+                doc = docs[position]
+                if doc not in seen:
+                    consider(doc)
+                threshold += idf * weights[position]
+            if len(heap) == wanted and threshold <= heap[0][0]:
+                break
+            if len(seen) >= MAX_CANDIDATES:
+                break
+
+        return sorted(((score, -negdoc) for score, negdoc in heap), key=lambda hit: (-hit[0], hit[1]))
+
+    def _disjunctive(self, term_ids, kind_codes, wanted):
+        """Top documents containing some of the terms, from each term's best postings"""
+        if not term_ids:
+            return []
+        idfs = {t: self._idf(t) for t in term_ids}
+        candidates = set()
+        for term_id in term_ids:
+            candidates.update(self._delta_postings.get(term_id, ()))
+            candidates.update(self._postings[term_id][0][:DISJUNCTIVE_CANDIDATES])
+
+        wanted_terms = set(term_ids)
+        scored = []
+        for doc in candidates:
+            score = self._score(doc, wanted_terms, idfs, kind_codes, require_all=False)
+            if score:
+                scored.append((score, doc))
+        return heapq.nsmallest(wanted, scored, key=lambda hit: (-hit[0], hit[1]))
+
+    def get_stats(self):
+        """
+        Index size for monitoring
+
+        Returns:
+            dict: live and dead documents, terms, postings and delta documents
+        """
+        with self._lock:
+            return {
+                'documents': self._live,
+                'dead_documents': len(self._kinds) - self._live,
+                'terms': len(self._term_ids),
+                'postings': len(self._forward_terms) + sum(len(d) for d in self._delta_forward.values()),
+                'delta_documents': len(self._delta_forward),
+                'trigram_postings': self._trigrams.get_stats()['postings']
+            }
@@ -0,0 +1,137 @@
+"""
+Search routes for local catalog search
+"""
+from flask import Blueprint, request, jsonify
+from .index import KINDS
+from .services import search_service, autocomplete_service
+
+
+# Create Blueprint
+search_bp = Blueprint('search', __name__, url_prefix='/api/search')
+
+# Longest query accepted, in characters
+MAX_QUERY_LENGTH = 200
+
+
+def _parse_kinds(types):
+    """
+    Parse the comma-separated type parameter
+
+    Returns:
+        tuple: (valid: bool, kinds: list or None for all kinds)
+    """
+    if not types:
+        return True, None
+    kinds = [kind.strip() for kind in types.split(',') if kind.strip()]
+    return bool(kinds) and all(kind in KINDS for kind in kinds), kinds
+
+
+@search_bp.route('', methods=['GET'])
+def search():
+    """
+    Full-text search over songs, artists and artworks
+
+    Query Parameters:
+        q (str): Search text (required); case and accents are ignored
+        type (str): Comma-separated subset of song, artist, artwork (default: all)
+        limit (int): Page size, 1-100 (default: 20)
+        offset (int): Results to skip (default: 0)
+
+    Returns:
+        200: Ranked results
+        400: Invalid parameters
+        503: Index still building after a restart
+        500: Server error
+    """
+    try:
+        query = request.args.get('q', '').strip()
+        types = request.args.get('type')
+        limit = request.args.get('limit', 20, type=int)
+        offset = request.args.get('offset', 0, type=int)
+
+        if not query:
+            return jsonify({'error': 'Query parameter q is required'}), 400
+
+        if len(query) > MAX_QUERY_LENGTH:
+            return jsonify({'error': f'Query must not exceed {MAX_QUERY_LENGTH} characters'}), 400
+
+        # Validate pagination parameters
+        if limit < 1 or limit > 100:
+            return jsonify({'error': 'Limit must be between 1 and 100'}), 400
+
+        if offset < 0:
+            return jsonify({'error': 'Offset must be non-negative'}), 400
+
+        valid, kinds = _parse_kinds(types)
+        if not valid:
+            return jsonify({'error': f'Type must be any of {", ".join(KINDS)}'}), 400
+
+        success, result = search_service.search(query, kinds=kinds, limit=limit, offset=offset)
+
+        if not success:
+            status_code = 503 if 'not ready' in result.lower() else 500
+            return jsonify({'error': result}), status_code
+
+        return jsonify({
+            'query': query,
+            'results': result,
+            'pagination': {
+                'limit': limit,
+                'offset': offset,
+                'count': len(result)
+            }
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+
+
+@search_bp.route('/suggest', methods=['GET'])
+def suggest():
+    """
+    Search-as-you-type suggestions: most played names starting with the typed text
+
+    A name matches when it, or the part of it from its second or third word
+    on, starts with the query ("tung" suggests "Sơn Tùng M-TP").
+
+    Query Parameters:
+        q (str): Text typed so far (required); case and accents are ignored
+        type (str): Comma-separated subset of song, artist, artwork (default: all)
+        limit (int): 1-20 (default: 8)
+
+    Returns:
+        200: Suggestions, most played first
+        400: Invalid parameters
+        503: No autocomplete file built yet
+        500: Server error
+    """
+    try:
+        query = request.args.get('q', '')
+        types = request.args.get('type')
+        limit = request.args.get('limit', 8, type=int)
+
+        if not query.strip():
+            return jsonify({'error': 'Query parameter q is required'}), 400
+
+        if len(query) > MAX_QUERY_LENGTH:
+            return jsonify({'error': f'Query must not exceed {MAX_QUERY_LENGTH} characters'}), 400
+
+        if limit < 1 or limit > 20:
+            return jsonify({'error': 'Limit must be between 1 and 20'}), 400
+
+        valid, kinds = _parse_kinds(types)
+        if not valid:
+            return jsonify({'error': f'Type must be any of {", ".join(KINDS)}'}), 400
+
+        success, result = autocomplete_service.suggest(query, kinds=kinds, limit=limit)
+
+        if not success:
+            status_code = 503 if 'not ready' in result.lower() else 500
+            return jsonify({'error': result}), status_code
+
+        response = jsonify({'query': query, 'suggestions': result})
+        response.headers['Cache-Control'] = 'public, max-age=60'
+        return response, 200
+
+    except Exception as e:
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
@@ -0,0 +1,532 @@
+"""
+Search service layer: builds the search and autocomplete indexes from the database and keeps them current
+"""
+import os
+import time
+import tempfile
+import threading
+import pymysql
+from app.auth.utils import get_db_connection
+from services.metrics import LatencyRecorder
+from .index import SearchIndex
+from .autocomplete import AutocompleteIndex, write_autocomplete
+
+
+# Rows pulled per round trip while streaming the catalog
+FETCH_SIZE = 5000
+
+# How often the autocomplete thread checks whether its file is stale or was
+# replaced by another process
+AUTOCOMPLETE_CHECK_SECONDS = 60
+
+_SONG_QUERY = """
+    SELECT s.SongID, s.Title, aw.ArtworkID, aw.Title AS ArtworkTitle, ar.ArtistID,
+           COALESCE(u.Username, ar.JamendoName) AS ArtistName
+    FROM Song s
+    JOIN Artwork aw ON s.ArtworkID = aw.ArtworkID
+    JOIN Artist ar ON aw.ArtistID = ar.ArtistID
+    LEFT JOIN User u ON ar.UserID = u.UserID
+"""
+
+_ARTWORK_QUERY = """
+    SELECT aw.ArtworkID, aw.Title, ar.ArtistID, COALESCE(u.Username, ar.JamendoName) AS ArtistName
+    FROM Artwork aw
+    JOIN Artist ar ON aw.ArtistID = ar.ArtistID
+    LEFT JOIN User u ON ar.UserID = u.UserID
+"""
+
+_ARTIST_QUERY = """
+    SELECT ar.ArtistID, COALESCE(u.Username, ar.JamendoName) AS ArtistName
+    FROM Artist ar
+    LEFT JOIN User u ON ar.UserID = u.UserID
+"""
+
+
+def _song_document(row, plays):
+    return {
+        'kind': 'song',
+        'id': row['SongID'],
+        'title': row['Title'],
+        'subtitle': row['ArtistName'],
+        'fields': {'title': row['Title'], 'artist': row['ArtistName'], 'album': row['ArtworkTitle']},
+        'plays': plays,
+        'artist_id': row['ArtistID']
+    }
+
+
+def _artwork_document(row, plays):
+    return {
+        'kind': 'artwork',
+        'id': row['ArtworkID'],
+        'title': row['Title'],
+        'subtitle': row['ArtistName'],
+        'fields': {'title': row['Title'], 'artist': row['ArtistName']},
+        'plays': plays,
+        'artist_id': row['ArtistID']
+    }
+
+
+def _artist_document(row, plays):
+    return {
+        'kind': 'artist',
+        'id': row['ArtistID'],
+        'title': row['ArtistName'],
+        'subtitle': None,
+        'fields': {'title': row['ArtistName']},
+        'plays': plays,
+        'artist_id': row['ArtistID']
+    }
+
+
+def _play_counts(connection):
+    """Plays per SongID"""
+    cursor = connection.cursor(pymysql.cursors.SSCursor)
+    try:
+        cursor.execute("SELECT SongID, COUNT(*) FROM PlayHistory GROUP BY SongID")
+        plays = {}
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                return plays
+            plays.update(rows)
+    finally:
+        cursor.close()
+
+
+def _stream(connection, query, params=()):
+    """Rows of a query, read from the server in batches instead of all at once"""
+    cursor = connection.cursor(pymysql.cursors.SSDictCursor)
+    try:
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                return
+            yield from rows
+    finally:
+        cursor.close()
+
+
+def catalog_documents(connection):
+    """
+    Every song, artwork and artist as search documents, streamed
+
+    Args:
+        connection: Open database connection, used for one query at a time
+
+    Returns:
+        generator: Document dicts (see SearchIndex.load), songs first
+    """
+    song_plays = _play_counts(connection)
+    artwork_plays = {}
+    artist_plays = {}
+
+    for row in _stream(connection, _SONG_QUERY):
+        plays = song_plays.get(row['SongID'], 0)
+        artwork_plays[row['ArtworkID']] = artwork_plays.get(row['ArtworkID'], 0) + plays
+        artist_plays[row['ArtistID']] = artist_plays.get(row['ArtistID'], 0) + plays
+        yield _song_document(row, plays)
+
+    for row in _stream(connection, _ARTWORK_QUERY):
+        yield _artwork_document(row, artwork_plays.get(row['ArtworkID'], 0))
+
+    for row in _stream(connection, _ARTIST_QUERY):
+        if row['ArtistName']:
+            yield _artist_document(row, artist_plays.get(row['ArtistID'], 0))
+
+
+class SearchService:
+    """
+    Owns the process-wide SearchIndex
+
+    The index is built from Song, Artwork and Artist/User in a background
+    thread at startup and rebuilt every `rebuild_interval` seconds (which
+    also refreshes play counts and picks up writes made by other processes,
+    such as catalog ingestion). Writes made through this API call the
+    *_changed hooks, which re-read the affected rows and update the live
+    index right away. Hooks that fire while a rebuild is running are replayed
+    on the new index before it is swapped in.
+
+    Args:
+        rebuild_interval (int): Seconds between full rebuilds; 0 builds only once
+        index_options (dict): Keyword arguments for SearchIndex
+    """
+
+    def __init__(self, rebuild_interval=3600, index_options=None):
+        self.rebuild_interval = rebuild_interval
+        self.index_options = index_options or {}
+
+        self._index = None
+        self._lock = threading.Lock()
+        self._pending = None          # hooks seen during a rebuild, None when idle
+        self._thread = None
+        self.latency = LatencyRecorder()
+        self.last_build = None
+
+    def init_app(self, app):
+        """Start the background build (and periodic rebuild) thread for an app"""
+        if self._thread is not None:
+            return
+
+        def run():
+            while True:
+                with app.app_context():
+                    success, message = self.rebuild()
+                    if not success:
+                        print(f"Search index build failed: {message}")
+                if not self.rebuild_interval:
+                    return
+                time.sleep(self.rebuild_interval)
+
+        self._thread = threading.Thread(target=run, name='search-index', daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+
+    def rebuild(self):
+        """
+        Build a new index from the database and swap it in
+
+        Returns:
+            tuple: (success: bool, result: dict/str)
+                result dict contains the new index's stats and build time
+        """
+        with self._lock:
+            if self._pending is not None:
+                return False, "Search index rebuild already running"
+            self._pending = []
+
+        started = time.monotonic()
+        connection = None
+        index = None
+        try:
+            connection = get_db_connection()
+            index = SearchIndex(**self.index_options).load(catalog_documents(connection))
+
+        except pymysql.Error as e:
+            return False, f"Database error: {str(e)}"
+
+        except Exception as e:
+            # Runs on the background thread, which must outlive a bad build
+            return False, f"Index build error: {str(e)}"
+
+        finally:
+            if connection:
+                connection.close()
+            if index is None:
+                with self._lock:
+                    self._pending = None
+
+        # Replay hooks that fired while the rows were being read, then swap
+        while True:
+            with self._lock:
+                pending, self._pending = self._pending, []
+                if not pending:
+                    self._index = index
+                    self._pending = None
+                    break
+            for hook, key in pending:
+                self._apply(index, hook, key)
+
+        self.last_build = {
+            'finished_at': time.time(),
+            'seconds': round(time.monotonic() - started, 3),
+            **index.get_stats()
+        }
+        return True, self.last_build
+
+    # ------------------------------------------------------------------
+    # Incremental updates
+    # ------------------------------------------------------------------
+
+    def song_changed(self, song_id):
+        """Re-index one song after it was created, edited or deleted"""
+        self._hook('song', song_id)
+
+    def artwork_changed(self, artwork_id):
+        """Re-index an artwork and its songs (their album name)"""
+        self._hook('artwork', artwork_id)
+
+    def artist_changed(self, artist_id):
+        """Re-index an artist with all their artworks and songs (their artist name)"""
+        self._hook('artist', artist_id)
+
+    def user_changed(self, user_id):
+        """Re-index the artist profile of a user, if any (e.g. after a username change)"""
+        self._hook('user', user_id)
+
+    def artist_removed(self, artist_id):
+        """Drop an artist and everything indexed under them"""
+        self._hook('artist_removed', artist_id)
+
+    def _hook(self, hook, key):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((hook, key))
+            index = self._index
+        if index is not None:
+            self._apply(index, hook, key)
+
+    def _apply(self, index, hook, key):
+        """Bring one entity up to date in an index. Failures are logged, never raised."""
+        connection = None
+        try:
+            if hook == 'artist_removed':
+                index.remove_artist(key)
+                return
+
+            connection = get_db_connection()
+            cursor = connection.cursor(pymysql.cursors.DictCursor)
+
+            if hook == 'user':
+                cursor.execute("SELECT ArtistID FROM Artist WHERE UserID = %s", (key,))
+                artist = cursor.fetchone()
+                if not artist:
+                    return
+                hook, key = 'artist', artist['ArtistID']
+
+            if hook == 'song':
+                self._reindex_songs(cursor, index, "s.SongID = %s", key, missing=[key])
+            elif hook == 'artwork':
+                self._reindex_artworks(cursor, index, "aw.ArtworkID = %s", key, missing=[key])
+                self._reindex_songs(cursor, index, "s.ArtworkID = %s", key)
+            elif hook == 'artist':
+                cursor.execute(f"{_ARTIST_QUERY} WHERE ar.ArtistID = %s", (key,))
+                row = cursor.fetchone()
+                if row is None or not row['ArtistName']:
+                    index.remove_artist(key)
+                    return
+                plays = self._plays(cursor, 'aw.ArtistID', "aw.ArtistID = %s", key)
+                index.upsert(_artist_document(row, plays.get(key, 0)))
+                self._reindex_artworks(cursor, index, "aw.ArtistID = %s", key)
+                self._reindex_songs(cursor, index, "aw.ArtistID = %s", key)
+
+        except Exception as e:
+            # Hooks run inside API requests and during rebuilds; neither may fail
+            # because one entity could not be re-indexed
+            print(f"Search index update failed for {hook} {key}: {e}")
+
+        finally:
+            if connection:
+                cursor.close()
+                connection.close()
+
+    @staticmethod
+    def _plays(cursor, group_column, condition, key):
+        """Play counts grouped by a Song or Artwork column, for the rows matching a condition"""
+        cursor.execute(
+            f"""
+            SELECT {group_column} AS id, COUNT(*) AS plays
+            FROM PlayHistory ph
+            JOIN Song s ON ph.SongID = s.SongID
+            JOIN Artwork aw ON s.ArtworkID = aw.ArtworkID
+            WHERE {condition}
+            GROUP BY {group_column}
+            """,
+            (key,)
+        )
+        return {row['id']: row['plays'] for row in cursor.fetchall()}
+
+    def _reindex_songs(self, cursor, index, condition, key, missing=()):
+        cursor.execute(f"{_SONG_QUERY} WHERE {condition}", (key,))
+        rows = cursor.fetchall()
+        plays = self._plays(cursor, 's.SongID', condition, key) if rows else {}
+        for row in rows:
+            index.upsert(_song_document(row, plays.get(row['SongID'], 0)))
+        if not rows:
+            for song_id in missing:
+                index.remove('song', song_id)
+
+    def _reindex_artworks(self, cursor, index, condition, key, missing=()):
+        cursor.execute(f"{_ARTWORK_QUERY} WHERE {condition}", (key,))
+        rows = cursor.fetchall()
+        plays = self._plays(cursor, 'aw.ArtworkID', condition, key) if rows else {}
+        for row in rows:
+            index.upsert(_artwork_document(row, plays.get(row['ArtworkID'], 0)))
+        if not rows:
+            for artwork_id in missing:
+                index.remove('artwork', artwork_id)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def search(self, query, kinds=None, limit=20, offset=0):
+        """
+        Search songs, artists and artworks
+
+        Args:
+            query (str): Free text, matched without regard to case or accents
+            kinds (list): Any of 'song', 'artist', 'artwork' (default: all)
+            limit (int): Page size
+            offset (int): Results to skip
+
+        Returns:
+            tuple: (success: bool, result: list/str)
+        """
+        index = self._index
+        if index is None:
+            return False, "Search index is not ready yet"
+
+        with self.latency.time('search'):
+            return True, index.search(query, kinds=kinds, limit=limit, offset=offset)
+
+    def get_stats(self):
+        """
+        Index size, last build and query latency for monitoring
+
+        Returns:
+            dict: ready flag, index stats, last build, and search latency percentiles
+        """
+        index = self._index
+        return {
+            'ready': index is not None,
+            'index': index.get_stats() if index is not None else None,
+            'last_build': self.last_build,
+            'latency': self.latency.snapshot()
+        }
+
+
+class AutocompleteService:
+    """
+    Owns the memory-mapped autocomplete file
+
+    An existing file is mapped as soon as the app starts, so suggestions are
+    served immediately after a restart. A background thread rebuilds the file
+    from the database once it is older than `rebuild_interval` and maps the
+    new one; other processes sharing the path pick the new file up on their
+    next check instead of building their own.
+
+    Args:
+        path (str): Autocomplete file location
+        rebuild_interval (int): Seconds before the file is considered stale
+    """
+
+    def __init__(self, path, rebuild_interval=3600):
+        self.path = path
+        self.rebuild_interval = rebuild_interval
+
+        self._index = None
+        self._mtime = None
+        self._build_lock = threading.Lock()
+        self._thread = None
+        self.latency = LatencyRecorder()
+        self.last_build = None
+
+    def init_app(self, app):
+        """Map the current file and start the background refresh thread for an app"""
+        if self._thread is not None:
+            return
+        self._load()
+
+        def run():
+            while True:
+                if self._age() >= self.rebuild_interval:
+                    with app.app_context():
+                        success, message = self.rebuild()
+                        if not success:
+                            print(f"Autocomplete build failed: {message}")
+                else:
+                    self._load()
+                time.sleep(AUTOCOMPLETE_CHECK_SECONDS)
+
+        self._thread = threading.Thread(target=run, name='autocomplete-index', daemon=True)
+        self._thread.start()
+
+    def _age(self):
+        try:
+            return time.time() - os.path.getmtime(self.path)
+        except OSError:
+            return float('inf')
+
+    def _load(self):
+        """Map the file if it changed since it was last mapped"""
+        try:
+            mtime = os.path.getmtime(self.path)
+            if mtime != self._mtime:
+                self._index = AutocompleteIndex(self.path)
+                self._mtime = mtime
+        except (OSError, ValueError) as e:
+            print(f"Autocomplete file not loaded: {e}")
+
+    def rebuild(self):
+        """
+        Write a new autocomplete file from the database and map it
+
+        Returns:
+            tuple: (success: bool, result: dict/str)
+        """
+        if not self._build_lock.acquire(blocking=False):
+            return False, "Autocomplete rebuild already running"
+
+        started = time.monotonic()
+        connection = None
+        try:
+            connection = get_db_connection()
+            result = write_autocomplete(catalog_documents(connection), self.path)
+
+        except pymysql.Error as e:
+            return False, f"Database error: {str(e)}"
+
+        except Exception as e:
+            return False, f"Autocomplete build error: {str(e)}"
+
+        finally:
+            if connection:
+                connection.close()
+            self._build_lock.release()
+
+        self._load()
+        self.last_build = {
+            'finished_at': time.time(),
+            'seconds': round(time.monotonic() - started, 3),
+            **result
+        }
+        return True, self.last_build
+
+    def suggest(self, prefix, kinds=None, limit=10):
+        """
+        Most played songs, artists and artworks whose name starts with prefix
+
+        Args:
+            prefix (str): Text typed so far; case and accents are ignored
+            kinds (list): Any of 'song', 'artist', 'artwork' (default: all)
+            limit (int): Most suggestions returned
+
+        Returns:
+            tuple: (success: bool, result: list/str)
+        """
+        index = self._index
+        if index is None:
+            return False, "Autocomplete index is not ready yet"
+
+        with self.latency.time('suggest'):
+            return True, index.suggest(prefix, kinds=kinds, limit=limit)
+
+    def get_stats(self):
+        """
+        File details, last build and suggestion latency for monitoring
+
+        Returns:
+            dict: ready flag, file stats, last build, and suggest latency percentiles
+        """
+        index = self._index
+        return {
+            'ready': index is not None,
+            'file': index.get_stats() if index is not None else None,
+            'last_build': self.last_build,
+            'latency': self.latency.snapshot()
+        }
+
+
+# Singleton instances
+search_service = SearchService(
+    rebuild_interval=int(os.getenv('SEARCH_REBUILD_MINUTES', 60)) * 60
+)
+
+autocomplete_service = AutocompleteService(
+    path=os.getenv('AUTOCOMPLETE_PATH') or os.path.join(tempfile.gettempdir(), 'music-autocomplete.idx'),
+    rebuild_interval=int(os.getenv('SEARCH_REBUILD_MINUTES', 60)) * 60
+)
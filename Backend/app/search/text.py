@@ -0,0 +1,45 @@
+"""
+Text normalization shared by the search indexes
+
+Titles and names are folded to lowercase ASCII-like tokens so that a query
+typed without diacritics still matches: "Sơn Tùng" and "son tung" both give
+['son', 'tung'].
+"""
+import re
+import unicodedata
+
+
+# Letters that Unicode does not decompose into a base letter plus a mark
+_EXTRA_FOLDS = str.maketrans({'đ': 'd', 'Đ': 'd', 'ø': 'o', 'Ø': 'o', 'ł': 'l', 'Ł': 'l', 'ß': 'ss', 'æ': 'ae', 'œ': 'oe'})
+
+_TOKEN_RE = re.compile(r'[^\W_]+')
+
+
+def fold(text):
+    """
+    Lowercase text with diacritics removed
+
+    Args:
+        text (str): Any text
+
+    Returns:
+        str: Folded text, e.g. 'Đen Vâu' -> 'den vau'
+    """
+    if not text:
+        return ''
+    text = text.translate(_EXTRA_FOLDS)
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+
+def tokenize(text):
+    """
+    Split text into folded word tokens
+
+    Args:
+        text (str): Any text
+
+    Returns:
+        list: Tokens in order, duplicates kept
+    """
+    return _TOKEN_RE.findall(fold(text))
@@ -0,0 +1,6 @@
+"""
+Songs module for song playback
+"""
+from .routes import songs_bp
+
+__all__ = ['songs_bp']
@@ -0,0 +1,473 @@
+"""
+Bulk ingestion of the Jamendo catalog into Artist, Artwork and Song
+
+CatalogIngester pages through Jamendo's /tracks on a few worker threads
+under a shared request rate, maps every track with
+JamendoService.format_track_response and upserts each page in one
+transaction keyed by Jamendo ID. The transaction also advances the
+CatalogSync checkpoint, so an interrupted run resumes at the first page it
+did not store.
+
+A full run walks the whole catalog. An incremental run only asks for tracks
+released since the last completed run (minus a few days of overlap), since
+Jamendo filters tracks by release date but not by modification date.
+
+Run it from the Backend directory:
+
+    python -m app.songs.ingest --full
+    python -m app.songs.ingest --incremental --workers 4 --requests-per-second 5
+"""
+import json
+import time
+import argparse
+import threading
+import pymysql
+from datetime import date, datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from app.auth.utils import get_db_connection
+from app.utils.cli import job_app
+from services.jamendo_service import jamendo_service, MAX_PAGE_SIZE
+
+
+SOURCE = 'jamendo'
+
+# Days re-read before the watermark on incremental runs, for tracks that
+# appear in the catalog some time after their release date
+DEFAULT_OVERLAP_DAYS = 7
+
+# Bulk runs share the client ID with live traffic, so they stay gentle
+DEFAULT_WORKERS = 4
+DEFAULT_REQUESTS_PER_SECOND = 4
+
+
+class RateLimiter:
+    """
+    Token bucket shared by worker threads
+
+    Args:
+        rate (float): Tokens added per second; None or 0 for no limit
+        burst (int): Most tokens held at once
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available and take it"""
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class CatalogIngester:
+    """
+    Copies the Jamendo catalog into the local database
+
+    Args:
+        service: JamendoService to read from (default: the shared jamendo_service)
+        connect: Database connection factory (default: get_db_connection)
+        workers (int): Pages fetched in parallel
+        requests_per_second (float): Shared pace of Jamendo calls; None for no limit
+        page_size (int): Tracks per page, at most 200
+        overlap_days (int): Days re-read before the watermark on incremental runs
+        max_pages (int): Stop after this many pages; None for no limit
+    """
+
+    def __init__(self, service=None, connect=None, workers=DEFAULT_WORKERS,
+                 requests_per_second=DEFAULT_REQUESTS_PER_SECOND, page_size=MAX_PAGE_SIZE,
+                 overlap_days=DEFAULT_OVERLAP_DAYS, max_pages=None):
+        self.service = service or jamendo_service
+        self.connect = connect or get_db_connection
+        self.workers = max(workers, 1)
+        self.limiter = RateLimiter(requests_per_second, burst=self.workers)
+        self.page_size = min(page_size, MAX_PAGE_SIZE)
+        self.overlap_days = overlap_days
+        self.max_pages = max_pages
+
+    def run(self, mode='full', reset=False):
+        """
+        Ingest the catalog, resuming from the checkpoint of this mode
+
+        Args:
+            mode (str): 'full' or 'incremental'
+            reset (bool): Ignore the checkpoint and start from the first page
+
+        Returns:
+            dict: Report with pages and records stored, the checkpoint reached,
+                whether the run completed, and any errors
+        """
+        if mode not in ('full', 'incremental'):
+            raise ValueError(f"Invalid mode: {mode}")
+
+        started = time.monotonic()
+        report = {
+            'mode': mode,
+            'range': None,
+            'start_offset': 0,
+            'next_offset': 0,
+            'pages': 0,
+            'tracks': 0,
+            'artists': 0,
+            'artworks': 0,
+            'songs': 0,
+            'watermark': None,
+            'completed': False,
+            'errors': []
+        }
+
+        try:
+            offset, released_between = self._start(mode, reset)
+        except pymysql.Error as e:
+            report['errors'].append({'offset': None, 'message': f"Database error: {str(e)}"})
+            return report
+        except ValueError as e:
+            report['errors'].append({'offset': None, 'message': str(e)})
+            return report
+
+        report['start_offset'] = report['next_offset'] = offset
+        if released_between:
+            report['range'] = [day.isoformat() for day in released_between]
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while not report['errors']:
+                wave = [offset + i * self.page_size for i in range(self.workers)]
+                if self.max_pages is not None:
+                    wave = wave[:max(self.max_pages - report['pages'], 0)]
+                    if not wave:
+                        break
+
+                pages = pool.map(lambda page_offset: self._fetch(page_offset, released_between), wave)
+
+                last_page = False
+                for page_offset, tracks in zip(wave, pages):
+                    if tracks is None:
+                        report['errors'].append({'offset': page_offset, 'message': "Jamendo request failed"})
+                        break
+                    if not self._store_page(mode, page_offset, tracks, report):
+                        break
+                    offset = report['next_offset'] = page_offset + self.page_size
+                    if len(tracks) < self.page_size:
+                        last_page = True
+                        break
+
+                if last_page:
+                    report['completed'] = self._complete(mode, report)
+                    break
+
+        report['duration_seconds'] = round(time.monotonic() - started, 3)
+        return report
+
+    # ------------------------------------------------------------------
+    # Checkpoints
+    # ------------------------------------------------------------------
+
+    def _start(self, mode, reset):
+        """
+        Offset and release date range to start from
+
+        Returns:
+            tuple: (offset, (start date, end date) or None for a full run)
+        """
+        connection = None
+        try:
+            connection = self.connect()
+            cursor = connection.cursor(pymysql.cursors.DictCursor)
+
+            cursor.execute(
+                "SELECT NextOffset, RangeStart, RangeEnd FROM CatalogSync WHERE Source = %s AND Mode = %s",
+                (SOURCE, mode)
+            )
+            checkpoint = cursor.fetchone()
+            resuming = checkpoint and checkpoint['NextOffset'] > 0 and not reset
+
+            if mode == 'full':
+                offset = checkpoint['NextOffset'] if resuming else 0
+                released_between = None
+            elif resuming:
+                offset = checkpoint['NextOffset']
+                released_between = (checkpoint['RangeStart'], checkpoint['RangeEnd'])
+            else:
+                cursor.execute("SELECT MAX(Watermark) AS watermark FROM CatalogSync WHERE Source = %s", (SOURCE,))
+                watermark = cursor.fetchone()['watermark']
+                if watermark is None:
+                    raise ValueError("No completed sync yet, run a full ingestion first")
+                offset = 0
+                released_between = (watermark - timedelta(days=self.overlap_days), date.today())
+
+            range_start, range_end = released_between or (None, None)
+            cursor.execute(
+                """
+                INSERT INTO CatalogSync (Source, Mode, NextOffset, RangeStart, RangeEnd)
+                VALUES (%s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE NextOffset = VALUES(NextOffset),
+                    RangeStart = VALUES(RangeStart), RangeEnd = VALUES(RangeEnd)
+                """,
+                (SOURCE, mode, offset, range_start, range_end)
+            )
+            connection.commit()
+            return offset, released_between
+
+        except pymysql.Error:
+            if connection:
+                connection.rollback()
+            raise
+
+        finally:
+            if connection:
+                cursor.close()
+                connection.close()
+
+    def _complete(self, mode, report):
+        """Reset the checkpoint and move the watermark to the newest stored release date"""
+        connection = None
+        try:
+            connection = self.connect()
+            cursor = connection.cursor(pymysql.cursors.DictCursor)
+
+            cursor.execute(
+                "SELECT MAX(JamendoReleaseDate) AS watermark FROM Artwork WHERE JamendoID IS NOT NULL"
+            )
+            watermark = cursor.fetchone()['watermark']
+            cursor.execute(
+                """
+                UPDATE CatalogSync
+                SET NextOffset = 0, RangeStart = NULL, RangeEnd = NULL,
+                    Watermark = COALESCE(GREATEST(Watermark, %s), %s, Watermark)
+                WHERE Source = %s AND Mode = %s
+                """,
+                (watermark, watermark, SOURCE, mode)
+            )
+            connection.commit()
+            report['watermark'] = watermark.isoformat() if watermark else None
+            return True
+
+        except pymysql.Error as e:
+            if connection:
+                connection.rollback()
+            report['errors'].append({'offset': None, 'message': f"Database error: {str(e)}"})
+            return False
+
+        finally:
+            if connection:
+                cursor.close()
+                connection.close()
+
+    # ------------------------------------------------------------------
+    # Pages
+    # ------------------------------------------------------------------
+
+    def _fetch(self, offset, released_between):
+        """One page of formatted tracks, or None if Jamendo could not be reached"""
+        self.limiter.acquire()
+        response = self.service.list_tracks(
+            offset=offset,
+            limit=self.page_size,
+            released_between=released_between
+        )
+        if response is None:
+            return None
+        return [self.service.format_track_response(track) for track in response.get('results', [])]
+
+    def _store_page(self, mode, offset, tracks, report):
+        """
+        Upsert one page of tracks and advance the checkpoint past it, in one transaction
+
+        Returns:
+            bool: Whether the page was stored
+        """
+        connection = None
+        try:
+            connection = self.connect()
+            cursor = connection.cursor(pymysql.cursors.DictCursor)
+
+            artists = self._upsert_artists(cursor, tracks)
+            artworks = self._upsert_artworks(cursor, tracks, artists)
+            songs = self._upsert_songs(cursor, tracks, artworks)
+
+            cursor.execute(
+                "UPDATE CatalogSync SET NextOffset = %s WHERE Source = %s AND Mode = %s",
+                (offset + self.page_size, SOURCE, mode)
+            )
+            connection.commit()
+
+            report['pages'] += 1
+            report['tracks'] += len(tracks)
+            report['artists'] += len(artists)
+            report['artworks'] += len(artworks)
+            report['songs'] += songs
+            return True
+
+        except pymysql.Error as e:
+            if connection:
+                connection.rollback()
+            report['errors'].append({'offset': offset, 'message': f"Database error: {str(e)}"})
+            return False
+
+        finally:
+            if connection:
+                cursor.close()
+                connection.close()
+
+    @staticmethod
+    def _select_ids(cursor, table, id_column, jamendo_ids):
+        """Map Jamendo IDs to local primary keys"""
+        placeholders = ', '.join(['%s'] * len(jamendo_ids))
+        cursor.execute(
+            f"SELECT {id_column} AS local_id, JamendoID FROM {table} WHERE JamendoID IN ({placeholders})",
+            list(jamendo_ids)
+        )
+        return {str(row['JamendoID']): row['local_id'] for row in cursor.fetchall()}
+
+    def _upsert_artists(self, cursor, tracks):
+        """Returns: dict Jamendo artist ID -> ArtistID"""
+        rows = {}
+        for track in tracks:
+            if track['artist_id'] and track['artist_id'] not in rows:
+                genres = track['genre']
+                rows[track['artist_id']] = (int(track['artist_id']), track['artist'], genres[0] if genres else None)
+        if not rows:
+            return {}
+
+        cursor.executemany(
+            """
+            INSERT INTO Artist (JamendoID, JamendoName, Genre, VerifiedStatus)
+            VALUES (%s, %s, %s, 'Pending')
+            ON DUPLICATE KEY UPDATE JamendoName = VALUES(JamendoName), Genre = COALESCE(Genre, VALUES(Genre))
+            """,
+            list(rows.values())
+        )
+        return self._select_ids(cursor, 'Artist', 'ArtistID', rows)
+
+    @staticmethod
+    def _artwork_key(track):
+        """Jamendo album ID, or 'track-<id>' for a track released without an album"""
+        album_id = track['album_id']
+        if album_id and str(album_id) != '0':
+            return str(album_id)
+        return f"track-{track['jamendo_id']}"
+
+    def _upsert_artworks(self, cursor, tracks, artists):
+        """Returns: dict artwork key -> ArtworkID"""
+        rows = {}
+        for track in tracks:
+            artist_id = artists.get(str(track['artist_id']))
+            key = self._artwork_key(track)
+            if artist_id is None or key in rows:
+                continue
+            title = track['album'] if key == str(track['album_id']) else track['title']
+            rows[key] = (key, artist_id, title[:255], track['image_url'] or None,
+                         _parse_date(track['release_date']))
+        if not rows:
+            return {}
+
+        cursor.executemany(
+            """
+            INSERT INTO Artwork (JamendoID, ArtistID, Title, JamendoImageURL, JamendoReleaseDate)
+            VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE ArtistID = VALUES(ArtistID), Title = VALUES(Title),
+                JamendoImageURL = VALUES(JamendoImageURL), JamendoReleaseDate = VALUES(JamendoReleaseDate)
+            """,
+            list(rows.values())
+        )
+        return self._select_ids(cursor, 'Artwork', 'ArtworkID', rows)
+
+    def _upsert_songs(self, cursor, tracks, artworks):
+        """Returns: number of tracks written"""
+        synced_at = datetime.utcnow()
+        rows = []
+        for track in tracks:
+            artwork_id = artworks.get(self._artwork_key(track))
+            if artwork_id is None:
+                continue
+            rows.append((
+                int(track['jamendo_id']),
+                artwork_id,
+                track['title'][:255],
+                track['duration'],
+                track['audio_url'] or None,
+                track['license_url'][:255] or None,
+                ','.join(track['genre'])[:255] or None,
+                synced_at
+            ))
+        if not rows:
+            return 0
+
+        cursor.executemany(
+            """
+            INSERT INTO Song (JamendoID, ArtworkID, Title, Duration, JamendoAudioURL,
+                              JamendoLicenseURL, JamendoGenres, JamendoSyncedAt)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE ArtworkID = VALUES(ArtworkID), Title = VALUES(Title),
+                Duration = VALUES(Duration), JamendoAudioURL = VALUES(JamendoAudioURL),
+                JamendoLicenseURL = VALUES(JamendoLicenseURL), JamendoGenres = VALUES(JamendoGenres),
+                JamendoSyncedAt = VALUES(JamendoSyncedAt)
+            """,
+            rows
+        )
+        return len(rows)
+
+
+def _parse_date(value):
+    """Jamendo 'YYYY-MM-DD' date, or None"""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+    except ValueError:
+        return None
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Copy the Jamendo catalog into Artist, Artwork and Song")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--full', dest='mode', action='store_const', const='full',
+                      help="walk the whole catalog (default)")
+    mode.add_argument('--incremental', dest='mode', action='store_const', const='incremental',
+                      help="only tracks released since the last completed run")
+    parser.set_defaults(mode='full')
+    parser.add_argument('--reset', action='store_true', help="ignore the checkpoint and start over")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f"pages fetched in parallel (default: {DEFAULT_WORKERS})")
+    parser.add_argument('--requests-per-second', type=float, default=DEFAULT_REQUESTS_PER_SECOND,
+                        help=f"pace of Jamendo calls (default: {DEFAULT_REQUESTS_PER_SECOND})")
+    parser.add_argument('--page-size', type=int, default=MAX_PAGE_SIZE,
+                        help=f"tracks per request (default: {MAX_PAGE_SIZE})")
+    parser.add_argument('--overlap-days', type=int, default=DEFAULT_OVERLAP_DAYS,
+                        help=f"days re-read before the watermark (default: {DEFAULT_OVERLAP_DAYS})")
+    parser.add_argument('--max-pages', type=int, default=None,
+                        help="stop after this many pages (default: unlimited)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    app = job_app(__name__)
+
+    ingester = CatalogIngester(
+        workers=args.workers,
+        requests_per_second=args.requests_per_second,
+        page_size=args.page_size,
+        overlap_days=args.overlap_days,
+        max_pages=args.max_pages
+    )
+
+    with app.app_context():
+        report = ingester.run(mode=args.mode, reset=args.reset)
+
+    print(json.dumps(report, indent=2, default=str))
+    return 1 if report['errors'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
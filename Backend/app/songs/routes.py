@@ -0,0 +1,91 @@
+"""
+Song routes for song playback
+"""
+from flask import Blueprint, request, jsonify, Response
+from werkzeug.wsgi import wrap_file
+from app.utils.decorators import guest_optional
+from services.segment_cache import segment_cache
+from .services import SongService
+
+
+# Create Blueprint
+songs_bp = Blueprint('songs', __name__, url_prefix='/api/songs')
+
+
+@songs_bp.route('/<int:song_id>/stream', methods=['GET'])
+@guest_optional
+def stream_song(song_id, user_id=None):
+    """
+    Stream a song's audio with HTTP Range support
+
+    Audio is served from a bounded on-disk cache of object segments (see
+    services/segment_cache.py). A Range request is answered with 206 and at
+    most one segment; players simply request the next range. When the range
+    ends on a segment boundary the cached file is handed to the WSGI server's
+    file wrapper so servers such as gunicorn can sendfile() it.
+
+    Unauthenticated listeners only get the first 30 seconds.
+
+    Headers:
+        Range: bytes=<start>-<end> (optional)
+
+    Returns:
+        200: Full audio (no Range header)
+        206: Partial audio
+        404: Song or audio file not found
+        416: Range not satisfiable
+        500: Server error
+    """
+    try:
+        success, song = SongService.get_stream_source(song_id)
+
+        if not success:
+            status_code = 404 if 'not found' in song.lower() else 500
+            return jsonify({'error': song}), status_code
+
+        info = song['object']
+        length = SongService.playable_length(song, authenticated=user_id is not None)
+        headers = {
+            'Accept-Ranges': 'bytes',
+            'ETag': f'"{info["etag"]}"',
+            'Cache-Control': 'private, max-age=3600'
+        }
+        mimetype = info['content_type'] or 'audio/mpeg'
+
+        byte_range = request.range
+        if byte_range is None or len(byte_range.ranges) != 1:
+            # No (or multi-part) Range: send everything the caller may hear
+            headers['Content-Length'] = str(length)
+            return Response(
+                SongService.iter_range(song, 0, length),
+                status=200,
+                headers=headers,
+                mimetype=mimetype,
+                direct_passthrough=True
+            )
+
+        requested = byte_range.range_for_length(length)
+        if requested is None:
+            headers['Content-Range'] = f'bytes */{length}'
+            return Response(status=416, headers=headers)
+
+        start, stop = requested
+        index = start // segment_cache.segment_size
+        segment_start, segment_end = segment_cache.segment_range(index, info['size'])
+        stop = min(stop, segment_end)
+
+        headers['Content-Range'] = f'bytes {start}-{stop - 1}/{length}'
+        headers['Content-Length'] = str(stop - start)
+
+        if stop == segment_end:
+            # Rest of a cached file: let the server use wsgi.file_wrapper / sendfile
+            f = segment_cache.open_segment(song['AudioKey'], info, index, stop - start)
+            f.seek(start - segment_start)
+            body = wrap_file(request.environ, f)
+        else:
+            body = SongService.iter_range(song, start, stop)
+
+        return Response(body, status=206, headers=headers, mimetype=mimetype, direct_passthrough=True)
+
+    except Exception as e:
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
@@ -0,0 +1,115 @@
+"""
+Song service layer for song operations
+"""
+import pymysql
+from app.auth.utils import get_db_connection
+from services.segment_cache import segment_cache
+
+
+# Unauthenticated listeners only get this many seconds of audio
+PREVIEW_SECONDS = 30
+
+# Read size when copying cached segments into a response
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class SongService:
+    """Service class for song operations"""
+
+    @staticmethod
+    def get_stream_source(song_id):
+        """
+        Get what is needed to stream a song: its audio key, duration and object info
+
+        Args:
+            song_id (int): Song's ID
+
+        Returns:
+            tuple: (success: bool, result: dict/str)
+                result dict contains: SongID, Title, Duration, AudioKey and
+                'object' ({'size', 'content_type', 'etag'} from S3)
+        """
+        connection = None
+        try:
+            connection = get_db_connection()
+            cursor = connection.cursor(pymysql.cursors.DictCursor)
+
+            cursor.execute(
+                "SELECT SongID, Title, Duration, AudioKey FROM Song WHERE SongID = %s",
+                (song_id,)
+            )
+            song = cursor.fetchone()
+
+        except pymysql.Error as e:
+            return False, f"Database error: {str(e)}"
+
+        finally:
+            if connection:
+                cursor.close()
+                connection.close()
+
+        if not song:
+            return False, "Song not found"
+
+        if not song['AudioKey']:
+            return False, "Audio file not found for this song"
+
+        info = segment_cache.get_info(song['AudioKey'])
+        if info is None:
+            return False, "Audio file not found for this song"
+
+        song['object'] = info
+        return True, song
+
+    @staticmethod
+    def playable_length(song, authenticated):
+        """
+        Number of bytes of a song the caller may stream
+
+        Guests without an account get roughly the first PREVIEW_SECONDS,
+        estimated from the song's duration.
+
+        Args:
+            song (dict): Result of get_stream_source
+            authenticated (bool): Whether the caller is logged in
+
+        Returns:
+            int: Byte length available to the caller
+        """
+        size = song['object']['size']
+        duration = song.get('Duration')
+        if authenticated or not duration or duration <= PREVIEW_SECONDS:
+            return size
+        return min(size, -(-size * PREVIEW_SECONDS // int(duration)))
+
+    @staticmethod
+    def iter_range(song, start, end):
+        """
+        Yield bytes [start, end) of a song's audio from the segment cache
+
+        Args:
+            song (dict): Result of get_stream_source
+            start (int): First byte offset
+            end (int): Offset one past the last byte
+
+        Yields:
+            bytes: Chunks of at most STREAM_CHUNK_SIZE
+        """
+        key, info = song['AudioKey'], song['object']
+        position = start
+        while position < end:
+            index = position // segment_cache.segment_size
+            segment_start, segment_end = segment_cache.segment_range(index, info['size'])
+            stop = min(end, segment_end)
+
+            with segment_cache.open_segment(key, info, index, stop - position) as f:
+                f.seek(position - segment_start)
+                remaining = stop - position
+                while remaining > 0:
+                    chunk = f.read(min(STREAM_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        raise IOError(f"Cached segment {index} of {key} is truncated")
+                    remaining -= len(chunk)
+                    yield chunk
+
+            position = stop
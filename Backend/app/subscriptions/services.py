@@ -5,6 +5,7 @@ import pymysql
 from datetime import datetime, timedelta
 from flask import current_app
 from app.auth.utils import get_db_connection
+from app.search import services as search  # module import: app.search imports app.auth
 
 
 class SubscriptionService:
@@ -81,6 +82,9 @@ class SubscriptionService:
 
             connection.commit()
 
+            if plan['PlanType'] == 'Artist':
+                search.search_service.user_changed(user_id)
+
             # Fetch created subscription
             cursor.execute(
                 """
@@ -0,0 +1,6 @@
+"""
+Uploads module for streaming media uploads to S3
+"""
+from .routes import uploads_bp
+
+__all__ = ['uploads_bp']
@@ -0,0 +1,266 @@
+"""
+Garbage collection of S3 media that no database row references
+
+Deleting a user cascades their MediaObject and MediaBlobRef rows, but the S3
+objects behind them stay in the bucket. MediaGarbageCollector lists the
+prefixes the database owns, looks each page of keys up in MediaObject,
+MediaBlob and Song, and deletes the unreferenced ones with DeleteObjects.
+
+Run it from the Backend directory:
+
+    python -m app.uploads.gc --dry-run
+    python -m app.uploads.gc --min-age-hours 48 --max-deletes-per-second 200
+"""
+import json
+import time
+import argparse
+import pymysql
+from datetime import datetime, timedelta, timezone
+from app.auth.utils import get_db_connection
+from app.utils.cli import job_app
+from services.s3_service import s3_service
+
+
+# Prefixes whose objects are all tracked in the database. 'uploads/' is left
+# out on purpose: the form upload at /api/upload keeps no row for its files.
+DEFAULT_PREFIXES = ('media/', 'cas/', 'staging/')
+
+# Objects younger than this are never collected, so uploads still in flight
+# (staging copies, presigned uploads awaiting /complete) are left alone
+DEFAULT_MIN_AGE = timedelta(hours=24)
+
+# How many orphaned keys are listed by name in the report
+REPORT_SAMPLE_SIZE = 100
+
+
+class MediaGarbageCollector:
+    """
+    Finds and deletes S3 objects that no database row references
+
+    Args:
+        storage: S3Service to collect from (default: the shared s3_service)
+        connect: Database connection factory (default: get_db_connection)
+        prefixes: Key prefixes to scan
+        min_age (timedelta): Grace period before an object may be collected
+        max_deletes_per_second (float): Pace of DeleteObjects calls; None for no limit
+        max_deletes (int): Stop after this many objects; None for no limit
+        dry_run (bool): Report what would be deleted without deleting anything
+    """
+
+    def __init__(self, storage=None, connect=None, prefixes=DEFAULT_PREFIXES,
+                 min_age=DEFAULT_MIN_AGE, max_deletes_per_second=None,
+                 max_deletes=None, dry_run=False):
+        self.storage = storage or s3_service
+        self.connect = connect or get_db_connection
+        self.prefixes = tuple(prefixes)
+        self.min_age = min_age
+        self.max_deletes_per_second = max_deletes_per_second
+        self.max_deletes = max_deletes
+        self.dry_run = dry_run
+
+        self._next_delete_at = 0.0
+
+    def run(self):
+        """
+        Scan every prefix and collect orphaned objects
+
+        Returns:
+            dict: Report with counts and bytes per prefix, totals, a sample of
+                orphaned keys and any per-key delete errors
+        """
+        started = time.monotonic()
+        cutoff = datetime.now(timezone.utc) - self.min_age
+
+        report = {
+            'dry_run': self.dry_run,
+            'cutoff': cutoff.isoformat(),
+            'prefixes': {},
+            'scanned_objects': 0,
+            'orphaned_objects': 0,
+            'orphaned_bytes': 0,
+            'deleted_objects': 0,
+            'freed_bytes': 0,
+            'blob_rows_removed': 0,
+            'delete_requests': 0,
+            'sample': [],
+            'errors': [],
+            'truncated': False
+        }
+
+        for prefix in self.prefixes:
+            stats = {'scanned': 0, 'orphaned': 0, 'orphaned_bytes': 0, 'deleted': 0, 'freed_bytes': 0}
+            report['prefixes'][prefix] = stats
+
+            for page in self.storage.list_files(prefix):
+                stats['scanned'] += len(page)
+                report['scanned_objects'] += len(page)
+
+                if self._budget_left(report) == 0:
+                    report['truncated'] = True
+                    break
+
+                candidates = [obj for obj in page if obj['last_modified'] < cutoff]
+                if candidates:
+                    self._collect_page(candidates, stats, report)
+
+            if report['truncated']:
+                break
+
+        report['duration_seconds'] = round(time.monotonic() - started, 3)
+        return report
+
+    def _budget_left(self, report):
+        if self.max_deletes is None:
+            return None
+        return max(self.max_deletes - report['orphaned_objects'], 0)
+
+    def _collect_page(self, candidates, stats, report):
+        """
+        Find the orphans among one page of objects and delete them
+
+        The MediaBlob rows of unreferenced blobs stay locked until their
+        objects are gone, so a concurrent upload can't re-reference a blob
+        that is being deleted (see UploadService.reference_existing_blob).
+        """
+        connection = None
+        try:
+            connection = self.connect()
+            cursor = connection.cursor(pymysql.cursors.DictCursor)
+
+            keys = [obj['key'] for obj in candidates]
+            referenced, unreferenced_blobs = self._lookup(cursor, keys)
+
+            orphans = [obj for obj in candidates if obj['key'] not in referenced]
+            budget = self._budget_left(report)
+            if budget is not None and len(orphans) > budget:
+                orphans = orphans[:budget]
+                report['truncated'] = True
+
+            if not orphans:
+                connection.rollback()
+                return
+
+            orphan_bytes = sum(obj['size'] for obj in orphans)
+            stats['orphaned'] += len(orphans)
+            stats['orphaned_bytes'] += orphan_bytes
+            report['orphaned_objects'] += len(orphans)
+            report['orphaned_bytes'] += orphan_bytes
+            room = REPORT_SAMPLE_SIZE - len(report['sample'])
+            if room > 0:
+                report['sample'].extend(obj['key'] for obj in orphans[:room])
+
+            if self.dry_run:
+                connection.rollback()
+                return
+
+            self._throttle(len(orphans))
+            result = self.storage.delete_files(obj['key'] for obj in orphans)
+            report['delete_requests'] += result['requests']
+            report['errors'].extend(result['errors'])
+
+            deleted = set(result['deleted'])
+            freed = sum(obj['size'] for obj in orphans if obj['key'] in deleted)
+            stats['deleted'] += len(deleted)
+            stats['freed_bytes'] += freed
+            report['deleted_objects'] += len(deleted)
+            report['freed_bytes'] += freed
+
+            digests = [digest for key, digest in unreferenced_blobs.items() if key in deleted]
+            if digests:
+                placeholders = ', '.join(['%s'] * len(digests))
+                cursor.execute(f"DELETE FROM MediaBlob WHERE Digest IN ({placeholders})", digests)
+                report['blob_rows_removed'] += cursor.rowcount
+
+            connection.commit()
+
+        except pymysql.Error as e:
+            if connection:
+                connection.rollback()
+            report['errors'].append({'key': None, 'code': 'DatabaseError', 'message': str(e)})
+
+        finally:
+            if connection:
+                cursor.close()
+                connection.close()
+
+    def _lookup(self, cursor, keys):
+        """
+        Split keys into referenced ones and blobs that lost their last reference
+
+        Returns:
+            tuple: (referenced: set of keys, unreferenced_blobs: dict key -> digest)
+        """
+        placeholders = ', '.join(['%s'] * len(keys))
+        referenced = set()
+
+        cursor.execute(f"SELECT ObjectKey FROM MediaObject WHERE ObjectKey IN ({placeholders})", keys)
+        referenced.update(row['ObjectKey'] for row in cursor.fetchall())
+
+        cursor.execute(f"SELECT AudioKey FROM Song WHERE AudioKey IN ({placeholders})", keys)
+        referenced.update(row['AudioKey'] for row in cursor.fetchall())
+
+        cursor.execute(
+            f"""
+            SELECT b.Digest, b.ObjectKey,
+                   EXISTS (SELECT 1 FROM MediaBlobRef r WHERE r.Digest = b.Digest) AS has_refs
+            FROM MediaBlob b
+            WHERE b.ObjectKey IN ({placeholders})
+            FOR UPDATE
+            """,
+            keys
+        )
+        unreferenced_blobs = {}
+        for row in cursor.fetchall():
+            if row['has_refs']:
+                referenced.add(row['ObjectKey'])
+            else:
+                unreferenced_blobs[row['ObjectKey']] = row['Digest']
+
+        return referenced, unreferenced_blobs
+
+    def _throttle(self, key_count):
+        """Sleep so DeleteObjects keys go out at most max_deletes_per_second"""
+        if not self.max_deletes_per_second:
+            return
+        now = time.monotonic()
+        if self._next_delete_at > now:
+            time.sleep(self._next_delete_at - now)
+            now = self._next_delete_at
+        self._next_delete_at = now + key_count / self.max_deletes_per_second
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Delete S3 media that no database row references")
+    parser.add_argument('--dry-run', action='store_true', help="report orphans without deleting them")
+    parser.add_argument('--prefix', action='append', dest='prefixes',
+                        help=f"prefix to scan, repeatable (default: {' '.join(DEFAULT_PREFIXES)})")
+    parser.add_argument('--min-age-hours', type=float, default=DEFAULT_MIN_AGE.total_seconds() / 3600,
+                        help="only collect objects older than this (default: 24)")
+    parser.add_argument('--max-deletes-per-second', type=float, default=None,
+                        help="pace of deletions (default: unlimited)")
+    parser.add_argument('--max-deletes', type=int, default=None,
+                        help="stop after this many objects (default: unlimited)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    app = job_app(__name__)
+
+    collector = MediaGarbageCollector(
+        prefixes=args.prefixes or DEFAULT_PREFIXES,
+        min_age=timedelta(hours=args.min_age_hours),
+        max_deletes_per_second=args.max_deletes_per_second,
+        max_deletes=args.max_deletes,
+        dry_run=args.dry_run
+    )
+
+    with app.app_context():
+        report = collector.run()
+
+    print(json.dumps(report, indent=2, default=str))
+    return 1 if report['errors'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
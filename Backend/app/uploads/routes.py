@@ -0,0 +1,331 @@
+"""
+Upload routes for streaming media uploads
+"""
+from flask import Blueprint, request, jsonify, current_app
+from werkzeug.exceptions import RequestEntityTooLarge
+from app.utils.decorators import artist_required
+from services.s3_service import UploadTooLargeError
+from .services import UploadService
+from .schemas import (
+    validate_stream_upload_params,
+    validate_presign_data,
+    validate_complete_data,
+    validate_blob_upload_headers
+)
+
+
+# Create Blueprint
+uploads_bp = Blueprint('uploads', __name__, url_prefix='/api/uploads')
+
+
+def _check_stream_body():
+    """
+    Reject raw-body uploads whose length is unknown, empty or over the limit
+
+    Returns:
+        tuple or None: (response, status_code) to return, or None if the body is acceptable
+    """
+    max_bytes = current_app.config.get('MAX_CONTENT_LENGTH')
+    content_length = request.content_length
+
+    if content_length is None and not request.environ.get('wsgi.input_terminated'):
+        return jsonify({'error': 'Content-Length header or chunked transfer encoding is required'}), 411
+
+    if content_length == 0:
+        return jsonify({'error': 'Request body is required'}), 400
+
+    if max_bytes and content_length and content_length > max_bytes:
+        return jsonify({'error': 'File too large', 'max_bytes': max_bytes}), 413
+
+    return None
+
+
+@uploads_bp.route('/stream', methods=['PUT', 'POST'])
+@artist_required
+def stream_upload(user_id):
+    """
+    Upload a media file by streaming the raw request body to S3
+
+    Unlike /api/upload (multipart form), the body is never spooled to a temp
+    file: it is read part by part and pushed to S3 multipart in parallel.
+
+    Query Parameters:
+        filename (str): File name to store under (required)
+        folder (str): Optional sub-folder within the artist's own prefix
+
+    Headers:
+        Content-Type: MIME type of the file (e.g., 'audio/flac')
+        Content-Length: Body size (or Transfer-Encoding: chunked)
+
+    Returns:
+        201: File uploaded
+        400: Validation error or empty body
+        401: Not authenticated
+        403: Not an artist
+        411: Body length unknown
+        413: Body exceeds MAX_CONTENT_LENGTH
+        415: Not a supported media file, or not the type its name/Content-Type claim
+        500: Server error
+    """
+    try:
+        params = request.args.to_dict()
+        is_valid, errors = validate_stream_upload_params(params)
+        if not is_valid:
+            return jsonify({'error': 'Validation failed', 'details': errors}), 400
+
+        error_response = _check_stream_body()
+        if error_response:
+            return error_response
+
+        success, result = UploadService.stream_upload(
+            user_id,
+            request.stream,
+            filename=params['filename'],
+            folder=params.get('folder'),
+            content_type=request.mimetype or None,
+            content_length=request.content_length,
+            max_bytes=current_app.config.get('MAX_CONTENT_LENGTH')
+        )
+
+        if not success:
+            if 'unsupported' in result.lower():
+                status_code = 415
+            elif 'invalid' in result.lower():
+                status_code = 400
+            else:
+                status_code = 500
+            return jsonify({'error': result}), status_code
+
+        return jsonify({
+            'success': True,
+            'media_id': result['media_id'],
+            'url': result['url'],
+            'key': result['key'],
+            'size': result['size'],
+            'parts': result['parts'],
+            'media': result['media']
+        }), 201
+
+    except (UploadTooLargeError, RequestEntityTooLarge):
+        return jsonify({'error': 'File too large', 'max_bytes': current_app.config.get('MAX_CONTENT_LENGTH')}), 413
+
+    except Exception as e:
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+
+
+@uploads_bp.route('/presign', methods=['POST'])
+@artist_required
+def presign_upload(user_id):
+    """
+    Issue presigned URLs so the client uploads straight to S3
+
+    Small files get a presigned POST (form upload); files above 64 MiB, or
+    when "multipart" is true, get a multipart upload with one presigned PUT
+    URL per part. Either way the client must call /complete afterwards.
+
+    Request Body:
+        {
+            "filename": "track.flac",
+            "content_type": "audio/flac",
+            "size": 52428800,  // bytes
+            "multipart": false  // optional
+        }
+
+    Returns:
+        201: Presigned upload issued
+        400: Validation error
+        401: Not authenticated
+        403: Not an artist
+        413: Size exceeds MAX_CONTENT_LENGTH
+        500: Server error
+    """
+    try:
+        data = request.get_json()
+
+        if not data:
+            return jsonify({'error': 'Request body is required'}), 400
+
+        is_valid, errors = validate_presign_data(data)
+        if not is_valid:
+            return jsonify({'error': 'Validation failed', 'details': errors}), 400
+
+        max_bytes = current_app.config.get('MAX_CONTENT_LENGTH')
+        if max_bytes and data['size'] > max_bytes:
+            return jsonify({'error': 'File too large', 'max_bytes': max_bytes}), 413
+
+        success, result = UploadService.create_presigned_upload(
+            user_id=user_id,
+            filename=data['filename'],
+            content_type=data['content_type'],
+            size=data['size'],
+            multipart=data.get('multipart')
+        )
+
+        if not success:
+            status_code = 400 if 'invalid' in result.lower() else 500
+            return jsonify({'error': result}), status_code
+
+        return jsonify({'upload': result}), 201
+
+    except Exception as e:
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+
+
+@uploads_bp.route('/complete', methods=['POST'])
+@artist_required
+def complete_upload(user_id):
+    """
+    Completion callback for a presigned upload
+
+    Request Body:
+        {
+            "key": "media/artists/7/<id>/track.flac",
+            "parts": [  // multipart uploads only
+                {"part_number": 1, "etag": "\"9b2cf5...\""}
+            ]
+        }
+
+    Returns:
+        200: Object validated and registered
+        400: Validation error
+        401: Not authenticated
+        403: Not an artist
+        404: Unknown or expired upload, or object missing from S3
+        409: Upload already completed
+        422: Parts rejected by S3 (e.g. a wrong ETag), or the stored object
+             does not match the declared size or content type, or its content
+             is not that media type
+        500: Server error
+    """
+    try:
+        data = request.get_json()
+
+        if not data:
+            return jsonify({'error': 'Request body is required'}), 400
+
+        is_valid, errors = validate_complete_data(data)
+        if not is_valid:
+            return jsonify({'error': 'Validation failed', 'details': errors}), 400
+
+        success, result = UploadService.complete_presigned_upload(
+            user_id=user_id,
+            s3_key=data['key'],
+            parts=data.get('parts')
+        )
+
+        if not success:
+            if 'not found' in result.lower():
+                status_code = 404
+            elif 'already' in result.lower():
+                status_code = 409
+            elif 'not match' in result.lower():
+                status_code = 422
+            elif 'invalid' in result.lower():
+                status_code = 400
+            else:
+                status_code = 500
+            return jsonify({'error': result}), status_code
+
+        return jsonify({'message': 'Upload completed', 'media': result}), 200
+
+    except Exception as e:
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+
+
+@uploads_bp.route('/blobs', methods=['PUT', 'POST'])
+@artist_required
+def upload_blob(user_id):
+    """
+    Content-addressed upload: store the raw body under its SHA-256 digest
+
+    Identical content is stored once no matter who uploads it or under what
+    name. Sending X-Content-SHA256 lets the server skip the transfer entirely
+    when that content already exists; the body is then not read.
+
+    Headers:
+        Content-Type: MIME type of the file
+        Content-Length: Body size (or Transfer-Encoding: chunked)
+        X-Content-SHA256: Hex SHA-256 of the body (optional)
+
+    Returns:
+        200: Content already stored, reference added
+        201: Content stored, reference added
+        400: Validation error or digest mismatch
+        401: Not authenticated
+        403: Not an artist
+        411: Body length unknown
+        413: Body exceeds MAX_CONTENT_LENGTH
+        415: Not a supported media file, or not the declared Content-Type
+        500: Server error
+    """
+    try:
+        expected_digest = request.headers.get('X-Content-SHA256')
+        is_valid, errors = validate_blob_upload_headers({'sha256': expected_digest})
+        if not is_valid:
+            return jsonify({'error': 'Validation failed', 'details': errors}), 400
+
+        # Known content: add a reference without reading the body
+        if expected_digest:
+            success, result = UploadService.reference_existing_blob(user_id, expected_digest)
+            if success:
+                return jsonify({'blob': result}), 200
+            if result is not None:
+                return jsonify({'error': result}), 500
+
+        error_response = _check_stream_body()
+        if error_response:
+            return error_response
+
+        success, result = UploadService.upload_content_addressed(
+            user_id=user_id,
+            stream=request.stream,
+            content_type=request.mimetype or None,
+            content_length=request.content_length,
+            max_bytes=current_app.config.get('MAX_CONTENT_LENGTH'),
+            expected_digest=expected_digest
+        )
+
+        if not success:
+            if 'unsupported' in result.lower():
+                status_code = 415
+            elif 'invalid' in result.lower():
+                status_code = 400
+            else:
+                status_code = 500
+            return jsonify({'error': result}), status_code
+
+        return jsonify({'blob': result}), 200 if result['deduplicated'] else 201
+
+    except (UploadTooLargeError, RequestEntityTooLarge):
+        return jsonify({'error': 'File too large', 'max_bytes': current_app.config.get('MAX_CONTENT_LENGTH')}), 413
+
+    except Exception as e:
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+
+
+@uploads_bp.route('/blobs/refs/<int:ref_id>', methods=['DELETE'])
+@artist_required
+def release_blob(ref_id, user_id):
+    """
+    Release one of the current user's blob references
+
+    The stored object is deleted only when no references remain.
+
+    Returns:
+        200: Reference released
+        401: Not authenticated
+        403: Not an artist
+        404: Reference not found
+        500: Server error
+    """
+    try:
+        success, result = UploadService.release_blob_reference(user_id, ref_id)
+
+        if not success:
+            status_code = 404 if 'not found' in result.lower() else 500
+            return jsonify({'error': result}), status_code
+
+        return jsonify(result), 200
+
+    except Exception as e:
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
@@ -0,0 +1,108 @@
+"""
+Schema validation for uploads module
+"""
+from app.utils.validation import Schema, Field, matches, max_length, min_value, one_of, instance_of
+
+
+# Content types accepted for direct uploads (mirrors ALLOWED_EXTENSIONS in app.py)
+ALLOWED_CONTENT_TYPES = (
+    'audio/mpeg', 'audio/wav', 'audio/x-wav', 'audio/flac', 'audio/x-flac',
+    'video/mp4', 'video/webm', 'video/x-matroska', 'video/quicktime', 'video/x-msvideo',
+)
+
+
+FOLDER_RULES = (
+    max_length(255, 'Folder must be at most 255 characters'),
+    matches(
+        r'^[A-Za-z0-9_-]+(/[A-Za-z0-9_-]+)*$',
+        'Folder must be slash-separated segments of letters, numbers, dashes and underscores'
+    ),
+)
+
+STREAM_UPLOAD_SCHEMA = Schema({
+    'filename': Field(required='filename is required', rules=[
+        max_length(255, 'Filename must be at most 255 characters')
+    ]),
+    'folder': Field(rules=FOLDER_RULES),
+})
+
+BLOB_UPLOAD_SCHEMA = Schema({
+    'sha256': Field(rules=[
+        matches(r'^[0-9a-fA-F]{64}$', 'X-Content-SHA256 must be a hex SHA-256 digest')
+    ]),
+})
+
+
+def validate_stream_upload_params(params):
+    """
+    Validate query parameters of a streaming upload
+
+    Args:
+        params (dict): Query parameters
+
+    Returns:
+        tuple: (is_valid: bool, errors: dict)
+    """
+    return STREAM_UPLOAD_SCHEMA.validate(params)
+
+
+PRESIGN_SCHEMA = Schema({
+    'filename': Field(required='filename is required', rules=[
+        instance_of(str, 'Filename must be a string'),
+        max_length(255, 'Filename must be at most 255 characters')
+    ]),
+    'content_type': Field(required='content_type is required', rules=[
+        one_of(ALLOWED_CONTENT_TYPES, f"content_type must be one of: {', '.join(ALLOWED_CONTENT_TYPES)}")
+    ]),
+    'size': Field(required='size is required', rules=[
+        min_value(1, 'Size must be a positive whole number of bytes')
+    ]),
+})
+
+COMPLETE_SCHEMA = Schema({
+    'key': Field(required='key is required', rules=[
+        instance_of(str, 'Key must be a string')
+    ]),
+    'parts': Field(rules=[
+        instance_of(list, 'Parts must be a list of {part_number, etag} objects')
+    ]),
+})
+
+
+def validate_presign_data(data):
+    """
+    Validate a presigned upload request
+
+    Args:
+        data (dict): Request data
+
+    Returns:
+        tuple: (is_valid: bool, errors: dict)
+    """
+    return PRESIGN_SCHEMA.validate(data)
+
+
+def validate_complete_data(data):
+    """
+    Validate a presigned upload completion callback
+
+    Args:
+        data (dict): Request data
+
+    Returns:
+        tuple: (is_valid: bool, errors: dict)
+    """
+    return COMPLETE_SCHEMA.validate(data)
+
+
+def validate_blob_upload_headers(headers):
+    """
+    Validate headers of a content-addressed upload
+
+    Args:
+        headers (dict): {'sha256': value of X-Content-SHA256}
+
+    Returns:
+        tuple: (is_valid: bool, errors: dict)
+    """
+    return BLOB_UPLOAD_SCHEMA.validate(headers)
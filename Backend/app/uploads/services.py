@@ -0,0 +1,586 @@
+"""
+Upload service layer for media uploads
+"""
+import uuid
+import hashlib
+import pymysql
+from werkzeug.utils import secure_filename
+from app.auth.utils import get_db_connection
+from services.s3_service import s3_service
+from services.media_probe import MediaProbeError, PROBE_BYTES, required_probe_bytes, sniff_stream, check as check_media
+
+
+# Declared sizes above this use presigned multipart instead of a single presigned POST
+MULTIPART_THRESHOLD = 64 * 1024 * 1024
+
+# Content-addressed storage layout
+BLOB_PREFIX = 'cas/'
+STAGING_PREFIX = 'staging/'
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def blob_key(digest):
+    """
+    S3 key of a content-addressed blob
+
+    Args:
+        digest (str): Hex SHA-256 of the content
+
+    Returns:
+        str: Key under cas/, fanned out by the first two hex digits
+    """
+    return f"{BLOB_PREFIX}{digest[:2]}/{digest}"
+
+
+def artist_media_prefix(user_id):
+    """
+    Key prefix that a user's direct uploads are confined to
+
+    Args:
+        user_id (int): User's ID
+
+    Returns:
+        str: Prefix ending in '/'
+    """
+    return f"media/artists/{int(user_id)}/"
+
+
+class UploadService:
+    """Service class for upload operations"""
+
+    @staticmethod
+    def stream_upload(user_id, stream, filename, folder=None, content_type=None, content_length=None,
+                      max_bytes=None):
+        """
+        Stream a request body straight into S3 and register it as ready
+
+        The first bytes are probed before anything is sent to S3, so a body
+        that is not the media type its name and content type claim is
+        rejected without reading the rest. Like presigned uploads, the key is
+        generated under the user's prefix with a random segment, so a
+        stream upload can't overwrite another user's files or a shared blob,
+        and a MediaObject row records it.
+
+        Args:
+            user_id (int): Uploading user's ID
+            stream: Binary request stream
+            filename (str): Client-supplied file name
+            folder (str): Optional sub-path within the user's prefix (e.g. 'songs')
+            content_type (str): MIME type of the body
+            content_length (int): Declared body size, if any
+            max_bytes (int): Hard limit on bytes read from the stream
+
+        Returns:
+            tuple: (success: bool, result: dict/str)
+
+        Raises:
+            UploadTooLargeError: if the body exceeds max_bytes
+        """
+        safe_name = secure_filename(filename)
+        if not safe_name:
+            return False, "Invalid filename"
+
+        try:
+            stream = sniff_stream(stream, safe_name, content_type, content_length)
+        except MediaProbeError as e:
+            return False, f"Unsupported media: {str(e)}"
+
+        folder = f"{folder.strip('/')}/" if folder else ''
+        s3_key = f"{artist_media_prefix(user_id)}{folder}{uuid.uuid4().hex}/{safe_name}"
+        content_type = content_type or stream.info['mime_type']
+
+        result = s3_service.upload_stream(
+            stream,
+            s3_key,
+            content_type=content_type,
+            content_length=content_length,
+            max_bytes=max_bytes
+        )
+
+        if not result['success']:
+            return False, result['error']
+
+        media = stream.info
+        connection = None
+        try:
+            connection = get_db_connection()
+            cursor = connection.cursor(pymysql.cursors.DictCursor)
+
+            cursor.execute(
+                """
+                INSERT INTO MediaObject
+                    (UserID, ObjectKey, ContentType, DeclaredSize, SizeBytes, Status, CompletedAt,
+                     MediaFormat, DurationSeconds, BitrateBps, SampleRateHz)
+                VALUES (%s, %s, %s, %s, %s, 'Ready', NOW(), %s, %s, %s, %s)
+                """,
+                (user_id, s3_key, content_type, result['size'], result['size'], media['format'],
+                 media.get('duration'), media.get('bitrate'), media.get('sample_rate'))
+            )
+            result['media_id'] = cursor.lastrowid
+            connection.commit()
+
+        except pymysql.Error as e:
+            if connection:
+                connection.rollback()
+            s3_service.delete_file(s3_key)
+            return False, f"Database error: {str(e)}"
+
+        finally:
+            if connection:
+                cursor.close()
+                connection.close()
+
+        result['media'] = media
+        return True, result
+
+    @staticmethod
+    def create_presigned_upload(user_id, filename, content_type, size, multipart=None):
+        """
+        Issue presigned URLs for a direct-to-S3 upload and record it as pending
+
+        The object key is generated server side under the user's prefix, so
+        the client can only write that one key, with the declared content
+        type and at most the declared size.
+
+        Args:
+            user_id (int): Uploading user's ID
+            filename (str): Client-supplied file name
+            content_type (str): MIME type the client will send
+            size (int): Declared size in bytes
+            multipart (bool): Force (True) or disable (False) multipart.
+                Defaults to multipart above MULTIPART_THRESHOLD.
+
+        Returns:
+            tuple: (success: bool, result: dict/str)
+        """
+        safe_name = secure_filename(filename)
+        if not safe_name:
+            return False, "Invalid filename"
+
+        size = int(size)
+        if multipart is None:
+            multipart = size > MULTIPART_THRESHOLD
+
+        s3_key = f"{artist_media_prefix(user_id)}{uuid.uuid4().hex}/{safe_name}"
+
+        if multipart:
+            presigned = s3_service.presign_multipart(s3_key, content_type, size)
+        else:
+            presigned = s3_service.presign_post(s3_key, content_type, size)
+
+        if not presigned['success']:
+            return False, presigned['error']
+
+        connection = None
+        try:
+            connection = get_db_connection()
+            cursor = connection.cursor(pymysql.cursors.DictCursor)
+
+            cursor.execute(
+                """
+                INSERT INTO MediaObject (UserID, ObjectKey, ContentType, DeclaredSize, UploadID)
+                VALUES (%s, %s, %s, %s, %s)
+                """,
+                (user_id, s3_key, content_type, size, presigned.get('upload_id'))
+            )
+            media_id = cursor.lastrowid
+            connection.commit()
+
+        except pymysql.Error as e:
+            if connection:
+                connection.rollback()
+            if multipart:
+                s3_service.abort_multipart(s3_key, presigned['upload_id'])
+            return False, f"Database error: {str(e)}"
+
+        finally:
+            if connection:
+                cursor.close()
+                connection.close()
+
+        result = {
+            'media_id': media_id,
+            'key': s3_key,
+            'content_type': content_type,
+            'size': size,
+            'expires_in': s3_service.presign_expires
+        }
+
+        if multipart:
+            result.update({
+                'method': 'multipart',
+                'upload_id': presigned['upload_id'],
+                'part_size': presigned['part_size'],
+                'parts': presigned['parts']
+            })
+        else:
+            result.update({
+                'method': 'post',
+                'url': presigned['url'],
+                'fields': presigned['fields']
+            })
+
+        return True, result
+
+    @staticmethod
+    def complete_presigned_upload(user_id, s3_key, parts=None):
+        """
+        Validate a directly uploaded object and register it as ready
+
+        For multipart uploads the parts reported by the client are assembled
+        first; if S3 rejects them (a wrong ETag, or the upload expired) the
+        pending record is dropped. The stored object must then match the
+        declared size and content type, and its first bytes must be that
+        media type; otherwise it is deleted and the pending record dropped.
+
+        Args:
+            user_id (int): Uploading user's ID
+            s3_key (str): Key returned by create_presigned_upload
+            parts (list): [{'part_number': int, 'etag': str}] for multipart uploads
+
+        Returns:
+            tuple: (success: bool, result: dict/str)
+        """
+        if not s3_key.startswith(artist_media_prefix(user_id)):
+            return False, "Upload not found"
+
+        connection = None
+        try:
+            connection = get_db_connection()
+            cursor = connection.cursor(pymysql.cursors.DictCursor)
+
+            cursor.execute(
+                """
+                SELECT MediaID, ObjectKey, ContentType, DeclaredSize, UploadID, Status
+                FROM MediaObject
+                WHERE ObjectKey = %s AND UserID = %s
+                """,
+                (s3_key, user_id)
+            )
+            media = cursor.fetchone()
+
+            if not media:
+                return False, "Upload not found"
+
+            if media['Status'] == 'Ready':
+                return False, "Upload already completed"
+
+            if media['UploadID']:
+                if not parts:
+                    return False, "Invalid request: parts are required to complete a multipart upload"
+                try:
+                    completed = s3_service.complete_multipart(s3_key, media['UploadID'], parts)
+                except (KeyError, TypeError, ValueError):
+                    return False, "Invalid request: each part needs part_number and etag"
+                if not completed['success']:
+                    # The multipart upload is gone either way (expired, or
+                    # aborted by complete_multipart), so the record can't complete
+                    cursor.execute("DELETE FROM MediaObject WHERE MediaID = %s", (media['MediaID'],))
+                    connection.commit()
+                    if 'NoSuchUpload' in completed['error']:
+                        return False, "Upload not found: it expired or was aborted"
+                    return False, f"Uploaded parts do not match the upload: {completed['error']}"
+
+            info = s3_service.get_file_info(s3_key)
+            if info is None:
+                return False, "Uploaded object not found"
+
+            probed = None
+            if info['size'] == media['DeclaredSize'] and info['content_type'] == media['ContentType']:
+                # Only the head of the object is fetched to check what it really is
+                head = s3_service.get_range(s3_key, 0, min(info['size'], PROBE_BYTES) - 1)
+                wanted = min(required_probe_bytes(head), info['size'])
+                if wanted > len(head):
+                    head += s3_service.get_range(s3_key, len(head), wanted - 1)
+                try:
+                    probed = check_media(head, s3_key, info['content_type'], total_size=info['size'])
+                except MediaProbeError:
+                    probed = None
+
+            if probed is None:
+                s3_service.delete_file(s3_key)
+                cursor.execute("DELETE FROM MediaObject WHERE MediaID = %s", (media['MediaID'],))
+                connection.commit()
+                return False, "Uploaded object does not match the declared size or content type"
+
+            cursor.execute(
+                """
+                UPDATE MediaObject
+                SET Status = 'Ready', SizeBytes = %s, ETag = %s, CompletedAt = NOW(),
+                    MediaFormat = %s, DurationSeconds = %s, BitrateBps = %s, SampleRateHz = %s
+                WHERE MediaID = %s
+                """,
+                (info['size'], info['etag'], probed['format'], probed['duration'],
+                 probed['bitrate'], probed['sample_rate'], media['MediaID'])
+            )
+            connection.commit()
+
+            return True, {
+                'media_id': media['MediaID'],
+                'key': s3_key,
+                'url': s3_service.get_file_url(s3_key),
+                'content_type': info['content_type'],
+                'size': info['size'],
+                'etag': info['etag'],
+                'media': probed
+            }
+
+        except pymysql.Error as e:
+            if connection:
+                connection.rollback()
+            return False, f"Database error: {str(e)}"
+
+        finally:
+            if connection:
+                cursor.close()
+                connection.close()
+
+    @staticmethod
+    def upload_content_addressed(user_id, stream, content_type=None, content_length=None,
+                                 max_bytes=None, expected_digest=None):
+        """
+        Store a request body under its SHA-256 digest, deduplicating repeats
+
+        The body is streamed to a staging key while being hashed, then copied
+        server side to cas/<digest> with immutable caching headers unless an
+        identical blob is already there. Callers that know the digest up front
+        should try reference_existing_blob first to skip the transfer. Bodies
+        that are not a supported media type are rejected from their first bytes.
+
+        Args:
+            user_id (int): Uploading user's ID
+            stream: Binary request stream
+            content_type (str): MIME type of the body
+            content_length (int): Declared body size, if any
+            max_bytes (int): Hard limit on bytes read from the stream
+            expected_digest (str): Hex SHA-256 announced by the client, verified
+                against the body (optional)
+
+        Returns:
+            tuple: (success: bool, result: dict/str)
+
+        Raises:
+            UploadTooLargeError: if the body exceeds max_bytes
+        """
+        try:
+            stream = sniff_stream(stream, content_type=content_type, content_length=content_length)
+        except MediaProbeError as e:
+            return False, f"Unsupported media: {str(e)}"
+
+        if not content_type or content_type == 'application/octet-stream':
+            content_type = stream.info['mime_type']
+
+        staging_key = f"{STAGING_PREFIX}{uuid.uuid4().hex}"
+        hasher = hashlib.sha256()
+        uploaded = s3_service.upload_stream(
+            stream,
+            staging_key,
+            content_type=content_type,
+            content_length=content_length,
+            max_bytes=max_bytes,
+            hasher=hasher
+        )
+        if not uploaded['success']:
+            return False, uploaded['error']
+
+        try:
+            digest = hasher.hexdigest()
+            if expected_digest and digest != expected_digest.lower():
+                return False, "Invalid request: body does not match X-Content-SHA256"
+
+            return UploadService._register_blob(
+                user_id, digest, staging_key, uploaded['size'], content_type, stream.info
+            )
+        finally:
+            s3_service.delete_file(staging_key)
+
+    @staticmethod
+    def reference_existing_blob(user_id, digest):
+        """
+        Add a reference to an already stored blob without any transfer
+
+        Args:
+            user_id (int): User's ID
+            digest (str): Hex SHA-256 of the content
+
+        Returns:
+            tuple: (True, result) on success, (False, None) if the blob does
+                not exist, (False, error_message) on failure
+        """
+        connection = None
+        try:
+            connection = get_db_connection()
+            cursor = connection.cursor(pymysql.cursors.DictCursor)
+
+            # Row lock serializes against release_blob_reference deleting the blob
+            cursor.execute(
+                "SELECT Digest, ObjectKey, SizeBytes, ContentType, MediaFormat, DurationSeconds, BitrateBps, SampleRateHz "
+                "FROM MediaBlob WHERE Digest = %s FOR UPDATE",
+                (digest.lower(),)
+            )
+            blob = cursor.fetchone()
+
+            if not blob or s3_service.get_file_info(blob['ObjectKey']) is None:
+                connection.rollback()
+                return False, None
+
+            cursor.execute("INSERT INTO MediaBlobRef (Digest, UserID) VALUES (%s, %s)", (blob['Digest'], user_id))
+            ref_id = cursor.lastrowid
+            connection.commit()
+
+            return True, UploadService._blob_result(blob, ref_id, deduplicated=True)
+
+        except pymysql.Error as e:
+            if connection:
+                connection.rollback()
+            return False, f"Database error: {str(e)}"
+
+        finally:
+            if connection:
+                cursor.close()
+                connection.close()
+
+    @staticmethod
+    def _register_blob(user_id, digest, staging_key, size, content_type, media):
+        """
+        Promote a staged upload to its content-addressed key and add a reference
+
+        Args:
+            media (dict): Probe result of the content, stored with a new blob
+
+        Returns:
+            tuple: (success: bool, result: dict/str)
+        """
+        connection = None
+        try:
+            connection = get_db_connection()
+            cursor = connection.cursor(pymysql.cursors.DictCursor)
+
+            cursor.execute(
+                """
+                INSERT INTO MediaBlob (Digest, ObjectKey, SizeBytes, ContentType,
+                                       MediaFormat, DurationSeconds, BitrateBps, SampleRateHz)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE Digest = Digest
+                """,
+                (digest, blob_key(digest), size, content_type, media['format'],
+                 media['duration'], media['bitrate'], media['sample_rate'])
+            )
+            cursor.execute(
+                "SELECT Digest, ObjectKey, SizeBytes, ContentType, MediaFormat, DurationSeconds, BitrateBps, SampleRateHz "
+                "FROM MediaBlob WHERE Digest = %s FOR UPDATE",
+                (digest,)
+            )
+            blob = cursor.fetchone()
+
+            deduplicated = s3_service.get_file_info(blob['ObjectKey']) is not None
+            if not deduplicated:
+                copied = s3_service.copy_file(
+                    staging_key,
+                    blob['ObjectKey'],
+                    content_type=blob['ContentType'],
+                    cache_control=IMMUTABLE_CACHE_CONTROL
+                )
+                if not copied['success']:
+                    connection.rollback()
+                    return False, copied['error']
+
+            cursor.execute("INSERT INTO MediaBlobRef (Digest, UserID) VALUES (%s, %s)", (digest, user_id))
+            ref_id = cursor.lastrowid
+            connection.commit()
+
+            return True, UploadService._blob_result(blob, ref_id, deduplicated)
+
+        except pymysql.Error as e:
+            if connection:
+                connection.rollback()
+            return False, f"Database error: {str(e)}"
+
+        finally:
+            if connection:
+                cursor.close()
+                connection.close()
+
+    @staticmethod
+    def _blob_result(blob, ref_id, deduplicated):
+        return {
+            'ref_id': ref_id,
+            'digest': blob['Digest'],
+            'key': blob['ObjectKey'],
+            'url': s3_service.get_file_url(blob['ObjectKey']),
+            'size': blob['SizeBytes'],
+            'content_type': blob['ContentType'],
+            'media': {
+                'format': blob['MediaFormat'],
+                'duration': float(blob['DurationSeconds']) if blob['DurationSeconds'] is not None else None,
+                'bitrate': blob['BitrateBps'],
+                'sample_rate': blob['SampleRateHz']
+            },
+            'deduplicated': deduplicated
+        }
+
+    @staticmethod
+    def release_blob_reference(user_id, ref_id):
+        """
+        Drop one of a user's blob references, deleting the blob with its last reference
+
+        Args:
+            user_id (int): User's ID
+            ref_id (int): Reference ID returned at upload
+
+        Returns:
+            tuple: (success: bool, result: dict/str)
+        """
+        connection = None
+        try:
+            connection = get_db_connection()
+            cursor = connection.cursor(pymysql.cursors.DictCursor)
+
+            cursor.execute(
+                "SELECT RefID, Digest FROM MediaBlobRef WHERE RefID = %s AND UserID = %s",
+                (ref_id, user_id)
+            )
+            ref = cursor.fetchone()
+
+            if not ref:
+                return False, "Reference not found"
+
+            cursor.execute(
+                "SELECT Digest, ObjectKey FROM MediaBlob WHERE Digest = %s FOR UPDATE",
+                (ref['Digest'],)
+            )
+            blob = cursor.fetchone()
+
+            cursor.execute("DELETE FROM MediaBlobRef WHERE RefID = %s", (ref_id,))
+            cursor.execute(
+                "SELECT COUNT(*) AS remaining FROM MediaBlobRef WHERE Digest = %s",
+                (ref['Digest'],)
+            )
+            remaining = cursor.fetchone()['remaining']
+
+            if remaining == 0:
+                # Delete while still holding the row lock so no upload can re-reference it meanwhile
+                deleted = s3_service.delete_file(blob['ObjectKey'])
+                if not deleted['success']:
+                    connection.rollback()
+                    return False, deleted['error']
+                cursor.execute("DELETE FROM MediaBlob WHERE Digest = %s", (ref['Digest'],))
+
+            connection.commit()
+
+            return True, {
+                'message': 'Reference released',
+                'digest': ref['Digest'],
+                'remaining_references': remaining,
+                'blob_deleted': remaining == 0
+            }
+
+        except pymysql.Error as e:
+            if connection:
+                connection.rollback()
+            return False, f"Database error: {str(e)}"
+
+        finally:
+            if connection:
+                cursor.close()
+                connection.close()
@@ -2,5 +2,6 @@
 Users module for user-specific operations
 """
 from .routes import users_bp
+from .recent import recent_plays_cache
 
-__all__ = ['users_bp']
+__all__ = ['users_bp', 'recent_plays_cache']
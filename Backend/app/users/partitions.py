@@ -0,0 +1,388 @@
+"""
+Monthly PlayHistory partitions: creating future months, archiving old ones
+
+PlayHistory is range partitioned by month on PlayedAt
+(migrations/008_play_history_partitions.sql). This job keeps it that way:
+
+- Splits the catch-all p_future partition so the next `--months-ahead`
+  months each have their own partition before any play lands in them
+- Writes every partition ending more than `--retain-months` months ago to a
+  compressed archive file, checks the row count, then drops the partition
+
+Archive files live in PLAY_HISTORY_ARCHIVE_DIR, two per partition:
+
+    p202501.plays   zlib-compressed blocks, one per listener, each a JSON
+                    list of [HistoryID, SongID, PlayedAt, ListenDuration],
+                    newest play first
+    p202501.json    index: the partition's date range, row count and each
+                    listener's block (offset, length, plays)
+
+The index is written last, so a partition is only dropped, and only read
+back, once its archive is complete. UserService.get_play_history reads
+archived plays through PlayHistoryArchive once a listener pages past the
+plays still in the table.
+
+Plays are recorded at the current time, so archived partitions no longer
+change. Archive files are not rewritten when an account is deleted.
+
+Run it from the Backend directory, at least monthly (e.g. from cron):
+
+    python -m app.users.partitions
+    python -m app.users.partitions --months-ahead 6 --retain-months 24
+"""
+import os
+import json
+import zlib
+import time
+import argparse
+import threading
+import pymysql
+from collections import OrderedDict
+from datetime import date, datetime
+from app.auth.utils import get_db_connection
+from app.utils.cli import job_app
+
+
+# Months past the current one that get a partition ahead of time
+MONTHS_AHEAD = 3
+
+# Months kept in MySQL before a partition is archived and dropped
+RETAIN_MONTHS = 12
+
+# Rows pulled per round trip while streaming a partition
+FETCH_SIZE = 10000
+
+# Archive indexes kept in memory
+INDEX_CACHE_SIZE = 24
+
+FUTURE_PARTITION = 'p_future'
+
+
+def add_months(day, months):
+    """First day of the month `months` after day's month"""
+    month = day.year * 12 + day.month - 1 + months
+    return date(month // 12, month % 12 + 1, 1)
+
+
+def list_partitions(cursor):
+    """
+    PlayHistory's partitions in order
+
+    Returns:
+        list: [(name, upper bound date, or None for MAXVALUE)], empty when
+            the table is not partitioned
+    """
+    cursor.execute(
+        """
+        SELECT PARTITION_NAME AS name, PARTITION_DESCRIPTION AS description
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'PlayHistory'
+        ORDER BY PARTITION_ORDINAL_POSITION
+        """
+    )
+    partitions = []
+    for row in cursor.fetchall():
+        if row['name'] is None:
+            return []
+        description = row['description']
+        upper = None if description == 'MAXVALUE' else date.fromisoformat(description.strip("'")[:10])
+        partitions.append((row['name'], upper))
+    return partitions
+
+
+def add_future_partitions(cursor, today, months_ahead=MONTHS_AHEAD):
+    """
+    Split p_future so every month up to `months_ahead` after today's has a partition
+
+    Returns:
+        list: Names of the partitions added
+    """
+    partitions = list_partitions(cursor)
+    if not partitions or partitions[-1] != (FUTURE_PARTITION, None) or len(partitions) < 2:
+        raise ValueError("PlayHistory is not partitioned (apply migrations/008_play_history_partitions.sql)")
+
+    upper = partitions[-2][1]
+    target = add_months(today, months_ahead + 1)
+    added = []
+    while upper < target:
+        added.append((f'p{upper:%Y%m}', add_months(upper, 1)))
+        upper = added[-1][1]
+    if not added:
+        return []
+
+    definitions = ', '.join(f"PARTITION {name} VALUES LESS THAN ('{bound.isoformat()}')" for name, bound in added)
+    cursor.execute(
+        f"ALTER TABLE PlayHistory REORGANIZE PARTITION {FUTURE_PARTITION} INTO "
+        f"({definitions}, PARTITION {FUTURE_PARTITION} VALUES LESS THAN (MAXVALUE))"
+    )
+    return [name for name, _ in added]
+
+
+class PlayHistoryArchive:
+    """
+    Archived PlayHistory partitions on disk (see the module docstring)
+
+    Args:
+        directory (str): Archive directory, or None when nothing is archived
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._indexes = OrderedDict()     # name -> (mtime, index), least recently used first
+        self._lock = threading.Lock()
+
+    def _path(self, name, extension):
+        return os.path.join(self.directory, f'{name}.{extension}')
+
+    def write(self, name, lower, upper, rows):
+        """
+        Archive a partition's rows
+
+        Args:
+            name (str): Partition name
+            lower (date): First day covered (None for everything before upper)
+            upper (date): First day no longer covered
+            rows: (HistoryID, ListenerID, SongID, PlayedAt, ListenDuration)
+                tuples ordered by ListenerID, then newest first
+
+        Returns:
+            int: Rows written
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        listeners = {}
+        count = 0
+        data_path = self._path(name, 'plays')
+        with open(data_path + '.tmp', 'wb') as f:
+            def flush(listener_id, block):
+                data = zlib.compress(json.dumps(block, separators=(',', ':')).encode())
+                listeners[str(listener_id)] = [f.tell(), len(data), len(block)]
+                f.write(data)
+
+            current, block = None, []
+            for history_id, listener_id, song_id, played_at, listen_duration in rows:
+                if listener_id != current:
+                    if block:
+                        flush(current, block)
+                    current, block = listener_id, []
+                block.append([history_id, song_id, played_at.isoformat(), listen_duration])
+                count += 1
+            if block:
+                flush(current, block)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(data_path + '.tmp', data_path)
+
+        index = {
+            'partition': name,
+            'from': lower.isoformat() if lower else None,
+            'to': upper.isoformat(),
+            'rows': count,
+            'archived_at': datetime.now().isoformat(timespec='seconds'),
+            'listeners': listeners
+        }
+        index_path = self._path(name, 'json')
+        with open(index_path + '.tmp', 'w') as f:
+            json.dump(index, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(index_path + '.tmp', index_path)
+        return count
+
+    def _index(self, name):
+        path = self._path(name, 'json')
+        mtime = os.path.getmtime(path)
+        with self._lock:
+            cached = self._indexes.get(name)
+            if cached and cached[0] == mtime:
+                self._indexes.move_to_end(name)
+                return cached[1]
+
+        with open(path) as f:
+            index = json.load(f)
+        with self._lock:
+            self._indexes[name] = (mtime, index)
+            self._indexes.move_to_end(name)
+            while len(self._indexes) > INDEX_CACHE_SIZE:
+                self._indexes.popitem(last=False)
+        return index
+
+    def partitions(self):
+        """
+        Names of the archived partitions, newest first
+
+        Returns:
+            list: Partition names (empty when no archive directory is set)
+        """
+        if not self.directory or not os.path.isdir(self.directory):
+            return []
+        # Partition names sort by month; p_start holds everything before them
+        names = [name[:-5] for name in os.listdir(self.directory) if name.endswith('.json')]
+        return sorted(names, key=lambda name: (name != 'p_start', name), reverse=True)
+
+    def listener_plays(self, listener_id, skip, limit):
+        """
+        A listener's archived plays, newest first
+
+        Args:
+            listener_id (int): Listener's ID
+            skip (int): Archived plays to skip
+            limit (int): Plays to return
+
+        Returns:
+            list: [{'HistoryID', 'SongID', 'PlayedAt', 'ListenDuration'}]
+        """
+        plays = []
+        for name in self.partitions():
+            entry = self._index(name)['listeners'].get(str(listener_id))
+            if entry is None:
+                continue
+            offset, length, count = entry
+            if skip >= count:
+                skip -= count
+                continue
+
+            with open(self._path(name, 'plays'), 'rb') as f:
+                f.seek(offset)
+                block = json.loads(zlib.decompress(f.read(length)))
+            for history_id, song_id, played_at, listen_duration in block[skip:skip + limit - len(plays)]:
+                plays.append({
+                    'HistoryID': history_id,
+                    'SongID': song_id,
+                    'PlayedAt': datetime.fromisoformat(played_at),
+                    'ListenDuration': listen_duration
+                })
+            skip = 0
+            if len(plays) >= limit:
+                break
+        return plays
+
+
+def archive_partition(connection, archive, name, lower, upper):
+    """
+    Archive one partition and drop it once the archive holds every row
+
+    Returns:
+        int: Rows archived
+
+    Raises:
+        RuntimeError: If the partition changed while it was archived
+    """
+    cursor = connection.cursor(pymysql.cursors.SSCursor)
+    try:
+        cursor.execute(
+            f"""
+            SELECT HistoryID, ListenerID, SongID, PlayedAt, ListenDuration
+            FROM PlayHistory PARTITION ({name})
+            ORDER BY ListenerID, PlayedAt DESC, HistoryID DESC
+            """
+        )
+
+        def rows():
+            while True:
+                batch = cursor.fetchmany(FETCH_SIZE)
+                if not batch:
+                    return
+                yield from batch
+
+        written = archive.write(name, lower, upper, rows())
+    finally:
+        cursor.close()
+
+    cursor = connection.cursor(pymysql.cursors.DictCursor)
+    try:
+        cursor.execute(f"SELECT COUNT(*) AS plays FROM PlayHistory PARTITION ({name})")
+        plays = cursor.fetchone()['plays']
+        if plays != written:
+            raise RuntimeError(f"{name} has {plays} plays but {written} were archived; not dropped")
+        cursor.execute(f"ALTER TABLE PlayHistory DROP PARTITION {name}")
+    finally:
+        cursor.close()
+    return written
+
+
+def maintain_partitions(archive, months_ahead=MONTHS_AHEAD, retain_months=RETAIN_MONTHS, today=None, connect=None):
+    """
+    Add the coming months' partitions and archive the expired ones
+
+    Args:
+        archive (PlayHistoryArchive): Archive to write to; expired partitions
+            are kept when it has no directory
+        months_ahead (int): Months after the current one to create
+        retain_months (int): Whole months kept before the current one
+        today (date): Date to plan from (default: today)
+        connect: Database connection factory (default: get_db_connection)
+
+    Returns:
+        tuple: (success: bool, result: dict/str)
+    """
+    started = time.monotonic()
+    today = today or date.today()
+    cutoff = add_months(today, -retain_months)
+    report = {'added': [], 'archived': {}, 'cutoff': cutoff.isoformat()}
+    connection = None
+    try:
+        connection = (connect or get_db_connection)()
+        cursor = connection.cursor(pymysql.cursors.DictCursor)
+        report['added'] = add_future_partitions(cursor, today, months_ahead)
+
+        if archive.directory:
+            lower = None
+            for name, upper in list_partitions(cursor):
+                if upper is None or upper > cutoff:
+                    break
+                report['archived'][name] = archive_partition(connection, archive, name, lower, upper)
+                lower = upper
+        else:
+            report['archive'] = "PLAY_HISTORY_ARCHIVE_DIR is not set; expired partitions kept"
+
+    except (ValueError, RuntimeError) as e:
+        return False, str(e)
+
+    except pymysql.Error as e:
+        return False, f"Database error: {str(e)}"
+
+    except OSError as e:
+        return False, f"Archive failed: {str(e)}"
+
+    finally:
+        if connection:
+            cursor.close()
+            connection.close()
+
+    report['seconds'] = round(time.monotonic() - started, 3)
+    return True, report
+
+
+# Singleton instance
+play_history_archive = PlayHistoryArchive(os.getenv('PLAY_HISTORY_ARCHIVE_DIR') or None)
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Create upcoming PlayHistory partitions and archive expired ones")
+    parser.add_argument('--months-ahead', type=int, default=MONTHS_AHEAD,
+                        help=f"months after the current one to create (default: {MONTHS_AHEAD})")
+    parser.add_argument('--retain-months', type=int,
+                        default=int(os.getenv('PLAY_HISTORY_RETAIN_MONTHS', RETAIN_MONTHS)),
+                        help=f"months kept in MySQL (default: PLAY_HISTORY_RETAIN_MONTHS or {RETAIN_MONTHS})")
+    parser.add_argument('--archive-dir', default=os.getenv('PLAY_HISTORY_ARCHIVE_DIR') or None,
+                        help="archive directory (default: PLAY_HISTORY_ARCHIVE_DIR; without one nothing is dropped)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    app = job_app(__name__)     # loads .env before the defaults are read
+    args = _parse_args(argv)
+
+    with app.app_context():
+        success, result = maintain_partitions(
+            PlayHistoryArchive(args.archive_dir),
+            months_ahead=args.months_ahead,
+            retain_months=args.retain_months
+        )
+
+    print(json.dumps(result, indent=2) if success else result)
+    return 0 if success else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
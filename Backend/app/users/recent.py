@@ -0,0 +1,215 @@
+"""
+In-memory ring buffers of each listener's most recent plays
+
+Almost every history request is for the first page, so RecentPlaysCache
+keeps the newest `size` plays of recently active listeners, already joined
+with their song, artwork and artist fields, and serves any page that lies
+within them without a query.
+
+A listener's buffer is loaded from the database on their first history
+request and then kept current: record_play_history pushes each new play onto
+the front, and the oldest falls off the back. A buffer shorter than `size`
+holds the listener's whole history. Plays recorded while a buffer is being
+loaded may be missing from the loaded rows, so that load is discarded.
+
+Buffers live in one process, but plays may be recorded, and accounts deleted,
+by other workers. Each buffer therefore remembers the listener's play count
+and newest HistoryID, and get_play_history checks them against PlayHistory (an
+index-only count on ix_playhistory_listener) before serving it; a buffer that
+disagrees is reloaded. Song, artwork and artist fields changed by another
+worker are not detected that way, so buffers are also reloaded after `ttl`
+seconds.
+
+Memory is bounded by `max_plays` across all buffers; past it the least
+recently used listeners are dropped and reloaded when they come back.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict, deque
+from itertools import islice
+
+
+# Fields of a cached play, in the order of UserService.get_play_history rows
+FIELDS = (
+    'HistoryID', 'SongID', 'PlayedAt', 'ListenDuration', 'song_title',
+    'song_duration', 'ArtworkID', 'artwork_title', 'artist_username'
+)
+
+
+class RecentPlaysCache:
+    """
+    Newest plays per listener (keyed by UserID), least recently used evicted first
+
+    Args:
+        size (int): Plays kept per listener (the deepest page served)
+        max_plays (int): Plays kept across all listeners
+        ttl (float): Seconds a buffer is served before it is reloaded
+    """
+
+    def __init__(self, size=100, max_plays=200000, ttl=300):
+        self.size = size
+        self.max_plays = max_plays
+        self.ttl = ttl
+        self._buffers = OrderedDict()   # UserID -> deque of play tuples, newest first
+        self._versions = {}             # UserID -> [plays in PlayHistory, newest HistoryID, loaded at]
+        self._loading = {}              # UserID -> True once a play made the load stale
+        self._plays = 0
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'loads': 0, 'stale_loads': 0, 'outdated': 0, 'evictions': 0}
+
+    def covers(self, limit, offset):
+        """Whether a page lies within the buffers"""
+        return offset + limit <= self.size
+
+    def get(self, user_id, limit, offset, version):
+        """
+        A page of a listener's history
+
+        Args:
+            user_id (int): User's ID
+            limit (int): Number of plays
+            offset (int): Plays skipped
+            version (tuple): (play count, newest HistoryID) of the listener
+                in PlayHistory now
+
+        Returns:
+            list: Play dicts, newest first, or None when the listener is not
+                cached, or their buffer is out of date (it is dropped)
+        """
+        with self._lock:
+            plays = self._buffers.get(user_id)
+            if plays is None:
+                self.stats['misses'] += 1
+                return None
+            count, newest_id, loaded_at = self._versions[user_id]
+            if (count, newest_id) != tuple(version) or time.monotonic() - loaded_at >= self.ttl:
+                self._drop(user_id)
+                self.stats['outdated'] += 1
+                self.stats['misses'] += 1
+                return None
+            self._buffers.move_to_end(user_id)
+            self.stats['hits'] += 1
+            page = list(islice(plays, offset, offset + limit))
+        return [dict(zip(FIELDS, play)) for play in page]
+
+    def begin_load(self, user_id):
+        """Call before reading a listener's newest `size` plays from the database"""
+        with self._lock:
+            self._loading[user_id] = False
+
+    def load(self, user_id, rows, version):
+        """
+        Cache the rows read after begin_load, unless a play was recorded meanwhile
+
+        Args:
+            user_id (int): User's ID
+            rows (list): The listener's newest plays (up to `size`), newest
+                first, or None when reading them failed
+            version (tuple): (play count, newest HistoryID) read before the rows
+        """
+        with self._lock:
+            stale = self._loading.pop(user_id, True)
+            if rows is None:
+                return
+            if stale:
+                self.stats['stale_loads'] += 1
+                return
+            plays = deque((tuple(row[field] for field in FIELDS) for row in rows[:self.size]), maxlen=self.size)
+            self._drop(user_id)
+            self._buffers[user_id] = plays
+            self._versions[user_id] = [version[0], version[1], time.monotonic()]
+            self._plays += len(plays)
+            self.stats['loads'] += 1
+            self._evict()
+
+    def _drop(self, user_id):
+        """Remove a listener's buffer. Caller holds _lock."""
+        plays = self._buffers.pop(user_id, None)
+        if plays is not None:
+            self._plays -= len(plays)
+            del self._versions[user_id]
+
+    def _evict(self):
+        while self._plays > self.max_plays and len(self._buffers) > 1:
+            self._drop(next(iter(self._buffers)))
+            self.stats['evictions'] += 1
+
+    def wants(self, user_id):
+        """Whether a new play of this listener must be passed to add()"""
+        with self._lock:
+            return user_id in self._buffers or user_id in self._loading
+
+    def add(self, user_id, history_id, row):
+        """
+        Push a newly recorded play (a dict with FIELDS) onto the listener's buffer
+
+        Args:
+            user_id (int): User's ID
+            history_id (int): The play's HistoryID
+            row (dict): The play, or None when it is not listed in the history
+                (e.g. its song has no artist account); a load in progress is
+                discarded either way
+        """
+        with self._lock:
+            if user_id in self._loading:
+                self._loading[user_id] = True
+            plays = self._buffers.get(user_id)
+            if plays is None:
+                return
+            # A load that began after the play was committed already counted it
+            version = self._versions[user_id]
+            if version[1] is not None and history_id <= version[1]:
+                return
+            version[0] += 1
+            version[1] = history_id
+            if row is None or any(play[0] == history_id for play in plays):
+                return
+            if len(plays) < self.size:
+                self._plays += 1
+            plays.appendleft(tuple(row[field] for field in FIELDS))
+            self._evict()
+
+    def forget(self, user_id):
+        """Drop a listener's buffer (e.g. their account was deleted)"""
+        with self._lock:
+            if user_id in self._loading:
+                self._loading[user_id] = True
+            self._drop(user_id)
+
+    def clear(self):
+        """Drop every buffer, e.g. when cached song or artist fields changed"""
+        with self._lock:
+            for user_id in self._loading:
+                self._loading[user_id] = True
+            self._buffers.clear()
+            self._versions.clear()
+            self._plays = 0
+
+    def get_stats(self):
+        """
+        Cache counters for monitoring
+
+        Returns:
+            dict: hits, misses, hit_ratio, loads (and loads discarded as
+                stale), buffers dropped as outdated, evictions, cached
+                listeners and plays, and limits
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats['listeners'] = len(self._buffers)
+            stats['plays'] = self._plays
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+        stats['size'] = self.size
+        stats['max_plays'] = self.max_plays
+        stats['ttl'] = self.ttl
+        return stats
+
+
+# Singleton instance
+recent_plays_cache = RecentPlaysCache(
+    size=int(os.getenv('RECENT_PLAYS_PER_LISTENER', 100)),
+    max_plays=int(os.getenv('RECENT_PLAYS_MAX', 200000)),
+    ttl=int(os.getenv('RECENT_PLAYS_TTL_SECONDS', 300))
+)
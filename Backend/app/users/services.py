@@ -4,6 +4,62 @@ User service layer for user-specific operations
 import pymysql
 from flask import current_app
 from app.auth.utils import get_db_connection
+from app.search import services as search  # module import: app.search imports app.auth
+from app.recommendations import services as recommendations
+from app.analytics import services as analytics
+from app.users.partitions import play_history_archive
+from app.users.recent import recent_plays_cache
+
+
+_ARCHIVED_SONG_QUERY = """
+    SELECT
+        s.SongID,
+        s.Title as song_title,
+        s.Duration as song_duration,
+        a.ArtworkID,
+        a.Title as artwork_title,
+        u.Username as artist_username
+    FROM Song s
+    JOIN Artwork a ON s.ArtworkID = a.ArtworkID
+    JOIN Artist ar ON a.ArtistID = ar.ArtistID
+    JOIN User u ON ar.UserID = u.UserID
+    WHERE s.SongID IN ({placeholders})
+"""
+
+
+_RECENT_PLAY_QUERY = """
+    SELECT
+        ph.HistoryID,
+        ph.SongID,
+        ph.PlayedAt,
+        ph.ListenDuration,
+        s.Title as song_title,
+        s.Duration as song_duration,
+        a.ArtworkID,
+        a.Title as artwork_title,
+        u.Username as artist_username
+    FROM PlayHistory ph
+    JOIN Song s ON ph.SongID = s.SongID
+    JOIN Artwork a ON s.ArtworkID = a.ArtworkID
+    JOIN Artist ar ON a.ArtistID = ar.ArtistID
+    JOIN User u ON ar.UserID = u.UserID
+    WHERE ph.HistoryID = %s
+"""
+
+
+def _hydrate_archived_plays(cursor, plays):
+    """
+    Add the song, artwork and artist fields of live history rows to archived plays
+
+    Plays of songs that no longer exist are dropped, as the JOINs drop them
+    from the table.
+    """
+    song_ids = list({play['SongID'] for play in plays})
+    if not song_ids:
+        return []
+    cursor.execute(_ARCHIVED_SONG_QUERY.format(placeholders=', '.join(['%s'] * len(song_ids))), song_ids)
+    songs = {row.pop('SongID'): row for row in cursor.fetchall()}
+    return [{**play, **songs[play['SongID']]} for play in plays if play['SongID'] in songs]
 
 
 class UserService:
@@ -69,6 +125,9 @@ class UserService:
 
             connection.commit()
 
+            if new_role == 'Artist':
+                search.search_service.user_changed(user_id)
+
             # Fetch updated user info
             cursor.execute(
                 "SELECT UserID, Email, Username, FirstName, LastName, Role FROM User WHERE UserID = %s",
@@ -230,6 +289,7 @@ class UserService:
                 (listener_id,)
             )
             updated_listener = cursor.fetchone()
+            recommendations.for_you_service.preferences_changed(user_id, updated_listener)
 
             return True, updated_listener
 
@@ -248,6 +308,82 @@ class UserService:
         """
         Get user's play history (for listeners only)
 
+        Pages within the newest recent_plays_cache.size plays are served from
+        the listener's recent plays in memory, loaded on the first request
+        and reloaded when PlayHistory no longer matches them (e.g. another
+        worker recorded a play).
+
+        Args:
+            user_id (int): User's ID
+            limit (int): Number of records to return
+            offset (int): Offset for pagination
+
+        Returns:
+            tuple: (success: bool, result: list/str)
+        """
+        if not recent_plays_cache.covers(limit, offset):
+            return UserService._query_play_history(user_id, limit, offset)
+
+        success, version = UserService._play_history_version(user_id)
+        if not success:
+            return False, version
+
+        page = recent_plays_cache.get(user_id, limit, offset, version)
+        if page is not None:
+            return True, page
+
+        recent_plays_cache.begin_load(user_id)
+        success, result = UserService._query_play_history(user_id, recent_plays_cache.size, 0)
+        recent_plays_cache.load(user_id, result if success else None, version)
+        if not success:
+            return False, result
+        return True, result[offset:offset + limit]
+
+    @staticmethod
+    def _play_history_version(user_id):
+        """
+        Number of plays and newest HistoryID of a listener in PlayHistory
+
+        Both come from ix_playhistory_listener alone, and change whenever any
+        worker records a play or the listener's plays are deleted.
+
+        Args:
+            user_id (int): User's ID
+
+        Returns:
+            tuple: (success: bool, result: tuple/str)
+                result tuple is (plays, newest HistoryID or None)
+        """
+        connection = None
+        try:
+            connection = get_db_connection()
+            cursor = connection.cursor(pymysql.cursors.DictCursor)
+
+            cursor.execute(
+                """
+                SELECT COUNT(ph.HistoryID) AS plays, MAX(ph.HistoryID) AS newest
+                FROM Listener l
+                LEFT JOIN PlayHistory ph ON ph.ListenerID = l.ListenerID
+                WHERE l.UserID = %s
+                """,
+                (user_id,)
+            )
+            row = cursor.fetchone()
+            return True, (row['plays'], row['newest'])
+
+        except pymysql.Error as e:
+            return False, f"Database error: {str(e)}"
+
+        finally:
+            if connection:
+                cursor.close()
+                connection.close()
+
+    @staticmethod
+    def _query_play_history(user_id, limit, offset):
+        """
+        Read a page of play history from the database
+
         Args:
             user_id (int): User's ID
             limit (int): Number of records to return
@@ -291,11 +427,30 @@ class UserService:
                 JOIN Artist ar ON a.ArtistID = ar.ArtistID
                 JOIN User u ON ar.UserID = u.UserID
                 WHERE ph.ListenerID = %s
-                ORDER BY ph.PlayedAt DESC
+                ORDER BY ph.PlayedAt DESC, ph.HistoryID DESC
                 LIMIT %s OFFSET %s
             """
             cursor.execute(query, (listener_id, limit, offset))
-            history = cursor.fetchall()
+            history = list(cursor.fetchall())
+
+            # Months older than the table keeps were archived
+            # (app/users/partitions.py); continue into them past the last row
+            if len(history) < limit and play_history_archive.partitions():
+                cursor.execute(
+                    """
+                    SELECT COUNT(*) AS plays
+                    FROM PlayHistory ph
+                    JOIN Song s ON ph.SongID = s.SongID
+                    JOIN Artwork a ON s.ArtworkID = a.ArtworkID
+                    JOIN Artist ar ON a.ArtistID = ar.ArtistID
+                    JOIN User u ON ar.UserID = u.UserID
+                    WHERE ph.ListenerID = %s
+                    """,
+                    (listener_id,)
+                )
+                skip = max(0, offset - cursor.fetchone()['plays'])
+                archived = play_history_archive.listener_plays(listener_id, skip, limit - len(history))
+                history.extend(_hydrate_archived_plays(cursor, archived))
 
             return True, history
 
@@ -347,6 +502,16 @@ class UserService:
             )
             history_id = cursor.lastrowid
             connection.commit()
+            recommendations.trending_service.record_play(song_id)
+            analytics.unique_listeners_service.record_play(listener_id, song_id)
+
+            if recent_plays_cache.wants(user_id):
+                try:
+                    cursor.execute(_RECENT_PLAY_QUERY, (history_id,))
+                    recent_plays_cache.add(user_id, history_id, cursor.fetchone())
+                except pymysql.Error:
+                    # The play is recorded; the listener's buffer is reloaded instead
+                    recent_plays_cache.forget(user_id)
 
             return True, {'history_id': history_id, 'message': 'Play history recorded'}
 
@@ -0,0 +1,35 @@
+"""
+Support for maintenance jobs run with `python -m ...` from the Backend directory
+
+app.py cannot be imported by name (the `app` package shadows it), so jobs
+build a bare Flask app carrying the same DB_CONFIG to get an app context for
+get_db_connection.
+"""
+import os
+from flask import Flask
+from dotenv import load_dotenv
+
+
+def job_app(name):
+    """
+    Minimal Flask app with the API's database settings
+
+    Args:
+        name (str): Import name of the job module
+
+    Returns:
+        Flask: App to push a context from (`with job_app(__name__).app_context():`)
+    """
+    load_dotenv()
+
+    app = Flask(name)
+    app.config['DB_CONFIG'] = {
+        'host': os.getenv('DB_HOST'),
+        'port': int(os.getenv('DB_PORT', 3306)),
+        'user': os.getenv('DB_USER'),
+        'password': os.getenv('DB_PASSWORD'),
+        'database': os.getenv('DB_NAME'),
+        'ssl_disabled': False,  # Aiven requires SSL
+        'charset': 'utf8mb4'
+    }
+    return app
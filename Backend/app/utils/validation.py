@@ -0,0 +1,184 @@
+"""
+Declarative request validation
+
+Schemas are declared once at import time as a mapping of field name to Field.
+Rules are compiled into closures over precompiled regex patterns and each
+Schema flattens its fields into plain tuples, so validating a request is a
+single pass with no per-call pattern lookups or attribute dispatch.
+
+Usage:
+    REGISTRATION_SCHEMA = Schema({
+        'email': Field(required="Email is required", rules=[
+            matches(r'^[^@]+@[^@]+$', "Invalid email format")
+        ]),
+        'first_name': Field(rules=[
+            max_length(100, "First name must be at most 100 characters")
+        ])
+    })
+
+    is_valid, errors = REGISTRATION_SCHEMA.validate(data)
+"""
+import re
+
+
+# ---------------------------------------------------------------------------
+# Rules
+#
+# A rule is a (test, message) pair. test(value) returns True when the value
+# passes. Rules of a field run in order and the first failing message wins.
+# ---------------------------------------------------------------------------
+
+def min_length(length, message):
+    """Value must have at least `length` items/characters"""
+    return (lambda value: len(value) >= length), message
+
+
+def max_length(length, message):
+    """Value must have at most `length` items/characters"""
+    return (lambda value: len(value) <= length), message
+
+
+def matches(pattern, message, flags=0):
+    """Value must match `pattern` from its start (re.match semantics)"""
+    match = re.compile(pattern, flags).match
+    return (lambda value: match(value) is not None), message
+
+
+def contains(pattern, message, flags=0):
+    """Value must contain `pattern` somewhere (re.search semantics)"""
+    search = re.compile(pattern, flags).search
+    return (lambda value: search(value) is not None), message
+
+
+def min_value(minimum, message):
+    """Value must be an integer (not a bool) no smaller than `minimum`"""
+    return (lambda value: isinstance(value, int) and not isinstance(value, bool) and value >= minimum), message
+
+
+def one_of(choices, message):
+    """Value must be one of `choices`"""
+    allowed = frozenset(choices)
+
+    def test(value):
+        try:
+            return value in allowed
+        except TypeError:
+            # Unhashable JSON values (lists, objects) are never a choice
+            return False
+
+    return test, message
+
+
+def instance_of(types, message):
+    """Value must be an instance of `types`"""
+    return (lambda value: isinstance(value, types)), message
+
+
+def first_error(rules, value):
+    """
+    Run rules against a single value
+
+    Args:
+        rules (sequence): (test, message) pairs
+        value: Value to check
+
+    Returns:
+        str or None: Message of the first failing rule, None if all pass
+    """
+    for test, message in rules:
+        if not test(value):
+            return message
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Fields, checks and schemas
+# ---------------------------------------------------------------------------
+
+class Field:
+    """
+    Declaration of a single request field
+
+    Args:
+        required (str): Error message when the field is missing or empty.
+            Leave as None for optional fields; empty optional fields are skipped.
+        rules (sequence): (test, message) rules applied to non-empty values
+    """
+
+    __slots__ = ('required', 'rules')
+
+    def __init__(self, required=None, rules=()):
+        self.required = required
+        self.rules = tuple(rules)
+
+
+class Check:
+    """
+    Cross-field check run after all fields
+
+    The check is skipped when `key` already has an error from its Field, so a
+    missing value is reported as missing rather than as a mismatch.
+
+    Args:
+        key (str): Key the error is reported under
+        test (callable): test(data) returns True when the request passes
+        message (str): Error message
+    """
+
+    __slots__ = ('key', 'test', 'message')
+
+    def __init__(self, key, test, message):
+        self.key = key
+        self.test = test
+        self.message = message
+
+
+class Schema:
+    """
+    Compiled request schema
+
+    Args:
+        fields (dict): Field name -> Field, validated in declaration order
+        checks (sequence): Check instances run after the fields
+    """
+
+    def __init__(self, fields, checks=()):
+        self.fields = dict(fields)
+        self.checks = tuple(checks)
+
+        # Flatten declarations into plain tuples so validate() does no attribute lookups
+        self._fields = tuple(
+            (name, field.required, field.rules) for name, field in self.fields.items()
+        )
+        self._checks = tuple((check.key, check.test, check.message) for check in self.checks)
+
+    def validate(self, data):
+        """
+        Validate request data, collecting every field's error in one pass
+
+        Args:
+            data (dict): Request data
+
+        Returns:
+            tuple: (bool, dict) - (is_valid, errors_dict)
+        """
+        errors = {}
+        get = data.get
+
+        for name, required, rules in self._fields:
+            value = get(name)
+            if not value:
+                # Missing and empty values only matter for required fields
+                if required is not None:
+                    errors[name] = required
+                continue
+            for test, message in rules:
+                if not test(value):
+                    errors[name] = message
+                    break
+
+        for key, test, message in self._checks:
+            if key not in errors and not test(data):
+                errors[key] = message
+
+        return not errors, errors
@@ -0,0 +1,45 @@
+"""
+Benchmarks for JWT and password helpers in app/auth/utils.py
+"""
+import pytest
+
+from app.auth.utils import (
+    create_jwt_token,
+    decode_jwt_token,
+    hash_password,
+    verify_password,
+    get_current_user_from_token
+)
+from conftest import BENCH_USER
+
+
+PASSWORD = 'BenchPass123'
+
+
+@pytest.fixture(scope='module')
+def password_hash():
+    return hash_password(PASSWORD)
+
+
+def bench_create_jwt_token(benchmark, app_context):
+    benchmark(create_jwt_token, BENCH_USER)
+
+
+def bench_decode_jwt_token(benchmark, app_context, token):
+    payload = benchmark(decode_jwt_token, token)
+    assert payload['sub'] == BENCH_USER['UserID']
+
+
+def bench_get_current_user_from_token(benchmark, app_context, token):
+    user = benchmark(get_current_user_from_token, token)
+    assert user['role'] == BENCH_USER['Role']
+
+
+def bench_hash_password(benchmark):
+    # bcrypt is deliberately slow, a handful of rounds is enough for a stable mean
+    benchmark.pedantic(hash_password, args=(PASSWORD,), rounds=5, iterations=1)
+
+
+def bench_verify_password(benchmark, password_hash):
+    result = benchmark.pedantic(verify_password, args=(PASSWORD, password_hash), rounds=5, iterations=1)
+    assert result is True
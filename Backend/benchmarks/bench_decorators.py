@@ -0,0 +1,51 @@
+"""
+Benchmarks for the per-request auth decorators
+
+Both the app/auth/utils.py and app/utils/decorators.py variants are measured
+so a change to either shows up as a per-request cost.
+"""
+from app.auth import utils as auth_utils
+from app.utils import decorators
+from conftest import protected_view
+
+
+auth_login_required = auth_utils.login_required(protected_view)
+auth_role_required = auth_utils.role_required('Listener', 'Artist')(protected_view)
+
+login_required = decorators.login_required(protected_view)
+listener_required = decorators.listener_required(protected_view)
+role_required = decorators.role_required('Listener', 'Artist')(protected_view)
+guest_optional = decorators.guest_optional(protected_view)
+
+
+def bench_auth_utils_login_required(benchmark, authed_request):
+    benchmark(auth_login_required)
+
+
+def bench_auth_utils_role_required(benchmark, authed_request):
+    benchmark(auth_role_required)
+
+
+def bench_decorators_login_required(benchmark, authed_request):
+    benchmark(login_required)
+
+
+def bench_decorators_listener_required(benchmark, authed_request):
+    benchmark(listener_required)
+
+
+def bench_decorators_role_required(benchmark, authed_request):
+    benchmark(role_required)
+
+
+def bench_decorators_guest_optional_authenticated(benchmark, authed_request):
+    benchmark(guest_optional)
+
+
+def bench_decorators_guest_optional_anonymous(benchmark, anonymous_request):
+    benchmark(guest_optional)
+
+
+def bench_decorators_login_required_rejected(benchmark, anonymous_request):
+    response, status = benchmark(login_required)
+    assert status == 401
@@ -0,0 +1,147 @@
+"""
+Benchmarks for typo-tolerant search (app/search/fuzzy.py and SearchIndex)
+
+A SearchIndex over a synthetic catalog of FUZZY_BENCH_NAMES names (1M by
+default) is built once per session. bench_trigram_build records the catalog
+and trigram index sizes in its extra_info; the search benchmarks time single
+misspelled queries against the full index and record how often the intended
+name came back in the top 10.
+"""
+import os
+import time
+import random
+import tracemalloc
+import pytest
+
+from app.search.index import SearchIndex
+from app.search.fuzzy import TrigramIndex, edit_distance
+
+
+NAMES = int(os.getenv('FUZZY_BENCH_NAMES', 1000000))
+
+_ONSETS = ['', 'b', 'c', 'ch', 'd', 'g', 'h', 'k', 'l', 'm', 'n', 'ng', 'ph', 'r', 's', 't', 'th', 'tr', 'v', 'x']
+_VOWELS = ['a', 'e', 'i', 'o', 'u', 'y', 'ai', 'ao', 'ea', 'ie', 'ou', 'uy']
+_CODAS = ['', '', 'n', 'ng', 'm', 't', 'c', 'nh', 'r', 's']
+_LETTERS = 'abcdeghiklmnoprstuvy'
+
+
+def _catalog(count, seed=7):
+    """Names of one to four pronounceable words drawn from a 200k word vocabulary"""
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < 200000:
+        words.add(''.join(
+            rng.choice(_ONSETS) + rng.choice(_VOWELS) + rng.choice(_CODAS) for _ in range(rng.randint(1, 4))
+        ))
+    words = sorted(words)
+    return [' '.join(rng.choice(words) for _ in range(rng.randint(1, 4))).title() for _ in range(count)]
+
+
+def _misspell(name, rng, typos):
+    """name with `typos` words of five letters or more changed by one substitution, deletion, insertion or swap"""
+    words = name.lower().split()
+    long_words = [i for i, word in enumerate(words) if len(word) >= 5]
+    for position in rng.sample(long_words, min(typos, len(long_words))):
+        chars = list(words[position])
+        i = rng.randrange(1, len(chars) - 1)
+        operation = rng.choice(('substitute', 'delete', 'insert', 'swap'))
+        if operation == 'substitute':
+            chars[i] = rng.choice(_LETTERS.replace(chars[i], ''))
+        elif operation == 'delete':
+            del chars[i]
+        elif operation == 'insert':
+            chars.insert(i, rng.choice(_LETTERS))
+        else:
+            chars[i - 1], chars[i] = chars[i], chars[i - 1]
+        words[position] = ''.join(chars)
+    return ' '.join(words)
+
+
+@pytest.fixture(scope='session')
+def catalog():
+    return _catalog(NAMES)
+
+
+@pytest.fixture(scope='session')
+def built(catalog):
+    """(SearchIndex over the catalog, seconds it took to build)"""
+    started = time.perf_counter()
+    index = SearchIndex().load(
+        {'kind': 'song', 'id': i, 'title': name, 'subtitle': None, 'fields': {'title': name}, 'plays': i % 1000}
+        for i, name in enumerate(catalog)
+    )
+    return index, time.perf_counter() - started
+
+
+def _queries(catalog, typos, count=200, seed=11):
+    """Misspelled names with enough long words, paired with their catalog position"""
+    rng = random.Random(seed)
+    queries = []
+    while len(queries) < count:
+        position = rng.randrange(len(catalog))
+        name = catalog[position]
+        if sum(1 for word in name.split() if len(word) >= 5) >= typos:
+            queries.append((_misspell(name, rng, typos), position))
+    return queries
+
+
+def _bench_search(benchmark, index, queries):
+    state = {'next': 0}
+
+    def run():
+        query, _ = queries[state['next'] % len(queries)]
+        state['next'] += 1
+        return index.search(query, limit=10)
+
+    benchmark.pedantic(run, rounds=len(queries), iterations=1)
+
+    found = sum(1 for query, position in queries if position in {hit['id'] for hit in index.search(query, limit=10)})
+    benchmark.extra_info['recall_at_10'] = round(found / len(queries), 3)
+
+
+def bench_trigram_build(benchmark, built, catalog):
+    index, seconds = built
+    vocabulary = list(index._term_ids)
+
+    tracemalloc.start()
+    trigrams = TrigramIndex()
+    for word in vocabulary:
+        trigrams.add(word)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    benchmark.extra_info.update({
+        'names': len(catalog),
+        'search_index_build_seconds': round(seconds, 1),
+        **trigrams.get_stats(),
+        'trigram_index_traced_mb': round(memory / 2 ** 20, 1)
+    })
+
+    def build():
+        fresh = TrigramIndex()
+        for word in vocabulary:
+            fresh.add(word)
+
+    benchmark.pedantic(build, rounds=3, iterations=1)
+
+
+def bench_search_exact(benchmark, built, catalog):
+    _bench_search(benchmark, built[0], _queries(catalog, typos=0))
+
+
+def bench_search_one_typo(benchmark, built, catalog):
+    _bench_search(benchmark, built[0], _queries(catalog, typos=1))
+
+
+def bench_search_two_typos(benchmark, built, catalog):
+    _bench_search(benchmark, built[0], _queries(catalog, typos=2))
+
+
+def bench_search_no_match(benchmark, built):
+    result = benchmark(built[0].search, 'qwxzj', limit=10)
+    assert result == []
+
+
+def bench_edit_distance(benchmark):
+    distance = benchmark(edit_distance, 'tugn', 'tung', limit=1)
+    assert distance == 1
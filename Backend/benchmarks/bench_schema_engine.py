@@ -0,0 +1,79 @@
+"""
+Compiled schemas (app/utils/validation.py) against the hand-written validators
+they replaced (legacy_schemas.py)
+
+Each case first checks both implementations agree on every sample input, then
+benchmarks them side by side in the same group.
+"""
+import pytest
+
+import legacy_schemas
+from app.auth import schemas as auth_schemas
+from app.users import schemas as users_schemas
+
+
+CASES = {
+    'validate_registration_data': (auth_schemas, [
+        {'email': 'bench.user@example.com', 'password': 'BenchPass123', 'username': 'bench_user',
+         'first_name': 'Bench', 'last_name': 'User', 'role': 'Listener'},
+        {'email': 'not-an-email', 'password': 'weak', 'username': '1bad', 'role': 'Admin',
+         'first_name': 'x' * 101},
+        {},
+    ]),
+    'validate_login_data': (auth_schemas, [
+        {'email': 'bench.user@example.com', 'password': 'BenchPass123'},
+        {'username': 'bench_user'},
+        {'password': ''},
+    ]),
+    'validate_profile_update_data': (auth_schemas, [
+        {'email': 'bench.user@example.com', 'username': 'new_name', 'first_name': 'New'},
+        {'email': 'bad@', 'username': 'ab', 'last_name': 'y' * 101},
+    ]),
+    'validate_password_change_data': (auth_schemas, [
+        {'current_password': 'OldPass123', 'new_password': 'NewPass456', 'confirm_password': 'NewPass456'},
+        {'current_password': 'OldPass123', 'new_password': 'nodigits', 'confirm_password': 'other'},
+        {'new_password': 'NewPass456'},
+    ]),
+    'validate_preferences_update': (users_schemas, [
+        {'preference': 'Late night lo-fi', 'favorite_genre': 'Jazz'},
+        {'preference': 123, 'favorite_genre': 'g' * 101},
+        {'other': True},
+    ]),
+}
+
+IMPLEMENTATIONS = ['compiled', 'legacy']
+
+
+def _resolve(name, implementation):
+    module, _ = CASES[name]
+    return getattr(module if implementation == 'compiled' else legacy_schemas, name)
+
+
+@pytest.mark.parametrize('implementation', IMPLEMENTATIONS)
+@pytest.mark.parametrize('name', list(CASES))
+def bench_schema(benchmark, name, implementation):
+    benchmark.group = name
+    _, samples = CASES[name]
+    validator = _resolve(name, implementation)
+
+    for sample in samples:
+        assert validator(sample) == _resolve(name, 'legacy')(sample)
+
+    def run():
+        for sample in samples:
+            validator(sample)
+
+    benchmark(run)
+
+
+@pytest.mark.parametrize('implementation', IMPLEMENTATIONS)
+@pytest.mark.parametrize('name,value', [
+    ('validate_email', 'bench.user@example.com'),
+    ('validate_password', 'BenchPass123'),
+    ('validate_username', 'bench_user'),
+])
+def bench_field_validator(benchmark, name, value, implementation):
+    benchmark.group = name
+    validator = getattr(auth_schemas if implementation == 'compiled' else legacy_schemas, name)
+    assert validator(value) == getattr(legacy_schemas, name)(value)
+    benchmark(validator, value)
@@ -0,0 +1,69 @@
+"""
+Benchmarks for request validators in app/auth/schemas.py and app/users/schemas.py
+"""
+from app.auth.schemas import (
+    validate_email,
+    validate_password,
+    validate_username,
+    validate_registration_data,
+    validate_login_data,
+    validate_profile_update_data,
+    validate_password_change_data
+)
+from app.users.schemas import validate_preferences_update
+
+
+REGISTRATION = {
+    'email': 'bench.user@example.com',
+    'password': 'BenchPass123',
+    'username': 'bench_user',
+    'first_name': 'Bench',
+    'last_name': 'User',
+    'role': 'Listener'
+}
+
+INVALID_REGISTRATION = {
+    'email': 'not-an-email',
+    'password': 'weak',
+    'username': '1bad',
+    'role': 'Admin'
+}
+
+
+def bench_validate_email(benchmark):
+    assert benchmark(validate_email, REGISTRATION['email'])
+
+
+def bench_validate_password(benchmark):
+    assert benchmark(validate_password, REGISTRATION['password'])[0]
+
+
+def bench_validate_username(benchmark):
+    assert benchmark(validate_username, REGISTRATION['username'])[0]
+
+
+def bench_validate_registration_data(benchmark):
+    assert benchmark(validate_registration_data, REGISTRATION)[0]
+
+
+def bench_validate_registration_data_invalid(benchmark):
+    assert not benchmark(validate_registration_data, INVALID_REGISTRATION)[0]
+
+
+def bench_validate_login_data(benchmark):
+    assert benchmark(validate_login_data, {'email': REGISTRATION['email'], 'password': 'x'})[0]
+
+
+def bench_validate_profile_update_data(benchmark):
+    data = {'email': REGISTRATION['email'], 'username': 'new_name', 'first_name': 'New'}
+    assert benchmark(validate_profile_update_data, data)[0]
+
+
+def bench_validate_password_change_data(benchmark):
+    data = {'current_password': 'OldPass123', 'new_password': 'NewPass456', 'confirm_password': 'NewPass456'}
+    assert benchmark(validate_password_change_data, data)[0]
+
+
+def bench_validate_preferences_update(benchmark):
+    data = {'preference': 'Late night lo-fi', 'favorite_genre': 'Jazz'}
+    assert benchmark(validate_preferences_update, data)[0]
@@ -0,0 +1,113 @@
+"""
+Benchmarks for trending charts (app/recommendations/trending.py)
+
+A synthetic day of plays (TRENDING_BENCH_PLAYS, 1M by default, over 100k
+songs with Zipf-like popularity) is generated once per session. The ingest
+benchmarks time recording one second of traffic at 10k plays per second
+into the three windows TrendingService keeps; the accuracy benchmark
+compares the 24h chart with exact counts, records top-50 recall and the
+largest count error in its extra_info, and fails when the reported lower
+bounds do not hold or recall or error are worse than the limits below.
+"""
+import os
+import random
+import pytest
+from collections import Counter
+
+from app.recommendations.trending import SlidingTopK
+from app.recommendations.services import TRENDING_WINDOWS
+
+
+PLAYS = int(os.getenv('TRENDING_BENCH_PLAYS', 1000000))
+SONGS = 100000
+PLAYS_PER_SECOND = 10000
+DAY = 86400
+START = 1699920000    # midnight UTC, so one day of plays fills exactly 24 hourly buckets
+
+# Accuracy the 24h chart must keep on the synthetic day
+MIN_RECALL_AT_50 = 0.9
+MAX_RELATIVE_ERROR = 0.05
+
+
+def _windows():
+    return {name: SlidingTopK(span, buckets) for name, (span, buckets) in TRENDING_WINDOWS.items()}
+
+
+def _plays_per_second(benchmark):
+    # No stats are collected under --benchmark-disable
+    if benchmark.stats:
+        benchmark.extra_info['plays_per_second'] = round(PLAYS_PER_SECOND / benchmark.stats.stats.mean)
+
+
+def _record(windows, plays):
+    for song_id, timestamp in plays:
+        for window in windows.values():
+            window.add(song_id, timestamp)
+
+
+@pytest.fixture(scope='session')
+def day_of_plays():
+    """(SongID, timestamp) pairs spread evenly over one day, song popularity ~ 1 / rank"""
+    rng = random.Random(3)
+    weights = [1 / rank for rank in range(1, SONGS + 1)]
+    songs = rng.choices(range(1, SONGS + 1), weights=weights, k=PLAYS)
+    step = DAY / PLAYS
+    return [(song_id, START + i * step) for i, song_id in enumerate(songs)]
+
+
+@pytest.fixture(scope='session')
+def filled(day_of_plays):
+    windows = _windows()
+    _record(windows, day_of_plays)
+    return windows
+
+
+def bench_record_one_second(benchmark, day_of_plays):
+    """10k plays (one second at 10k plays/s) into fresh 1h, 24h and 7d windows"""
+    second = [(song_id, START + i / PLAYS_PER_SECOND) for i, (song_id, _) in enumerate(day_of_plays[:PLAYS_PER_SECOND])]
+
+    def run():
+        _record(_windows(), second)
+
+    benchmark.pedantic(run, rounds=20, iterations=1)
+    _plays_per_second(benchmark)
+
+
+def bench_record_full_windows(benchmark, filled, day_of_plays):
+    """10k plays into windows that already hold a day of plays (every bucket at capacity)"""
+    state = {'next': START + DAY}
+
+    def run():
+        timestamp = state['next']
+        state['next'] += 1
+        _record(filled, ((song_id, timestamp) for song_id, _ in day_of_plays[:PLAYS_PER_SECOND]))
+
+    benchmark.pedantic(run, rounds=20, iterations=1)
+    _plays_per_second(benchmark)
+
+
+def bench_chart_accuracy(benchmark, day_of_plays):
+    """Top 50 of the 24h window against exact counts; times merging its 24 buckets"""
+    window = SlidingTopK(*TRENDING_WINDOWS['24h'])
+    for song_id, timestamp in day_of_plays:
+        window.add(song_id, timestamp)
+    now = day_of_plays[-1][1]
+
+    top, total = benchmark(window.top, 50, now)
+
+    exact = Counter(song_id for song_id, timestamp in day_of_plays if timestamp > now - DAY)
+    expected = {song_id for song_id, _ in exact.most_common(50)}
+    recall = len(expected & {song_id for song_id, _, _ in top}) / 50
+    max_error = max(abs(count - exact[song_id]) / exact[song_id] for song_id, count, _ in top)
+    lower_bounds_hold = all(count - error <= exact[song_id] for song_id, count, error in top)
+    benchmark.extra_info.update({
+        'plays': total,
+        'recall_at_50': recall,
+        'max_relative_error': round(max_error, 4),
+        'lower_bounds_hold': lower_bounds_hold
+    })
+
+    assert total == sum(exact.values())
+    assert lower_bounds_hold
+    assert recall >= MIN_RECALL_AT_50
+    assert max_error <= MAX_RELATIVE_ERROR
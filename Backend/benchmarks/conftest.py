@@ -0,0 +1,55 @@
+"""
+Shared fixtures for the microbenchmark suite
+"""
+import pytest
+from flask import Flask, jsonify
+
+from app.auth.utils import create_jwt_token
+
+
+BENCH_SECRET = 'bench-secret-not-for-production'
+
+BENCH_USER = {
+    'UserID': 42,
+    'Username': 'benchuser',
+    'Role': 'Listener'
+}
+
+
+@pytest.fixture(scope='session')
+def app():
+    """Minimal Flask app carrying only the config the auth helpers read"""
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = BENCH_SECRET
+    return app
+
+
+@pytest.fixture
+def app_context(app):
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture(scope='session')
+def token(app):
+    with app.app_context():
+        return create_jwt_token(BENCH_USER)
+
+
+@pytest.fixture
+def authed_request(app, token):
+    """Push a request context carrying a valid Bearer token"""
+    with app.test_request_context(headers={'Authorization': f'Bearer {token}'}):
+        yield
+
+
+@pytest.fixture
+def anonymous_request(app):
+    """Push a request context without an Authorization header"""
+    with app.test_request_context():
+        yield
+
+
+def protected_view(user_id=None):
+    """Trivial view so decorator overhead dominates the measurement"""
+    return jsonify({'user_id': user_id})
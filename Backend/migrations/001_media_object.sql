@@ -0,0 +1,20 @@
+-- Media objects uploaded directly to S3 through presigned URLs.
+-- A row is created as 'Pending' when the URL is issued and becomes 'Ready'
+-- once the completion callback has validated the stored object.
+
+CREATE TABLE IF NOT EXISTS MediaObject (
+    MediaID INT AUTO_INCREMENT PRIMARY KEY,
+    UserID INT NOT NULL,
+    ObjectKey VARCHAR(512) NOT NULL,
+    ContentType VARCHAR(100) NOT NULL,
+    DeclaredSize BIGINT NOT NULL,
+    SizeBytes BIGINT NULL,
+    ETag VARCHAR(100) NULL,
+    UploadID VARCHAR(255) NULL,
+    Status ENUM('Pending', 'Ready') NOT NULL DEFAULT 'Pending',
+    CreatedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CompletedAt DATETIME NULL,
+    UNIQUE KEY uq_mediaobject_key (ObjectKey),
+    KEY ix_mediaobject_user (UserID, Status),
+    CONSTRAINT fk_mediaobject_user FOREIGN KEY (UserID) REFERENCES User (UserID) ON DELETE CASCADE
+);
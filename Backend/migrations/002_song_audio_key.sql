@@ -0,0 +1,3 @@
+-- S3 key of each song's audio file, read by GET /api/songs/<id>/stream.
+
+ALTER TABLE Song ADD COLUMN AudioKey VARCHAR(512) NULL;
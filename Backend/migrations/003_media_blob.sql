@@ -0,0 +1,22 @@
+-- Content-addressed media: one S3 object per distinct SHA-256 digest, stored
+-- under cas/<digest[:2]>/<digest>. Every upload that resolves to a blob adds a
+-- MediaBlobRef row; the object is deleted only when its last reference goes.
+
+CREATE TABLE IF NOT EXISTS MediaBlob (
+    Digest CHAR(64) NOT NULL PRIMARY KEY,
+    ObjectKey VARCHAR(512) NOT NULL,
+    SizeBytes BIGINT NOT NULL,
+    ContentType VARCHAR(100) NOT NULL,
+    CreatedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS MediaBlobRef (
+    RefID INT AUTO_INCREMENT PRIMARY KEY,
+    Digest CHAR(64) NOT NULL,
+    UserID INT NOT NULL,
+    CreatedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    KEY ix_mediablobref_digest (Digest),
+    KEY ix_mediablobref_user (UserID),
+    CONSTRAINT fk_mediablobref_blob FOREIGN KEY (Digest) REFERENCES MediaBlob (Digest),
+    CONSTRAINT fk_mediablobref_user FOREIGN KEY (UserID) REFERENCES User (UserID) ON DELETE CASCADE
+);
@@ -0,0 +1,15 @@
+-- Media details read from file headers at upload time (services/media_probe.py),
+-- so nothing has to download the file again to learn its length or quality.
+-- Columns stay NULL when the container does not carry the value up front.
+
+ALTER TABLE MediaObject
+    ADD COLUMN MediaFormat VARCHAR(20) NULL,
+    ADD COLUMN DurationSeconds DECIMAL(10, 3) NULL,
+    ADD COLUMN BitrateBps INT NULL,
+    ADD COLUMN SampleRateHz INT NULL;
+
+ALTER TABLE MediaBlob
+    ADD COLUMN MediaFormat VARCHAR(20) NULL,
+    ADD COLUMN DurationSeconds DECIMAL(10, 3) NULL,
+    ADD COLUMN BitrateBps INT NULL,
+    ADD COLUMN SampleRateHz INT NULL;
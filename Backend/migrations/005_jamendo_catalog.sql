@@ -0,0 +1,38 @@
+-- Local copy of the Jamendo catalog, filled by app/songs/ingest.py.
+-- Imported rows are keyed by their Jamendo ID so re-syncs update them in place.
+-- Imported artists have no user account, so Artist.UserID becomes optional.
+-- Tracks without an album get their own Artwork with JamendoID 'track-<id>'.
+
+ALTER TABLE Artist
+    MODIFY COLUMN UserID INT NULL,
+    ADD COLUMN JamendoID INT NULL,
+    ADD COLUMN JamendoName VARCHAR(255) NULL,
+    ADD UNIQUE KEY ux_artist_jamendo (JamendoID);
+
+ALTER TABLE Artwork
+    ADD COLUMN JamendoID VARCHAR(32) NULL,
+    ADD COLUMN JamendoImageURL VARCHAR(512) NULL,
+    ADD COLUMN JamendoReleaseDate DATE NULL,
+    ADD UNIQUE KEY ux_artwork_jamendo (JamendoID);
+
+ALTER TABLE Song
+    ADD COLUMN JamendoID INT NULL,
+    ADD COLUMN JamendoAudioURL VARCHAR(512) NULL,
+    ADD COLUMN JamendoLicenseURL VARCHAR(255) NULL,
+    ADD COLUMN JamendoGenres VARCHAR(255) NULL,
+    ADD COLUMN JamendoSyncedAt DATETIME NULL,
+    ADD UNIQUE KEY ux_song_jamendo (JamendoID);
+
+-- Resume point of each ingestion mode. NextOffset is the first catalog page
+-- not yet stored; Watermark is the newest release date seen by the last
+-- completed run, where the next incremental run starts.
+CREATE TABLE IF NOT EXISTS CatalogSync (
+    Source VARCHAR(32) NOT NULL,
+    Mode VARCHAR(16) NOT NULL,
+    NextOffset INT NOT NULL DEFAULT 0,
+    Watermark DATE NULL,
+    RangeStart DATE NULL,
+    RangeEnd DATE NULL,
+    UpdatedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (Source, Mode)
+);
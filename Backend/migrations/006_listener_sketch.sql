@@ -0,0 +1,14 @@
+-- Unique-listener counts kept as HyperLogLog sketches (app/analytics/hll.py).
+-- One row per song or artist per day, and one per month (Day = the 1st) so
+-- long ranges merge a few monthly sketches instead of every day. Sketches are
+-- at most 4 KB and rows are only ever merged into, never overwritten.
+
+CREATE TABLE IF NOT EXISTS ListenerSketch (
+    Kind ENUM('song', 'artist') NOT NULL,
+    EntityID INT NOT NULL,
+    Granularity ENUM('day', 'month') NOT NULL,
+    Day DATE NOT NULL,
+    Registers VARBINARY(4097) NOT NULL,
+    UpdatedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (Kind, EntityID, Granularity, Day)
+);
@@ -0,0 +1,38 @@
+-- Plays, listening time and skips per song and per artwork, by hour and by
+-- day, maintained by app/analytics/rollups.py from PlayHistory. Artist
+-- analytics read only these tables. ArtistID is copied in so an artist's
+-- rows are found without joining the catalog.
+-- A skip is a play that stopped within its first 30 seconds (or before the
+-- end of a shorter song).
+
+CREATE TABLE IF NOT EXISTS SongPlayRollup (
+    SongID INT NOT NULL,
+    Granularity ENUM('hour', 'day') NOT NULL,
+    PeriodStart DATETIME NOT NULL,
+    ArtistID INT NOT NULL,
+    Plays INT NOT NULL DEFAULT 0,
+    ListenSeconds BIGINT NOT NULL DEFAULT 0,
+    Skips INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (SongID, Granularity, PeriodStart),
+    KEY ix_songplayrollup_artist (ArtistID, Granularity, PeriodStart)
+);
+
+CREATE TABLE IF NOT EXISTS ArtworkPlayRollup (
+    ArtworkID INT NOT NULL,
+    Granularity ENUM('hour', 'day') NOT NULL,
+    PeriodStart DATETIME NOT NULL,
+    ArtistID INT NOT NULL,
+    Plays INT NOT NULL DEFAULT 0,
+    ListenSeconds BIGINT NOT NULL DEFAULT 0,
+    Skips INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (ArtworkID, Granularity, PeriodStart),
+    KEY ix_artworkplayrollup_artist (ArtistID, Granularity, PeriodStart)
+);
+
+-- Last PlayHistory row folded into the rollups, moved in the same
+-- transaction as the rollup rows it produced
+CREATE TABLE IF NOT EXISTS RollupWatermark (
+    Name VARCHAR(32) NOT NULL PRIMARY KEY,
+    LastHistoryID BIGINT NOT NULL DEFAULT 0,
+    UpdatedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
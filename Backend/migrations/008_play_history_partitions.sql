@@ -0,0 +1,37 @@
+-- Monthly range partitions of PlayHistory on PlayedAt, so queries for recent
+-- plays read only recent partitions and old months can be archived and
+-- dropped whole (app/users/partitions.py).
+--
+-- MySQL requires the partitioning column in every unique key, and
+-- partitioned InnoDB tables cannot have foreign keys. The primary key becomes
+-- (HistoryID, PlayedAt) and the foreign keys to Listener and Song are
+-- dropped (their indexes stay); AuthService.delete_user deletes an
+-- account's plays itself instead of relying on the cascade.
+--
+-- Everything before the migration lands in p_start. After applying it, run
+--     python -m app.users.partitions
+-- to split p_future into monthly partitions; run it again monthly (cron).
+
+SET @drop_foreign_keys = (
+    SELECT GROUP_CONCAT(CONCAT('DROP FOREIGN KEY `', CONSTRAINT_NAME, '`') SEPARATOR ', ')
+    FROM information_schema.TABLE_CONSTRAINTS
+    WHERE TABLE_SCHEMA = DATABASE()
+      AND TABLE_NAME = 'PlayHistory'
+      AND CONSTRAINT_TYPE = 'FOREIGN KEY'
+);
+SET @statement = IF(@drop_foreign_keys IS NULL, 'DO 0', CONCAT('ALTER TABLE PlayHistory ', @drop_foreign_keys));
+PREPARE drop_foreign_keys FROM @statement;
+EXECUTE drop_foreign_keys;
+DEALLOCATE PREPARE drop_foreign_keys;
+
+ALTER TABLE PlayHistory
+    MODIFY PlayedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (HistoryID, PlayedAt),
+    ADD KEY ix_playhistory_listener (ListenerID, PlayedAt);
+
+ALTER TABLE PlayHistory
+    PARTITION BY RANGE COLUMNS (PlayedAt) (
+        PARTITION p_start VALUES LESS THAN ('2026-11-01'),
+        PARTITION p_future VALUES LESS THAN (MAXVALUE)
+    );
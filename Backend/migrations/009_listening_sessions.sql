@@ -0,0 +1,18 @@
+-- Listening sessions: runs of a listener's plays without a pause longer than
+-- 30 minutes, summarized by app/analytics/sessions.py from PlayHistory (its
+-- watermark is the 'listening_sessions' row of RollupWatermark, see 007).
+-- A skip stopped within 30 seconds (or before the end of a shorter song); a
+-- completion lasted at least 90% of Song.Duration.
+
+CREATE TABLE IF NOT EXISTS ListeningSession (
+    SessionID BIGINT AUTO_INCREMENT PRIMARY KEY,
+    ListenerID INT NOT NULL,
+    StartedAt DATETIME NOT NULL,
+    LastPlayedAt DATETIME NOT NULL,
+    Plays INT NOT NULL DEFAULT 0,
+    ListenSeconds BIGINT NOT NULL DEFAULT 0,
+    Skips INT NOT NULL DEFAULT 0,
+    Completions INT NOT NULL DEFAULT 0,
+    KEY ix_listeningsession_listener (ListenerID, LastPlayedAt),
+    KEY ix_listeningsession_started (StartedAt)
+);
@@ -0,0 +1,5 @@
+-- Index for the Song.AudioKey lookups of the media garbage collector
+-- (app/uploads/gc.py), which checks each page of up to 1000 listed S3 keys
+-- with AudioKey IN (...); without it every page scans the whole Song table.
+
+ALTER TABLE Song ADD KEY ix_song_audiokey (AudioKey);
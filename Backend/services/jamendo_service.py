@@ -1,22 +1,178 @@
 import os
+import time
+import random
+import tempfile
+import threading
 import requests
+from collections import Counter
+from requests.adapters import HTTPAdapter
 from typing import Optional, Dict, List
+from services.metrics import LatencyRecorder
+from services.response_cache import ResponseCache
+
+# Status codes worth retrying: rate limited or a transient server-side failure
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Most track IDs sent in one /tracks request
+ID_BATCH_SIZE = 100
+
+# Largest page the /tracks endpoint returns
+MAX_PAGE_SIZE = 200
+
 
 class JamendoService:
-    def __init__(self):
+    """
+    Jamendo API client on a shared keep-alive session
+
+    All calls go through one requests.Session whose HTTPAdapter keeps up to
+    `pool_size` connections per host alive, so repeated calls skip the TCP
+    and TLS handshakes. Connection errors, timeouts, 429 and 5xx responses
+    are retried with full-jitter exponential backoff (honouring Retry-After)
+    within an overall deadline per call.
+
+    Search and genre listings are answered from a ResponseCache (memory LRU
+    over SQLite) with per-endpoint TTLs and stale-while-revalidate.
+    """
+
+    def __init__(self, session=None, pool_size=None, max_retries=None, backoff_base=None,
+                 backoff_max=None, connect_timeout=None, read_timeout=None, deadline=None,
+                 cache=None):
         self.base_url = os.getenv('JAMENDO_API_BASEURL', 'https://api.jamendo.com/v3.0')
         self.client_id = os.getenv('JAMENDO_CLIENT_ID', 'f72ed6e5')
         
         if not self.client_id:
             raise ValueError("JAMENDO_CLIENT_ID environment variable is required")
+
+        self.pool_size = pool_size or int(os.getenv('JAMENDO_POOL_SIZE', 20))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv('JAMENDO_MAX_RETRIES', 3))
+        self.backoff_base = backoff_base if backoff_base is not None else float(os.getenv('JAMENDO_BACKOFF_BASE', 0.25))
+        self.backoff_max = backoff_max if backoff_max is not None else float(os.getenv('JAMENDO_BACKOFF_MAX', 4))
+        self.timeout = (
+            connect_timeout or float(os.getenv('JAMENDO_CONNECT_TIMEOUT', 3.05)),
+            read_timeout or float(os.getenv('JAMENDO_READ_TIMEOUT', 10))
+        )
+        # Total time budget of one call, retries and backoff included
+        self.deadline = deadline or float(os.getenv('JAMENDO_DEADLINE', 20))
+
+        self.session = session or self._build_session()
+        self.cache = cache or self._build_cache()
+
+        self.latency = LatencyRecorder()
+        self._stats_lock = threading.Lock()
+        self._counters = Counter()
+
+    def _build_session(self):
+        session = requests.Session()
+        # Retries are done in _get so they can back off with jitter and be counted
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size, max_retries=0, pool_block=True)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({'Accept': 'application/json', 'Accept-Encoding': 'gzip, deflate'})
+        return session
+
+    @staticmethod
+    def _build_cache():
+        return ResponseCache(
+            path=os.getenv('JAMENDO_CACHE_PATH') or os.path.join(tempfile.gettempdir(), 'jamendo-cache.sqlite3'),
+            ttls={
+                'search': int(os.getenv('JAMENDO_CACHE_SEARCH_TTL', 600)),
+                'genre': int(os.getenv('JAMENDO_CACHE_GENRE_TTL', 3600)),
+                'track': int(os.getenv('JAMENDO_CACHE_TRACK_TTL', 21600)),
+            },
+            stale_ttl=int(os.getenv('JAMENDO_CACHE_STALE_TTL', 86400)),
+            memory_entries=int(os.getenv('JAMENDO_CACHE_MEMORY_ENTRIES', 1024))
+        )
+
+    def _count(self, *names):
+        with self._stats_lock:
+            for name in names:
+                self._counters[name] += 1
+
+    def _backoff(self, attempt, response=None):
+        """Seconds to wait before retry number `attempt` (1-based)"""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max)
+        # Full jitter: spreads retries of concurrent callers instead of synchronising them
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _get(self, endpoint: str, params: Dict, timeout=None) -> Optional[Dict]:
+        """
+        GET a Jamendo endpoint, retrying transient failures
+
+        Args:
+            endpoint: Path below the API base URL (e.g. 'tracks')
+            params: Query parameters, client_id and format are added
+            timeout: (connect, read) seconds for each attempt (default from config)
+
+        Returns:
+            dict or None: Decoded JSON, or None once retries are exhausted
+        """
+        params = {'client_id': self.client_id, 'format': 'json', **params}
+        url = f"{self.base_url}/{endpoint}/"
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+
+        while True:
+            response = None
+            started = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, timeout=timeout or self.timeout)
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    data = response.json()
+                    self.latency.record(endpoint, time.perf_counter() - started)
+                    self._count('requests')
+                    return data
+                error = requests.exceptions.HTTPError(
+                    f"{response.status_code} Server Error for url: {response.url}", response=response
+                )
+                retryable = True
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error, retryable = e, True
+            except (requests.exceptions.RequestException, ValueError) as e:
+                error, retryable = e, False
+
+            self.latency.record(endpoint, time.perf_counter() - started, error=True)
+            self._count('requests', 'errors')
+
+            attempt += 1
+            wait = self._backoff(attempt, response) if retryable else 0
+            if not retryable or attempt > self.max_retries or time.monotonic() + wait >= deadline:
+                self._count('failures')
+                print(f"Error calling Jamendo API: {error}")
+                return None
+
+            self._count('retries')
+            time.sleep(wait)
+
+    def get_stats(self) -> Dict:
+        """
+        Call counters and per-endpoint latency for monitoring
+
+        Returns:
+            dict: requests, errors, retries and failures (calls that gave up),
+                pool size, latency per endpoint (see LatencyRecorder.snapshot)
+                and response cache counters (see ResponseCache.get_stats)
+        """
+        with self._stats_lock:
+            counters = dict(self._counters)
+        return {
+            'requests': counters.get('requests', 0),
+            'errors': counters.get('errors', 0),
+            'retries': counters.get('retries', 0),
+            'failures': counters.get('failures', 0),
+            'pool_size': self.pool_size,
+            'endpoints': self.latency.snapshot(),
+            'cache': self.cache.get_stats()
+        }
     
-    def search_tracks(self, query: str, limit: int = 20, offset: int = 0) -> Optional[Dict]:
+    def search_tracks(self, query: str, limit: int = 20, offset: int = 0, timeout=None) -> Optional[Dict]:
         """
         Search for tracks on Jamendo
         """
         params = {
-            'client_id': self.client_id,
-            'format': 'json',
             'search': query,
             'limit': limit,
             'offset': offset,
@@ -24,45 +180,59 @@ class JamendoService:
             'audioformat': 'mp32'    # Get MP3 audio format
         }
         
-        try:
-            response = requests.get(f"{self.base_url}/tracks/", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            print(f"Error calling Jamendo API: {e}")
-            return None
+        return self.cache.get_or_fetch('search', params, lambda: self._get('tracks', params, timeout))
     
-    def get_track_by_id(self, track_id: str) -> Optional[Dict]:
+    def get_track_by_id(self, track_id: str, timeout=None) -> Optional[Dict]:
         """
         Get a specific track by Jamendo ID
         """
-        params = {
-            'client_id': self.client_id,
-            'format': 'json',
-            'id': track_id,
-            'include': 'musicinfo',
-            'audioformat': 'mp32'
-        }
-        
-        try:
-            response = requests.get(f"{self.base_url}/tracks/", params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data.get('results') and len(data['results']) > 0:
-                return data['results'][0]
-            return None
-        except requests.exceptions.RequestException as e:
-            print(f"Error calling Jamendo API: {e}")
-            return None
+        return self.get_tracks_by_ids([track_id], timeout).get(str(track_id))
+    
+    def get_tracks_by_ids(self, track_ids: List[str], timeout=None) -> Dict[str, Dict]:
+        """
+        Get many tracks by Jamendo ID with as few requests as possible
+
+        IDs already in the per-track cache are not requested again. The rest
+        are sent through the `id` list parameter, ID_BATCH_SIZE per request.
+
+        Args:
+            track_ids: Jamendo track IDs (duplicates are fine)
+            timeout: (connect, read) seconds per attempt
+
+        Returns:
+            dict: track ID (str) -> Jamendo track. Unknown IDs, and IDs whose
+                batch failed, are left out.
+        """
+        tracks = {}
+        missing = []
+        for track_id in dict.fromkeys(str(track_id) for track_id in track_ids):
+            cached = self.cache.get('track', {'id': track_id})
+            if cached is not None:
+                tracks[track_id] = cached
+            else:
+                missing.append(track_id)
+
+        for start in range(0, len(missing), ID_BATCH_SIZE):
+            batch = missing[start:start + ID_BATCH_SIZE]
+            params = {
+                'id': ' '.join(batch),  # sent as id=1+2+3
+                'limit': len(batch),
+                'include': 'musicinfo',
+                'audioformat': 'mp32'
+            }
+            data = self._get('tracks', params, timeout)
+            for track in (data or {}).get('results') or []:
+                track_id = str(track.get('id'))
+                tracks[track_id] = track
+                self.cache.put('track', {'id': track_id}, track)
+
+        return tracks
     
-    def get_tracks_by_genre(self, genre: str, limit: int = 20) -> Optional[Dict]:
+    def get_tracks_by_genre(self, genre: str, limit: int = 20, timeout=None) -> Optional[Dict]:
         """
         Get tracks by genre/tag
         """
         params = {
-            'client_id': self.client_id,
-            'format': 'json',
             'tags': genre,
             'limit': limit,
             'include': 'musicinfo',
@@ -70,13 +240,35 @@ class JamendoService:
             'featured': '1'  # Get featured tracks
         }
         
-        try:
-            response = requests.get(f"{self.base_url}/tracks/", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            print(f"Error calling Jamendo API: {e}")
-            return None
+        return self.cache.get_or_fetch('genre', params, lambda: self._get('tracks', params, timeout))
+    
+    def list_tracks(self, offset: int = 0, limit: int = MAX_PAGE_SIZE, order: str = 'id',
+                    released_between: Optional[tuple] = None, timeout=None) -> Optional[Dict]:
+        """
+        Page through the whole catalog (uncached, for bulk ingestion)
+
+        Args:
+            offset: Index of the first track
+            limit: Page size, at most MAX_PAGE_SIZE
+            order: Jamendo sort order; 'id' keeps pages stable while paging
+            released_between: Optional (date, date) range on release date
+            timeout: (connect, read) seconds per attempt
+
+        Returns:
+            dict or None: Jamendo response with 'results', None on failure
+        """
+        params = {
+            'offset': offset,
+            'limit': min(limit, MAX_PAGE_SIZE),
+            'order': order,
+            'include': 'musicinfo',
+            'audioformat': 'mp32'
+        }
+        if released_between:
+            start, end = released_between
+            params['datebetween'] = f"{start.isoformat()}_{end.isoformat()}"
+        
+        return self._get('tracks', params, timeout)
     
     def format_track_response(self, jamendo_track: Dict) -> Dict:
         """
@@ -86,7 +278,9 @@ class JamendoService:
             'jamendo_id': jamendo_track.get('id'),
             'title': jamendo_track.get('name', ''),
             'artist': jamendo_track.get('artist_name', ''),
+            'artist_id': jamendo_track.get('artist_id'),
             'album': jamendo_track.get('album_name', ''),
+            'album_id': jamendo_track.get('album_id'),
             'duration': jamendo_track.get('duration'),
             'image_url': jamendo_track.get('image', ''),
             'audio_url': jamendo_track.get('audio', ''),
@@ -95,3 +289,7 @@ class JamendoService:
             'release_date': jamendo_track.get('releasedate', ''),
             'genre': jamendo_track.get('musicinfo', {}).get('tags', {}).get('genres', []) if jamendo_track.get('musicinfo') else []
         }
+
+
+# Singleton instance
+jamendo_service = JamendoService()
@@ -0,0 +1,605 @@
+import os
+import struct
+
+
+# Bytes read up front to identify a file
+PROBE_BYTES = 64 * 1024
+
+# Upper bound when a leading ID3 tag (e.g. embedded cover art) pushes the first
+# frame further out. MP3s whose tag is larger are rejected: their first frame
+# can't be checked.
+MAX_PROBE_BYTES = 4 * 1024 * 1024
+
+MIME_TYPES = {
+    'mp3': 'audio/mpeg',
+    'wav': 'audio/wav',
+    'flac': 'audio/flac',
+    'mp4': 'video/mp4',
+    'mov': 'video/quicktime',
+    'webm': 'video/webm',
+    'matroska': 'video/x-matroska',
+    'avi': 'video/x-msvideo',
+}
+
+# Formats a file may contain given its extension (keys match ALLOWED_EXTENSIONS in app.py)
+EXTENSION_FORMATS = {
+    'mp3': {'mp3'},
+    'wav': {'wav'},
+    'flac': {'flac'},
+    'mp4': {'mp4'},
+    'mov': {'mov', 'mp4'},
+    'webm': {'webm'},
+    'mkv': {'matroska', 'webm'},
+    'avi': {'avi'},
+}
+
+CONTENT_TYPE_FORMATS = {
+    'audio/mpeg': {'mp3'},
+    'audio/mp3': {'mp3'},
+    'audio/wav': {'wav'},
+    'audio/x-wav': {'wav'},
+    'audio/wave': {'wav'},
+    'audio/flac': {'flac'},
+    'audio/x-flac': {'flac'},
+    'audio/mp4': {'mp4'},
+    'video/mp4': {'mp4'},
+    'video/quicktime': {'mov', 'mp4'},
+    'audio/webm': {'webm'},
+    'video/webm': {'webm'},
+    'video/x-matroska': {'matroska', 'webm'},
+    'audio/x-matroska': {'matroska', 'webm'},
+    'video/x-msvideo': {'avi'},
+}
+
+
+class MediaProbeError(Exception):
+    """Raised when a file is not a supported media format or not the declared one"""
+
+
+# ---------------------------------------------------------------------------
+# MP3
+# ---------------------------------------------------------------------------
+
+_MP3_BITRATES = {
+    (3, 3): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (3, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (3, 1): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 3): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 1): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+
+_MP3_SAMPLE_RATES = {
+    3: [44100, 48000, 32000],  # MPEG-1
+    2: [22050, 24000, 16000],  # MPEG-2
+    0: [11025, 12000, 8000],   # MPEG-2.5
+}
+
+
+def _id3_size(head):
+    """Total size of a leading ID3v2 tag, 0 if there is none"""
+    if len(head) < 10 or head[:3] != b'ID3':
+        return 0
+    size = (head[6] & 0x7F) << 21 | (head[7] & 0x7F) << 14 | (head[8] & 0x7F) << 7 | (head[9] & 0x7F)
+    footer = 10 if head[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _mp3_frame(head, offset):
+    """Parse an MPEG audio frame header at `offset`, None if it isn't one"""
+    if offset + 4 > len(head):
+        return None
+    b0, b1, b2, b3 = head[offset:offset + 4]
+    if b0 != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+
+    version = (b1 >> 3) & 3
+    layer = (b1 >> 1) & 3
+    bitrate_index = b2 >> 4
+    rate_index = (b2 >> 2) & 3
+    if version == 1 or layer == 0 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    bitrate = _MP3_BITRATES[(3 if version == 3 else 2, layer)][bitrate_index] * 1000
+    sample_rate = _MP3_SAMPLE_RATES[version][rate_index]
+    padding = (b2 >> 1) & 1
+    mono = (b3 >> 6) == 3
+
+    if layer == 3:  # Layer I
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if (layer == 2 or version == 3) else 576
+        length = (samples // 8) * bitrate // sample_rate + padding
+
+    return {
+        'version': version,
+        'bitrate': bitrate,
+        'sample_rate': sample_rate,
+        'channels': 1 if mono else 2,
+        'samples': samples,
+        'length': length,
+        'mono': mono,
+    }
+
+
+def _probe_mp3(head, total_size):
+    tag_size = _id3_size(head)
+    offset = tag_size
+
+    frame = _mp3_frame(head, offset)
+    if frame is None:
+        if tag_size:
+            # An ID3 tag can be put in front of anything: only a frame makes it an MP3
+            if tag_size + 4 > MAX_PROBE_BYTES:
+                raise MediaProbeError("ID3 tag is too large to find the first MPEG audio frame")
+            raise MediaProbeError("ID3 tag is not followed by an MPEG audio frame")
+        return None
+
+    # Require a second frame right behind the first to rule out random 0xFFEx bytes
+    following = offset + frame['length']
+    if following + 4 <= len(head) and _mp3_frame(head, following) is None:
+        return None
+
+    info = {'format': 'mp3', 'sample_rate': frame['sample_rate'], 'channels': frame['channels']}
+    audio_bytes = total_size - tag_size if total_size else None
+
+    # Xing/Info (LAME) or VBRI header carries the frame count of VBR files
+    side_info = (32 if not frame['mono'] else 17) if frame['version'] == 3 else (17 if not frame['mono'] else 9)
+    frames = None
+    xing = offset + 4 + side_info
+    if head[xing:xing + 4] in (b'Xing', b'Info') and len(head) >= xing + 12:
+        flags = struct.unpack('>I', head[xing + 4:xing + 8])[0]
+        if flags & 1:
+            frames = struct.unpack('>I', head[xing + 8:xing + 12])[0]
+    elif head[offset + 36:offset + 40] == b'VBRI' and len(head) >= offset + 54:
+        frames = struct.unpack('>I', head[offset + 50:offset + 54])[0]
+
+    if frames:
+        duration = frames * frame['samples'] / frame['sample_rate']
+        info['duration'] = duration
+        info['bitrate'] = int(audio_bytes * 8 / duration) if audio_bytes and duration else frame['bitrate']
+    else:
+        info['bitrate'] = frame['bitrate']
+        if audio_bytes:
+            info['duration'] = audio_bytes * 8 / frame['bitrate']
+
+    return info
+
+
+# ---------------------------------------------------------------------------
+# RIFF: WAV and AVI
+# ---------------------------------------------------------------------------
+
+def _riff_chunks(head, offset):
+    """Yield (id, data_offset, size) for RIFF chunks starting at `offset`"""
+    while offset + 8 <= len(head):
+        chunk_id = head[offset:offset + 4]
+        size = struct.unpack('<I', head[offset + 4:offset + 8])[0]
+        yield chunk_id, offset + 8, size
+        offset += 8 + size + (size & 1)
+
+
+def _probe_riff(head, total_size):
+    if len(head) < 12 or head[:4] != b'RIFF':
+        return None
+
+    kind = head[8:12]
+    if kind == b'WAVE':
+        info = {'format': 'wav'}
+        byte_rate = None
+        for chunk_id, start, size in _riff_chunks(head, 12):
+            if chunk_id == b'fmt ' and start + 16 <= len(head):
+                _, channels, sample_rate, byte_rate = struct.unpack('<HHII', head[start:start + 12])
+                info.update({'channels': channels, 'sample_rate': sample_rate, 'bitrate': byte_rate * 8})
+            elif chunk_id == b'data':
+                if size in (0, 0xFFFFFFFF) and total_size:
+                    # Streaming writers leave the size unset: fall back to the file size
+                    size = total_size - start
+                if byte_rate:
+                    info['duration'] = size / byte_rate
+                break
+        return info
+
+    if kind == b'AVI ':
+        info = {'format': 'avi'}
+        for chunk_id, start, _ in _riff_chunks(head, 12):
+            if chunk_id == b'LIST' and head[start:start + 4] == b'hdrl':
+                for sub_id, sub_start, _ in _riff_chunks(head, start + 4):
+                    if sub_id == b'avih' and sub_start + 20 <= len(head):
+                        usec_per_frame = struct.unpack('<I', head[sub_start:sub_start + 4])[0]
+                        total_frames = struct.unpack('<I', head[sub_start + 16:sub_start + 20])[0]
+                        if usec_per_frame and total_frames:
+                            info['duration'] = usec_per_frame * total_frames / 1000000
+                        break
+                break
+        if info.get('duration') and total_size:
+            info['bitrate'] = int(total_size * 8 / info['duration'])
+        return info
+
+    return None
+
+
+# ---------------------------------------------------------------------------
+# FLAC
+# ---------------------------------------------------------------------------
+
+def _probe_flac(head, total_size):
+    offset = _id3_size(head)
+    if head[offset:offset + 4] != b'fLaC':
+        return None
+
+    info = {'format': 'flac'}
+    block = offset + 4
+    # STREAMINFO is always the first metadata block
+    if len(head) >= block + 4 + 18 and head[block] & 0x7F == 0:
+        packed = int.from_bytes(head[block + 14:block + 22], 'big')
+        sample_rate = packed >> 44
+        channels = ((packed >> 41) & 0x7) + 1
+        total_samples = packed & 0xFFFFFFFFF
+        info.update({'sample_rate': sample_rate, 'channels': channels})
+        if sample_rate and total_samples:
+            info['duration'] = total_samples / sample_rate
+            if total_size:
+                info['bitrate'] = int(total_size * 8 / info['duration'])
+    return info
+
+
+# ---------------------------------------------------------------------------
+# ISO base media (MP4 / MOV)
+# ---------------------------------------------------------------------------
+
+def _boxes(head, offset, end):
+    """Yield (type, data_offset, box_end) for ISO BMFF boxes in [offset, end)"""
+    while offset + 8 <= end:
+        size, box_type = struct.unpack('>I4s', head[offset:offset + 8])
+        header = 8
+        if size == 1:
+            if offset + 16 > end:
+                return
+            size = struct.unpack('>Q', head[offset + 8:offset + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            return
+        yield box_type, offset + header, offset + size
+        offset += size
+
+
+def _probe_iso_bmff(head, total_size):
+    if len(head) < 12:
+        return None
+
+    first_type = head[4:8]
+    if first_type == b'ftyp':
+        major_brand = head[8:12]
+        info = {'format': 'mov' if major_brand == b'qt  ' else 'mp4'}
+    elif first_type in (b'moov', b'wide', b'mdat', b'free', b'skip') and struct.unpack('>I', head[:4])[0] >= 8:
+        # Older QuickTime files start without ftyp
+        info = {'format': 'mov'}
+    else:
+        return None
+
+    # moov is only visible here when the file was written "fast start"
+    for box_type, start, box_end in _boxes(head, 0, len(head)):
+        if box_type != b'moov':
+            continue
+        for child_type, child_start, _ in _boxes(head, start, min(box_end, len(head))):
+            if child_type != b'mvhd':
+                continue
+            version = head[child_start]
+            if version == 1 and child_start + 32 <= len(head):
+                timescale, duration = struct.unpack('>IQ', head[child_start + 20:child_start + 32])
+            elif child_start + 20 <= len(head):
+                timescale, duration = struct.unpack('>II', head[child_start + 12:child_start + 20])
+            else:
+                break
+            if timescale:
+                info['duration'] = duration / timescale
+                if total_size and duration:
+                    info['bitrate'] = int(total_size * 8 / info['duration'])
+            break
+        break
+
+    return info
+
+
+# ---------------------------------------------------------------------------
+# Matroska / WebM (EBML)
+# ---------------------------------------------------------------------------
+
+_EBML_MASTERS = {
+    0x1A45DFA3,  # EBML header
+    0x18538067,  # Segment
+    0x1549A966,  # Info
+    0x1654AE6B,  # Tracks
+    0xAE,        # TrackEntry
+    0xE1,        # Audio
+}
+_EBML_CLUSTER = 0x1F43B675
+
+
+def _ebml_vint(head, offset, keep_marker):
+    """Read an EBML variable-length integer, returning (value, length) or (None, 0)"""
+    if offset >= len(head):
+        return None, 0
+    first = head[offset]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first & mask:
+        mask >>= 1
+        length += 1
+    if length > 8 or offset + length > len(head):
+        return None, 0
+    value = first if keep_marker else first & (mask - 1)
+    for byte in head[offset + 1:offset + length]:
+        value = (value << 8) | byte
+    if not keep_marker and value == (1 << (7 * length)) - 1:
+        value = -1  # unknown size
+    return value, length
+
+
+def _ebml_elements(head, offset, end):
+    """Yield (id, data_offset, data_end) for EBML elements in [offset, end)"""
+    while offset < end:
+        element_id, id_length = _ebml_vint(head, offset, keep_marker=True)
+        if element_id is None:
+            return
+        size, size_length = _ebml_vint(head, offset + id_length, keep_marker=False)
+        if size is None:
+            return
+        start = offset + id_length + size_length
+        data_end = end if size < 0 else start + size
+        yield element_id, start, data_end
+        offset = start if element_id in _EBML_MASTERS else data_end
+
+
+def _ebml_float(data):
+    if len(data) == 4:
+        return struct.unpack('>f', data)[0]
+    if len(data) == 8:
+        return struct.unpack('>d', data)[0]
+    return None
+
+
+def _probe_matroska(head, total_size):
+    if head[:4] != b'\x1a\x45\xdf\xa3':
+        return None
+
+    info = {'format': 'matroska'}
+    timestamp_scale = 1000000
+    duration = None
+
+    for element_id, start, end in _ebml_elements(head, 0, len(head)):
+        data = head[start:min(end, len(head))]
+        if element_id == 0x4282:  # DocType
+            doc_type = data.rstrip(b'\x00').decode('ascii', 'replace')
+            info['format'] = 'webm' if doc_type == 'webm' else 'matroska'
+        elif element_id == 0x2AD7B1:  # TimestampScale
+            timestamp_scale = int.from_bytes(data, 'big') or timestamp_scale
+        elif element_id == 0x4489:  # Duration
+            duration = _ebml_float(data)
+        elif element_id == 0xB5 and 'sample_rate' not in info:  # SamplingFrequency
+            rate = _ebml_float(data)
+            if rate:
+                info['sample_rate'] = int(rate)
+        elif element_id == 0x9F and 'channels' not in info:  # Channels
+            info['channels'] = int.from_bytes(data, 'big')
+        elif element_id == _EBML_CLUSTER:
+            break
+
+    if duration:
+        info['duration'] = duration * timestamp_scale / 1000000000
+        if total_size:
+            info['bitrate'] = int(total_size * 8 / info['duration'])
+
+    return info
+
+
+_PROBES = (_probe_riff, _probe_flac, _probe_iso_bmff, _probe_matroska, _probe_mp3)
+
+
+def required_probe_bytes(head):
+    """
+    How many leading bytes are needed to probe this file
+
+    Args:
+        head (bytes): Bytes read so far (at least 10)
+
+    Returns:
+        int: Wanted prefix length, capped at MAX_PROBE_BYTES
+    """
+    tag_size = _id3_size(head)
+    if tag_size:
+        return min(max(tag_size + 4096, PROBE_BYTES), MAX_PROBE_BYTES)
+    return PROBE_BYTES
+
+
+def probe(head, total_size=None):
+    """
+    Identify a media file from its first bytes and read what its headers tell
+
+    Args:
+        head (bytes): Leading bytes of the file
+        total_size (int): Full file size if known, used for duration and bitrate
+
+    Returns:
+        dict: {
+            'format': str ('mp3', 'wav', 'flac', 'mp4', 'mov', 'webm', 'matroska', 'avi'),
+            'mime_type': str,
+            'duration': float seconds or None,
+            'bitrate': int bits per second or None,
+            'sample_rate': int Hz or None,
+            'channels': int or None
+        }
+
+    Raises:
+        MediaProbeError: if the bytes are not a supported media format
+    """
+    for probe_format in _PROBES:
+        info = probe_format(head, total_size)
+        if info:
+            return {
+                'format': info['format'],
+                'mime_type': MIME_TYPES[info['format']],
+                'duration': round(info['duration'], 3) if info.get('duration') else None,
+                'bitrate': info.get('bitrate'),
+                'sample_rate': info.get('sample_rate'),
+                'channels': info.get('channels'),
+            }
+    raise MediaProbeError("Unrecognized or unsupported media format")
+
+
+def expected_formats(filename=None, content_type=None):
+    """
+    Formats allowed by a file's extension and declared content type
+
+    Args:
+        filename (str): File name, extension is checked if present
+        content_type (str): Declared MIME type; generic types are ignored
+
+    Returns:
+        set or None: Allowed formats, None if neither constrains the format
+
+    Raises:
+        MediaProbeError: if the extension or content type is not supported
+    """
+    allowed = None
+
+    if filename and '.' in filename:
+        extension = filename.rsplit('.', 1)[1].lower()
+        if extension not in EXTENSION_FORMATS:
+            raise MediaProbeError(f"File extension '.{extension}' is not allowed")
+        allowed = set(EXTENSION_FORMATS[extension])
+
+    if content_type and content_type != 'application/octet-stream':
+        if content_type not in CONTENT_TYPE_FORMATS:
+            raise MediaProbeError(f"Content type '{content_type}' is not allowed")
+        by_type = CONTENT_TYPE_FORMATS[content_type]
+        allowed = by_type if allowed is None else allowed & by_type
+        if not allowed:
+            raise MediaProbeError("File extension and content type disagree")
+
+    return allowed
+
+
+def check(head, filename=None, content_type=None, total_size=None):
+    """
+    Probe a file and make sure it is what its name and content type claim
+
+    Args:
+        head (bytes): Leading bytes of the file
+        filename (str): Declared file name
+        content_type (str): Declared MIME type
+        total_size (int): Full file size if known
+
+    Returns:
+        dict: Probe result (see probe())
+
+    Raises:
+        MediaProbeError: if unsupported or not matching the declaration
+    """
+    allowed = expected_formats(filename, content_type)
+    info = probe(head, total_size)
+    if allowed is not None and info['format'] not in allowed:
+        raise MediaProbeError(
+            f"File content is {info['format']}, which does not match the declared type"
+        )
+    return info
+
+
+class SniffedStream:
+    """
+    Stream wrapper that has already inspected the body's first bytes
+
+    The probed prefix is replayed on read(), so consumers see the original
+    stream unchanged and the file is only read once.
+    """
+
+    def __init__(self, stream, head, info):
+        self._stream = stream
+        self._head = head
+        self._position = 0
+        self.info = info
+
+    def read(self, size=-1):
+        if self._position < len(self._head):
+            if size is None or size < 0:
+                data = self._head[self._position:] + self._stream.read()
+                self._position = len(self._head)
+                return data
+            data = self._head[self._position:self._position + size]
+            self._position += len(data)
+            return data
+        return self._stream.read(size)
+
+
+def _read_up_to(stream, size):
+    chunks = []
+    while size > 0:
+        data = stream.read(size)
+        if not data:
+            break
+        chunks.append(data)
+        size -= len(data)
+    return b''.join(chunks)
+
+
+def sniff_stream(stream, filename=None, content_type=None, content_length=None):
+    """
+    Validate a streaming body from its first bytes, before the rest is read
+
+    Args:
+        stream: Binary stream positioned at the start of the file
+        filename (str): Declared file name
+        content_type (str): Declared MIME type
+        content_length (int): Declared body size if known
+
+    Returns:
+        SniffedStream: Wrapper replaying the probed bytes, with `.info` set
+
+    Raises:
+        MediaProbeError: if unsupported or not matching the declaration
+    """
+    # Fail on a bad extension or content type without touching the body
+    expected_formats(filename, content_type)
+
+    head = _read_up_to(stream, PROBE_BYTES)
+    wanted = required_probe_bytes(head)
+    if wanted > len(head) and len(head) == PROBE_BYTES:
+        head += _read_up_to(stream, wanted - len(head))
+
+    info = check(head, filename, content_type, total_size=content_length)
+    return SniffedStream(stream, head, info)
+
+
+def sniff_file(file_obj, filename=None, content_type=None):
+    """
+    Validate a seekable file (e.g. from request.files) and rewind it
+
+    Args:
+        file_obj: Seekable binary file object
+        filename (str): Declared file name
+        content_type (str): Declared MIME type
+
+    Returns:
+        dict: Probe result (see probe())
+
+    Raises:
+        MediaProbeError: if unsupported or not matching the declaration
+    """
+    expected_formats(filename, content_type)
+
+    start = file_obj.tell()
+    file_obj.seek(0, os.SEEK_END)
+    total_size = file_obj.tell() - start
+    file_obj.seek(start)
+
+    head = file_obj.read(PROBE_BYTES)
+    wanted = required_probe_bytes(head)
+    if wanted > len(head):
+        head += file_obj.read(wanted - len(head))
+    file_obj.seek(start)
+
+    return check(head, filename, content_type, total_size=total_size)
@@ -0,0 +1,102 @@
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+
+# Histogram bucket upper bounds in milliseconds; the last bucket is open ended
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, float('inf'))
+
+
+class LatencyRecorder:
+    """
+    Thread-safe per-operation latency histogram
+
+    Each operation keeps a count, an error count, the total and maximum time,
+    and a fixed-bucket histogram. Percentiles are read off the histogram, so
+    recording is O(log buckets) and memory does not grow with traffic.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._operations = {}
+
+    def record(self, operation, seconds, error=False):
+        """
+        Record one call
+
+        Args:
+            operation (str): Operation name (e.g. 'get_object')
+            seconds (float): Wall time of the call
+            error (bool): Whether the call failed
+        """
+        elapsed_ms = seconds * 1000
+        bucket = bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)
+        with self._lock:
+            stats = self._operations.get(operation)
+            if stats is None:
+                stats = self._operations[operation] = {
+                    'count': 0,
+                    'errors': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'buckets': [0] * len(LATENCY_BUCKETS_MS)
+                }
+            stats['count'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['buckets'][bucket] += 1
+            if elapsed_ms > stats['max_ms']:
+                stats['max_ms'] = elapsed_ms
+            if error:
+                stats['errors'] += 1
+
+    @contextmanager
+    def time(self, operation):
+        """Time the enclosed block as one call; exceptions count as errors"""
+        started = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.record(operation, time.perf_counter() - started, error)
+
+    @staticmethod
+    def _percentile(buckets, count, max_ms, quantile):
+        threshold = quantile * count
+        seen = 0
+        for upper, hits in zip(LATENCY_BUCKETS_MS, buckets):
+            seen += hits
+            if seen >= threshold:
+                return min(upper, max_ms)
+        return max_ms
+
+    def snapshot(self):
+        """
+        Current figures for every operation
+
+        Returns:
+            dict: operation -> {count, errors, mean_ms, max_ms, p50_ms, p95_ms, p99_ms}.
+                Percentiles are bucket upper bounds, capped at max_ms.
+        """
+        with self._lock:
+            operations = {
+                name: dict(stats, buckets=list(stats['buckets']))
+                for name, stats in self._operations.items()
+            }
+
+        result = {}
+        for name, stats in operations.items():
+            count = stats['count']
+            result[name] = {
+                'count': count,
+                'errors': stats['errors'],
+                'mean_ms': round(stats['total_ms'] / count, 3) if count else 0.0,
+                'max_ms': round(stats['max_ms'], 3),
+                'p50_ms': round(self._percentile(stats['buckets'], count, stats['max_ms'], 0.50), 3),
+                'p95_ms': round(self._percentile(stats['buckets'], count, stats['max_ms'], 0.95), 3),
+                'p99_ms': round(self._percentile(stats['buckets'], count, stats['max_ms'], 0.99), 3),
+            }
+        return result
@@ -0,0 +1,326 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict, Counter
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Parameters Jamendo matches case-insensitively: only these are lowercased.
+# Others (namesearch, audioformat, IDs...) are sent to the API as given.
+CASE_INSENSITIVE_PARAMS = frozenset({'search', 'tags', 'fuzzytags'})
+
+
+def normalize_params(params):
+    """
+    Canonical form of query parameters, so equivalent requests share a key
+
+    Keys are sorted, string values are trimmed and have inner whitespace
+    collapsed, values of CASE_INSENSITIVE_PARAMS are lowercased, and None
+    values are dropped.
+
+    Args:
+        params (dict): Query parameters
+
+    Returns:
+        str: Stable JSON encoding of the parameters
+    """
+    normalized = {}
+    for name, value in params.items():
+        if value is None:
+            continue
+        if isinstance(value, str):
+            value = ' '.join(value.split())
+            if name in CASE_INSENSITIVE_PARAMS:
+                value = value.lower()
+        normalized[name] = value
+    return json.dumps(normalized, sort_keys=True, separators=(',', ':'), default=str)
+
+
+class ResponseCache:
+    """
+    Two-level (memory LRU + SQLite) cache of API responses with stale-while-revalidate
+
+    Every entry is fresh for its endpoint's TTL. After that it is stale for
+    another `stale_ttl` seconds: a stale entry is still returned immediately
+    while a single background refresh replaces it. Entries past the stale
+    window are treated as misses, but are still returned if the refetch fails.
+
+    Concurrent misses for the same key wait for one fetch instead of each
+    calling the origin. The SQLite file survives restarts, so a cold process
+    starts from the last responses it saw.
+
+    Args:
+        path (str): SQLite file; None keeps only the memory level
+        ttls (dict): endpoint -> seconds fresh
+        default_ttl (int): Fresh time for endpoints missing from ttls
+        stale_ttl (int): Seconds an expired entry may still be served while refreshing
+        memory_entries (int): Size of the in-memory LRU
+        disk_entries (int): Most rows kept in SQLite; oldest are pruned
+        refresh_workers (int): Threads running background refreshes
+    """
+
+    def __init__(self, path=None, ttls=None, default_ttl=300, stale_ttl=86400,
+                 memory_entries=1024, disk_entries=100000, refresh_workers=2):
+        self.path = path
+        self.ttls = dict(ttls or {})
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> (value, fresh_until, stale_until), oldest first
+        self._in_flight = {}          # key -> threading.Event
+        self._refreshing = set()
+        self._refresher = ThreadPoolExecutor(max_workers=refresh_workers)
+        self._writes = 0
+        self.stats = Counter()
+
+        self._db = None
+        self._db_lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    key TEXT PRIMARY KEY,
+                    endpoint TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    fresh_until REAL NOT NULL,
+                    stale_until REAL NOT NULL
+                )
+                """
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS ix_response_cache_stale ON response_cache (stale_until)")
+
+    @staticmethod
+    def make_key(endpoint, params):
+        """Cache key of an endpoint call: endpoint plus hashed normalized parameters"""
+        digest = hashlib.sha1(normalize_params(params).encode('utf-8')).hexdigest()
+        return f"{endpoint}:{digest}"
+
+    # ------------------------------------------------------------------
+    # Storage levels
+    # ------------------------------------------------------------------
+
+    def _memory_get(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+            return entry
+
+    def _memory_put(self, key, entry):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _disk_get(self, key):
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT value, fresh_until, stale_until FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1], row[2]
+
+    def _disk_put(self, key, endpoint, entry):
+        if self._db is None:
+            return
+        value, fresh_until, stale_until = entry
+        with self._db_lock:
+            self._db.execute(
+                """
+                INSERT OR REPLACE INTO response_cache (key, endpoint, value, fresh_until, stale_until)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (key, endpoint, json.dumps(value), fresh_until, stale_until)
+            )
+            self._writes += 1
+            if self._writes % 500 == 0:
+                self._prune()
+
+    def _prune(self):
+        """Drop entries past their stale window, then the oldest beyond disk_entries. Caller holds _db_lock."""
+        self._db.execute("DELETE FROM response_cache WHERE stale_until < ?", (time.time(),))
+        self._db.execute(
+            """
+            DELETE FROM response_cache WHERE key IN (
+                SELECT key FROM response_cache ORDER BY fresh_until DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.disk_entries,)
+        )
+
+    def _lookup(self, key):
+        """Memory first, then disk (promoting disk hits into memory)"""
+        entry = self._memory_get(key)
+        if entry is not None:
+            return entry, 'memory'
+        entry = self._disk_get(key)
+        if entry is not None:
+            self._memory_put(key, entry)
+            return entry, 'disk'
+        return None, None
+
+    def _store(self, key, endpoint, value):
+        now = time.time()
+        fresh_until = now + self.ttls.get(endpoint, self.default_ttl)
+        entry = (value, fresh_until, fresh_until + self.stale_ttl)
+        self._memory_put(key, entry)
+        self._disk_put(key, endpoint, entry)
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def get_or_fetch(self, endpoint, params, fetch):
+        """
+        Cached value of an endpoint call, fetching it on a miss
+
+        Args:
+            endpoint (str): Endpoint name, selects the TTL
+            params (dict): Request parameters (normalized into the key)
+            fetch (callable): fetch() returns the fresh value, or None on
+                failure. None results are never cached.
+
+        Returns:
+            The cached or fetched value, or None if the fetch failed and
+            nothing (not even an expired entry) was cached
+        """
+        key = self.make_key(endpoint, params)
+        now = time.time()
+
+        entry, level = self._lookup(key)
+        if entry is not None:
+            value, fresh_until, stale_until = entry
+            if now < fresh_until:
+                self._count(f'hits_{level}')
+                return value
+            if now < stale_until:
+                self._count('stale_served')
+                self._refresh_in_background(key, endpoint, fetch)
+                return value
+
+        return self._fetch_coalesced(key, endpoint, fetch, expired=entry)
+
+    def _fetch_coalesced(self, key, endpoint, fetch, expired=None):
+        """Fetch on a miss, letting concurrent callers for the same key share one fetch"""
+        with self._lock:
+            event = self._in_flight.get(key)
+            owner = event is None
+            if owner:
+                event = self._in_flight[key] = threading.Event()
+
+        if not owner:
+            self._count('coalesced')
+            event.wait()
+            entry, _ = self._lookup(key)
+            if entry is not None:
+                return entry[0]
+            return expired[0] if expired is not None else None
+
+        self._count('misses')
+        try:
+            value = fetch()
+            if value is not None:
+                self._store(key, endpoint, value)
+                return value
+            self._count('fetch_failures')
+            if expired is not None:
+                # Better an old answer than none while the origin is down
+                self._count('expired_served')
+                return expired[0]
+            return None
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            event.set()
+
+    def _refresh_in_background(self, key, endpoint, fetch):
+        with self._lock:
+            if key in self._refreshing or key in self._in_flight:
+                return
+            self._refreshing.add(key)
+        self._refresher.submit(self._refresh, key, endpoint, fetch)
+
+    def _refresh(self, key, endpoint, fetch):
+        try:
+            value = fetch()
+            if value is not None:
+                self._store(key, endpoint, value)
+                self._count('refreshes')
+            else:
+                self._count('refresh_failures')
+        except Exception:
+            self._count('refresh_failures')
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get(self, endpoint, params):
+        """
+        Fresh cached value without fetching (for callers that batch their own misses)
+
+        Returns:
+            The value, or None if absent or past its TTL
+        """
+        entry, level = self._lookup(self.make_key(endpoint, params))
+        if entry is not None and time.time() < entry[1]:
+            self._count(f'hits_{level}')
+            return entry[0]
+        self._count('misses')
+        return None
+
+    def put(self, endpoint, params, value):
+        """Store a value fetched outside get_or_fetch"""
+        self._store(self.make_key(endpoint, params), endpoint, value)
+
+    def invalidate(self, endpoint, params):
+        """Drop one entry from both levels"""
+        key = self.make_key(endpoint, params)
+        with self._lock:
+            self._memory.pop(key, None)
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def get_stats(self):
+        """
+        Cache counters for monitoring
+
+        Returns:
+            dict: hits per level, misses, stale and expired entries served,
+                coalesced waits, background refreshes (and failures),
+                hit_ratio, and current entry counts
+        """
+        with self._lock:
+            stats = {
+                name: self.stats.get(name, 0)
+                for name in ('hits_memory', 'hits_disk', 'stale_served', 'misses', 'coalesced',
+                             'fetch_failures', 'expired_served', 'refreshes', 'refresh_failures')
+            }
+            stats['memory_entries'] = len(self._memory)
+        if self._db is not None:
+            with self._db_lock:
+                stats['disk_entries'] = self._db.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+        served = stats['hits_memory'] + stats['hits_disk'] + stats['stale_served'] + stats['coalesced']
+        lookups = served + stats['misses']
+        stats['hit_ratio'] = served / lookups if lookups else 0.0
+        return stats
+
@@ -1,17 +1,187 @@
 import os
+import time
+import threading
 import boto3
+from collections import Counter
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
+from werkzeug.exceptions import HTTPException
 from werkzeug.utils import secure_filename
+from services.metrics import LatencyRecorder
+
+# S3 multipart limits
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10000
+
+# Most keys a single DeleteObjects / ListObjectsV2 request handles
+MAX_KEYS_PER_REQUEST = 1000
+
+
+class UploadTooLargeError(Exception):
+    """Raised when a streamed upload grows past its byte limit"""
+
+
+def _read_chunk(stream, size):
+    """
+    Read up to `size` bytes, looping over short reads until the stream ends
+
+    Args:
+        stream: Binary file-like object
+        size (int): Number of bytes wanted
+
+    Returns:
+        bytes: Exactly `size` bytes, or fewer only at end of stream
+    """
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        data = stream.read(remaining)
+        if not data:
+            break
+        chunks.append(data)
+        remaining -= len(data)
+    return b''.join(chunks)
+
 
 class S3Service:
-    def __init__(self):
+    """
+    S3 access shared by every request thread
+
+    boto3 clients are thread-safe, so one client with a sized connection pool
+    serves the whole process. Object transfers (puts, part uploads, ranged
+    gets, managed uploads and copies) additionally take a slot from a
+    process-wide semaphore, so a burst of uploads queues here instead of
+    starving the pool. Every S3 call is timed per operation; see get_stats().
+
+    Args:
+        max_concurrent_transfers (int): Transfers allowed at once across the
+            process (default S3_MAX_CONCURRENT_TRANSFERS or 16)
+        max_pool_connections (int): HTTP connection pool size (default
+            S3_MAX_POOL_CONNECTIONS, or the transfer limit plus headroom for
+            metadata calls)
+        max_attempts (int): Attempts per call including the first (default
+            S3_MAX_ATTEMPTS or 5)
+        retry_mode (str): botocore retry mode (default S3_RETRY_MODE or
+            'adaptive', which adds client-side rate limiting on throttling)
+    """
+
+    def __init__(self, max_concurrent_transfers=None, max_pool_connections=None,
+                 max_attempts=None, retry_mode=None):
+        self.endpoint_url = os.getenv('AWS_S3_ENDPOINT_URL') or None
+        self.bucket_name = os.getenv('AWS_S3_BUCKET_NAME')
+
+        self.max_concurrent_transfers = max(
+            max_concurrent_transfers or int(os.getenv('S3_MAX_CONCURRENT_TRANSFERS', 16)), 1
+        )
+        self.max_pool_connections = max_pool_connections or int(
+            os.getenv('S3_MAX_POOL_CONNECTIONS', self.max_concurrent_transfers + 10)
+        )
+        self.retry_mode = retry_mode or os.getenv('S3_RETRY_MODE', 'adaptive')
+        self.max_attempts = max_attempts or int(os.getenv('S3_MAX_ATTEMPTS', 5))
+
         self.s3_client = boto3.client(
             's3',
             aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
             aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-            region_name=os.getenv('AWS_S3_REGION', 'ap-southeast-2')
+            region_name=os.getenv('AWS_S3_REGION', 'ap-southeast-2'),
+            endpoint_url=self.endpoint_url,
+            config=Config(
+                max_pool_connections=self.max_pool_connections,
+                retries={'total_max_attempts': self.max_attempts, 'mode': self.retry_mode},
+                connect_timeout=int(os.getenv('S3_CONNECT_TIMEOUT', 5)),
+                read_timeout=int(os.getenv('S3_READ_TIMEOUT', 60)),
+                tcp_keepalive=True
+            )
         )
-        self.bucket_name = os.getenv('AWS_S3_BUCKET_NAME')
+
+        # Streaming multipart upload tuning
+        self.part_size = max(int(os.getenv('S3_UPLOAD_PART_SIZE_MB', 8)) * 1024 * 1024, MIN_PART_SIZE)
+        self.max_concurrency = max(int(os.getenv('S3_UPLOAD_CONCURRENCY', 4)), 1)
+
+        # Managed transfers (upload_fileobj, copy) spawn their own threads; keep them in step
+        self.transfer_config = TransferConfig(max_concurrency=self.max_concurrency)
+
+        # Lifetime of presigned upload URLs, in seconds
+        self.presign_expires = int(os.getenv('S3_PRESIGN_EXPIRES', 900))
+
+        self._transfer_slots = threading.BoundedSemaphore(self.max_concurrent_transfers)
+        self._gauge_lock = threading.Lock()
+        self._in_flight = Counter()
+        self._waiting = 0
+        self._transfers = 0
+        self.latency = LatencyRecorder()
+
+    @contextmanager
+    def _track(self, operation, transfer=False):
+        """
+        Time one S3 call and count it as in flight
+
+        Transfers first wait for a slot from the process-wide semaphore; the
+        wait is recorded separately as 'transfer_slot_wait'.
+        """
+        if transfer:
+            with self._gauge_lock:
+                self._waiting += 1
+            waited = time.perf_counter()
+            self._transfer_slots.acquire()
+            self.latency.record('transfer_slot_wait', time.perf_counter() - waited)
+            with self._gauge_lock:
+                self._waiting -= 1
+                self._transfers += 1
+
+        with self._gauge_lock:
+            self._in_flight[operation] += 1
+        try:
+            with self.latency.time(operation):
+                yield
+        finally:
+            with self._gauge_lock:
+                self._in_flight[operation] -= 1
+                if transfer:
+                    self._transfers -= 1
+            if transfer:
+                self._transfer_slots.release()
+
+    def _call(self, operation, transfer=False, **kwargs):
+        """Run s3_client.<operation>(**kwargs) under _track"""
+        with self._track(operation, transfer):
+            return getattr(self.s3_client, operation)(**kwargs)
+
+    def get_stats(self):
+        """
+        Connection, concurrency and latency figures for monitoring
+
+        Returns:
+            dict: {
+                'in_flight': {operation: count, 'total': int, 'transfers': int},
+                'waiting_for_transfer_slot': int,
+                'max_concurrent_transfers': int,
+                'max_pool_connections': int,
+                'retry_mode': str,
+                'max_attempts': int,
+                'operations': per-operation latency (see LatencyRecorder.snapshot)
+            }
+        """
+        with self._gauge_lock:
+            in_flight = {operation: count for operation, count in self._in_flight.items() if count}
+            waiting = self._waiting
+            transfers = self._transfers
+        in_flight['total'] = sum(in_flight.values())
+        in_flight['transfers'] = transfers
+
+        return {
+            'in_flight': in_flight,
+            'waiting_for_transfer_slot': waiting,
+            'max_concurrent_transfers': self.max_concurrent_transfers,
+            'max_pool_connections': self.max_pool_connections,
+            'retry_mode': self.retry_mode,
+            'max_attempts': self.max_attempts,
+            'operations': self.latency.snapshot()
+        }
 
     def upload_file(self, file_obj, folder_name, file_name=None):
         """
@@ -40,17 +210,20 @@ class S3Service:
             s3_key = f"{folder_name}/{file_name}"
             
             # Upload file to S3
-            self.s3_client.upload_fileobj(
-                file_obj,
-                self.bucket_name,
-                s3_key,
+            self._call(
+                'upload_fileobj',
+                transfer=True,
+                Fileobj=file_obj,
+                Bucket=self.bucket_name,
+                Key=s3_key,
                 ExtraArgs={
                     'ContentType': file_obj.content_type or 'application/octet-stream'
-                }
+                },
+                Config=self.transfer_config
             )
             
             # Generate S3 URL
-            url = f"https://{self.bucket_name}.s3.{os.getenv('AWS_S3_REGION', 'ap-southeast-2')}.amazonaws.com/{s3_key}"
+            url = self.get_file_url(s3_key)
             
             return {
                 'success': True,
@@ -69,6 +242,415 @@ class S3Service:
                 'error': f"Upload failed: {str(e)}"
             }
 
+    def upload_stream(self, stream, s3_key, content_type=None, content_length=None,
+                      max_bytes=None, part_size=None, max_concurrency=None, hasher=None):
+        """
+        Upload a binary stream to S3 without spooling it to disk
+
+        The stream is read one part at a time and parts are pushed with S3
+        multipart upload on a small thread pool. At most 2 * max_concurrency
+        parts are buffered in memory at once, so memory stays bounded no matter
+        how large the body is. Bodies smaller than one part go up with a single
+        PutObject.
+
+        Args:
+            stream: Binary file-like object (e.g. request.stream)
+            s3_key: Full destination key in S3
+            content_type: MIME type stored on the object
+            content_length: Expected size in bytes if known, used to size parts
+                so large bodies stay under the 10,000 part limit
+            max_bytes: Abort with UploadTooLargeError past this many bytes
+            part_size: Override the configured part size (bytes, min 5 MiB)
+            max_concurrency: Override the configured number of parallel part uploads
+            hasher: Optional hashlib object updated with every byte read, so the
+                caller gets the content digest without a second pass
+
+        Returns:
+            dict: {
+                'success': bool,
+                'url': str (S3 URL if successful),
+                'key': str,
+                'size': int (bytes uploaded),
+                'parts': int (number of parts, 1 for a single PutObject),
+                'error': str (error message if failed)
+            }
+
+        Raises:
+            UploadTooLargeError: if the stream exceeds max_bytes
+            HTTPException: re-raised from the request stream (e.g. 413 from Werkzeug)
+        """
+        part_size = max(part_size or self.part_size, MIN_PART_SIZE)
+        if content_length:
+            part_size = max(part_size, -(-content_length // MAX_PARTS))
+        max_concurrency = max(max_concurrency or self.max_concurrency, 1)
+        content_type = content_type or 'application/octet-stream'
+
+        upload_id = None
+        executor = None
+        try:
+            chunk = _read_chunk(stream, part_size)
+            total = len(chunk)
+            if hasher is not None:
+                hasher.update(chunk)
+            if max_bytes is not None and total > max_bytes:
+                raise UploadTooLargeError(f"Upload exceeds {max_bytes} bytes")
+
+            # Small body: one request, no multipart bookkeeping
+            if total < part_size:
+                self._call(
+                    'put_object',
+                    transfer=True,
+                    Bucket=self.bucket_name,
+                    Key=s3_key,
+                    Body=chunk,
+                    ContentType=content_type
+                )
+                return {
+                    'success': True,
+                    'url': self.get_file_url(s3_key),
+                    'key': s3_key,
+                    'size': total,
+                    'parts': 1
+                }
+
+            upload_id = self._call(
+                'create_multipart_upload',
+                Bucket=self.bucket_name,
+                Key=s3_key,
+                ContentType=content_type
+            )['UploadId']
+
+            executor = ThreadPoolExecutor(max_workers=max_concurrency)
+            in_flight = BoundedSemaphore(max_concurrency * 2)
+            failures = []
+            futures = []
+            part_number = 1
+
+            def part_done(future):
+                in_flight.release()
+                if not future.cancelled() and future.exception():
+                    failures.append(future.exception())
+
+            while chunk:
+                # Fail fast instead of reading the rest of the body after a part failed
+                if failures:
+                    raise failures[0]
+
+                in_flight.acquire()
+                future = executor.submit(self._upload_part, s3_key, upload_id, part_number, chunk)
+                future.add_done_callback(part_done)
+                futures.append(future)
+
+                part_number += 1
+                chunk = _read_chunk(stream, part_size)
+                total += len(chunk)
+                if hasher is not None:
+                    hasher.update(chunk)
+                if max_bytes is not None and total > max_bytes:
+                    raise UploadTooLargeError(f"Upload exceeds {max_bytes} bytes")
+
+            parts = [future.result() for future in futures]
+            self._call(
+                'complete_multipart_upload',
+                Bucket=self.bucket_name,
+                Key=s3_key,
+                UploadId=upload_id,
+                MultipartUpload={'Parts': parts}
+            )
+
+            return {
+                'success': True,
+                'url': self.get_file_url(s3_key),
+                'key': s3_key,
+                'size': total,
+                'parts': len(parts)
+            }
+
+        except (UploadTooLargeError, HTTPException):
+            self._abort_stream(executor, s3_key, upload_id)
+            raise
+        except ClientError as e:
+            self._abort_stream(executor, s3_key, upload_id)
+            return {
+                'success': False,
+                'error': f"AWS S3 Error: {str(e)}"
+            }
+        except Exception as e:
+            self._abort_stream(executor, s3_key, upload_id)
+            return {
+                'success': False,
+                'error': f"Upload failed: {str(e)}"
+            }
+        finally:
+            if executor:
+                executor.shutdown(wait=True, cancel_futures=True)
+
+    def _abort_stream(self, executor, s3_key, upload_id):
+        """
+        Abort a streamed multipart upload once none of its parts can still land
+
+        Queued parts are cancelled and running ones waited for first: a part
+        that finishes after the abort would be stored, billed and never
+        collected.
+        """
+        if executor:
+            executor.shutdown(wait=True, cancel_futures=True)
+        self.abort_multipart(s3_key, upload_id)
+
+    def _upload_part(self, s3_key, upload_id, part_number, body):
+        """Upload one multipart part and return its completion entry"""
+        response = self._call(
+            'upload_part',
+            transfer=True,
+            Bucket=self.bucket_name,
+            Key=s3_key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=body
+        )
+        return {'PartNumber': part_number, 'ETag': response['ETag']}
+
+    def abort_multipart(self, s3_key, upload_id):
+        """Best-effort abort so failed uploads don't leave billable parts behind"""
+        if not upload_id:
+            return
+        try:
+            self._call(
+                'abort_multipart_upload',
+                Bucket=self.bucket_name,
+                Key=s3_key,
+                UploadId=upload_id
+            )
+        except ClientError:
+            pass
+
+    def part_size_for(self, size):
+        """
+        Part size to use for an object of `size` bytes
+
+        Args:
+            size (int): Object size in bytes
+
+        Returns:
+            int: Configured part size, grown if needed to stay under 10,000 parts
+        """
+        return max(self.part_size, -(-size // MAX_PARTS))
+
+    def presign_post(self, s3_key, content_type, max_bytes, expires_in=None):
+        """
+        Create a presigned POST that only accepts this key, content type and size
+
+        Args:
+            s3_key: Exact key the client may write
+            content_type: Content-Type the client must send
+            max_bytes: Upper bound enforced by S3 through content-length-range
+            expires_in: Lifetime in seconds (default S3_PRESIGN_EXPIRES)
+
+        Returns:
+            dict: {
+                'success': bool,
+                'url': str (form action),
+                'fields': dict (form fields to send before the file),
+                'error': str (error message if failed)
+            }
+        """
+        try:
+            presigned = self.s3_client.generate_presigned_post(
+                Bucket=self.bucket_name,
+                Key=s3_key,
+                Fields={'Content-Type': content_type},
+                Conditions=[
+                    {'Content-Type': content_type},
+                    ['content-length-range', 1, max_bytes]
+                ],
+                ExpiresIn=expires_in or self.presign_expires
+            )
+            return {
+                'success': True,
+                'url': presigned['url'],
+                'fields': presigned['fields']
+            }
+        except ClientError as e:
+            return {
+                'success': False,
+                'error': f"AWS S3 Error: {str(e)}"
+            }
+
+    def presign_multipart(self, s3_key, content_type, size, expires_in=None):
+        """
+        Start a multipart upload and presign a PUT URL for every part
+
+        Args:
+            s3_key: Exact key the client may write
+            content_type: Content-Type stored on the object
+            size: Declared object size in bytes, used to size and count parts
+            expires_in: Lifetime in seconds (default S3_PRESIGN_EXPIRES)
+
+        Returns:
+            dict: {
+                'success': bool,
+                'upload_id': str,
+                'part_size': int,
+                'parts': list of {'part_number': int, 'url': str},
+                'error': str (error message if failed)
+            }
+        """
+        upload_id = None
+        try:
+            part_size = self.part_size_for(size)
+            part_count = max(-(-size // part_size), 1)
+
+            upload_id = self._call(
+                'create_multipart_upload',
+                Bucket=self.bucket_name,
+                Key=s3_key,
+                ContentType=content_type
+            )['UploadId']
+
+            parts = [
+                {
+                    'part_number': part_number,
+                    'url': self.s3_client.generate_presigned_url(
+                        'upload_part',
+                        Params={
+                            'Bucket': self.bucket_name,
+                            'Key': s3_key,
+                            'UploadId': upload_id,
+                            'PartNumber': part_number
+                        },
+                        ExpiresIn=expires_in or self.presign_expires
+                    )
+                }
+                for part_number in range(1, part_count + 1)
+            ]
+
+            return {
+                'success': True,
+                'upload_id': upload_id,
+                'part_size': part_size,
+                'parts': parts
+            }
+        except ClientError as e:
+            self.abort_multipart(s3_key, upload_id)
+            return {
+                'success': False,
+                'error': f"AWS S3 Error: {str(e)}"
+            }
+
+    def complete_multipart(self, s3_key, upload_id, parts):
+        """
+        Complete a client-driven multipart upload
+
+        Args:
+            s3_key: Key of the upload
+            upload_id: Id returned by presign_multipart
+            parts: list of {'part_number': int, 'etag': str} reported by the client
+
+        Returns:
+            dict: {'success': bool, 'error': str}
+        """
+        try:
+            self._call(
+                'complete_multipart_upload',
+                Bucket=self.bucket_name,
+                Key=s3_key,
+                UploadId=upload_id,
+                MultipartUpload={
+                    'Parts': [
+                        {'PartNumber': int(part['part_number']), 'ETag': part['etag']}
+                        for part in sorted(parts, key=lambda part: int(part['part_number']))
+                    ]
+                }
+            )
+            return {'success': True}
+        except ClientError as e:
+            self.abort_multipart(s3_key, upload_id)
+            return {
+                'success': False,
+                'error': f"AWS S3 Error: {str(e)}"
+            }
+
+    def get_file_info(self, s3_key):
+        """
+        Fetch stored metadata of an object without downloading it
+
+        Args:
+            s3_key: Full path to file in S3
+
+        Returns:
+            dict or None: {'size', 'content_type', 'etag'} or None if missing
+        """
+        try:
+            response = self._call('head_object', Bucket=self.bucket_name, Key=s3_key)
+        except ClientError:
+            return None
+        return {
+            'size': response['ContentLength'],
+            'content_type': response.get('ContentType'),
+            'etag': response.get('ETag', '').strip('"')
+        }
+
+    def get_range(self, s3_key, start, end):
+        """
+        Read an inclusive byte range of an object
+
+        Args:
+            s3_key: Full path to file in S3
+            start: First byte offset
+            end: Last byte offset (inclusive)
+
+        Returns:
+            bytes: Object bytes in [start, end]
+
+        Raises:
+            ClientError: if the object is missing or the range is invalid
+        """
+        # The body is read inside the slot: the transfer is not over until then
+        with self._track('get_object', transfer=True):
+            response = self.s3_client.get_object(
+                Bucket=self.bucket_name,
+                Key=s3_key,
+                Range=f"bytes={start}-{end}"
+            )
+            return response['Body'].read()
+
+    def copy_file(self, source_key, s3_key, content_type=None, cache_control=None):
+        """
+        Server-side copy of an object within the bucket (no bytes pass through us)
+
+        Args:
+            source_key: Key to copy from
+            s3_key: Destination key
+            content_type: Content-Type to store on the copy
+            cache_control: Cache-Control header to store on the copy
+
+        Returns:
+            dict: {'success': bool, 'error': str}
+        """
+        extra_args = {'MetadataDirective': 'REPLACE'}
+        if content_type:
+            extra_args['ContentType'] = content_type
+        if cache_control:
+            extra_args['CacheControl'] = cache_control
+
+        try:
+            # Managed copy switches to multipart copy for objects over 5 GB
+            self._call(
+                'copy',
+                transfer=True,
+                CopySource={'Bucket': self.bucket_name, 'Key': source_key},
+                Bucket=self.bucket_name,
+                Key=s3_key,
+                ExtraArgs=extra_args,
+                Config=self.transfer_config
+            )
+            return {'success': True}
+        except ClientError as e:
+            return {
+                'success': False,
+                'error': f"AWS S3 Error: {str(e)}"
+            }
+
     def delete_file(self, s3_key):
         """
         Delete a file from S3 bucket
@@ -80,7 +662,8 @@ class S3Service:
             dict: {'success': bool, 'error': str}
         """
         try:
-            self.s3_client.delete_object(
+            self._call(
+                'delete_object',
                 Bucket=self.bucket_name,
                 Key=s3_key
             )
@@ -96,6 +679,89 @@ class S3Service:
                 'error': f"Delete failed: {str(e)}"
             }
 
+    def delete_files(self, s3_keys):
+        """
+        Delete many objects with DeleteObjects, up to 1000 keys per request
+
+        Args:
+            s3_keys: Iterable of full S3 keys
+
+        Returns:
+            dict: {
+                'success': bool (True if every key was deleted),
+                'deleted': list of deleted keys,
+                'errors': list of {'key', 'code', 'message'},
+                'requests': int (DeleteObjects calls made)
+            }
+        """
+        keys = list(s3_keys)
+        deleted = []
+        errors = []
+        requests = 0
+
+        for start in range(0, len(keys), MAX_KEYS_PER_REQUEST):
+            batch = keys[start:start + MAX_KEYS_PER_REQUEST]
+            requests += 1
+            try:
+                response = self._call(
+                    'delete_objects',
+                    Bucket=self.bucket_name,
+                    Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+                )
+            except ClientError as e:
+                errors.extend({'key': key, 'code': 'ClientError', 'message': str(e)} for key in batch)
+                continue
+
+            # Quiet mode only reports failures; everything else in the batch is gone
+            failed = {
+                error['Key']: error for error in response.get('Errors', [])
+            }
+            for key in batch:
+                if key in failed:
+                    errors.append({
+                        'key': key,
+                        'code': failed[key].get('Code'),
+                        'message': failed[key].get('Message')
+                    })
+                else:
+                    deleted.append(key)
+
+        return {
+            'success': not errors,
+            'deleted': deleted,
+            'errors': errors,
+            'requests': requests
+        }
+
+    def list_files(self, prefix=''):
+        """
+        List objects under a prefix, one page (up to 1000 objects) at a time
+
+        Args:
+            prefix: Key prefix to list (default: whole bucket)
+
+        Yields:
+            list: [{'key': str, 'size': int, 'last_modified': datetime}]
+        """
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        pages = iter(paginator.paginate(
+            Bucket=self.bucket_name,
+            Prefix=prefix,
+            PaginationConfig={'PageSize': MAX_KEYS_PER_REQUEST}
+        ))
+        while True:
+            # Each page is one ListObjectsV2 request, fetched lazily by next()
+            with self._track('list_objects_v2'):
+                page = next(pages, None)
+            if page is None:
+                break
+            contents = page.get('Contents', [])
+            if contents:
+                yield [
+                    {'key': obj['Key'], 'size': obj['Size'], 'last_modified': obj['LastModified']}
+                    for obj in contents
+                ]
+
     def get_file_url(self, s3_key):
         """
         Generate a public URL for a file in S3
@@ -106,6 +772,9 @@ class S3Service:
         Returns:
             str: Public URL
         """
+        if self.endpoint_url:
+            # Path-style URL for S3-compatible stores (MinIO, moto server)
+            return f"{self.endpoint_url.rstrip('/')}/{self.bucket_name}/{s3_key}"
         return f"https://{self.bucket_name}.s3.{os.getenv('AWS_S3_REGION', 'ap-southeast-2')}.amazonaws.com/{s3_key}"
 
 # Singleton instance
@@ -0,0 +1,266 @@
+import os
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from services.s3_service import s3_service
+
+
+# Downloads still being written are named <pid>-<random>.part; ones older than
+# this were left behind by a process that died mid-write
+STALE_PART_SECONDS = 15 * 60
+
+
+class SegmentCache:
+    """
+    Bounded on-disk LRU cache of fixed-size S3 object segments
+
+    Objects are split into `segment_size` byte segments. Each segment is
+    fetched from S3 with a ranged GET the first time it is needed, written to
+    `directory` and served from disk afterwards. The least recently used
+    segments are evicted once the cache holds more than `max_bytes`.
+
+    Segments are keyed by object key and ETag, so overwriting an object never
+    serves stale bytes. Concurrent misses for the same segment share a single
+    origin fetch, and reading segment N schedules a background prefetch of
+    segment N + 1.
+
+    Several worker processes may share `directory`: segments are written to a
+    per-process temporary file and renamed into place, and a process only
+    sweeps temporary files old enough to be abandoned. Each process adopts
+    the segments on disk when it starts and then counts only what it fetches
+    itself, so `max_bytes` bounds each process, not the directory; with N
+    workers the directory can reach about N * max_bytes.
+    """
+
+    def __init__(self, directory, segment_size, max_bytes, origin=None,
+                 prefetch_workers=2, info_ttl=60):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_bytes = max_bytes
+        self.origin = origin or s3_service
+        self.info_ttl = info_ttl
+
+        self._lock = threading.Lock()
+        self._segments = OrderedDict()  # path -> size, oldest first
+        self._in_flight = {}            # path -> threading.Event
+        self._info = OrderedDict()      # s3_key -> (expires_at, info)
+        self._prefetcher = ThreadPoolExecutor(max_workers=prefetch_workers)
+        self._size = 0
+
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'bytes_served': 0,
+            'bytes_from_cache': 0,
+            'bytes_from_origin': 0,
+            'evictions': 0,
+            'prefetches': 0
+        }
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._load_existing()
+
+    def _load_existing(self):
+        """Adopt segments already on disk, oldest first, and sweep abandoned downloads"""
+        found = []
+        stale_before = time.time() - STALE_PART_SECONDS
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                    if name.endswith('.part'):
+                        # Another worker may still be writing a recent one
+                        if stat.st_mtime < stale_before:
+                            os.remove(path)
+                        continue
+                except FileNotFoundError:
+                    # Renamed, swept or evicted by another worker meanwhile
+                    continue
+                found.append((stat.st_mtime, path, stat.st_size))
+
+        for _, path, size in sorted(found):
+            self._segments[path] = size
+            self._size += size
+        self._evict()
+
+    def _segment_path(self, s3_key, etag, index):
+        digest = hashlib.sha1(f"{s3_key}\0{etag}".encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest, str(index))
+
+    def _evict(self):
+        """Drop least recently used segments until under max_bytes. Caller holds the lock."""
+        while self._size > self.max_bytes and self._segments:
+            path, size = self._segments.popitem(last=False)
+            self._size -= size
+            self.stats['evictions'] += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def get_info(self, s3_key):
+        """
+        Size and ETag of an object, cached for info_ttl seconds
+
+        Args:
+            s3_key: Full path to file in S3
+
+        Returns:
+            dict or None: {'size', 'content_type', 'etag'} or None if missing
+        """
+        now = time.monotonic()
+        with self._lock:
+            cached = self._info.get(s3_key)
+            if cached and cached[0] > now:
+                self._info.move_to_end(s3_key)
+                return cached[1]
+
+        info = self.origin.get_file_info(s3_key)
+        if info is not None:
+            with self._lock:
+                self._info[s3_key] = (now + self.info_ttl, info)
+                if len(self._info) > 4096:
+                    self._info.popitem(last=False)
+        return info
+
+    def segment_range(self, index, object_size):
+        """Byte range [start, end) covered by segment `index`"""
+        start = index * self.segment_size
+        return start, min(start + self.segment_size, object_size)
+
+    def get_segment(self, s3_key, info, index, prefetch=True):
+        """
+        Path of a cached segment, fetching it from S3 on a miss
+
+        Args:
+            s3_key: Object key
+            info: Object info from get_info()
+            index: Segment number
+            prefetch: Schedule the following segment in the background.
+                Prefetch calls themselves pass False and are not counted
+                as hits or misses.
+
+        Returns:
+            tuple: (path: str, hit: bool)
+        """
+        path = self._segment_path(s3_key, info['etag'], index)
+
+        while True:
+            with self._lock:
+                if path in self._segments:
+                    self._segments.move_to_end(path)
+                    owner = False
+                    break
+                event = self._in_flight.get(path)
+                if event is None:
+                    self._in_flight[path] = threading.Event()
+                    owner = True
+                    break
+            # Another thread is already fetching this segment
+            event.wait()
+
+        if owner:
+            try:
+                self._fetch(s3_key, info, index, path)
+            finally:
+                with self._lock:
+                    self._in_flight.pop(path).set()
+
+        if prefetch:
+            with self._lock:
+                self.stats['misses' if owner else 'hits'] += 1
+            self.prefetch(s3_key, info, index + 1)
+
+        return path, not owner
+
+    def open_segment(self, s3_key, info, index, served_bytes):
+        """
+        Open a cached segment for reading, fetching it on a miss
+
+        Once opened, the file stays readable even if the segment is evicted.
+
+        Args:
+            s3_key: Object key
+            info: Object info from get_info()
+            index: Segment number
+            served_bytes: Bytes of the segment about to be sent, for stats
+
+        Returns:
+            file: Binary file object positioned at the segment start
+        """
+        while True:
+            path, hit = self.get_segment(s3_key, info, index)
+            try:
+                f = open(path, 'rb')
+            except FileNotFoundError:
+                # Evicted between lookup and open: forget it and fetch again
+                with self._lock:
+                    size = self._segments.pop(path, None)
+                    if size is not None:
+                        self._size -= size
+                continue
+
+            with self._lock:
+                self.stats['bytes_served'] += served_bytes
+                if hit:
+                    self.stats['bytes_from_cache'] += served_bytes
+            return f
+
+    def _fetch(self, s3_key, info, index, path):
+        """Download one segment from S3 into the cache directory"""
+        start, end = self.segment_range(index, info['size'])
+        data = self.origin.get_range(s3_key, start, end - 1)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f"{os.getpid()}-", suffix='.part')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._segments[path] = len(data)
+            self._size += len(data)
+            self.stats['bytes_from_origin'] += len(data)
+            self._evict()
+
+    def prefetch(self, s3_key, info, index):
+        """Warm segment `index` in the background if it exists and is not cached"""
+        if index * self.segment_size >= info['size']:
+            return
+        path = self._segment_path(s3_key, info['etag'], index)
+        with self._lock:
+            if path in self._segments or path in self._in_flight:
+                return
+            self.stats['prefetches'] += 1
+        self._prefetcher.submit(self.get_segment, s3_key, info, index, False)
+
+    def get_stats(self):
+        """
+        Cache counters for monitoring
+
+        Returns:
+            dict: hits, misses, hit_ratio, bytes served (total and straight
+                from cache), bytes fetched from origin, evictions, prefetches,
+                current size and capacity
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats['segments'] = len(self._segments)
+            stats['size_bytes'] = self._size
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+        stats['max_bytes'] = self.max_bytes
+        stats['segment_size'] = self.segment_size
+        return stats
+
+
+# Singleton instance
+segment_cache = SegmentCache(
+    directory=os.getenv('STREAM_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'music-stream-cache')),
+    segment_size=int(os.getenv('STREAM_SEGMENT_KB', 1024)) * 1024,
+    max_bytes=int(os.getenv('STREAM_CACHE_MAX_MB', 1024)) * 1024 * 1024
+)
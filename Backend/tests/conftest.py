@@ -0,0 +1,173 @@
+"""
+Shared fixtures for the test suite
+
+S3 tests run against moto's in-memory S3, so they need no AWS account or
+network access. Services that query MySQL are pointed at an in-memory SQLite
+database holding the tables they touch (see `db`).
+"""
+import sqlite3
+import struct
+import pymysql
+import pytest
+from moto import mock_aws
+
+from services.s3_service import S3Service
+
+
+TEST_BUCKET = 'test-media'
+
+
+@pytest.fixture
+def aws_env(monkeypatch):
+    """Credentials and bucket settings S3Service reads, pointed at nothing real"""
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_S3_REGION', 'us-east-1')
+    monkeypatch.setenv('AWS_S3_BUCKET_NAME', TEST_BUCKET)
+    monkeypatch.delenv('AWS_S3_ENDPOINT_URL', raising=False)
+
+
+@pytest.fixture
+def s3(aws_env):
+    """S3Service backed by moto, with an empty bucket"""
+    with mock_aws():
+        service = S3Service(max_attempts=1)
+        service.s3_client.create_bucket(Bucket=TEST_BUCKET)
+        yield service
+
+
+# SQLite versions of the tables the tested services use (see migrations/)
+SCHEMA = """
+CREATE TABLE MediaObject (
+    MediaID INTEGER PRIMARY KEY AUTOINCREMENT,
+    UserID INT NOT NULL,
+    ObjectKey VARCHAR(512) NOT NULL UNIQUE,
+    ContentType VARCHAR(100) NOT NULL,
+    DeclaredSize BIGINT NOT NULL,
+    SizeBytes BIGINT NULL,
+    ETag VARCHAR(100) NULL,
+    UploadID VARCHAR(255) NULL,
+    Status VARCHAR(10) NOT NULL DEFAULT 'Pending',
+    CreatedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CompletedAt DATETIME NULL,
+    MediaFormat VARCHAR(20) NULL,
+    DurationSeconds DECIMAL(10, 3) NULL,
+    BitrateBps INT NULL,
+    SampleRateHz INT NULL
+);
+CREATE TABLE MediaBlob (
+    Digest CHAR(64) NOT NULL PRIMARY KEY,
+    ObjectKey VARCHAR(512) NOT NULL,
+    SizeBytes BIGINT NOT NULL,
+    ContentType VARCHAR(100) NOT NULL
+);
+CREATE TABLE MediaBlobRef (
+    RefID INTEGER PRIMARY KEY AUTOINCREMENT,
+    Digest CHAR(64) NOT NULL,
+    UserID INT NOT NULL
+);
+CREATE TABLE Song (
+    SongID INTEGER PRIMARY KEY AUTOINCREMENT,
+    AudioKey VARCHAR(512) NULL
+);
+"""
+
+
+class SqliteCursor:
+    """The part of the PyMySQL cursor API the services use, on SQLite"""
+
+    def __init__(self, cursor, as_dict):
+        self._cursor = cursor
+        self._as_dict = as_dict
+        self.lastrowid = None
+        self.rowcount = -1
+
+    @staticmethod
+    def _translate(query):
+        return (query.replace('%s', '?')
+                     .replace('NOW()', 'CURRENT_TIMESTAMP')
+                     .replace('FOR UPDATE', ''))
+
+    def execute(self, query, params=()):
+        try:
+            self._cursor.execute(self._translate(query), tuple(params or ()))
+        except sqlite3.Error as e:
+            raise pymysql.Error(str(e))
+        self.lastrowid = self._cursor.lastrowid
+        self.rowcount = self._cursor.rowcount
+        return self.rowcount
+
+    def _row(self, row):
+        if row is None or not self._as_dict:
+            return row
+        return {column[0]: value for column, value in zip(self._cursor.description, row)}
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def close(self):
+        self._cursor.close()
+
+
+class SqliteConnection:
+    """A PyMySQL-like connection on a shared SQLite database; close() keeps it open"""
+
+    def __init__(self, database):
+        self._database = database
+
+    def cursor(self, cursor_class=None):
+        return SqliteCursor(self._database.cursor(), cursor_class is pymysql.cursors.DictCursor)
+
+    def commit(self):
+        self._database.commit()
+
+    def rollback(self):
+        self._database.rollback()
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def db():
+    """
+    In-memory database with SCHEMA
+
+    Returns a connection factory to use in place of get_db_connection; call
+    it for a connection to seed or inspect rows.
+    """
+    database = sqlite3.connect(':memory:', check_same_thread=False)
+    database.executescript(SCHEMA)
+    yield lambda: SqliteConnection(database)
+    database.close()
+
+
+def query(connect, sql, params=()):
+    connection = connect()
+    cursor = connection.cursor(pymysql.cursors.DictCursor)
+    cursor.execute(sql, params)
+    rows = cursor.fetchall()
+    connection.commit()
+    return rows
+
+
+def list_keys(service, prefix=''):
+    response = service.s3_client.list_objects_v2(Bucket=TEST_BUCKET, Prefix=prefix)
+    return sorted(item['Key'] for item in response.get('Contents', []))
+
+
+def open_multipart_uploads(service):
+    return service.s3_client.list_multipart_uploads(Bucket=TEST_BUCKET).get('Uploads', [])
+
+
+def wav(size):
+    """A 16-bit stereo 44.1 kHz WAV file of exactly `size` bytes"""
+    header = (
+        b'RIFF' + struct.pack('<I', size - 8) + b'WAVE'
+        + b'fmt ' + struct.pack('<IHHIIHH', 16, 1, 2, 44100, 176400, 4, 16)
+        + b'data' + struct.pack('<I', size - 44)
+    )
+    return header + bytes(size - len(header))
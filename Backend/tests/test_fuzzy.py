@@ -0,0 +1,54 @@
+"""
+TrigramIndex candidate generation and edit distance
+"""
+import pytest
+
+from app.search.fuzzy import TrigramIndex, edit_distance
+
+
+def index(*words):
+    trigrams = TrigramIndex()
+    for word in words:
+        trigrams.add(word)
+    return trigrams
+
+
+def matched(trigrams, word):
+    return [(distance, trigrams._words[number]) for distance, number in trigrams.match(word)]
+
+
+@pytest.mark.parametrize('typo', ['tnug', 'utng', 'tugn'])
+def test_adjacent_swap_is_one_edit(typo):
+    assert edit_distance(typo, 'tung') == 1
+    assert matched(index('tung', 'tong', 'sung'), typo) == [(1, 'tung')]
+
+
+def test_swap_in_a_longer_word():
+    assert matched(index('ballad', 'salad'), 'blalad') == [(1, 'ballad')]
+
+
+@pytest.mark.parametrize('typo, expected', [('tun', 'tung'), ('tungg', 'tung'), ('tang', 'tung')])
+def test_single_edits(typo, expected):
+    assert matched(index('tung', 'rock'), typo) == [(1, expected)]
+
+
+def test_two_edits_only_for_longer_words():
+    trigrams = index('melody', 'ton')
+
+    assert matched(trigrams, 'mellodi') == [(2, 'melody')]
+    assert matched(trigrams, 'tnn') == []
+
+
+def test_one_edit_corrections_win():
+    assert matched(index('harmony', 'harmonic'), 'harmoni') == [(1, 'harmony'), (1, 'harmonic')]
+
+
+def test_the_word_itself_is_not_a_match():
+    assert matched(index('tung'), 'tung') == []
+
+
+def test_rank_orders_equally_close_words():
+    trigrams = index('tang', 'tong')
+    plays = {0: 5, 1: 50}
+
+    assert trigrams.match('tung', rank=lambda number: -plays[number]) == [(1, 1), (1, 0)]
@@ -0,0 +1,181 @@
+"""
+JamendoService._get against a local http.server stand-in for the Jamendo API
+"""
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from services.jamendo_service import JamendoService
+from services.response_cache import ResponseCache
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps the connection open between requests
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests.append((time.monotonic(), self.path))
+            status, headers, delay = self.server.script.pop(0) if self.server.script else (200, {}, 0)
+        if delay:
+            time.sleep(delay)
+
+        # Known tracks are echoed back by ID, like /tracks/?id=1+2+3
+        ids = parse_qs(urlsplit(self.path).query).get('id', [''])[0].split()
+        results = [{'id': int(track_id)} for track_id in ids if track_id in self.server.known]
+        if not ids:
+            results = [{'id': len(self.server.requests)}]
+        body = json.dumps({'headers': {'status': 'success'}, 'results': results})
+        body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    """
+    Stub API server
+
+    Append (status, headers, delay) to .script to shape the next responses;
+    track IDs in .known are found by ?id= lookups.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.connections = 0
+    server.requests = []
+    server.script = []
+    server.known = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def make_service(stub, tmp_path, monkeypatch):
+    monkeypatch.setenv('JAMENDO_API_BASEURL', f"http://127.0.0.1:{stub.server_address[1]}/v3.0")
+    services = []
+
+    def make(**options):
+        options = {'backoff_base': 0.01, 'backoff_max': 4, 'deadline': 10, **options}
+        service = JamendoService(cache=ResponseCache(path=str(tmp_path / 'cache.sqlite3')), **options)
+        services.append(service)
+        return service
+
+    yield make
+    for service in services:
+        service.session.close()
+
+
+def test_calls_reuse_one_keep_alive_connection(stub, make_service):
+    service = make_service()
+
+    results = [service.list_tracks(offset=offset) for offset in range(0, 600, 200)]
+
+    assert all(result['results'] for result in results)
+    assert len(stub.requests) == 3
+    assert stub.connections == 1
+    assert service.get_stats()['requests'] == 3
+
+
+def test_retries_429_after_retry_after(stub, make_service):
+    stub.script = [(429, {'Retry-After': '1'}, 0)]
+    service = make_service()
+
+    result = service.list_tracks()
+
+    assert result['results']
+    (first, _), (second, _) = stub.requests
+    assert second - first >= 1
+    stats = service.get_stats()
+    assert (stats['requests'], stats['errors'], stats['retries'], stats['failures']) == (2, 1, 1, 0)
+
+
+@pytest.mark.parametrize('status', [500, 502, 503, 504])
+def test_retries_server_errors(stub, make_service, status):
+    stub.script = [(status, {}, 0), (status, {}, 0)]
+    service = make_service(max_retries=3)
+
+    assert service.list_tracks()['results']
+    assert len(stub.requests) == 3
+    assert stub.connections == 1
+
+
+def test_gives_up_after_the_retry_budget(stub, make_service):
+    stub.script = [(503, {}, 0)] * 10
+    service = make_service(max_retries=2)
+
+    assert service.list_tracks() is None
+    assert len(stub.requests) == 3
+    stats = service.get_stats()
+    assert (stats['retries'], stats['failures']) == (2, 1)
+
+
+def test_gives_up_when_retry_after_passes_the_deadline(stub, make_service):
+    stub.script = [(429, {'Retry-After': '3'}, 0)]
+    service = make_service(deadline=1)
+
+    started = time.monotonic()
+    assert service.list_tracks() is None
+    assert time.monotonic() - started < 1
+    assert len(stub.requests) == 1
+
+
+def test_client_errors_are_not_retried(stub, make_service):
+    stub.script = [(404, {}, 0)]
+    service = make_service()
+
+    assert service.list_tracks() is None
+    assert len(stub.requests) == 1
+    assert service.get_stats()['retries'] == 0
+
+
+def test_per_call_timeout_overrides_the_default(stub, make_service):
+    stub.script = [(200, {}, 1)]
+    service = make_service(read_timeout=10, max_retries=0)
+
+    started = time.monotonic()
+    assert service.list_tracks(timeout=(1, 0.2)) is None
+    assert time.monotonic() - started < 0.9
+    assert service.get_stats()['failures'] == 1
+
+
+def test_timed_out_attempt_is_retried(stub, make_service):
+    stub.script = [(200, {}, 1)]
+    service = make_service(read_timeout=0.2, max_retries=1)
+
+    assert service.list_tracks()['results']
+    assert len(stub.requests) == 2
+    assert service.get_stats()['retries'] == 1
+
+
+def test_tracks_by_ids_batches_and_caches_found_tracks(stub, make_service):
+    stub.known = {'1', '2'}
+    stub.script = [(503, {}, 0)]
+    service = make_service(max_retries=0)
+
+    assert service.get_tracks_by_ids(['1', '3']) == {}
+    assert service.get_tracks_by_ids(['1', '3', '1']) == {'1': {'id': 1}}
+    assert service.get_tracks_by_ids(['1', '2']) == {'1': {'id': 1}, '2': {'id': 2}}
+    # Only found tracks are cached: 3 is asked again, 1 is not
+    requested = [parse_qs(urlsplit(path).query)['id'][0].split() for _, path in stub.requests]
+    assert requested == [['1', '3'], ['1', '3'], ['2']]
@@ -0,0 +1,150 @@
+"""
+MediaGarbageCollector against moto's S3 and an in-memory database
+"""
+from datetime import timedelta
+
+import pytest
+
+import services.s3_service as s3_module
+from app.uploads.gc import MediaGarbageCollector
+from conftest import list_keys, query
+
+
+DIGEST_KEPT = 'a' * 64
+DIGEST_UNUSED = 'b' * 64
+
+TRACKED = 'media/artists/1/0001/track.wav'
+SONG_AUDIO = 'media/artists/1/0002/song.mp3'
+BLOB_KEPT = f"cas/aa/{DIGEST_KEPT}"
+BLOB_UNUSED = f"cas/bb/{DIGEST_UNUSED}"
+ORPHANS = ['media/artists/1/0003/orphan.wav', 'media/artists/2/0004/orphan.flac', 'staging/left-behind']
+FORM_UPLOAD = 'uploads/songs/form.mp3'
+
+
+@pytest.fixture
+def bucket(s3, db):
+    for key in [TRACKED, SONG_AUDIO, BLOB_KEPT, BLOB_UNUSED, FORM_UPLOAD] + ORPHANS:
+        s3.s3_client.put_object(Bucket=s3.bucket_name, Key=key, Body=b'x' * 100)
+
+    query(db, "INSERT INTO MediaObject (UserID, ObjectKey, ContentType, DeclaredSize) VALUES (1, %s, 'audio/wav', 100)",
+          (TRACKED,))
+    query(db, "INSERT INTO Song (AudioKey) VALUES (%s)", (SONG_AUDIO,))
+    query(db, "INSERT INTO MediaBlob (Digest, ObjectKey, SizeBytes, ContentType) VALUES (%s, %s, 100, 'audio/wav')",
+          (DIGEST_KEPT, BLOB_KEPT))
+    query(db, "INSERT INTO MediaBlob (Digest, ObjectKey, SizeBytes, ContentType) VALUES (%s, %s, 100, 'audio/wav')",
+          (DIGEST_UNUSED, BLOB_UNUSED))
+    query(db, "INSERT INTO MediaBlobRef (Digest, UserID) VALUES (%s, 1)", (DIGEST_KEPT,))
+    return s3
+
+
+def age_objects(monkeypatch, service, fresh=()):
+    """Make every object two days old, except the keys in `fresh`"""
+    list_files = service.list_files
+
+    def aged(prefix=''):
+        for page in list_files(prefix):
+            yield [
+                obj if obj['key'] in fresh else dict(obj, last_modified=obj['last_modified'] - timedelta(days=2))
+                for obj in page
+            ]
+
+    monkeypatch.setattr(service, 'list_files', aged)
+
+
+def fail_deletes(monkeypatch, service, keys):
+    """Make DeleteObjects report AccessDenied for `keys` and delete the rest"""
+    delete_objects = service.s3_client.delete_objects
+    calls = []
+
+    def partial(**kwargs):
+        objects = kwargs['Delete']['Objects']
+        calls.append([obj['Key'] for obj in objects])
+        kwargs['Delete']['Objects'] = [obj for obj in objects if obj['Key'] not in keys]
+        response = delete_objects(**kwargs) if kwargs['Delete']['Objects'] else {}
+        response.setdefault('Errors', []).extend(
+            {'Key': obj['Key'], 'Code': 'AccessDenied', 'Message': 'Access Denied'}
+            for obj in objects if obj['Key'] in keys
+        )
+        return response
+
+    monkeypatch.setattr(service.s3_client, 'delete_objects', partial)
+    return calls
+
+
+def test_deletes_only_unreferenced_objects(bucket, db, monkeypatch):
+    age_objects(monkeypatch, bucket)
+
+    report = MediaGarbageCollector(storage=bucket, connect=db).run()
+
+    assert sorted(report['sample']) == sorted(ORPHANS + [BLOB_UNUSED])
+    assert report['deleted_objects'] == report['orphaned_objects'] == 4
+    assert report['freed_bytes'] == 400
+    assert report['blob_rows_removed'] == 1
+    assert not report['errors']
+    assert list_keys(bucket) == sorted([TRACKED, SONG_AUDIO, BLOB_KEPT, FORM_UPLOAD])
+    assert [row['Digest'] for row in query(db, "SELECT Digest FROM MediaBlob")] == [DIGEST_KEPT]
+
+
+def test_objects_within_the_grace_period_are_kept(bucket, db, monkeypatch):
+    age_objects(monkeypatch, bucket, fresh={ORPHANS[0], BLOB_UNUSED})
+
+    report = MediaGarbageCollector(storage=bucket, connect=db, min_age=timedelta(hours=24)).run()
+
+    assert sorted(report['sample']) == sorted(ORPHANS[1:])
+    assert ORPHANS[0] in list_keys(bucket)
+    assert BLOB_UNUSED in list_keys(bucket)
+    assert len(query(db, "SELECT Digest FROM MediaBlob")) == 2
+
+
+def test_nothing_is_collected_before_the_grace_period(bucket, db):
+    report = MediaGarbageCollector(storage=bucket, connect=db).run()
+
+    assert report['scanned_objects'] == 7
+    assert report['orphaned_objects'] == 0
+    assert len(list_keys(bucket)) == 8
+
+
+def test_dry_run_deletes_nothing(bucket, db, monkeypatch):
+    age_objects(monkeypatch, bucket)
+
+    report = MediaGarbageCollector(storage=bucket, connect=db, dry_run=True).run()
+
+    assert report['orphaned_objects'] == 4
+    assert report['deleted_objects'] == report['delete_requests'] == 0
+    assert len(list_keys(bucket)) == 8
+    assert len(query(db, "SELECT Digest FROM MediaBlob")) == 2
+
+
+def test_delete_files_batches_and_reports_partial_failures(s3, monkeypatch):
+    monkeypatch.setattr(s3_module, 'MAX_KEYS_PER_REQUEST', 2)
+    keys = [f"media/artists/1/{i}/x" for i in range(5)]
+    for key in keys:
+        s3.s3_client.put_object(Bucket=s3.bucket_name, Key=key, Body=b'x')
+    calls = fail_deletes(monkeypatch, s3, {keys[1], keys[4]})
+
+    result = s3.delete_files(iter(keys))
+
+    assert calls == [keys[0:2], keys[2:4], keys[4:5]]
+    assert result['requests'] == 3
+    assert not result['success']
+    assert result['deleted'] == [keys[0], keys[2], keys[3]]
+    assert [(error['key'], error['code']) for error in result['errors']] == [
+        (keys[1], 'AccessDenied'), (keys[4], 'AccessDenied')
+    ]
+    assert list_keys(s3) == [keys[1], keys[4]]
+
+
+def test_failed_deletes_keep_their_blob_rows(bucket, db, monkeypatch):
+    monkeypatch.setattr(s3_module, 'MAX_KEYS_PER_REQUEST', 2)
+    age_objects(monkeypatch, bucket)
+    fail_deletes(monkeypatch, bucket, {BLOB_UNUSED, ORPHANS[2]})
+
+    report = MediaGarbageCollector(storage=bucket, connect=db).run()
+
+    assert report['orphaned_objects'] == 4
+    assert report['deleted_objects'] == 2
+    assert report['freed_bytes'] == 200
+    assert sorted(error['key'] for error in report['errors']) == sorted([BLOB_UNUSED, ORPHANS[2]])
+    assert report['blob_rows_removed'] == 0
+    assert len(query(db, "SELECT Digest FROM MediaBlob")) == 2
+    assert BLOB_UNUSED in list_keys(bucket) and ORPHANS[2] in list_keys(bucket)
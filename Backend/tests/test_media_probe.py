@@ -0,0 +1,277 @@
+"""
+Container parsers of services/media_probe.py on small hand-built headers
+"""
+import io
+import struct
+
+import pytest
+
+from services.media_probe import (
+    MAX_PROBE_BYTES, MediaProbeError, check, probe, required_probe_bytes, sniff_file, sniff_stream
+)
+from conftest import wav
+
+
+# ---------------------------------------------------------------------------
+# Builders
+# ---------------------------------------------------------------------------
+
+# MPEG-1 Layer III, 128 kbit/s, 44.1 kHz, stereo: 417-byte frames
+MP3_FRAME = b'\xff\xfb\x90\x00'.ljust(417, b'\x00')
+
+
+def id3(body_size):
+    """An ID3v2.4 tag header announcing `body_size` bytes, followed by them"""
+    syncsafe = bytes((body_size >> shift) & 0x7F for shift in (21, 14, 7, 0))
+    return b'ID3\x04\x00\x00' + syncsafe + bytes(body_size)
+
+
+def flac(sample_rate=44100, channels=2, total_samples=441000):
+    packed = (sample_rate << 44) | ((channels - 1) << 41) | (15 << 36) | total_samples
+    streaminfo = struct.pack('>HH', 4096, 4096) + b'\x00' * 6 + packed.to_bytes(8, 'big') + bytes(16)
+    return b'fLaC' + b'\x80' + len(streaminfo).to_bytes(3, 'big') + streaminfo
+
+
+def box(box_type, payload):
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+
+def mp4(timescale=1000, duration=30000, brand=b'isom'):
+    mvhd = box(b'mvhd', b'\x00' * 4 + struct.pack('>IIII', 0, 0, timescale, duration) + bytes(80))
+    return box(b'ftyp', brand + b'\x00\x00\x02\x00' + brand) + box(b'moov', mvhd) + box(b'mdat', bytes(64))
+
+
+def ebml(element_id, payload):
+    size = len(payload)
+    assert size < 127
+    return element_id + bytes([0x80 | size]) + payload
+
+
+def webm(doc_type=b'webm', duration_ms=12000.0):
+    header = ebml(b'\x1a\x45\xdf\xa3', ebml(b'\x42\x82', doc_type))
+    info = ebml(b'\x15\x49\xa9\x66', ebml(b'\x2a\xd7\xb1', (1000000).to_bytes(3, 'big'))
+                + ebml(b'\x44\x89', struct.pack('>d', duration_ms)))
+    audio = ebml(b'\xe1', ebml(b'\xb5', struct.pack('>d', 48000.0)) + ebml(b'\x9f', b'\x02'))
+    tracks = ebml(b'\x16\x54\xae\x6b', ebml(b'\xae', audio))
+    segment = b'\x18\x53\x80\x67' + b'\x01\xff\xff\xff\xff\xff\xff\xff' + info + tracks
+    return header + segment
+
+
+def avi(usec_per_frame=40000, frames=250):
+    avih = struct.pack('<IIIII', usec_per_frame, 0, 0, 0, frames) + bytes(36)
+    hdrl = b'hdrl' + b'avih' + struct.pack('<I', len(avih)) + avih
+    return b'RIFF' + struct.pack('<I', 4 + 8 + len(hdrl)) + b'AVI ' + b'LIST' + struct.pack('<I', len(hdrl)) + hdrl
+
+
+# ---------------------------------------------------------------------------
+# MP3
+# ---------------------------------------------------------------------------
+
+def test_mp3_frames():
+    data = MP3_FRAME * 10
+
+    info = check(data, 'track.mp3', 'audio/mpeg', total_size=len(data))
+
+    assert (info['format'], info['sample_rate'], info['channels'], info['bitrate']) == ('mp3', 44100, 2, 128000)
+    assert info['duration'] == pytest.approx(len(data) * 8 / 128000, abs=0.001)
+
+
+def test_mp3_behind_an_id3_tag():
+    data = id3(1000) + MP3_FRAME * 4
+
+    assert probe(data, len(data))['format'] == 'mp3'
+
+
+def test_single_sync_word_is_not_an_mp3():
+    data = MP3_FRAME + b'not another frame header' * 20
+
+    with pytest.raises(MediaProbeError):
+        probe(data)
+
+
+@pytest.mark.parametrize('after_tag', [b'', b'plain text, not audio' * 10, wav(1024)])
+def test_id3_tag_without_a_frame_is_rejected(after_tag):
+    data = id3(2000) + after_tag
+
+    with pytest.raises(MediaProbeError, match='not followed by an MPEG audio frame'):
+        check(data, 'track.mp3', 'audio/mpeg', total_size=len(data))
+
+
+def test_id3_tag_cut_short_is_rejected():
+    data = id3(200000)[:50000]
+
+    with pytest.raises(MediaProbeError):
+        probe(data)
+
+
+def test_id3_tag_past_the_probe_limit_is_rejected():
+    data = id3(MAX_PROBE_BYTES) + MP3_FRAME * 2
+
+    with pytest.raises(MediaProbeError, match='too large'):
+        sniff_stream(io.BytesIO(data), 'track.mp3', 'audio/mpeg', len(data))
+
+
+def test_stream_reads_past_a_large_id3_tag():
+    tag = id3(300000)
+    data = tag + MP3_FRAME * 4
+
+    assert required_probe_bytes(data[:10]) == len(tag) + 4096
+    stream = sniff_stream(io.BytesIO(data), 'track.mp3', 'audio/mpeg', len(data))
+
+    assert stream.info['format'] == 'mp3'
+    assert stream.read() == data
+
+
+# ---------------------------------------------------------------------------
+# WAV and AVI
+# ---------------------------------------------------------------------------
+
+def test_wav():
+    info = check(wav(176444), 'take.wav', 'audio/wav', total_size=176444)
+
+    assert (info['format'], info['sample_rate'], info['channels']) == ('wav', 44100, 2)
+    assert info['bitrate'] == 176400 * 8
+    assert info['duration'] == 1.0
+
+
+def test_wav_with_unset_data_size_uses_the_file_size():
+    data = bytearray(wav(176444 + 44))
+    data[40:44] = b'\xff\xff\xff\xff'
+
+    assert probe(bytes(data), total_size=len(data))['duration'] == pytest.approx(1.0, abs=0.001)
+
+
+def test_riff_that_is_neither_wav_nor_avi_is_rejected():
+    data = b'RIFF' + struct.pack('<I', 100) + b'WEBP' + bytes(100)
+
+    with pytest.raises(MediaProbeError):
+        probe(data)
+
+
+def test_avi():
+    info = check(avi(), 'clip.avi', 'video/x-msvideo', total_size=1000000)
+
+    assert info['format'] == 'avi'
+    assert info['duration'] == 10.0
+
+
+def test_wav_named_avi_is_rejected():
+    with pytest.raises(MediaProbeError, match='does not match'):
+        check(wav(4096), 'clip.avi')
+
+
+# ---------------------------------------------------------------------------
+# FLAC
+# ---------------------------------------------------------------------------
+
+def test_flac():
+    info = check(flac(), 'track.flac', 'audio/flac', total_size=2000000)
+
+    assert (info['format'], info['sample_rate'], info['channels'], info['duration']) == ('flac', 44100, 2, 10.0)
+    assert info['bitrate'] == 1600000
+
+
+def test_flac_behind_an_id3_tag():
+    assert probe(id3(100) + flac())['format'] == 'flac'
+
+
+def test_flac_declared_as_mp3_is_rejected():
+    with pytest.raises(MediaProbeError, match='does not match'):
+        check(flac(), 'track.mp3', 'audio/mpeg')
+
+
+def test_truncated_flac_has_no_stream_info():
+    info = probe(flac()[:12])
+
+    assert info['format'] == 'flac'
+    assert info['duration'] is None
+
+
+# ---------------------------------------------------------------------------
+# MP4 / MOV
+# ---------------------------------------------------------------------------
+
+def test_mp4_with_moov_up_front():
+    info = check(mp4(), 'clip.mp4', 'video/mp4', total_size=375000)
+
+    assert info['format'] == 'mp4'
+    assert info['duration'] == 30.0
+    assert info['bitrate'] == 100000
+
+
+def test_quicktime_brand():
+    assert check(mp4(brand=b'qt  '), 'clip.mov', 'video/quicktime')['format'] == 'mov'
+
+
+def test_mp4_with_moov_at_the_end_has_no_duration():
+    data = box(b'ftyp', b'isom\x00\x00\x02\x00isom') + box(b'mdat', bytes(256))
+
+    assert probe(data)['duration'] is None
+
+
+def test_mp4_named_webm_is_rejected():
+    with pytest.raises(MediaProbeError, match='does not match'):
+        check(mp4(), 'clip.webm')
+
+
+def test_box_with_a_bad_size_stops_parsing():
+    data = box(b'ftyp', b'isom\x00\x00\x02\x00isom') + struct.pack('>I4s', 4, b'moov') + bytes(32)
+
+    info = probe(data)
+
+    assert info['format'] == 'mp4'
+    assert info['duration'] is None
+
+
+# ---------------------------------------------------------------------------
+# Matroska / WebM
+# ---------------------------------------------------------------------------
+
+def test_webm():
+    info = check(webm(), 'clip.webm', 'video/webm', total_size=150000)
+
+    assert (info['format'], info['duration'], info['sample_rate'], info['channels']) == ('webm', 12.0, 48000, 2)
+    assert info['bitrate'] == 100000
+
+
+def test_matroska_doc_type():
+    assert check(webm(doc_type=b'matroska'), 'clip.mkv', 'video/x-matroska')['format'] == 'matroska'
+
+
+def test_matroska_named_webm_is_rejected():
+    with pytest.raises(MediaProbeError, match='does not match'):
+        check(webm(doc_type=b'matroska'), 'clip.webm', 'video/webm')
+
+
+def test_truncated_ebml_header_keeps_the_format_only():
+    info = probe(webm()[:6])
+
+    assert info['format'] == 'matroska'
+    assert info['duration'] is None
+
+
+# ---------------------------------------------------------------------------
+# Declarations
+# ---------------------------------------------------------------------------
+
+def test_unknown_bytes_are_rejected():
+    with pytest.raises(MediaProbeError, match='Unrecognized'):
+        probe(b'<html><body>hello</body></html>')
+
+
+@pytest.mark.parametrize('filename, content_type, message', [
+    ('track.exe', None, "extension '.exe'"),
+    ('track.mp3', 'text/html', "Content type 'text/html'"),
+    ('track.mp3', 'audio/flac', 'disagree'),
+])
+def test_bad_declarations_fail_before_probing(filename, content_type, message):
+    with pytest.raises(MediaProbeError, match=message):
+        check(b'', filename, content_type)
+
+
+def test_sniff_file_rewinds():
+    data = flac()
+    file_obj = io.BytesIO(data)
+
+    assert sniff_file(file_obj, 'track.flac', 'audio/flac')['format'] == 'flac'
+    assert file_obj.tell() == 0
@@ -0,0 +1,183 @@
+"""
+Presigned uploads end to end: presign, upload from the client, /complete
+
+The client side talks to the presigned URLs with requests, which moto
+intercepts like the boto3 calls.
+"""
+import pytest
+import requests
+from botocore.exceptions import ClientError
+
+import app.uploads.services as upload_services
+from app.uploads.services import UploadService
+from conftest import list_keys, open_multipart_uploads, query, wav
+
+
+USER_ID = 7
+MiB = 1024 * 1024
+
+
+@pytest.fixture
+def uploads(s3, db, monkeypatch):
+    monkeypatch.setattr(upload_services, 's3_service', s3)
+    monkeypatch.setattr(upload_services, 'get_db_connection', db)
+    return s3
+
+
+def media_rows(db):
+    return query(db, "SELECT ObjectKey, Status, SizeBytes, ETag, MediaFormat FROM MediaObject")
+
+
+def post_upload(upload, body):
+    response = requests.post(
+        upload['url'],
+        data=upload['fields'],
+        files={'file': ('track.wav', body, upload['content_type'])}
+    )
+    assert response.status_code in (200, 204), response.text
+
+
+def put_parts(upload, body):
+    parts = []
+    for part in upload['parts']:
+        start = (part['part_number'] - 1) * upload['part_size']
+        response = requests.put(part['url'], data=body[start:start + upload['part_size']])
+        assert response.status_code == 200, response.text
+        parts.append({'part_number': part['part_number'], 'etag': response.headers['ETag']})
+    return parts
+
+
+def test_post_upload_completes(uploads, db):
+    body = wav(64 * 1024)
+    success, upload = UploadService.create_presigned_upload(USER_ID, 'track.wav', 'audio/wav', len(body))
+    assert success and upload['method'] == 'post'
+    assert media_rows(db)[0]['Status'] == 'Pending'
+
+    post_upload(upload, body)
+    success, result = UploadService.complete_presigned_upload(USER_ID, upload['key'])
+
+    assert success, result
+    assert result['size'] == len(body)
+    assert result['media']['format'] == 'wav'
+    row = media_rows(db)[0]
+    assert (row['Status'], row['SizeBytes'], row['MediaFormat']) == ('Ready', len(body), 'wav')
+
+
+def test_multipart_upload_completes(uploads, db):
+    body = wav(12 * MiB)
+    success, upload = UploadService.create_presigned_upload(
+        USER_ID, 'track.wav', 'audio/wav', len(body), multipart=True
+    )
+    assert success and upload['method'] == 'multipart'
+    assert len(upload['parts']) == 2
+
+    parts = put_parts(upload, body)
+    success, result = UploadService.complete_presigned_upload(USER_ID, upload['key'], parts)
+
+    assert success, result
+    assert result['size'] == len(body)
+    assert media_rows(db)[0]['Status'] == 'Ready'
+    assert not open_multipart_uploads(uploads)
+    assert uploads.s3_client.get_object(Bucket=uploads.bucket_name, Key=upload['key'])['Body'].read() == body
+
+
+def test_completing_twice_is_rejected(uploads, db):
+    body = wav(4096)
+    _, upload = UploadService.create_presigned_upload(USER_ID, 'track.wav', 'audio/wav', len(body))
+    post_upload(upload, body)
+    assert UploadService.complete_presigned_upload(USER_ID, upload['key'])[0]
+
+    success, error = UploadService.complete_presigned_upload(USER_ID, upload['key'])
+
+    assert not success
+    assert 'already' in error
+
+
+def test_size_mismatch_deletes_object_and_record(uploads, db):
+    declared = wav(64 * 1024)
+    _, upload = UploadService.create_presigned_upload(USER_ID, 'track.wav', 'audio/wav', len(declared))
+
+    post_upload(upload, declared[:-1024])
+    success, error = UploadService.complete_presigned_upload(USER_ID, upload['key'])
+
+    assert not success
+    assert 'does not match' in error
+    assert not list_keys(uploads)
+    assert not media_rows(db)
+
+
+def test_content_that_is_not_the_declared_media_is_rejected(uploads, db):
+    body = b'not a wav file'.ljust(4096, b'.')
+    _, upload = UploadService.create_presigned_upload(USER_ID, 'track.wav', 'audio/wav', len(body))
+
+    post_upload(upload, body)
+    success, error = UploadService.complete_presigned_upload(USER_ID, upload['key'])
+
+    assert not success
+    assert 'does not match' in error
+    assert not list_keys(uploads)
+    assert not media_rows(db)
+
+
+def test_wrong_part_etag_aborts_upload_and_drops_record(uploads, db):
+    body = wav(12 * MiB)
+    _, upload = UploadService.create_presigned_upload(
+        USER_ID, 'track.wav', 'audio/wav', len(body), multipart=True
+    )
+    parts = put_parts(upload, body)
+    parts[1]['etag'] = '"00000000000000000000000000000000"'
+
+    success, error = UploadService.complete_presigned_upload(USER_ID, upload['key'], parts)
+
+    assert not success
+    assert 'do not match' in error
+    assert not open_multipart_uploads(uploads)
+    assert not list_keys(uploads)
+    assert not media_rows(db)
+
+
+def test_expired_multipart_upload_is_not_found(uploads, db, monkeypatch):
+    body = wav(12 * MiB)
+    _, upload = UploadService.create_presigned_upload(
+        USER_ID, 'track.wav', 'audio/wav', len(body), multipart=True
+    )
+    parts = put_parts(upload, body)
+    # What a bucket lifecycle rule does to incomplete uploads once they expire
+    uploads.abort_multipart(upload['key'], upload['upload_id'])
+
+    def no_such_upload(**kwargs):
+        # moto fails with a KeyError here; S3 answers NoSuchUpload
+        raise ClientError(
+            {'Error': {'Code': 'NoSuchUpload', 'Message': 'The specified upload does not exist.'}},
+            'CompleteMultipartUpload'
+        )
+
+    monkeypatch.setattr(uploads.s3_client, 'complete_multipart_upload', no_such_upload)
+
+    success, error = UploadService.complete_presigned_upload(USER_ID, upload['key'], parts)
+
+    assert not success
+    assert 'not found' in error.lower()
+    assert not media_rows(db)
+
+
+def test_post_upload_that_never_arrived_is_not_found(uploads, db):
+    _, upload = UploadService.create_presigned_upload(USER_ID, 'track.wav', 'audio/wav', 4096)
+
+    success, error = UploadService.complete_presigned_upload(USER_ID, upload['key'])
+
+    assert not success
+    assert 'not found' in error.lower()
+    assert media_rows(db)[0]['Status'] == 'Pending'
+
+
+def test_unknown_upload_is_not_found(uploads, db):
+    body = wav(4096)
+    _, upload = UploadService.create_presigned_upload(USER_ID, 'track.wav', 'audio/wav', len(body))
+    post_upload(upload, body)
+
+    never_issued = f"media/artists/{USER_ID}/0123456789abcdef/track.wav"
+    assert UploadService.complete_presigned_upload(USER_ID, never_issued) == (False, "Upload not found")
+    # Another user's key is outside this user's prefix
+    assert UploadService.complete_presigned_upload(USER_ID + 1, upload['key']) == (False, "Upload not found")
+    assert media_rows(db)[0]['Status'] == 'Pending'
@@ -0,0 +1,100 @@
+"""
+RecentPlaysCache buffers checked against the listener's plays in PlayHistory
+"""
+import time
+
+from app.users.recent import FIELDS, RecentPlaysCache
+
+
+def play(history_id):
+    return dict.fromkeys(FIELDS, None) | {'HistoryID': history_id, 'SongID': 100 + history_id}
+
+
+def loaded(cache, user_id, history_ids):
+    """Load a buffer the way get_play_history does; returns its version"""
+    version = (len(history_ids), max(history_ids, default=None))
+    cache.begin_load(user_id)
+    cache.load(user_id, [play(history_id) for history_id in sorted(history_ids, reverse=True)], version)
+    return version
+
+
+def ids(page):
+    return [row['HistoryID'] for row in page] if page is not None else None
+
+
+def test_buffer_is_served_while_the_version_matches():
+    cache = RecentPlaysCache(size=5)
+    version = loaded(cache, 1, [10, 20, 30])
+
+    assert ids(cache.get(1, 2, 0, version)) == [30, 20]
+    assert ids(cache.get(1, 5, 1, version)) == [20, 10]
+
+
+def test_play_recorded_by_another_worker_drops_the_buffer():
+    cache = RecentPlaysCache(size=5)
+    loaded(cache, 1, [10, 20])
+
+    assert cache.get(1, 5, 0, (3, 40)) is None
+    assert cache.get_stats()['outdated'] == 1
+    assert cache.get_stats()['listeners'] == 0
+
+
+def test_plays_recorded_here_keep_the_buffer_current():
+    cache = RecentPlaysCache(size=5)
+    loaded(cache, 1, [10, 20])
+
+    cache.add(1, 40, play(40))
+    cache.add(1, 50, None)  # recorded, but not listed
+
+    assert ids(cache.get(1, 5, 0, (4, 50))) == [40, 20, 10]
+
+
+def test_play_recorded_elsewhere_in_between_is_caught_by_the_count():
+    cache = RecentPlaysCache(size=5)
+    loaded(cache, 1, [10, 20])
+
+    # Another worker recorded 30, this one 40
+    cache.add(1, 40, play(40))
+
+    assert cache.get(1, 5, 0, (4, 40)) is None
+
+
+def test_deleted_account_on_another_worker_drops_the_buffer():
+    cache = RecentPlaysCache(size=5)
+    loaded(cache, 1, [10, 20])
+
+    assert cache.get(1, 5, 0, (0, None)) is None
+
+
+def test_buffers_expire_after_the_ttl(monkeypatch):
+    cache = RecentPlaysCache(size=5, ttl=60)
+    version = loaded(cache, 1, [10])
+    now = time.monotonic()
+
+    monkeypatch.setattr(time, 'monotonic', lambda: now + 59)
+    assert ids(cache.get(1, 5, 0, version)) == [10]
+    monkeypatch.setattr(time, 'monotonic', lambda: now + 61)
+    assert cache.get(1, 5, 0, version) is None
+
+
+def test_play_during_a_load_discards_it():
+    cache = RecentPlaysCache(size=5)
+    cache.begin_load(1)
+    cache.add(1, 30, play(30))
+    cache.load(1, [play(20), play(10)], (2, 20))
+
+    assert cache.get(1, 5, 0, (2, 20)) is None
+    assert cache.get_stats()['stale_loads'] == 1
+
+
+def test_eviction_and_forget_drop_versions_too():
+    cache = RecentPlaysCache(size=5, max_plays=4)
+    loaded(cache, 1, [1, 2])
+    loaded(cache, 2, [3, 4])
+    version = loaded(cache, 3, [5, 6])
+
+    assert cache.get_stats()['plays'] == 4
+    assert cache.get(1, 5, 0, (2, 2)) is None
+    cache.forget(3)
+    assert cache.get(3, 5, 0, version) is None
+    assert cache._versions.keys() == cache._buffers.keys() == {2}
@@ -0,0 +1,103 @@
+"""
+ResponseCache levels, stale-while-revalidate and key normalization
+"""
+import time
+
+from services.response_cache import ResponseCache, normalize_params
+
+
+class Origin:
+    """fetch() stand-in returning the next scripted value (None for a failure)"""
+
+    def __init__(self, *values):
+        self.values = list(values)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.values.pop(0)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_fresh_entries_are_served_from_memory():
+    cache = ResponseCache(ttls={'search': 60})
+    origin = Origin({'page': 1})
+
+    assert cache.get_or_fetch('search', {'search': 'rock'}, origin) == {'page': 1}
+    assert cache.get_or_fetch('search', {'search': 'rock'}, origin) == {'page': 1}
+    assert origin.calls == 1
+    assert cache.get_stats()['hits_memory'] == 1
+
+
+def test_stale_entry_is_served_while_one_refresh_replaces_it():
+    cache = ResponseCache(ttls={'search': 0}, stale_ttl=60)
+    origin = Origin('old', 'new')
+
+    assert cache.get_or_fetch('search', {'search': 'rock'}, origin) == 'old'
+    assert cache.get_or_fetch('search', {'search': 'rock'}, origin) == 'old'
+    wait_for(lambda: cache.get_stats()['refreshes'] == 1)
+
+    assert cache.get_or_fetch('search', {'search': 'rock'}, lambda: 'newer') == 'new'
+    assert origin.calls == 2
+    assert cache.get_stats()['stale_served'] == 2
+
+
+def test_failed_refresh_keeps_the_stale_entry():
+    cache = ResponseCache(ttls={'search': 0}, stale_ttl=60)
+
+    cache.get_or_fetch('search', {}, Origin('old'))
+    assert cache.get_or_fetch('search', {}, Origin(None)) == 'old'
+    wait_for(lambda: cache.get_stats()['refresh_failures'] == 1)
+
+    assert cache.get_or_fetch('search', {}, Origin(None)) == 'old'
+
+
+def test_expired_entry_is_returned_only_when_the_refetch_fails():
+    cache = ResponseCache(ttls={'search': 0}, stale_ttl=0)
+
+    cache.get_or_fetch('search', {}, Origin('old'))
+    assert cache.get_or_fetch('search', {}, Origin(None)) == 'old'
+    assert cache.get_or_fetch('search', {}, Origin('new')) == 'new'
+    stats = cache.get_stats()
+    assert (stats['fetch_failures'], stats['expired_served'], stats['misses']) == (1, 1, 3)
+
+
+def test_sqlite_level_survives_a_new_instance(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    ResponseCache(path=path, ttls={'genre': 60}).get_or_fetch('genre', {'tags': 'jazz'}, Origin([1, 2]))
+
+    cache = ResponseCache(path=path, ttls={'genre': 60})
+    origin = Origin(None)
+
+    assert cache.get_or_fetch('genre', {'tags': 'jazz'}, origin) == [1, 2]
+    assert cache.get_or_fetch('genre', {'tags': 'jazz'}, origin) == [1, 2]
+    assert origin.calls == 0
+    stats = cache.get_stats()
+    assert (stats['hits_disk'], stats['hits_memory'], stats['disk_entries']) == (1, 1, 1)
+
+
+def test_put_get_and_invalidate_reach_both_levels(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    cache = ResponseCache(path=path)
+    cache.put('track', {'id': '7'}, {'id': 7})
+
+    assert ResponseCache(path=path).get('track', {'id': '7'}) == {'id': 7}
+    cache.invalidate('track', {'id': '7'})
+    assert cache.get('track', {'id': '7'}) is None
+    assert ResponseCache(path=path).get('track', {'id': '7'}) is None
+
+
+def test_normalize_params_folds_search_text_only():
+    assert normalize_params({'search': '  Rock   Ballads ', 'limit': 20, 'offset': None}) == \
+        normalize_params({'limit': 20, 'search': 'rock ballads'})
+    assert normalize_params({'tags': 'Jazz'}) == normalize_params({'tags': 'jazz'})
+
+    assert normalize_params({'namesearch': 'ABBA'}) != normalize_params({'namesearch': 'abba'})
+    assert normalize_params({'audioformat': 'MP32'}) != normalize_params({'audioformat': 'mp32'})
+    assert normalize_params({'id': ' 1  2 '}) == normalize_params({'id': '1 2'})
@@ -0,0 +1,104 @@
+"""
+S3Service.upload_stream against moto's S3
+"""
+import io
+import time
+import hashlib
+import threading
+import pytest
+
+from services.s3_service import MIN_PART_SIZE, UploadTooLargeError
+from conftest import TEST_BUCKET, list_keys, open_multipart_uploads
+
+
+PART = MIN_PART_SIZE
+
+
+class FailingStream(io.RawIOBase):
+    """Yields `good` bytes, then raises as a dropped client connection would"""
+
+    def __init__(self, good):
+        self.remaining = good
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.remaining <= 0:
+            raise IOError("client disconnected")
+        n = min(len(buffer), self.remaining)
+        buffer[:n] = b'x' * n
+        self.remaining -= n
+        return n
+
+
+def test_small_body_is_a_single_put(s3):
+    result = s3.upload_stream(io.BytesIO(b'hello'), 'media/small.mp3', content_type='audio/mpeg')
+
+    assert result['success'] and result['parts'] == 1 and result['size'] == 5
+    body = s3.s3_client.get_object(Bucket=TEST_BUCKET, Key='media/small.mp3')
+    assert body['Body'].read() == b'hello'
+    assert body['ContentType'] == 'audio/mpeg'
+
+
+def test_large_body_goes_up_in_parts(s3):
+    data = bytes(range(256)) * (PART * 2 // 256 + 1000)
+    hasher = hashlib.sha256()
+
+    result = s3.upload_stream(io.BytesIO(data), 'media/large.flac', part_size=PART, max_concurrency=2, hasher=hasher)
+
+    assert result['success']
+    assert result['parts'] == 3
+    assert result['size'] == len(data)
+    assert hasher.hexdigest() == hashlib.sha256(data).hexdigest()
+    assert s3.s3_client.get_object(Bucket=TEST_BUCKET, Key='media/large.flac')['Body'].read() == data
+    assert open_multipart_uploads(s3) == []
+
+
+def test_body_over_max_content_length_is_rejected(s3):
+    max_bytes = PART + 100      # as passed from MAX_CONTENT_LENGTH by the upload routes
+
+    with pytest.raises(UploadTooLargeError):
+        s3.upload_stream(io.BytesIO(b'x' * (PART * 2)), 'media/too-big.wav', part_size=PART, max_bytes=max_bytes)
+
+    assert list_keys(s3) == []
+    assert open_multipart_uploads(s3) == []
+
+
+def test_small_body_over_max_content_length_is_rejected(s3):
+    with pytest.raises(UploadTooLargeError):
+        s3.upload_stream(io.BytesIO(b'x' * 2000), 'media/too-big.mp3', max_bytes=1000)
+
+    assert list_keys(s3) == []
+
+
+def test_mid_stream_failure_aborts_after_parts_settle(s3, monkeypatch):
+    """Parts still uploading when the body fails finish before the upload is aborted"""
+    events = []
+    lock = threading.Lock()
+    upload_part = s3._upload_part
+    abort_multipart = s3.abort_multipart
+
+    def slow_upload_part(*args):
+        time.sleep(0.2)
+        result = upload_part(*args)
+        with lock:
+            events.append('part')
+        return result
+
+    def recording_abort(*args):
+        with lock:
+            events.append('abort')
+        abort_multipart(*args)
+
+    monkeypatch.setattr(s3, '_upload_part', slow_upload_part)
+    monkeypatch.setattr(s3, 'abort_multipart', recording_abort)
+
+    result = s3.upload_stream(FailingStream(PART * 2 + 10), 'media/broken.flac', part_size=PART, max_concurrency=2)
+
+    assert not result['success']
+    assert 'client disconnected' in result['error']
+    assert events[-1] == 'abort' and events.count('abort') == 1
+    assert events.count('part') == 2
+    assert list_keys(s3) == []
+    assert open_multipart_uploads(s3) == []
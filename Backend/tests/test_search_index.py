@@ -0,0 +1,92 @@
+"""
+SearchIndex queries over merged and delta documents, and SearchService failure handling
+"""
+import pytest
+
+import app.search.services as search_services
+from app.search.index import SearchIndex
+from app.search.services import SearchService
+
+
+def song(id, title, plays=0):
+    return {
+        'kind': 'song', 'id': id, 'title': title, 'subtitle': None,
+        'fields': {'title': title}, 'plays': plays, 'artist_id': 1
+    }
+
+
+def ids(hits):
+    return [hit['id'] for hit in hits]
+
+
+def test_conjunctive_query_when_upserts_reorder_the_term_lists():
+    index = SearchIndex().load([song(1, 'alpha beta'), song(2, 'alpha gamma'), song(3, 'alpha delta')])
+    # 'beta' now has more postings than 'alpha' overall, but only one merged
+    for id in range(10, 15):
+        index.upsert(song(id, 'beta beta'))
+    index.upsert(song(20, 'alpha beta x'))
+
+    hits = index.search('alpha beta')
+
+    assert set(ids(hits)[:2]) == {1, 20}
+    assert set(ids(hits)) == {1, 2, 3, 10, 11, 12, 13, 14, 20}
+
+
+def test_conjunctive_query_after_merge():
+    index = SearchIndex(merge_threshold=3).load([song(1, 'alpha beta'), song(2, 'alpha')])
+    for id in range(10, 16):
+        index.upsert(song(id, 'beta'))
+    index.upsert(song(20, 'alpha beta'))
+    index.remove('song', 1)
+
+    assert ids(index.search('alpha beta', limit=1)) == [20]
+
+
+def test_failed_update_is_logged_not_raised(monkeypatch, capsys):
+    def broken():
+        raise RuntimeError("connection pool exhausted")
+
+    monkeypatch.setattr(search_services, 'get_db_connection', broken)
+    service = SearchService(rebuild_interval=0)
+    index = SearchIndex().load([song(1, 'alpha')])
+
+    service._apply(index, 'song', 1)
+
+    assert 'Search index update failed for song 1' in capsys.readouterr().out
+    assert ids(index.search('alpha')) == [1]
+
+
+def test_failed_rebuild_is_reported_not_raised(monkeypatch):
+    def broken():
+        raise RuntimeError("connection pool exhausted")
+
+    monkeypatch.setattr(search_services, 'get_db_connection', broken)
+    service = SearchService(rebuild_interval=0)
+
+    success, message = service.rebuild()
+
+    assert not success
+    assert 'connection pool exhausted' in message
+    # The next rebuild is not blocked by the failed one
+    assert service.rebuild()[1] == message
+
+
+@pytest.mark.parametrize('hook', ['song', 'artwork', 'artist', 'user'])
+def test_hooks_survive_unexpected_errors(monkeypatch, hook):
+    class Connection:
+        def cursor(self, *args):
+            return self
+
+        def execute(self, *args):
+            raise ValueError("unexpected row")
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(search_services, 'get_db_connection', Connection)
+    service = SearchService(rebuild_interval=0)
+    service._index = SearchIndex().load([song(1, 'alpha')])
+
+    getattr(service, f"{hook}_changed")(1)
+
+    assert ids(service._index.search('alpha')) == [1]
@@ -0,0 +1,58 @@
+"""
+SegmentCache on a directory shared by several worker processes
+"""
+import os
+import time
+
+from services.segment_cache import STALE_PART_SECONDS, SegmentCache
+
+
+class Origin:
+    def __init__(self, data):
+        self.data = data
+
+    def get_range(self, s3_key, start, end):
+        return self.data[start:end + 1]
+
+
+def write(path, data, age=0):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    if age:
+        mtime = time.time() - age
+        os.utime(path, (mtime, mtime))
+
+
+def test_startup_keeps_other_workers_downloads_and_sweeps_abandoned_ones(tmp_path):
+    segment = tmp_path / 'ab' / 'abcdef' / '0'
+    in_progress = tmp_path / 'ab' / 'abcdef' / '4242-x1.part'
+    abandoned = tmp_path / 'ab' / 'abcdef' / '4243-x2.part'
+    write(segment, b'x' * 10)
+    write(in_progress, b'y' * 5)
+    write(abandoned, b'z' * 5, age=STALE_PART_SECONDS + 60)
+
+    cache = SegmentCache(str(tmp_path), segment_size=10, max_bytes=100, origin=Origin(b''))
+
+    assert in_progress.exists()
+    assert not abandoned.exists()
+    assert cache.get_stats()['segments'] == 1
+    assert cache.get_stats()['size_bytes'] == 10
+
+
+def test_downloads_are_written_under_the_process_id(tmp_path, monkeypatch):
+    cache = SegmentCache(str(tmp_path), segment_size=4, max_bytes=100, origin=Origin(b'abcdefgh'))
+    names = []
+    replace = os.replace
+
+    def record(src, dst):
+        names.append(os.path.basename(src))
+        replace(src, dst)
+
+    monkeypatch.setattr(os, 'replace', record)
+    path, hit = cache.get_segment('song.mp3', {'etag': '"e"', 'size': 8}, 1, prefetch=False)
+
+    assert not hit
+    with open(path, 'rb') as f:
+        assert f.read() == b'efgh'
+    assert names[0].startswith(f"{os.getpid()}-") and names[0].endswith('.part')
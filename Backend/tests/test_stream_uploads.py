@@ -0,0 +1,94 @@
+"""
+UploadService.stream_upload: where streamed files land and how they are recorded
+"""
+import io
+from datetime import timedelta
+
+import pymysql
+import pytest
+
+import app.uploads.services as upload_services
+from app.uploads.gc import MediaGarbageCollector
+from app.uploads.services import UploadService
+from conftest import list_keys, query, wav
+
+
+USER_ID = 7
+
+
+@pytest.fixture
+def uploads(s3, db, monkeypatch):
+    monkeypatch.setattr(upload_services, 's3_service', s3)
+    monkeypatch.setattr(upload_services, 'get_db_connection', db)
+    return s3
+
+
+def stream(body, folder=None, filename='track.wav'):
+    return UploadService.stream_upload(
+        USER_ID, io.BytesIO(body), filename, folder=folder,
+        content_type='audio/wav', content_length=len(body)
+    )
+
+
+def test_upload_lands_under_the_users_prefix_and_is_recorded(uploads, db):
+    body = wav(4096)
+
+    success, result = stream(body, folder='songs')
+
+    assert success, result
+    prefix, random_id, name = result['key'].rsplit('/', 2)
+    assert prefix == f"media/artists/{USER_ID}/songs"
+    assert len(random_id) == 32 and name == 'track.wav'
+    assert list_keys(uploads) == [result['key']]
+    rows = query(db, "SELECT MediaID, ObjectKey, Status, SizeBytes, MediaFormat FROM MediaObject")
+    assert rows == [{'MediaID': result['media_id'], 'ObjectKey': result['key'], 'Status': 'Ready',
+                     'SizeBytes': len(body), 'MediaFormat': 'wav'}]
+
+
+@pytest.mark.parametrize('folder', ['cas/ab', 'staging', 'media/artists/8'])
+def test_folder_cannot_reach_shared_or_foreign_keys(uploads, db, folder):
+    shared = 'cas/ab/' + 'ab' * 32
+    uploads.s3_client.put_object(Bucket=uploads.bucket_name, Key=shared, Body=b'shared blob')
+
+    success, result = stream(wav(4096), folder=folder, filename='ab' * 32)
+
+    assert success, result
+    assert result['key'].startswith(f"media/artists/{USER_ID}/{folder}/")
+    blob = uploads.s3_client.get_object(Bucket=uploads.bucket_name, Key=shared)['Body'].read()
+    assert blob == b'shared blob'
+
+
+def test_same_name_twice_keeps_both_files(uploads, db):
+    first = stream(wav(4096))[1]
+    second = stream(wav(8192))[1]
+
+    assert first['key'] != second['key']
+    assert len(list_keys(uploads)) == 2
+
+
+def test_recorded_upload_is_not_garbage(uploads, db, monkeypatch):
+    _, result = stream(wav(4096))
+    list_files = uploads.list_files
+
+    def aged(prefix=''):
+        for page in list_files(prefix):
+            yield [dict(obj, last_modified=obj['last_modified'] - timedelta(days=2)) for obj in page]
+
+    monkeypatch.setattr(uploads, 'list_files', aged)
+    report = MediaGarbageCollector(storage=uploads, connect=db).run()
+
+    assert report['orphaned_objects'] == 0
+    assert list_keys(uploads) == [result['key']]
+
+
+def test_failed_insert_removes_the_object(uploads, monkeypatch):
+    def broken():
+        raise pymysql.Error("database unavailable")
+
+    monkeypatch.setattr(upload_services, 'get_db_connection', broken)
+
+    success, error = stream(wav(4096))
+
+    assert not success
+    assert 'Database error' in error
+    assert not list_keys(uploads)
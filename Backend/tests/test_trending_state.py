@@ -0,0 +1,82 @@
+"""
+TrendingService saves from several worker processes sharing one state path
+"""
+import os
+import sys
+import json
+import time
+import subprocess
+
+import pytest
+
+from app.recommendations.services import TrendingService
+
+
+@pytest.fixture
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def service(tmp_path, plays=()):
+    trending = TrendingService(path=str(tmp_path / 'music-trending.json'))
+    for song_id in plays:
+        trending.record_play(song_id)
+    return trending
+
+
+def counted(trending):
+    """(plays, songs) of the 24h window"""
+    entries, plays = trending.windows['24h'].top(10, time.time())
+    return plays, sorted(song_id for song_id, _, _ in entries)
+
+
+def saved(tmp_path):
+    return sorted(path.name for path in tmp_path.iterdir())
+
+
+def test_each_process_saves_its_own_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(os, 'getpid', lambda: 1001)
+    assert service(tmp_path, [1, 1]).save()[0]
+    monkeypatch.setattr(os, 'getpid', lambda: 1002)
+    assert service(tmp_path, [2]).save()[0]
+
+    assert saved(tmp_path) == ['music-trending.1001.json', 'music-trending.1002.json']
+    with open(tmp_path / 'music-trending.1001.json') as f:
+        assert json.load(f)['windows']
+
+
+def test_new_process_takes_over_the_file_of_an_exited_one(tmp_path, monkeypatch, dead_pid):
+    monkeypatch.setattr(os, 'getpid', lambda: dead_pid)
+    service(tmp_path, [1, 1, 2]).save()
+    monkeypatch.undo()
+
+    restarted = service(tmp_path)
+    assert restarted.load()
+    assert counted(restarted) == (3, [1, 2])
+    assert saved(tmp_path) == [f"music-trending.{os.getpid()}.json"]
+
+    # The file is taken: a second new worker starts empty
+    monkeypatch.setattr(os, 'getpid', lambda: os.getppid())
+    assert not service(tmp_path).load()
+
+
+def test_files_of_running_processes_are_left_alone(tmp_path, monkeypatch):
+    monkeypatch.setattr(os, 'getpid', lambda: os.getppid())
+    service(tmp_path, [1]).save()
+    monkeypatch.undo()
+
+    assert not service(tmp_path).load()
+    assert saved(tmp_path) == [f"music-trending.{os.getppid()}.json"]
+
+
+def test_single_file_from_older_versions_is_taken_over(tmp_path):
+    service(tmp_path, [5]).save()
+    os.rename(tmp_path / f"music-trending.{os.getpid()}.json", tmp_path / 'music-trending.json')
+
+    restarted = service(tmp_path)
+
+    assert restarted.load()
+    assert counted(restarted) == (1, [5])
+    assert saved(tmp_path) == [f"music-trending.{os.getpid()}.json"]
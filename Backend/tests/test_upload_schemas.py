@@ -0,0 +1,29 @@
+"""
+Validation of presigned upload requests against malformed JSON values
+"""
+import pytest
+
+from app.uploads.schemas import validate_presign_data
+
+
+VALID = {'filename': 'track.flac', 'content_type': 'audio/flac', 'size': 1024}
+
+
+def test_valid_request_passes():
+    assert validate_presign_data(dict(VALID)) == (True, {})
+
+
+@pytest.mark.parametrize('content_type', [['audio/flac'], {'type': 'audio/flac'}, 42, 'text/html'])
+def test_content_type_must_be_an_allowed_string(content_type):
+    is_valid, errors = validate_presign_data(dict(VALID, content_type=content_type))
+
+    assert not is_valid
+    assert 'content_type' in errors
+
+
+@pytest.mark.parametrize('size', [True, False, 1024.5, 1.0, '1024', 0, -1, None, [1024]])
+def test_size_must_be_a_positive_integer(size):
+    is_valid, errors = validate_presign_data(dict(VALID, size=size))
+
+    assert not is_valid
+    assert 'size' in errors